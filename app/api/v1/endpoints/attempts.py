@@ -0,0 +1,47 @@
+"""Step attempt endpoints"""
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.models.session import ScaffoldLevel
+from app.services.scaffold_service import ScaffoldService, format_sse, scaffold_service
+
+router = APIRouter()
+
+
+@router.get("/{attempt_id}/scaffold/stream")
+async def stream_scaffold(
+    attempt_id: UUID,
+    level: Optional[ScaffoldLevel] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Generar la ayuda socrática de un intento en streaming (SSE)
+
+    Emite eventos `token` con cada fragmento de texto según llega del
+    modelo y un evento `done` con la ayuda completa, que queda guardada en
+    el intento. Si el modelo falla a mitad se emite un evento `error` y no
+    se guarda nada.
+
+    - **level**: Nivel de ayuda (por defecto, el nivel de la sesión)
+    """
+    context = await run_in_threadpool(ScaffoldService.load_context, db, attempt_id, level)
+    events = scaffold_service.stream(context)
+    # Fail with 503 (not a broken stream) when the provider is down from the start
+    first = await anext(events)
+
+    async def body():
+        yield format_sse(*first)
+        async for event in events:
+            yield format_sse(*event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
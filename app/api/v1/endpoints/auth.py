@@ -1,19 +1,56 @@
 """Authentication endpoints"""
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.base import get_db
-from app.schemas.user import UserRegister, UserResponse, StudentResponse, TeacherResponse
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.base import get_async_db, get_db
+from app.schemas.user import (
+    StudentResponse,
+    TeacherResponse,
+    Token,
+    UserLogin,
+    UserRegister,
+    UserResponse,
+)
 from app.services.auth_service import AuthService
-from app.models.user import UserRole
+from app.models.user import User, UserRole
 
 router = APIRouter()
 
 
+def _to_response(user: User) -> UserResponse:
+    """Return appropriate response based on role"""
+    if user.role == UserRole.STUDENT:
+        return StudentResponse.model_validate(user)
+    else:
+        return TeacherResponse.model_validate(user)
+
+
+def _token_for(user: Optional[User]) -> Token:
+    """Issue an access token, or reject the credentials"""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email o contraseña incorrectos",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Token(access_token=create_access_token(
+        {"sub": str(user.id), "email": user.email, "role": user.role.value}))
+
+
+# Async sessions when DATABASE_DRIVER is asyncpg; sync ones run in the threadpool
+_get_session = get_async_db if settings.USE_ASYNC_DATABASE else get_db
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: Union[AsyncSession, Session] = Depends(_get_session)
 ):
     """
     Registrar un nuevo usuario (alumno o profesor)
@@ -24,10 +61,30 @@ def register_user(
 
     Retorna el usuario creado con su información básica.
     """
-    user = AuthService.register_user(db, user_data)
+    if isinstance(db, AsyncSession):
+        user = await AuthService.register_user_async(db, user_data)
+    else:
+        user = await run_in_threadpool(AuthService.register_user, db, user_data)
+    return _to_response(user)
 
-    # Return appropriate response based on role
-    if user.role == UserRole.STUDENT:
-        return StudentResponse.model_validate(user)
+
+@router.post("/login", response_model=Token)
+async def login(
+    credentials: UserLogin,
+    request: Request,
+    db: Union[AsyncSession, Session] = Depends(_get_session)
+):
+    """
+    Iniciar sesión con email y contraseña
+
+    Tras demasiados intentos para un mismo email o dirección se responde
+    429 con Retry-After, sin comprobar la contraseña.
+    """
+    ip = request.client.host if request.client else None
+    if isinstance(db, AsyncSession):
+        user = await AuthService.authenticate_user_async(
+            db, credentials.email, credentials.password, ip=ip)
     else:
-        return TeacherResponse.model_validate(user)
+        user = await run_in_threadpool(
+            AuthService.authenticate_user, db, credentials.email, credentials.password, ip)
+    return _token_for(user)
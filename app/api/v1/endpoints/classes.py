@@ -0,0 +1,83 @@
+"""Class management endpoints"""
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.models.class_model import Class
+from app.models.skill import SkillStatus
+from app.schemas.roster import RosterImportRequest, RosterImportResponse
+from app.schemas.skill_tree import ClassUnlockRecalculationResponse, StudentUnlockChanges
+from app.services.roster_service import RosterService
+from app.services.skill_state_cache import skill_state_cache
+from app.services.skill_tree_service import SkillTreeService
+
+router = APIRouter()
+
+
+@router.post("/{class_id}/roster", response_model=RosterImportResponse)
+def import_roster(
+    class_id: UUID,
+    roster: RosterImportRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Importar el listado de alumnos de una clase (JSON)
+
+    - **students**: Lista de alumnos con `email` y `password`
+
+    Crea las cuentas de alumno, las asigna al profesor de la clase y las
+    inscribe en ella. Las filas inválidas se reportan en `errors` sin
+    detener la importación del resto.
+    """
+    return RosterService.import_students(db, class_id, roster.students)
+
+
+@router.post("/{class_id}/roster/csv", response_model=RosterImportResponse)
+def import_roster_csv(
+    class_id: UUID,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Importar el listado de alumnos de una clase (CSV)
+
+    - **file**: CSV con columnas `email` y `password`
+
+    Mismo comportamiento que la importación JSON.
+    """
+    rows = RosterService.parse_csv(file.file.read())
+    return RosterService.import_students(db, class_id, rows)
+
+
+@router.post("/{class_id}/skills/recalculate", response_model=ClassUnlockRecalculationResponse)
+def recalculate_class_skills(
+    class_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """
+    Recalcular el desbloqueo de habilidades de toda la clase
+
+    Tras editar el árbol de habilidades, pasa a AVAILABLE las habilidades
+    cuyos prerrequisitos están dominados y vuelve a bloquear las que ya no
+    los cumplen. Las habilidades en progreso o dominadas no cambian.
+    """
+    if db.get(Class, class_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Clase no encontrada",
+        )
+
+    changes = SkillTreeService.recalculate_class(db, class_id)
+    db.commit()
+    skill_state_cache.apply_statuses(changes)
+
+    statuses = [new_status for student in changes.values() for new_status in student.values()]
+    return ClassUnlockRecalculationResponse(
+        class_id=class_id,
+        unlocked=statuses.count(SkillStatus.AVAILABLE),
+        locked=statuses.count(SkillStatus.LOCKED),
+        students=[StudentUnlockChanges(student_id=student_id, changes=student_changes)
+                  for student_id, student_changes in changes.items()],
+    )
@@ -0,0 +1,75 @@
+"""Teacher endpoints"""
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.models.user import Teacher
+from app.schemas.rag import NotionSyncStatus
+from app.schemas.scaffold import ScaffoldCacheSettings
+from app.services.rag import notion_sync_jobs
+from app.services.scaffold_cache import scaffold_cache
+
+router = APIRouter()
+
+
+@router.post("/{teacher_id}/sync-notion", response_model=NotionSyncStatus,
+             status_code=status.HTTP_202_ACCEPTED)
+def sync_notion(
+    teacher_id: UUID,
+    force: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Sincronizar los apuntes de Notion del profesor con el RAG
+
+    Encola una sincronización en segundo plano de `notion_page_ids`. Solo
+    se vuelven a vectorizar los bloques que cambiaron desde la última
+    sincronización; con **force** se vectoriza todo de nuevo. Si ya hay una
+    sincronización en curso se devuelve su estado.
+    """
+    if db.get(Teacher, teacher_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profesor no encontrado",
+        )
+    return notion_sync_jobs.submit(teacher_id, force=force)
+
+
+@router.get("/{teacher_id}/sync-status", response_model=NotionSyncStatus)
+def sync_status(teacher_id: UUID):
+    """Estado de la última sincronización de Notion del profesor"""
+    job = notion_sync_jobs.status(teacher_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hay sincronizaciones de este profesor",
+        )
+    return job
+
+
+@router.put("/{teacher_id}/scaffold-cache", response_model=ScaffoldCacheSettings)
+def update_scaffold_cache(
+    teacher_id: UUID,
+    cache_settings: ScaffoldCacheSettings,
+    db: Session = Depends(get_db)
+):
+    """
+    Activar o desactivar la reutilización de ayudas generadas
+
+    Con la caché activa, alumnos que cometen el mismo error en el mismo paso
+    reciben la ayuda ya generada para otro alumno. Al desactivarla se borran
+    las ayudas guardadas de los problemas del profesor.
+    """
+    teacher = db.get(Teacher, teacher_id)
+    if teacher is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profesor no encontrado",
+        )
+    teacher.scaffold_cache_enabled = cache_settings.enabled
+    db.commit()
+    if not cache_settings.enabled:
+        scaffold_cache.invalidate_teacher(teacher_id)
+    return ScaffoldCacheSettings(enabled=teacher.scaffold_cache_enabled)
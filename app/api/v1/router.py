@@ -1,16 +1,18 @@
 """Main API router"""
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth
+from app.api.v1.endpoints import attempts, auth, classes, teacher
 
 api_router = APIRouter()
 
 # Include endpoint routers
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(classes.router, prefix="/classes", tags=["classes"])
+api_router.include_router(teacher.router, prefix="/teacher", tags=["teacher"])
+api_router.include_router(attempts.router, prefix="/attempts", tags=["attempts"])
 
 # Placeholder for future endpoint routers
 # api_router.include_router(problems.router, prefix="/problems", tags=["problems"])
 # api_router.include_router(skills.router, prefix="/skills", tags=["skills"])
-# api_router.include_router(teacher.router, prefix="/teacher", tags=["teacher"])
 
 
 @api_router.get("/")
@@ -50,35 +50,198 @@ class Settings(BaseSettings):
             path=f"{values.get('POSTGRES_DB') or ''}",
         ).unicode_string()
 
+    # Database driver: "psycopg2" (sync sessions) or "asyncpg" (async sessions)
+    DATABASE_DRIVER: str = "psycopg2"
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+
+    @field_validator("DATABASE_DRIVER")
+    @classmethod
+    def validate_database_driver(cls, v: str) -> str:
+        if v not in ("psycopg2", "asyncpg"):
+            raise ValueError("DATABASE_DRIVER must be 'psycopg2' or 'asyncpg'")
+        return v
+
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """DATABASE_URL rewritten for the asyncpg driver"""
+        url = str(self.DATABASE_URL)
+        _, _, rest = url.partition("://")
+        return f"postgresql+asyncpg://{rest}"
+
+    @property
+    def USE_ASYNC_DATABASE(self) -> bool:
+        """Whether endpoints should use async database sessions"""
+        return self.DATABASE_DRIVER == "asyncpg"
+
     # ChromaDB
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8000
     CHROMA_COLLECTION_NAME: str = "elenchos_rag"
 
+    # Embeddings (RAG)
+    EMBEDDING_MODEL_NAME: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_MODEL_VERSION: str = "1"  # bump when the model files change to drop cached vectors
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_WAIT_MS: float = 5.0
+    EMBEDDING_QUEUE_DEPTH: int = 1024
+    EMBEDDING_TIMEOUT_SECONDS: float = 10.0
+    EMBEDDING_TORCH_THREADS: int = 0  # 0 = torch default
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 20000
+    EMBEDDING_DISK_CACHE_DIR: str = ""  # empty = memory tier only
+
+    # Vector store and Notion ingestion (RAG)
+    VECTOR_STORE_BACKEND: str = "chroma"  # "chroma", "local" (mmap files) or "memory" (single process only)
+    VECTOR_STORE_DIR: str = "var/vector_store"  # local backend: one collection per teacher
+    VECTOR_STORE_DTYPE: str = "float32"  # local backend: "float32" (exact), "float16" or "int8" (smaller)
+    VECTOR_STORE_MAX_SEGMENTS: int = 16  # local backend: upsert segments kept before compaction
+    RAG_CHUNK_MAX_CHARS: int = 1000
+    RAG_UPSERT_BATCH_SIZE: int = 64
+    NOTION_SOURCE: str = "api"  # "api" or "directory" (exported pages, offline)
+    NOTION_EXPORT_DIR: str = "var/notion_export"
+    NOTION_API_TIMEOUT_SECONDS: float = 10.0
+    NOTION_SYNC_WORKERS: int = 2
+    NOTION_SYNC_STATUS_TTL_SECONDS: int = 7 * 24 * 3600
+    NOTION_SYNC_LOCK_TTL_SECONDS: int = 60  # refreshed while the sync runs
+
+    # Retrieval (RAG)
+    RETRIEVAL_TOP_K: int = 3
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    RETRIEVAL_CACHE_LSH_BITS: int = 32  # fewer bits = coarser query buckets
+
+    @field_validator("VECTOR_STORE_BACKEND")
+    @classmethod
+    def validate_vector_store_backend(cls, v: str) -> str:
+        if v not in ("chroma", "local", "memory"):
+            raise ValueError("VECTOR_STORE_BACKEND must be 'chroma', 'local' or 'memory'")
+        return v
+
+    @field_validator("VECTOR_STORE_DTYPE")
+    @classmethod
+    def validate_vector_store_dtype(cls, v: str) -> str:
+        if v not in ("float32", "float16", "int8"):
+            raise ValueError("VECTOR_STORE_DTYPE must be 'float32', 'float16' or 'int8'")
+        return v
+
+    @field_validator("NOTION_SOURCE")
+    @classmethod
+    def validate_notion_source(cls, v: str) -> str:
+        if v not in ("api", "directory"):
+            raise ValueError("NOTION_SOURCE must be 'api' or 'directory'")
+        return v
+
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+    KV_BACKEND: str = "redis"  # "redis" or "memory" (single process only)
+
+    @field_validator("KV_BACKEND")
+    @classmethod
+    def validate_kv_backend(cls, v: str) -> str:
+        if v not in ("redis", "memory"):
+            raise ValueError("KV_BACKEND must be 'redis' or 'memory'")
+        return v
 
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
 
+    # Password hashing pool
+    PASSWORD_HASH_POOL_ENABLED: bool = True
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = one worker per CPU core
+    PASSWORD_HASH_QUEUE_DEPTH: int = 64
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+
     # Rate Limiting
-    RATE_LIMIT_LOGIN_ATTEMPTS: int = 5
+    RATE_LIMIT_LOGIN_ATTEMPTS: int = 5  # per email
+    RATE_LIMIT_LOGIN_ATTEMPTS_PER_IP: int = 100  # a whole classroom may share one address
     RATE_LIMIT_WINDOW_SECONDS: int = 300  # 5 minutes
 
     # AI Models
     ANTHROPIC_API_KEY: str = ""
     GOOGLE_API_KEY: str = ""
     AI_TIMEOUT_SECONDS: int = 30
+    ANTHROPIC_MODEL: str = "claude-3-haiku-20240307"
+    GOOGLE_MODEL: str = "gemini-1.5-flash"
+    SCAFFOLD_MAX_TOKENS: int = 300
+
+    # LLM provider router
+    LLM_PROVIDERS: str = "anthropic,google"  # in preference order; "fake" = offline canned text
+    LLM_MAX_CONCURRENCY: int = 16  # in-flight requests per provider
+    LLM_RATE_LIMIT_PER_SECOND: float = 5.0  # requests per provider, token-bucket refill rate
+    LLM_RATE_LIMIT_BURST: int = 20
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_DELAY_SECONDS: float = 2.0  # until a provider has enough first-token samples
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_PERCENTILE: float = 95.0
+
+    @field_validator("LLM_PROVIDERS")
+    @classmethod
+    def validate_llm_providers(cls, v: str) -> str:
+        names = [name.strip() for name in v.split(",") if name.strip()]
+        if not names or any(name not in ("anthropic", "google", "fake") for name in names):
+            raise ValueError("LLM_PROVIDERS must list 'anthropic', 'google' or 'fake'")
+        return ",".join(names)
+
+    # Scaffold cache
+    SCAFFOLD_CACHE_ENABLED: bool = True
+    SCAFFOLD_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    SCAFFOLD_CACHE_SIMILARITY: float = 0.92  # cosine similarity of answers for a semantic hit
+    SCAFFOLD_CACHE_GROUP_SIZE: int = 32  # answers kept per (problem, step, error, concept, level)
+
+    # Error diagnosis
+    DIAGNOSIS_MODEL_PATH: str = "var/models/error_classifier.joblib"
+    DIAGNOSIS_CONFIDENCE_THRESHOLD: float = 0.8  # classifier probability that skips the LLM
 
     # Docker Sandbox
     DOCKER_TIMEOUT_SECONDS: int = 1
     DOCKER_MEMORY_LIMIT: str = "256m"
     DOCKER_CPU_LIMIT: float = 1.0
 
+    # Sandbox pool
+    SANDBOX_ENABLED: bool = True
+    SANDBOX_BACKEND: str = "docker"  # "docker" or "local" (subprocess + rlimits, no isolation)
+    SANDBOX_POOL_SIZE_PYTHON: int = 4
+    SANDBOX_POOL_SIZE_CPP: int = 2
+    SANDBOX_POOL_SIZE_JAVA: int = 2
+    SANDBOX_MAX_RUNS_PER_WORKER: int = 100
+    SANDBOX_ACQUIRE_TIMEOUT_SECONDS: float = 5.0
+    SANDBOX_HEALTH_CHECK_INTERVAL_SECONDS: float = 30.0
+    SANDBOX_COMPILE_TIMEOUT_SECONDS: float = 10.0
+    SANDBOX_MAX_OUTPUT_BYTES: int = 65536
+    SANDBOX_STOP_ON_HIDDEN_FAILURE: bool = True
+
+    # Compiled artifact cache (CPP/JAVA)
+    ARTIFACT_CACHE_ENABLED: bool = True
+    ARTIFACT_CACHE_DIR: str = "var/artifact_cache"
+    ARTIFACT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Submission verdict cache
+    VERDICT_CACHE_ENABLED: bool = True
+    VERDICT_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+
+    @field_validator("SANDBOX_BACKEND")
+    @classmethod
+    def validate_sandbox_backend(cls, v: str) -> str:
+        if v not in ("docker", "local"):
+            raise ValueError("SANDBOX_BACKEND must be 'docker' or 'local'")
+        return v
+
+    # Math verification
+    MATH_MAX_EXPRESSION_LENGTH: int = 500
+    MATH_PARSE_TIMEOUT_SECONDS: float = 0.5
+    MATH_SYMBOLIC_TIMEOUT_SECONDS: float = 2.0
+    MATH_NUMERIC_SAMPLES: int = 32
+    MATH_CACHE_MAX_ENTRIES: int = 10000
+    MATH_POOL_ENABLED: bool = True
+    MATH_POOL_WORKERS: int = 2
+    MATH_WORKER_MEMORY_MB: int = 512  # 0 = no limit
+    MATH_WORKER_MAX_TASKS: int = 1000
+
     # BKT Parameters
     BKT_P_L0: float = 0.1  # Initial knowledge probability
     BKT_P_T: float = 0.3   # Learning probability
@@ -86,6 +249,17 @@ class Settings(BaseSettings):
     BKT_P_G: float = 0.2   # Guess probability
     BKT_MASTERY_THRESHOLD: float = 0.7
 
+    # BKT write-behind cache
+    BKT_FLUSH_INTERVAL_SECONDS: float = 5.0
+    BKT_FLUSH_MAX_BATCH: int = 500
+    BKT_CACHE_TTL_SECONDS: int = 24 * 60 * 60  # cached states in the shared key-value store
+    BKT_JOURNAL_PATH: str = "var/bkt_journal.log"  # one file per process: <name>.<pid>.log
+    BKT_JOURNAL_FSYNC: bool = True
+    BKT_JOURNAL_FSYNC_INTERVAL_SECONDS: float = 0.1  # group commit by the flush thread
+
+    # Skill tree index
+    SKILL_GRAPH_TTL_SECONDS: float = 300.0
+
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
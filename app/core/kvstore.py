@@ -0,0 +1,180 @@
+"""Shared key-value store (Redis, with an in-memory stand-in)"""
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Optional, Set
+
+from app.core.config import settings
+
+
+# Compare-and-delete: releases a lock only if this owner still holds it
+DELETE_IF_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class MemoryStore:
+    """
+    Process-local store with the subset of Redis commands used by the app
+
+    Used when KV_BACKEND is "memory" (development and tests); entries are
+    not shared between processes.
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[object, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[object]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.monotonic() + ttl if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._live(key)
+            return value if isinstance(value, bytes) else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, self._expiry(ttl))
+
+    def set_nx(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._values[key] = (value, self._expiry(ttl))
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._values.pop(key, None) is not None for key in keys)
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            if self._live(key) != value:
+                return False
+            del self._values[key]
+            return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._live(key)
+            count = int(value) + 1 if isinstance(value, bytes) else 1
+            expires_at = self._values[key][1] if value is not None else None
+            self._values[key] = (str(count).encode(), expires_at)
+            return count
+
+    def update(self, key: str, func: Callable[[Optional[bytes]], Optional[bytes]],
+               ttl: Optional[float] = None) -> Optional[bytes]:
+        with self._lock:
+            current = self._live(key)
+            value = func(current if isinstance(current, bytes) else None)
+            if value is not None:
+                self._values[key] = (value, self._expiry(ttl))
+            return value
+
+    def sadd(self, key: str, *members: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            current = self._live(key)
+            members_set = set(current) if isinstance(current, set) else set()
+            members_set.update(members)
+            self._values[key] = (members_set, self._expiry(ttl))
+
+    def smembers(self, key: str) -> Set[str]:
+        with self._lock:
+            value = self._live(key)
+            return set(value) if isinstance(value, set) else set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class RedisStore:
+    """Thin wrapper exposing the same commands on a Redis connection"""
+
+    def __init__(self, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            )
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def set_nx(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, nx=True, ex=int(ttl) if ttl else None))
+
+    def delete(self, *keys: str) -> int:
+        return self.client.delete(*keys) if keys else 0
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        """Delete a key only while it still holds ``value`` (e.g. a lock token)"""
+        return bool(self.client.eval(DELETE_IF_LUA, 1, key, value))
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+    def update(self, key: str, func: Callable[[Optional[bytes]], Optional[bytes]],
+               ttl: Optional[float] = None) -> Optional[bytes]:
+        """
+        Atomically replace a value with ``func(current)`` (optimistic, WATCH/MULTI)
+
+        ``func`` may run several times when other clients write the key
+        meanwhile; returning None leaves the value unchanged.
+        """
+        import redis
+        with self.client.pipeline() as pipeline:
+            while True:
+                try:
+                    pipeline.watch(key)
+                    value = func(pipeline.get(key))
+                    if value is None:
+                        pipeline.unwatch()
+                        return None
+                    pipeline.multi()
+                    pipeline.set(key, value, ex=int(ttl) if ttl else None)
+                    pipeline.execute()
+                    return value
+                except redis.WatchError:
+                    continue
+
+    def sadd(self, key: str, *members: str, ttl: Optional[float] = None) -> None:
+        pipeline = self.client.pipeline()
+        pipeline.sadd(key, *members)
+        if ttl:
+            pipeline.expire(key, int(ttl))
+        pipeline.execute()
+
+    def smembers(self, key: str) -> Set[str]:
+        return {member.decode() for member in self.client.smembers(key)}
+
+
+@lru_cache
+def get_kvstore():
+    """Shared store selected by KV_BACKEND"""
+    if settings.KV_BACKEND == "redis":
+        return RedisStore()
+    return MemoryStore()
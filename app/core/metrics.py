@@ -0,0 +1,111 @@
+"""In-process metrics registry for counters and latency summaries"""
+import threading
+from collections import deque
+from typing import Any
+
+
+class LatencySummary:
+    """Rolling latency summary backed by a bounded reservoir"""
+
+    def __init__(self, reservoir_size: int = 2048):
+        self._samples: deque[float] = deque(maxlen=reservoir_size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a new sample (seconds)"""
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float:
+        """
+        Get a percentile over the recent samples
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Percentile value, or 0.0 when there are no samples
+        """
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict[str, float]:
+        """Summarize the recorded samples"""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named counters and latency summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._gauges: dict[str, float] = {}
+        self._latencies: dict[str, LatencySummary] = {}
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a latency sample"""
+        with self._lock:
+            summary = self._latencies.get(name)
+            if summary is None:
+                summary = self._latencies[name] = LatencySummary()
+            summary.observe(seconds)
+
+    def counter(self, name: str) -> int:
+        """Get the current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def latency(self, name: str) -> dict[str, float]:
+        """Get the summary of a latency series"""
+        with self._lock:
+            summary = self._latencies.get(name)
+            return summary.snapshot() if summary else LatencySummary().snapshot()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get all metrics as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "latencies": {
+                    name: summary.snapshot()
+                    for name, summary in self._latencies.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics (used by tests)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._latencies.clear()
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
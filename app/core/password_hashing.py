@@ -0,0 +1,239 @@
+"""Bounded process pool for CPU-bound password hashing"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.security import hash_password, verify_password
+
+
+class PasswordHashingUnavailable(Exception):
+    """Raised when the hashing pool is saturated or too slow to answer"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _timed_call(func: Callable[..., Any], *args: Any) -> tuple[Any, float, float]:
+    """
+    Run a hashing function inside a worker and time it
+
+    Returns:
+        Tuple of (result, wall-clock start timestamp, elapsed seconds)
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, started_at, time.perf_counter() - start
+
+
+def _hash_chunk(passwords: list[str]) -> list[str]:
+    """Hash several passwords inside one worker call"""
+    return [hash_password(password) for password in passwords]
+
+
+class PasswordHashingPool:
+    """
+    Dedicated executor for bcrypt hashing and verification
+
+    Keeps bcrypt work off the API threadpool so that bursts of registrations
+    or logins cannot starve other requests. In-flight work is bounded by
+    ``max_workers + queue_depth``; past that, callers get
+    ``PasswordHashingUnavailable`` immediately instead of queueing forever.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        queue_depth: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.max_workers = max_workers or settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        self.queue_depth = settings.PASSWORD_HASH_QUEUE_DEPTH if queue_depth is None else queue_depth
+        self.timeout_seconds = timeout_seconds or settings.PASSWORD_HASH_TIMEOUT_SECONDS
+        self.enabled = settings.PASSWORD_HASH_POOL_ENABLED if enabled is None else enabled
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_depth)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._admitted: set[Future] = set()
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of hashing operations admitted at once"""
+        return self.max_workers + self.queue_depth
+
+    def start(self) -> None:
+        """Create the worker processes if the pool is enabled"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, future: Future) -> None:
+        """Give back the slot of an admitted job (once, whoever sees it finish first)"""
+        with self._lock:
+            if future not in self._admitted:
+                return
+            self._admitted.discard(future)
+            metrics.set_gauge("password_hash.in_flight", len(self._admitted))
+        self._slots.release()
+
+    def _submit(self, func: Callable[..., Any], *args: Any,
+                wait_seconds: Optional[float] = None) -> Future:
+        """Admit a job into the pool or fail when saturated (at once, or after ``wait_seconds``)"""
+        admitted = (self._slots.acquire(timeout=wait_seconds) if wait_seconds
+                    else self._slots.acquire(blocking=False))
+        if not admitted:
+            metrics.increment("password_hash.rejected")
+            raise PasswordHashingUnavailable(
+                "Servicio de autenticación saturado, inténtalo de nuevo en unos segundos"
+            )
+
+        self.start()
+        try:
+            future = self._executor.submit(_timed_call, func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._admitted.add(future)
+            metrics.set_gauge("password_hash.in_flight", len(self._admitted))
+        # Jobs abandoned by a timed-out caller keep their slot until they finish
+        future.add_done_callback(self._release)
+        return future
+
+    def _record(self, future: Future, submitted_at: float,
+                time_metric: str = "password_hash.hash_time") -> Any:
+        """Release a finished job's slot and record its metrics before returning its result"""
+        self._release(future)
+        try:
+            result, started_at, elapsed = future.result()
+        except Exception:
+            metrics.increment("password_hash.errors")
+            raise
+        metrics.observe("password_hash.queue_wait", max(0.0, started_at - submitted_at))
+        metrics.observe(time_metric, elapsed)
+        return result
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a job and block the calling thread until it finishes"""
+        if not self.enabled:
+            result, _, elapsed = _timed_call(func, *args)
+            metrics.observe("password_hash.hash_time", elapsed)
+            return result
+
+        submitted_at = time.time()
+        future = self._submit(func, *args)
+        if not wait([future], timeout=self.timeout_seconds).done:
+            future.cancel()
+            metrics.increment("password_hash.timeouts")
+            raise PasswordHashingUnavailable(
+                "Tiempo de espera agotado al procesar la contraseña"
+            )
+        return self._record(future, submitted_at)
+
+    async def _run_async(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a job without blocking the event loop"""
+        if not self.enabled:
+            return await asyncio.to_thread(self._run, func, *args)
+
+        submitted_at = time.time()
+        future = self._submit(func, *args)
+        done, _ = await asyncio.wait([asyncio.wrap_future(future)], timeout=self.timeout_seconds)
+        if not done:
+            future.cancel()
+            metrics.increment("password_hash.timeouts")
+            raise PasswordHashingUnavailable(
+                "Tiempo de espera agotado al procesar la contraseña"
+            )
+        return self._record(future, submitted_at)
+
+    def hash(self, password: str) -> str:
+        """Hash a password in the pool"""
+        return self._run(hash_password, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash in the pool"""
+        return self._run(verify_password, plain_password, hashed_password)
+
+    def hash_many(self, passwords: list[str], chunk_size: int = 8) -> list[str]:
+        """
+        Hash a batch of passwords in parallel across all workers
+
+        Work is submitted in windows of at most ``max_workers`` chunks, so
+        interactive hashes queued meanwhile wait for one window at most
+        instead of the whole batch. Chunks count against the same admission
+        bound as single hashes and time out like them (per hash).
+
+        Args:
+            passwords: Plain text passwords
+            chunk_size: Passwords hashed per worker call
+
+        Returns:
+            Hashes in the same order as ``passwords``
+
+        Raises:
+            PasswordHashingUnavailable: If no slot frees up or a chunk times out
+        """
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        if not self.enabled:
+            return [hashed for chunk in chunks for hashed in _hash_chunk(chunk)]
+
+        hashes: list[str] = []
+        for window_start in range(0, len(chunks), self.max_workers):
+            window = chunks[window_start:window_start + self.max_workers]
+            futures: list[tuple[Future, float]] = []
+            try:
+                for chunk in window:
+                    # Chunks take regular slots, waiting for them rather
+                    # than failing the whole batch on a burst of logins
+                    submitted_at = time.time()
+                    futures.append((
+                        self._submit(_hash_chunk, chunk, wait_seconds=self.timeout_seconds),
+                        submitted_at,
+                    ))
+                for (future, submitted_at), chunk in zip(futures, window):
+                    # A chunk does len(chunk) hashes
+                    if not wait([future], timeout=self.timeout_seconds * len(chunk)).done:
+                        metrics.increment("password_hash.timeouts")
+                        raise PasswordHashingUnavailable(
+                            "Tiempo de espera agotado al procesar las contraseñas"
+                        )
+                    hashes.extend(self._record(
+                        future, submitted_at, time_metric="password_hash.batch_chunk_time"))
+            finally:
+                for future, _ in futures:
+                    future.cancel()  # no-op for finished chunks
+        metrics.increment("password_hash.batch_hashed", len(passwords))
+        return hashes
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password in the pool from async code"""
+        return await self._run_async(hash_password, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password in the pool from async code"""
+        return await self._run_async(verify_password, plain_password, hashed_password)
+
+
+# Global hashing pool, started with the application
+password_hasher = PasswordHashingPool()
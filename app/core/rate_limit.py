@@ -0,0 +1,207 @@
+"""Sliding-window login rate limiting (Redis, with an in-memory stand-in)"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "ratelimit:login"
+
+# KEYS: one sorted set of attempt timestamps per limited identity
+# ARGV: window (ms), member for this attempt, then the limit of each key
+# Returns 0 and records the attempt, or the milliseconds until one is allowed
+SLIDING_WINDOW_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local window = tonumber(ARGV[1])
+local retry = 0
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now_ms - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[i + 2]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry = math.max(retry, tonumber(oldest[2]) + window - now_ms, 1)
+    end
+end
+if retry > 0 then
+    return retry
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now_ms, ARGV[2])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+
+class LoginRateLimited(Exception):
+    """Raised when an email or client address exceeded its login attempts"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemorySlidingWindow:
+    """
+    Process-local sliding windows
+
+    Used when KV_BACKEND is "memory" (single node and tests) and while Redis
+    is unreachable; limits are then enforced per process.
+    """
+
+    SWEEP_EVERY = 1024  # checks between sweeps of idle keys
+
+    def __init__(self):
+        self._attempts: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+        self._checks = 0
+
+    def _prune(self, key: str, cutoff: float) -> deque[float]:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return deque()
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+        return attempts
+
+    def hit(self, limits: dict[str, int], window_seconds: float) -> float:
+        """
+        Record an attempt against every key unless one of them is full
+
+        Returns:
+            0 if the attempt was allowed, else seconds until it would be
+        """
+        now = time.monotonic()
+        cutoff = now - window_seconds
+        with self._lock:
+            self._checks += 1
+            if self._checks % self.SWEEP_EVERY == 0:
+                for key in list(self._attempts):
+                    self._prune(key, cutoff)
+
+            retry = 0.0
+            for key, limit in limits.items():
+                attempts = self._prune(key, cutoff)
+                if len(attempts) >= limit:
+                    retry = max(retry, attempts[0] + window_seconds - now)
+            if retry > 0:
+                return retry
+            for key in limits:
+                self._attempts.setdefault(key, deque()).append(now)
+            return 0.0
+
+    def reset(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._attempts.pop(key, None)
+
+
+class RedisSlidingWindow:
+    """Sliding windows as Redis sorted sets, checked and updated in one script call"""
+
+    def __init__(self, client):
+        self.client = client
+        self._script = client.register_script(SLIDING_WINDOW_LUA)
+
+    def hit(self, limits: dict[str, int], window_seconds: float) -> float:
+        """
+        Record an attempt against every key unless one of them is full
+
+        Returns:
+            0 if the attempt was allowed, else seconds until it would be
+        """
+        retry_ms = self._script(
+            keys=list(limits),
+            args=[int(window_seconds * 1000), uuid.uuid4().hex, *limits.values()],
+        )
+        return int(retry_ms) / 1000
+
+    def reset(self, *keys: str) -> None:
+        self.client.delete(*keys)
+
+
+def _identity_key(kind: str, value: str) -> str:
+    # Emails are hashed so the store holds no personal data
+    digest = hashlib.sha256(value.strip().lower().encode("utf-8")).hexdigest()[:32]
+    return f"{KEY_PREFIX}:{kind}:{digest}"
+
+
+class LoginRateLimiter:
+    """
+    Limit login attempts per email and per client address
+
+    Every attempt counts against RATE_LIMIT_LOGIN_ATTEMPTS per email and
+    RATE_LIMIT_LOGIN_ATTEMPTS_PER_IP per address within a sliding window of
+    RATE_LIMIT_WINDOW_SECONDS; a successful login clears the email's window.
+    The check runs before the password is verified, so rejected attempts
+    cost no bcrypt work. If Redis fails, the process-local windows take
+    over until it is back.
+    """
+
+    def __init__(self, backend=None, attempts: Optional[int] = None,
+                 ip_attempts: Optional[int] = None, window_seconds: Optional[float] = None):
+        self._backend = backend
+        self.attempts = attempts or settings.RATE_LIMIT_LOGIN_ATTEMPTS
+        self.ip_attempts = ip_attempts or settings.RATE_LIMIT_LOGIN_ATTEMPTS_PER_IP
+        self.window_seconds = window_seconds or settings.RATE_LIMIT_WINDOW_SECONDS
+        self.fallback = MemorySlidingWindow()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.KV_BACKEND == "redis":
+                self._backend = RedisSlidingWindow(get_kvstore().client)
+            else:
+                self._backend = self.fallback
+        return self._backend
+
+    def check(self, email: str, ip: Optional[str] = None) -> None:
+        """
+        Count a login attempt
+
+        Args:
+            email: Email the client is trying to log in as
+            ip: Client address (not limited when unknown)
+
+        Raises:
+            LoginRateLimited: If the email or the address has no attempts left
+        """
+        limits = {_identity_key("email", email): self.attempts}
+        if ip:
+            limits[_identity_key("ip", ip)] = self.ip_attempts
+        try:
+            retry = self.backend.hit(limits, self.window_seconds)
+        except Exception as e:
+            metrics.increment("login_rate_limit.fallback")
+            log_error(logger, e, {"operation": "login_rate_limit"})
+            retry = self.fallback.hit(limits, self.window_seconds)
+        if retry > 0:
+            metrics.increment("login_rate_limit.rejected")
+            raise LoginRateLimited(
+                "Demasiados intentos de inicio de sesión, inténtalo más tarde",
+                retry_after=max(1, math.ceil(retry)),
+            )
+
+    def reset(self, email: str) -> None:
+        """Clear an email's window after a successful login"""
+        key = _identity_key("email", email)
+        self.fallback.reset(key)
+        try:
+            self.backend.reset(key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "login_rate_limit_reset"})
+
+
+# Global login rate limiter
+login_rate_limiter = LoginRateLimiter()
@@ -1,5 +1,8 @@
 """Database base configuration"""
+from functools import lru_cache
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -8,8 +11,8 @@ from app.core.config import settings
 engine = create_engine(
     str(settings.DATABASE_URL),
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
 )
 
 # Create session factory
@@ -26,3 +29,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """
+    Get the asyncpg-backed engine
+
+    Created lazily so that the asyncpg driver is only required when
+    DATABASE_DRIVER is set to "asyncpg".
+    """
+    return create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    )
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Get the async session factory"""
+    # expire_on_commit=False: attributes stay loaded after commit, since
+    # lazy refreshes are not possible outside of an await
+    return async_sessionmaker(
+        bind=get_async_engine(),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async def get_async_db():
+    """Dependency for getting async database session"""
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -1,18 +1,53 @@
 """FastAPI application entry point"""
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.metrics import metrics
+from app.core.password_hashing import PasswordHashingUnavailable, password_hasher
+from app.core.rate_limit import LoginRateLimited
+from app.db.base import get_async_engine
 from app.api.v1.router import api_router
+from app.services.llm import UNAVAILABLE_DETAIL, LLMUnavailable, get_llm_provider
+from app.services.math_pool import math_pool
+from app.services.rag import EmbeddingUnavailable, embedding_service, notion_sync_jobs
+from app.services.sandbox import SandboxUnavailable, sandbox_pool
+from app.services.skill_state_cache import skill_state_cache
 
 # Setup logging
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background resources"""
+    password_hasher.start()
+    skill_state_cache.start()
+    sandbox_pool.start()
+    if settings.MATH_POOL_ENABLED:
+        math_pool.start()
+    embedding_service.start()
+    yield
+    notion_sync_jobs.shutdown()
+    embedding_service.stop()
+    await get_llm_provider().aclose()
+    math_pool.shutdown()
+    sandbox_pool.stop()
+    skill_state_cache.stop()
+    password_hasher.shutdown()
+    if settings.USE_ASYNC_DATABASE:
+        await get_async_engine().dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="Plataforma educativa con enfoque neuro-simbólico",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -28,6 +63,56 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.exception_handler(PasswordHashingUnavailable)
+async def password_hashing_unavailable_handler(request: Request, exc: PasswordHashingUnavailable):
+    """Backpressure from the hashing pool is reported as 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(LoginRateLimited)
+async def login_rate_limited_handler(request: Request, exc: LoginRateLimited):
+    """Too many login attempts for an email or address are reported as 429"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(SandboxUnavailable)
+async def sandbox_unavailable_handler(request: Request, exc: SandboxUnavailable):
+    """No free sandbox within the acquire timeout is reported as 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(EmbeddingUnavailable)
+async def embedding_unavailable_handler(request: Request, exc: EmbeddingUnavailable):
+    """A saturated or unavailable embedding model is reported as 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailable):
+    """A failing or rate-limited LLM provider is reported as 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": UNAVAILABLE_DETAIL},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -46,3 +131,9 @@ async def health_check():
         "database": "connected",
         "service": settings.PROJECT_NAME
     }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics (counters, gauges and latency summaries)"""
+    return metrics.snapshot()
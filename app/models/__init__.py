@@ -4,6 +4,7 @@ from app.models.problem import Problem, ProblemContent, TestCase, ProblemType, L
 from app.models.session import Session, StepAttempt, ErrorDiagnosis, ScaffoldLevel, ErrorType
 from app.models.skill import Skill, SkillState, SkillDependency, SkillStatus
 from app.models.class_model import Class, ClassStudent
+from app.models.notion import NotionPage
 
 __all__ = [
     "User",
@@ -26,4 +27,5 @@ __all__ = [
     "SkillStatus",
     "Class",
     "ClassStudent",
+    "NotionPage",
 ]
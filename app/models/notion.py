@@ -0,0 +1,27 @@
+"""Notion ingestion models"""
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class NotionPage(Base):
+    """Sync state of one Notion page indexed for a teacher's RAG collection"""
+    __tablename__ = "notion_pages"
+    __table_args__ = (UniqueConstraint("teacher_id", "page_id"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    teacher_id = Column(UUID(as_uuid=True), ForeignKey(
+        "teachers.id"), nullable=False, index=True)
+    page_id = Column(String, nullable=False)
+    title = Column(String, nullable=True)
+    last_edited_time = Column(DateTime, nullable=True)
+    content_hash = Column(String, nullable=False)
+    # chunk id -> content hash of every chunk stored in the vector store
+    chunk_hashes = Column(JSON, default=dict, nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    teacher = relationship("Teacher", back_populates="notion_pages")
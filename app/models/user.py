@@ -1,7 +1,7 @@
 """User models"""
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import Column, String, DateTime, Enum as SQLEnum, ForeignKey, Float, Integer, JSON
+from sqlalchemy import Column, String, DateTime, Enum as SQLEnum, ForeignKey, Float, Integer, JSON, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -68,6 +68,7 @@ class Teacher(User):
     notion_token = Column(String, nullable=True)
     notion_page_ids = Column(JSON, default=list, nullable=False)
     alert_preferences = Column(JSON, default=dict, nullable=False)
+    scaffold_cache_enabled = Column(Boolean, default=True, nullable=False)
 
     # Relationships
     students = relationship(
@@ -76,6 +77,8 @@ class Teacher(User):
         "Class", back_populates="teacher", cascade="all, delete-orphan")
     problems = relationship(
         "Problem", back_populates="created_by_teacher", cascade="all, delete-orphan")
+    notion_pages = relationship(
+        "NotionPage", back_populates="teacher", cascade="all, delete-orphan")
 
     __mapper_args__ = {
         "polymorphic_identity": UserRole.TEACHER,
@@ -0,0 +1,33 @@
+"""RAG ingestion schemas"""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class NotionPageError(BaseModel):
+    """Schema for a page that could not be synced"""
+    page_id: str
+    detail: str
+
+
+class NotionSyncResult(BaseModel):
+    """Schema for the outcome of one Notion sync"""
+    pages_synced: int = 0  # pages whose chunks changed
+    pages_unchanged: int = 0
+    pages_removed: int = 0  # pages no longer in notion_page_ids
+    chunks_upserted: int = 0
+    chunks_deleted: int = 0
+    errors: list[NotionPageError] = Field(default_factory=list)
+
+
+class NotionSyncStatus(BaseModel):
+    """Schema for the state of a teacher's background sync job"""
+    teacher_id: UUID
+    state: str  # queued, running, done or failed
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[NotionSyncResult] = None
+    detail: Optional[str] = None
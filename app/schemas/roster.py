@@ -0,0 +1,45 @@
+"""Class roster import schemas"""
+from pydantic import BaseModel, Field
+from typing import Optional
+from uuid import UUID
+
+# Maximum number of students accepted in one roster import
+MAX_ROSTER_ROWS = 10000
+
+
+class RosterStudentIn(BaseModel):
+    """
+    Schema for one roster row
+
+    Fields are validated per row by the import (not by the request
+    schema), so one bad row is reported instead of rejecting the roster.
+    """
+    email: str
+    password: str
+
+
+class RosterImportRequest(BaseModel):
+    """Schema for a JSON roster import"""
+    students: list[RosterStudentIn] = Field(..., min_length=1, max_length=MAX_ROSTER_ROWS)
+
+
+class RosterRowError(BaseModel):
+    """Schema for a rejected roster row"""
+    row: int  # 1-based position in the submitted roster
+    email: Optional[str] = None
+    detail: str
+
+
+class RosterCreatedStudent(BaseModel):
+    """Schema for a student created by a roster import"""
+    id: UUID
+    email: str
+
+
+class RosterImportResponse(BaseModel):
+    """Schema for the roster import result"""
+    class_id: UUID
+    created: int
+    failed: int
+    students: list[RosterCreatedStudent]
+    errors: list[RosterRowError]
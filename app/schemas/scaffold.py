@@ -0,0 +1,7 @@
+"""Scaffold schemas"""
+from pydantic import BaseModel
+
+
+class ScaffoldCacheSettings(BaseModel):
+    """Schema for a teacher's opt-in to sharing generated scaffolds"""
+    enabled: bool
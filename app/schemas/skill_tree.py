@@ -0,0 +1,19 @@
+"""Skill tree schemas"""
+from pydantic import BaseModel
+from uuid import UUID
+
+from app.models.skill import SkillStatus
+
+
+class StudentUnlockChanges(BaseModel):
+    """Schema for the skill status changes of one student"""
+    student_id: UUID
+    changes: dict[str, SkillStatus]
+
+
+class ClassUnlockRecalculationResponse(BaseModel):
+    """Schema for a class-wide unlock recalculation"""
+    class_id: UUID
+    unlocked: int
+    locked: int
+    students: list[StudentUnlockChanges]
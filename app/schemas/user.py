@@ -79,6 +79,11 @@ class UserRegister(UserBase):
         return v
 
 
+class UserLogin(UserBase):
+    """Schema for user login"""
+    password: str = Field(..., max_length=100)
+
+
 class UserResponse(UserBase):
     """Schema for user response"""
     id: UUID
@@ -1,13 +1,19 @@
 """Authentication service for user registration and login"""
 
-from typing import Optional
-from uuid import UUID
+import asyncio
+from datetime import datetime
+from typing import Any, Mapping, Optional
+from uuid import UUID, uuid4
 
 from fastapi import HTTPException, status
+from sqlalchemy import Select, Table, cast, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.security import hash_password, verify_password
+from app.core.password_hashing import password_hasher
+from app.core.rate_limit import login_rate_limiter
 from app.models.user import Student, Teacher, User, UserRole
 from app.schemas.user import UserRegister
 
@@ -16,79 +22,163 @@ class AuthService:
     """Service for authentication operations"""
 
     @staticmethod
-    def register_user(db: Session, user_data: UserRegister) -> User:
+    def _role_columns(user_data: UserRegister) -> tuple[Table, dict[str, Any]]:
         """
-        Register a new user with password hashing
+        Get the role-specific table and its initial column values
 
         Args:
-            db: Database session
             user_data: User registration data
 
         Returns:
-            Created user instance (Student or Teacher)
+            Tuple of (inheritance table, initial values for that table)
 
         Raises:
-            HTTPException: If email already exists or registration fails
+            HTTPException: If the role is not supported
         """
-        # Check if email already exists
-        existing_user = (
-            db.query(User).filter(User.email == user_data.email.lower()).first()
+        if user_data.role == UserRole.STUDENT:
+            return Student.__table__, {
+                "total_problems_solved": 0,
+                "average_scaffold_level": 0.0,
+                "bkt_parameters": {},
+            }
+        if user_data.role == UserRole.TEACHER:
+            return Teacher.__table__, {
+                "notion_page_ids": [],
+                "alert_preferences": {},
+                "scaffold_cache_enabled": True,
+            }
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Rol de usuario inválido",
         )
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email ya está registrado",
+
+    @staticmethod
+    def build_register_statement(user_data: UserRegister, hashed_password: str) -> Select:
+        """
+        Build a single statement that registers a user atomically
+
+        Both joined-inheritance rows are written by data-modifying CTEs:
+        the ``users`` insert uses ``ON CONFLICT (email) DO NOTHING`` and the
+        ``students``/``teachers`` insert only selects from its ``RETURNING``
+        rows, so a duplicate email inserts nothing and returns no row.
+
+        Args:
+            user_data: User registration data
+            hashed_password: Already hashed password
+
+        Returns:
+            SELECT over the inserted rows with every response column
+        """
+        users = User.__table__
+        role_table, role_values = AuthService._role_columns(user_data)
+
+        new_user = (
+            pg_insert(users)
+            .values(
+                id=uuid4(),
+                email=user_data.email.lower(),
+                password_hash=hashed_password,
+                role=user_data.role,
+                created_at=datetime.utcnow(),
             )
+            .on_conflict_do_nothing(index_elements=[users.c.email])
+            .returning(users.c.id, users.c.email, users.c.role,
+                       users.c.created_at, users.c.last_login)
+            .cte("new_user")
+        )
 
-        # Hash the password using bcrypt
-        hashed_password = hash_password(user_data.password)
+        new_role = (
+            insert(role_table)
+            .from_select(
+                ["id", *role_values],
+                select(
+                    new_user.c.id,
+                    # Explicit casts: untyped literals in a SELECT list
+                    # would otherwise be resolved as text (e.g. for JSON)
+                    *[cast(literal(value, role_table.c[name].type), role_table.c[name].type)
+                      for name, value in role_values.items()],
+                ),
+            )
+            .returning(*role_table.c)
+            .cte("new_role")
+        )
 
-        try:
-            # Create user based on role
-            if user_data.role == UserRole.STUDENT:
-                new_user = Student(
-                    email=user_data.email.lower(),
-                    password_hash=hashed_password,
-                    role=UserRole.STUDENT,
-                    total_problems_solved=0,
-                    average_scaffold_level=0.0,
-                    bkt_parameters={},
-                )
-            elif user_data.role == UserRole.TEACHER:
-                new_user = Teacher(
-                    email=user_data.email.lower(),
-                    password_hash=hashed_password,
-                    role=UserRole.TEACHER,
-                    notion_page_ids=[],
-                    alert_preferences={},
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Rol de usuario inválido",
-                )
-
-            db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+        return select(
+            new_user,
+            *[column for column in new_role.c if column.name != "id"],
+        ).select_from(new_user.join(new_role, new_role.c.id == new_user.c.id))
 
-            return new_user
+    @staticmethod
+    def _user_from_row(row: Mapping[str, Any]) -> User:
+        """Build a (detached) user instance from a registration row"""
+        model = Student if row["role"] == UserRole.STUDENT else Teacher
+        return model(**row)
 
-        except IntegrityError:
-            db.rollback()
-            raise HTTPException(
+    @staticmethod
+    def _registration_error(error: Exception) -> HTTPException:
+        """HTTP error for a failed registration statement (after rollback)"""
+        if isinstance(error, IntegrityError):
+            return HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Error al registrar usuario. El email puede estar ya en uso.",
             )
-        except Exception as e:
-            db.rollback()
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno al registrar usuario: {str(error)}",
+        )
+
+    @staticmethod
+    def _registered_user(row: Optional[Mapping[str, Any]]) -> User:
+        """User created by the registration statement (no row: email already taken)"""
+        if row is None:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error interno al registrar usuario: {str(e)}",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email ya está registrado",
             )
+        return AuthService._user_from_row(row)
 
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    def _login_result(user: Optional[User], email: str, password_ok: bool) -> Optional[User]:
+        """Accept or reject a login; a success clears the email's rate-limit window"""
+        if user is None or not password_ok:
+            return None
+        login_rate_limiter.reset(email)
+        return user
+
+    @staticmethod
+    def register_user(db: Session, user_data: UserRegister) -> User:
+        """
+        Register a new user with password hashing
+
+        The duplicate check, both inheritance rows and the response data
+        are handled by one INSERT ... ON CONFLICT ... RETURNING statement.
+
+        Args:
+            db: Database session
+            user_data: User registration data
+
+        Returns:
+            Created user instance (Student or Teacher)
+
+        Raises:
+            HTTPException: If email already exists or registration fails
+        """
+        # Hash the password using bcrypt in the dedicated hashing pool
+        hashed_password = password_hasher.hash(user_data.password)
+
+        try:
+            statement = AuthService.build_register_statement(user_data, hashed_password)
+            row = db.execute(statement).mappings().first()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise AuthService._registration_error(e)
+
+        return AuthService._registered_user(row)
+
+    @staticmethod
+    def authenticate_user(db: Session, email: str, password: str,
+                          ip: Optional[str] = None) -> Optional[User]:
         """
         Authenticate a user by email and password
 
@@ -96,18 +186,20 @@ class AuthService:
             db: Database session
             email: User email
             password: Plain text password
+            ip: Client address, limited together with the email
 
         Returns:
             User instance if authentication successful, None otherwise
-        """
-        user = db.query(User).filter(User.email == email.lower()).first()
-        if not user:
-            return None
 
-        if not verify_password(password, user.password_hash):
-            return None
+        Raises:
+            LoginRateLimited: If the email or address has no attempts left
+                (checked before any password work)
+        """
+        login_rate_limiter.check(email, ip)
 
-        return user
+        user = AuthService.get_user_by_email(db, email)
+        password_ok = user is not None and password_hasher.verify(password, user.password_hash)
+        return AuthService._login_result(user, email, password_ok)
 
     @staticmethod
     def get_user_by_id(db: Session, user_id: UUID) -> Optional[User]:
@@ -136,3 +228,86 @@ class AuthService:
             User instance or None
         """
         return db.query(User).filter(User.email == email.lower()).first()
+
+    @staticmethod
+    async def register_user_async(db: AsyncSession, user_data: UserRegister) -> User:
+        """
+        Register a new user using an async database session
+
+        Args:
+            db: Async database session
+            user_data: User registration data
+
+        Returns:
+            Created user instance (Student or Teacher)
+
+        Raises:
+            HTTPException: If email already exists or registration fails
+        """
+        hashed_password = await password_hasher.hash_async(user_data.password)
+
+        try:
+            statement = AuthService.build_register_statement(user_data, hashed_password)
+            row = (await db.execute(statement)).mappings().first()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise AuthService._registration_error(e)
+
+        return AuthService._registered_user(row)
+
+    @staticmethod
+    async def authenticate_user_async(db: AsyncSession, email: str, password: str,
+                                      ip: Optional[str] = None) -> Optional[User]:
+        """
+        Authenticate a user by email and password using an async database session
+
+        Args:
+            db: Async database session
+            email: User email
+            password: Plain text password
+            ip: Client address, limited together with the email
+
+        Returns:
+            User instance if authentication successful, None otherwise
+
+        Raises:
+            LoginRateLimited: If the email or address has no attempts left
+                (checked before any password work)
+        """
+        await asyncio.to_thread(login_rate_limiter.check, email, ip)
+
+        user = await AuthService.get_user_by_email_async(db, email)
+        password_ok = (user is not None
+                       and await password_hasher.verify_async(password, user.password_hash))
+        return await asyncio.to_thread(AuthService._login_result, user, email, password_ok)
+
+    @staticmethod
+    async def get_user_by_id_async(db: AsyncSession, user_id: UUID) -> Optional[User]:
+        """
+        Get user by ID using an async database session
+
+        Args:
+            db: Async database session
+            user_id: User UUID
+
+        Returns:
+            User instance or None
+        """
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+        """
+        Get user by email using an async database session
+
+        Args:
+            db: Async database session
+            email: User email
+
+        Returns:
+            User instance or None
+        """
+        result = await db.execute(select(User).where(User.email == email.lower()))
+        return result.scalars().first()
@@ -0,0 +1,276 @@
+"""Offline fitting of BKT parameters from historical step attempts"""
+
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.models.problem import Problem
+from app.models.session import Session as ProblemSession, StepAttempt
+from app.models.skill import SkillState
+from app.models.user import Student
+from app.services.bkt_service import PARAM_KEYS, PARAMS_GENERATION_KEY, bump_generation
+
+logger = get_logger(__name__)
+
+# Coarse search space; S and G stay below 0.5 to keep the model identifiable
+COARSE_GRID = {
+    "P_L0": np.linspace(0.05, 0.9, 10),
+    "P_T": np.linspace(0.02, 0.5, 10),
+    "P_S": np.linspace(0.02, 0.3, 8),
+    "P_G": np.linspace(0.05, 0.4, 8),
+}
+
+# Pairs evaluated at once; bounds memory to PAIR_CHUNK x grid size floats
+PAIR_CHUNK = 1024
+
+EPSILON = 1e-9
+
+
+def _grid(axes: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Cartesian product of the parameter axes as flat arrays"""
+    mesh = np.meshgrid(*(axes[key] for key in PARAM_KEYS), indexing="ij")
+    return {key: values.ravel() for key, values in zip(PARAM_KEYS, mesh)}
+
+
+def log_likelihood(pair_index: np.ndarray, correct: np.ndarray,
+                   grid: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Log-likelihood of the observations under every grid point
+
+    Observations must be in chronological order within each pair. The
+    state has shape (pairs, grid points); like BKTEngine, the k-th
+    observation of every pair is processed in one vectorized step.
+
+    Args:
+        pair_index: Pair (student) of each observation, as 0..n-1 codes
+        correct: Outcome of each observation
+        grid: Flat P_L0, P_T, P_S and P_G arrays of equal length
+
+    Returns:
+        Log-likelihood per grid point
+    """
+    total = np.zeros(len(grid["P_L0"]))
+    if len(pair_index) == 0:
+        return total
+
+    order = np.argsort(pair_index, kind="stable")
+    pairs = pair_index[order]
+    outcomes = correct[order]
+    starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+    lengths = np.diff(np.r_[starts, len(pairs)])
+
+    p_l0, p_t, p_s, p_g = (grid[key] for key in PARAM_KEYS)
+    for chunk_start in range(0, len(starts), PAIR_CHUNK):
+        chunk_starts = starts[chunk_start:chunk_start + PAIR_CHUNK]
+        chunk_lengths = lengths[chunk_start:chunk_start + PAIR_CHUNK]
+        state = np.broadcast_to(p_l0, (len(chunk_starts), len(p_l0))).copy()
+        for depth in range(chunk_lengths.max()):
+            active = np.flatnonzero(chunk_lengths > depth)
+            obs = outcomes[chunk_starts[active] + depth][:, None]
+            known = state[active]
+            p_correct = known * (1 - p_s) + (1 - known) * p_g
+            total += np.where(obs, np.log(p_correct + EPSILON),
+                              np.log(1 - p_correct + EPSILON)).sum(axis=0)
+            posterior = np.where(
+                obs,
+                known * (1 - p_s) / (p_correct + EPSILON),
+                known * p_s / (1 - p_correct + EPSILON),
+            )
+            state[active] = posterior + (1 - posterior) * p_t
+    return total
+
+
+def fit_sequences(pair_index: np.ndarray, correct: np.ndarray) -> dict[str, float]:
+    """
+    Fit BKT parameters by coarse-to-fine grid search
+
+    Args:
+        pair_index: Pair (student) of each observation, as 0..n-1 codes
+        correct: Outcome of each observation, chronological per pair
+
+    Returns:
+        Best P_L0, P_T, P_S and P_G
+    """
+    grid = _grid(COARSE_GRID)
+    best = int(np.argmax(log_likelihood(pair_index, correct, grid)))
+
+    # Refine around the best coarse point with half the coarse step
+    fine_axes = {}
+    for key in PARAM_KEYS:
+        axis = COARSE_GRID[key]
+        step = (axis[1] - axis[0]) / 2
+        center = grid[key][best]
+        fine_axes[key] = np.clip(
+            np.linspace(center - step, center + step, 5), 0.001, 0.499 if key in ("P_S", "P_G") else 0.999)
+    fine = _grid(fine_axes)
+    best_fine = int(np.argmax(log_likelihood(pair_index, correct, fine)))
+
+    return {key: round(float(fine[key][best_fine]), 4) for key in PARAM_KEYS}
+
+
+def fit_skill(skill_id: str, student_codes: np.ndarray, correct: np.ndarray,
+              per_student_min_attempts: Optional[int] = None) -> tuple[
+                  str, dict[str, float], dict[int, dict[str, float]]]:
+    """
+    Fit one skill (and optionally each of its students); runs in workers
+
+    Args:
+        skill_id: Skill identifier
+        student_codes: Student code (0..n-1) of each attempt
+        correct: Outcome of each attempt, chronological per student
+        per_student_min_attempts: Fit students with at least this many
+            attempts individually (disabled when None)
+
+    Returns:
+        Tuple of (skill_id, skill parameters, parameters per student code)
+    """
+    skill_params = fit_sequences(student_codes, correct)
+
+    student_params: dict[int, dict[str, float]] = {}
+    if per_student_min_attempts is not None:
+        counts = np.bincount(student_codes)
+        for code in np.flatnonzero(counts >= per_student_min_attempts):
+            mask = student_codes == code
+            student_params[int(code)] = fit_sequences(np.zeros(mask.sum(), np.int64), correct[mask])
+
+    return skill_id, skill_params, student_params
+
+
+class BKTFittingService:
+    """Service for fitting BKT parameters as a batch job"""
+
+    @staticmethod
+    def _stream_skills(db: Session, batch_size: int) -> Iterator[
+            tuple[str, list[UUID], np.ndarray, np.ndarray]]:
+        """
+        Stream attempts grouped by skill through a server-side cursor
+
+        Yields:
+            Tuples of (skill_id, students, student code per attempt, outcomes)
+        """
+        query = (
+            select(Problem.skill_id, ProblemSession.student_id, StepAttempt.is_correct)
+            .join(ProblemSession, StepAttempt.session_id == ProblemSession.id)
+            .join(Problem, ProblemSession.problem_id == Problem.id)
+            .order_by(Problem.skill_id, ProblemSession.student_id, StepAttempt.timestamp)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        rows = db.execute(query)
+        for skill_id, skill_rows in itertools.groupby(rows, key=lambda row: row.skill_id):
+            students: dict[UUID, int] = {}
+            codes: list[int] = []
+            outcomes: list[bool] = []
+            for row in skill_rows:
+                codes.append(students.setdefault(row.student_id, len(students)))
+                outcomes.append(row.is_correct)
+            yield (skill_id, list(students), np.array(codes, dtype=np.int64),
+                   np.array(outcomes, dtype=bool))
+
+    @staticmethod
+    def _write_results(db: Session, skill_id: str, skill_params: dict[str, float],
+                       students: list[UUID],
+                       student_params: dict[int, dict[str, float]]) -> None:
+        """Write fitted parameters for one skill back in bulk"""
+        db.execute(
+            update(SkillState)
+            .where(SkillState.skill_id == skill_id)
+            .values(bkt_params=skill_params)
+        )
+        if not student_params:
+            return
+
+        table = SkillState.__table__
+        db.execute(
+            update(table)
+            .where(table.c.student_id == bindparam("b_student_id"),
+                   table.c.skill_id == bindparam("b_skill_id"))
+            .values(bkt_params=bindparam("b_params")),
+            [
+                {"b_student_id": students[code], "b_skill_id": skill_id, "b_params": params}
+                for code, params in student_params.items()
+            ],
+        )
+
+        fitted_students = {students[code]: params for code, params in student_params.items()}
+        current = db.execute(
+            select(Student.id, Student.bkt_parameters)
+            .where(Student.id.in_(list(fitted_students)))
+        ).all()
+        db.execute(update(Student), [
+            {"id": student_id, "bkt_parameters": {**(parameters or {}),
+                                                   skill_id: fitted_students[student_id]}}
+            for student_id, parameters in current
+        ])
+
+    @staticmethod
+    def fit_all(
+        db: Session,
+        workers: Optional[int] = None,
+        per_student_min_attempts: Optional[int] = None,
+        batch_size: int = 20000,
+    ) -> dict[str, dict[str, float]]:
+        """
+        Fit BKT parameters for every skill with attempts
+
+        Attempts are streamed skill by skill; each skill is fitted in a
+        worker process while the next ones are read. At most two skills per
+        worker are held in memory at any time.
+
+        Args:
+            db: Database session
+            workers: Worker processes (defaults to the number of cores)
+            per_student_min_attempts: Also fit students individually when
+                they have at least this many attempts on a skill
+            batch_size: Rows fetched per round trip from the cursor
+
+        Returns:
+            Fitted parameters per skill
+        """
+        workers = workers or os.cpu_count() or 1
+        max_in_flight = workers * 2
+        results: dict[str, dict[str, float]] = {}
+        students_by_skill: dict[str, list[UUID]] = {}
+        in_flight: list[Future] = []
+
+        def collect(future: Future) -> None:
+            skill_id, skill_params, student_params = future.result()
+            BKTFittingService._write_results(
+                db, skill_id, skill_params, students_by_skill.pop(skill_id), student_params)
+            results[skill_id] = skill_params
+            logger.info("Fitted BKT parameters",
+                        extra={"extra": {"skill_id": skill_id, **skill_params,
+                                         "students_fitted": len(student_params)}})
+
+        # Separate connection for reads: the streaming cursor must stay
+        # open while results are written through the session
+        read_db = Session(bind=db.get_bind())
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                for skill_id, students, codes, outcomes in BKTFittingService._stream_skills(
+                        read_db, batch_size):
+                    students_by_skill[skill_id] = students
+                    in_flight.append(executor.submit(
+                        fit_skill, skill_id, codes, outcomes, per_student_min_attempts))
+                    if len(in_flight) >= max_in_flight:
+                        collect(in_flight.pop(0))
+                for future in in_flight:
+                    collect(future)
+            db.commit()
+            bump_generation(PARAMS_GENERATION_KEY)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            read_db.close()
+
+        return results
@@ -0,0 +1,285 @@
+"""Bayesian Knowledge Tracing engine over SkillState"""
+
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.models.problem import Problem
+from app.models.session import Session as ProblemSession, StepAttempt
+from app.models.skill import SkillState, SkillStatus
+
+logger = get_logger(__name__)
+
+# Keys used in SkillState.bkt_params / Student.bkt_parameters overrides
+PARAM_KEYS = ("P_L0", "P_T", "P_S", "P_G")
+
+# Rows per bulk UPDATE batch
+UPDATE_CHUNK_SIZE = 5000
+
+# Shared counters read by the skill state cache on every process: a new
+# states generation drops cached states, a new params generation makes
+# cached states reload their BKT parameters
+STATES_GENERATION_KEY = "bkt:generation:states"
+PARAMS_GENERATION_KEY = "bkt:generation:params"
+
+
+def bump_generation(key: str, store=None) -> None:
+    """Invalidate cached skill states after a batch job wrote skill_states"""
+    try:
+        (store if store is not None else get_kvstore()).incr(key)
+    except Exception as e:
+        log_error(logger, e, {"operation": "bkt_bump_generation", "key": key})
+
+
+def default_params() -> dict[str, float]:
+    """Get the global BKT parameters from settings"""
+    return {
+        "P_L0": settings.BKT_P_L0,
+        "P_T": settings.BKT_P_T,
+        "P_S": settings.BKT_P_S,
+        "P_G": settings.BKT_P_G,
+    }
+
+
+def resolve_params(overrides: Optional[dict[str, Any]] = None) -> dict[str, float]:
+    """
+    Merge per-skill overrides over the global BKT parameters
+
+    Args:
+        overrides: Partial parameters (e.g. SkillState.bkt_params)
+
+    Returns:
+        Complete parameter dict with P_L0, P_T, P_S and P_G
+    """
+    params = default_params()
+    for key, value in (overrides or {}).items():
+        if key in PARAM_KEYS and value is not None:
+            params[key] = float(value)
+    return params
+
+
+def bkt_update(p_known, correct, p_transit, p_slip, p_guess):
+    """
+    Apply one BKT observation (scalars or NumPy arrays)
+
+    L(t+1) = P(L(t)|obs) + (1 - P(L(t)|obs)) * P(T)
+
+    Args:
+        p_known: Current mastery probability L(t)
+        correct: Whether the observation was a correct answer
+        p_transit: Learning probability P(T)
+        p_slip: Slip probability P(S)
+        p_guess: Guess probability P(G)
+
+    Returns:
+        Updated mastery probability L(t+1)
+    """
+    p_known = np.asarray(p_known, dtype=np.float64)
+    known_correct = p_known * (1.0 - p_slip)
+    known_incorrect = p_known * p_slip
+    posterior = np.where(
+        correct,
+        known_correct / (known_correct + (1.0 - p_known) * p_guess),
+        known_incorrect / (known_incorrect + (1.0 - p_known) * (1.0 - p_guess)),
+    )
+    updated = posterior + (1.0 - posterior) * p_transit
+    return updated if updated.ndim else float(updated)
+
+
+def derive_status(probability: float, current: SkillStatus, attempted: bool) -> SkillStatus:
+    """
+    Derive a skill status from its mastery probability
+
+    Args:
+        probability: Mastery probability L(t)
+        current: Current status
+        attempted: Whether the student has attempts on the skill
+
+    Returns:
+        MASTERED above the threshold, IN_PROGRESS once practised,
+        otherwise the current status (LOCKED skills stay locked)
+    """
+    if probability >= settings.BKT_MASTERY_THRESHOLD:
+        return SkillStatus.MASTERED
+    if attempted and current != SkillStatus.LOCKED:
+        return SkillStatus.IN_PROGRESS
+    return current
+
+
+class BKTEngine:
+    """Vectorized BKT over many (student, skill) pairs at once"""
+
+    @staticmethod
+    def apply_observations(
+        prior: np.ndarray,
+        pair_index: np.ndarray,
+        correct: np.ndarray,
+        p_transit: np.ndarray,
+        p_slip: np.ndarray,
+        p_guess: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Apply a batch of observations across all pairs
+
+        Observations must be in chronological order for each pair. The k-th
+        observation of every pair is applied in the same vectorized step, so
+        the Python loop runs once per attempt *depth*, not once per attempt.
+
+        Args:
+            prior: L(t) per pair, shape (n_pairs,)
+            pair_index: Pair of each observation, shape (n_obs,)
+            correct: Outcome of each observation, shape (n_obs,)
+            p_transit: P(T) per pair
+            p_slip: P(S) per pair
+            p_guess: P(G) per pair
+
+        Returns:
+            Posterior L(t) per pair
+        """
+        state = np.array(prior, dtype=np.float64, copy=True)
+        if len(pair_index) == 0:
+            return state
+
+        order = np.argsort(pair_index, kind="stable")
+        pairs = np.asarray(pair_index)[order]
+        outcomes = np.asarray(correct, dtype=bool)[order]
+
+        # Position of each observation within its pair's sequence
+        starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+        lengths = np.diff(np.r_[starts, len(pairs)])
+        rank = np.arange(len(pairs)) - np.repeat(starts, lengths)
+
+        by_rank = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[by_rank], np.arange(lengths.max() + 1))
+        for depth in range(lengths.max()):
+            positions = by_rank[bounds[depth]:bounds[depth + 1]]
+            step_pairs = pairs[positions]
+            state[step_pairs] = bkt_update(
+                state[step_pairs],
+                outcomes[positions],
+                p_transit[step_pairs],
+                p_slip[step_pairs],
+                p_guess[step_pairs],
+            )
+
+        return state
+
+    @staticmethod
+    def params_arrays(overrides: Iterable[Optional[dict[str, Any]]]) -> dict[str, np.ndarray]:
+        """
+        Build per-pair parameter arrays honouring per-skill overrides
+
+        Args:
+            overrides: SkillState.bkt_params per pair
+
+        Returns:
+            Dict of P_L0, P_T, P_S and P_G arrays
+        """
+        resolved = [resolve_params(item) for item in overrides]
+        return {
+            key: np.fromiter((params[key] for params in resolved), dtype=np.float64,
+                             count=len(resolved))
+            for key in PARAM_KEYS
+        }
+
+
+class BKTService:
+    """Service for recomputing mastery probabilities from attempts"""
+
+    @staticmethod
+    def recompute(
+        db: Session,
+        student_ids: Optional[list[UUID]] = None,
+        batch_size: int = 50000,
+    ) -> dict[str, int]:
+        """
+        Recompute L(t) and status of skill states from all step attempts
+
+        Loads skill states and attempts into NumPy arrays, replays every
+        attempt from P(L0) with BKTEngine and writes the results back with
+        bulk UPDATEs.
+
+        Args:
+            db: Database session
+            student_ids: Restrict to these students (all when None)
+            batch_size: Rows fetched per round trip when streaming attempts
+
+        Returns:
+            Summary with updated states, applied and skipped attempts
+        """
+        states_query = select(
+            SkillState.id, SkillState.student_id, SkillState.skill_id,
+            SkillState.status, SkillState.bkt_params,
+        )
+        if student_ids is not None:
+            states_query = states_query.where(SkillState.student_id.in_(student_ids))
+        states = db.execute(states_query).all()
+        if not states:
+            return {"states_updated": 0, "attempts_applied": 0, "attempts_skipped": 0}
+
+        pair_of = {(row.student_id, row.skill_id): i for i, row in enumerate(states)}
+        params = BKTEngine.params_arrays(row.bkt_params for row in states)
+
+        attempts_query = (
+            select(ProblemSession.student_id, Problem.skill_id, StepAttempt.is_correct)
+            .join(ProblemSession, StepAttempt.session_id == ProblemSession.id)
+            .join(Problem, ProblemSession.problem_id == Problem.id)
+            .order_by(StepAttempt.timestamp)
+            .execution_options(yield_per=batch_size)
+        )
+        if student_ids is not None:
+            attempts_query = attempts_query.where(ProblemSession.student_id.in_(student_ids))
+
+        pair_chunks: list[np.ndarray] = []
+        correct_chunks: list[np.ndarray] = []
+        skipped = 0
+        for partition in db.execute(attempts_query).partitions():
+            pairs = np.fromiter(
+                (pair_of.get((row.student_id, row.skill_id), -1) for row in partition),
+                dtype=np.int64, count=len(partition),
+            )
+            correct = np.fromiter((row.is_correct for row in partition),
+                                  dtype=bool, count=len(partition))
+            known = pairs >= 0
+            skipped += int((~known).sum())
+            pair_chunks.append(pairs[known])
+            correct_chunks.append(correct[known])
+
+        pair_index = np.concatenate(pair_chunks) if pair_chunks else np.empty(0, np.int64)
+        correct = np.concatenate(correct_chunks) if correct_chunks else np.empty(0, bool)
+
+        probabilities = BKTEngine.apply_observations(
+            params["P_L0"], pair_index, correct, params["P_T"], params["P_S"], params["P_G"])
+        attempted = np.bincount(pair_index, minlength=len(states)) > 0
+
+        values = [
+            {
+                "id": row.id,
+                "domain_probability": float(probabilities[i]),
+                "status": derive_status(float(probabilities[i]), row.status, bool(attempted[i])),
+            }
+            for i, row in enumerate(states)
+        ]
+        for i in range(0, len(values), UPDATE_CHUNK_SIZE):
+            db.execute(update(SkillState), values[i:i + UPDATE_CHUNK_SIZE])
+        db.commit()
+        # Unflushed incremental updates are superseded: their attempts are
+        # committed, so this or the next recompute replays them
+        bump_generation(STATES_GENERATION_KEY)
+
+        logger.info(
+            "BKT recompute finished",
+            extra={"extra": {"states": len(states), "attempts": len(pair_index),
+                             "skipped": skipped}},
+        )
+        return {
+            "states_updated": len(states),
+            "attempts_applied": int(len(pair_index)),
+            "attempts_skipped": skipped,
+        }
@@ -0,0 +1,380 @@
+"""Error diagnosis cascade: deterministic rules, a local classifier, then the LLM"""
+
+import ast
+import asyncio
+import json
+import os
+import re
+import statistics
+import textwrap
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.models.problem import Language, Problem, ProblemContent, ProblemType
+from app.models.session import ErrorDiagnosis, ErrorType, Session as ProblemSession, StepAttempt
+from app.services.llm import LLMRequest, LLMUnavailable, get_llm_provider
+from app.services.math_verifier import ExpressionParseError, math_verifier
+
+logger = get_logger(__name__)
+
+LANGUAGE_NAMES = {Language.PYTHON: "Python", Language.CPP: "C++", Language.JAVA: "Java"}
+
+SYSTEM_PROMPT = (
+    "Eres un profesor que diagnostica errores de alumnos de secundaria. Responde solo "
+    'con un objeto JSON: {"error_type": "SYNTAX" | "PROCEDURE" | "CONCEPT", '
+    '"affected_concept": "...", "severity": 1-5, "error_details": "..."}.'
+)
+
+
+@dataclass
+class DiagnosisInput:
+    """A wrong step attempt and what is known about it"""
+    problem_type: ProblemType
+    student_answer: str
+    expected_step: Optional[str] = None
+    skill_id: Optional[str] = None
+    language: Optional[Language] = None
+    compile_error: Optional[str] = None  # compiler output of CPP/JAVA submissions
+
+
+@dataclass
+class Diagnosis:
+    """A diagnosis with the stage that produced it"""
+    error_type: ErrorType
+    affected_concept: str
+    severity: int  # 1-5
+    error_details: str
+    source: str  # rule, model or llm
+    confidence: float
+
+
+@dataclass
+class LabeledAttempt:
+    """A past attempt with its stored diagnosis (training and replay data)"""
+    item: DiagnosisInput
+    error_type: ErrorType
+    affected_concept: str
+    severity: int
+
+
+def diagnose_with_rules(item: DiagnosisInput) -> Optional[Diagnosis]:
+    """
+    Diagnose errors that are certain without a model
+
+    Unparsable math, Python that ``ast.parse`` rejects and compiler errors
+    are SYNTAX; an expression where an equation was expected (or the
+    reverse) is PROCEDURE.
+
+    Returns:
+        The diagnosis, or None when no rule applies
+    """
+    if item.problem_type == ProblemType.MATH:
+        try:
+            answer = math_verifier.parse_answer(item.student_answer)
+        except ExpressionParseError as e:
+            return Diagnosis(ErrorType.SYNTAX, "notación matemática", 1, str(e), "rule", 1.0)
+        except FutureTimeoutError:
+            return None
+        if item.expected_step and "=" in item.expected_step and not answer.is_equation:
+            return Diagnosis(ErrorType.PROCEDURE, "planteamiento de ecuaciones", 2,
+                             "Se esperaba una ecuación", "rule", 1.0)
+        if item.expected_step and "=" not in item.expected_step and answer.is_equation:
+            return Diagnosis(ErrorType.PROCEDURE, "simplificación de expresiones", 2,
+                             "Se esperaba una expresión", "rule", 1.0)
+        return None
+
+    language = LANGUAGE_NAMES.get(item.language, "código")
+    if item.compile_error:
+        first_line = item.compile_error.strip().splitlines()[0] if item.compile_error.strip() else ""
+        return Diagnosis(ErrorType.SYNTAX, f"sintaxis de {language}", 1,
+                         first_line[:500], "rule", 1.0)
+    if item.language == Language.PYTHON:
+        error = _python_syntax_error(item.student_answer)
+        if error is not None:
+            return Diagnosis(ErrorType.SYNTAX, "sintaxis de Python", 1,
+                             f"Línea {error.lineno}: {error.msg}", "rule", 1.0)
+    return None
+
+
+def _python_syntax_error(code: str) -> Optional[SyntaxError]:
+    """Syntax error of a Python step, which may be a fragment of a program"""
+    try:
+        ast.parse(code)
+        return None
+    except SyntaxError as e:
+        error = e
+    # Steps are often a block header without its body or a return outside a function
+    lines = code.rstrip().splitlines() or [""]
+    if lines[-1].rstrip().endswith(":"):
+        indent = len(lines[-1]) - len(lines[-1].lstrip())
+        lines.append(" " * (indent + 4) + "pass")
+    try:
+        ast.parse("def _step():\n" + textwrap.indent("\n".join(lines), "    "))
+        return None
+    except SyntaxError:
+        return error
+
+
+def _features(item: DiagnosisInput) -> str:
+    """One text per attempt for the character n-gram classifier"""
+    answer = " ".join(item.student_answer.split())
+    expected = " ".join((item.expected_step or "").split())
+    language = item.language.value if item.language else "-"
+    return (f"{item.problem_type.value} {language} {item.skill_id or '-'} "
+            f"|| {answer} || {expected}")
+
+
+class ErrorClassifier:
+    """
+    Error-type classifier trained on stored diagnoses
+
+    A logistic regression over character n-grams of the answer and the
+    expected step predicts the error type with a probability. The concept
+    and severity come from the most common diagnosis of the same skill and
+    error type in the training data.
+    """
+
+    def __init__(self, pipeline: Any = None, concepts: Optional[dict] = None,
+                 severities: Optional[dict] = None):
+        self.pipeline = pipeline
+        self.concepts = concepts or {}
+        self.severities = severities or {}
+
+    @classmethod
+    def fit(cls, examples: Sequence[LabeledAttempt]) -> "ErrorClassifier":
+        """Train on labeled attempts"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        labels = [example.error_type.value for example in examples]
+        if len(set(labels)) < 2:
+            raise ValueError("Training needs diagnoses of at least two error types")
+        pipeline = make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), min_df=2, sublinear_tf=True),
+            LogisticRegression(max_iter=1000, class_weight="balanced"),
+        )
+        pipeline.fit([_features(example.item) for example in examples], labels)
+
+        concepts: dict[tuple, Counter] = defaultdict(Counter)
+        severities: dict[tuple, list[int]] = defaultdict(list)
+        for example in examples:
+            for key in ((example.item.skill_id, example.error_type.value),
+                        (None, example.error_type.value)):
+                concepts[key][example.affected_concept] += 1
+                severities[key].append(example.severity)
+        return cls(
+            pipeline,
+            {key: counter.most_common(1)[0][0] for key, counter in concepts.items()},
+            {key: int(statistics.median(values)) for key, values in severities.items()},
+        )
+
+    def predict(self, item: DiagnosisInput) -> Diagnosis:
+        """Most likely diagnosis with the classifier's probability as confidence"""
+        probabilities = self.pipeline.predict_proba([_features(item)])[0]
+        best = int(probabilities.argmax())
+        error_type = self.pipeline.classes_[best]
+        key = (item.skill_id, error_type)
+        fallback = (None, error_type)
+        return Diagnosis(
+            error_type=ErrorType(error_type),
+            affected_concept=self.concepts.get(key) or self.concepts.get(fallback)
+            or item.skill_id or "",
+            severity=self.severities.get(key) or self.severities.get(fallback) or 2,
+            error_details="",
+            source="model",
+            confidence=float(probabilities[best]),
+        )
+
+    def save(self, path: str) -> None:
+        import joblib
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        joblib.dump({"pipeline": self.pipeline, "concepts": self.concepts,
+                     "severities": self.severities}, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ErrorClassifier"]:
+        """Trained classifier, or None when none has been trained yet"""
+        if not os.path.exists(path):
+            return None
+        import joblib
+
+        bundle = joblib.load(path)
+        return cls(bundle["pipeline"], bundle["concepts"], bundle["severities"])
+
+
+def _parse_llm_diagnosis(text: str) -> Diagnosis:
+    """
+    Diagnosis from the LLM's JSON answer
+
+    Raises:
+        ValueError: If the answer is not a valid diagnosis
+    """
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match is None:
+        raise ValueError("No JSON object in the LLM answer")
+    data = json.loads(match.group(0))
+    return Diagnosis(
+        error_type=ErrorType(str(data["error_type"]).upper()),
+        affected_concept=str(data.get("affected_concept") or "")[:200],
+        severity=min(5, max(1, int(data.get("severity") or 2))),
+        error_details=str(data.get("error_details") or "")[:2000],
+        source="llm",
+        confidence=1.0,
+    )
+
+
+class ErrorDiagnosisService:
+    """
+    Diagnose wrong attempts, cheapest stage first
+
+    Rules settle what is certain (mostly SYNTAX). Then the local classifier
+    (DIAGNOSIS_MODEL_PATH, trained by scripts/train_error_classifier.py)
+    answers when its probability reaches DIAGNOSIS_CONFIDENCE_THRESHOLD.
+    Only the remaining attempts reach the LLM; if it fails, the
+    classifier's best guess is kept.
+    """
+
+    def __init__(self, classifier: Optional[ErrorClassifier] = None, provider=None,
+                 threshold: Optional[float] = None, model_path: Optional[str] = None):
+        self._classifier = classifier
+        self._provider = provider
+        self.threshold = threshold or settings.DIAGNOSIS_CONFIDENCE_THRESHOLD
+        self.model_path = model_path or settings.DIAGNOSIS_MODEL_PATH
+        self._loaded = classifier is not None
+        self._lock = threading.Lock()
+
+    @property
+    def classifier(self) -> Optional[ErrorClassifier]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._classifier = ErrorClassifier.load(self.model_path)
+                    except Exception as e:
+                        log_error(logger, e, {"operation": "load_error_classifier",
+                                              "path": self.model_path})
+                    self._loaded = True
+        return self._classifier
+
+    @property
+    def provider(self):
+        return self._provider if self._provider is not None else get_llm_provider()
+
+    def diagnose_locally(self, item: DiagnosisInput) -> tuple[Optional[Diagnosis], Optional[Diagnosis]]:
+        """
+        Rules, then the classifier
+
+        Returns:
+            (accepted diagnosis or None, classifier's best guess or None)
+        """
+        diagnosis = diagnose_with_rules(item)
+        if diagnosis is not None:
+            return diagnosis, None
+        classifier = self.classifier
+        if classifier is None:
+            return None, None
+        guess = classifier.predict(item)
+        return (guess if guess.confidence >= self.threshold else None), guess
+
+    async def diagnose(self, item: DiagnosisInput) -> Diagnosis:
+        """
+        Diagnose one wrong attempt
+
+        Raises:
+            LLMUnavailable: If the attempt needs the LLM, the LLM fails and
+                there is no classifier guess to fall back on
+        """
+        # Parsing, symbolic checks and the classifier are CPU-bound
+        diagnosis, guess = await asyncio.to_thread(self.diagnose_locally, item)
+        if diagnosis is not None:
+            metrics.increment(f"diagnosis.{diagnosis.source}")
+            return diagnosis
+
+        metrics.increment("diagnosis.llm")
+        try:
+            text = await self.provider.complete(self.build_request(item, guess))
+            return _parse_llm_diagnosis(text)
+        except (LLMUnavailable, ValueError, KeyError) as e:
+            metrics.increment("diagnosis.llm_failures")
+            log_error(logger, e, {"operation": "diagnose_with_llm"})
+            if guess is None:
+                raise LLMUnavailable(str(e)) from e
+            return guess
+
+    @staticmethod
+    def build_request(item: DiagnosisInput, guess: Optional[Diagnosis] = None) -> LLMRequest:
+        lines = [f"Tipo de problema: {item.problem_type.value}"]
+        if item.language:
+            lines.append(f"Lenguaje: {LANGUAGE_NAMES[item.language]}")
+        if item.skill_id:
+            lines.append(f"Habilidad: {item.skill_id}")
+        if item.expected_step:
+            lines.append(f"Paso esperado: {item.expected_step}")
+        lines.append(f"Respuesta del alumno: {item.student_answer}")
+        if guess is not None:
+            lines.append(f"Diagnóstico previo poco fiable: {guess.error_type.value}")
+        return LLMRequest(system=SYSTEM_PROMPT, prompt="\n".join(lines), max_tokens=200,
+                          temperature=0.0)
+
+    @staticmethod
+    def save(db: Session, attempt_id: UUID, diagnosis: Diagnosis) -> ErrorDiagnosis:
+        """Store (or replace) the diagnosis of an attempt"""
+        row = db.scalar(select(ErrorDiagnosis).where(ErrorDiagnosis.step_attempt_id == attempt_id))
+        if row is None:
+            row = ErrorDiagnosis(step_attempt_id=attempt_id)
+            db.add(row)
+        row.error_type = diagnosis.error_type
+        row.affected_concept = diagnosis.affected_concept
+        row.severity = diagnosis.severity
+        row.error_details = diagnosis.error_details
+        db.commit()
+        return row
+
+    @staticmethod
+    def load_examples(db: Session, limit: Optional[int] = None) -> list[LabeledAttempt]:
+        """Stored diagnoses with their attempts, oldest first"""
+        query = (
+            select(StepAttempt.student_answer, StepAttempt.step_number, Problem.type,
+                   Problem.skill_id, Problem.solution_steps, ProblemContent.language,
+                   ErrorDiagnosis.error_type, ErrorDiagnosis.affected_concept,
+                   ErrorDiagnosis.severity)
+            .join(ErrorDiagnosis, ErrorDiagnosis.step_attempt_id == StepAttempt.id)
+            .join(ProblemSession, ProblemSession.id == StepAttempt.session_id)
+            .join(Problem, Problem.id == ProblemSession.problem_id)
+            .outerjoin(ProblemContent, ProblemContent.problem_id == Problem.id)
+            .order_by(StepAttempt.timestamp)
+        )
+        if limit:
+            query = query.limit(limit)
+
+        examples = []
+        for (answer, step_number, problem_type, skill_id, steps, language, error_type,
+             concept, severity) in db.execute(query):
+            steps = steps or []
+            expected = str(steps[step_number - 1]) if 1 <= step_number <= len(steps) else None
+            examples.append(LabeledAttempt(
+                item=DiagnosisInput(problem_type=problem_type, student_answer=answer,
+                                    expected_step=expected, skill_id=skill_id,
+                                    language=language),
+                error_type=error_type, affected_concept=concept, severity=severity,
+            ))
+        return examples
+
+
+# Global diagnosis service
+error_diagnosis_service = ErrorDiagnosisService()
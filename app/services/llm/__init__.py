@@ -0,0 +1,24 @@
+"""LLM providers for scaffold generation"""
+from app.services.llm.providers import (
+    UNAVAILABLE_DETAIL,
+    AnthropicProvider,
+    FakeProvider,
+    GoogleProvider,
+    LLMRequest,
+    LLMUnavailable,
+    build_provider,
+)
+from app.services.llm.router import LLMRouter, TokenBucket, get_llm_provider
+
+__all__ = [
+    "AnthropicProvider",
+    "FakeProvider",
+    "GoogleProvider",
+    "LLMRequest",
+    "LLMRouter",
+    "LLMUnavailable",
+    "TokenBucket",
+    "UNAVAILABLE_DETAIL",
+    "build_provider",
+    "get_llm_provider",
+]
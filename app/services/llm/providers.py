@@ -0,0 +1,236 @@
+"""Streaming LLM providers (Anthropic, Google, and an offline fake)"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+ANTHROPIC_VERSION = "2023-06-01"
+GOOGLE_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent"
+
+# Shown to students whenever generation fails
+UNAVAILABLE_DETAIL = "El asistente no está disponible, inténtalo de nuevo en unos segundos"
+
+
+class LLMUnavailable(Exception):
+    """The provider failed, timed out or rejected the request"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMRequest:
+    """A single-turn generation request"""
+    system: str
+    prompt: str
+    max_tokens: int = 300
+    temperature: float = 0.3
+
+
+async def _sse_data(response: httpx.Response) -> AsyncIterator[dict]:
+    """JSON payloads of the data: lines of a server-sent event stream"""
+    data: list[str] = []
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif not line and data:
+            payload = "\n".join(data)
+            data = []
+            if payload != "[DONE]":
+                yield json.loads(payload)
+    if data and data[0] != "[DONE]":
+        yield json.loads("\n".join(data))
+
+
+class _HTTPProvider(ABC):
+    """Provider speaking to a streaming HTTP API through one pooled client"""
+
+    name = "http"
+
+    def __init__(self, api_key: str, model: str, client: Optional[httpx.AsyncClient] = None,
+                 timeout_seconds: Optional[float] = None):
+        self.api_key = api_key
+        self.model = model
+        self._client = client
+        self.timeout_seconds = timeout_seconds or settings.AI_TIMEOUT_SECONDS
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds, connect=5.0),
+                limits=httpx.Limits(max_connections=settings.LLM_MAX_CONCURRENCY,
+                                    max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                                    keepalive_expiry=60),
+            )
+        return self._client
+
+    @abstractmethod
+    def _build(self, request: LLMRequest) -> httpx.Request:
+        """HTTP request for the provider's streaming API"""
+
+    @abstractmethod
+    def _text(self, event: dict) -> str:
+        """Text delta carried by one streamed event"""
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """
+        Yield text fragments as the provider generates them
+
+        Raises:
+            LLMUnavailable: On missing credentials, HTTP errors or timeouts
+        """
+        if not self.api_key:
+            raise LLMUnavailable(f"{self.name}: API key not configured")
+        try:
+            response = await self.client.send(self._build(request), stream=True)
+            try:
+                if response.status_code >= 400:
+                    await response.aread()
+                    retry_after = response.headers.get("retry-after", "")
+                    raise LLMUnavailable(
+                        f"{self.name}: HTTP {response.status_code}",
+                        retry_after=int(retry_after) if retry_after.isdigit() else 5)
+                async for event in _sse_data(response):
+                    if event.get("type") == "error" or "error" in event:
+                        raise LLMUnavailable(f"{self.name}: {event.get('error')}")
+                    text = self._text(event)
+                    if text:
+                        yield text
+            finally:
+                await response.aclose()
+        except httpx.HTTPError as e:
+            raise LLMUnavailable(f"{self.name}: {type(e).__name__}") from e
+
+    async def complete(self, request: LLMRequest) -> str:
+        """Full generated text"""
+        return "".join([fragment async for fragment in self.stream(request)])
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AnthropicProvider(_HTTPProvider):
+    """Anthropic Messages API with stream=true"""
+
+    name = "anthropic"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, timeout_seconds: Optional[float] = None):
+        super().__init__(api_key if api_key is not None else settings.ANTHROPIC_API_KEY,
+                         model or settings.ANTHROPIC_MODEL, client, timeout_seconds)
+
+    def _build(self, request: LLMRequest) -> httpx.Request:
+        return self.client.build_request(
+            "POST", ANTHROPIC_URL,
+            headers={"x-api-key": self.api_key, "anthropic-version": ANTHROPIC_VERSION},
+            json={
+                "model": self.model,
+                "system": request.system,
+                "messages": [{"role": "user", "content": request.prompt}],
+                "max_tokens": request.max_tokens,
+                "temperature": request.temperature,
+                "stream": True,
+            },
+        )
+
+    def _text(self, event: dict) -> str:
+        if event.get("type") != "content_block_delta":
+            return ""
+        return event.get("delta", {}).get("text", "")
+
+
+class GoogleProvider(_HTTPProvider):
+    """Gemini streamGenerateContent with alt=sse"""
+
+    name = "google"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, timeout_seconds: Optional[float] = None):
+        super().__init__(api_key if api_key is not None else settings.GOOGLE_API_KEY,
+                         model or settings.GOOGLE_MODEL, client, timeout_seconds)
+
+    def _build(self, request: LLMRequest) -> httpx.Request:
+        return self.client.build_request(
+            "POST", GOOGLE_URL.format(model=self.model),
+            params={"alt": "sse", "key": self.api_key},
+            json={
+                "systemInstruction": {"parts": [{"text": request.system}]},
+                "contents": [{"role": "user", "parts": [{"text": request.prompt}]}],
+                "generationConfig": {"maxOutputTokens": request.max_tokens,
+                                     "temperature": request.temperature},
+            },
+        )
+
+    def _text(self, event: dict) -> str:
+        candidates = event.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+
+class FakeProvider:
+    """
+    Offline provider that streams canned text with configurable delays
+
+    Used when LLM_PROVIDERS is "fake" (development without API keys) and in
+    tests that measure time-to-first-token or exercise the router.
+    """
+
+    model = "fake"
+
+    DEFAULT_TEXT = ("¿Qué operación has aplicado en este paso? Revisa si la has hecho "
+                    "igual en los dos lados de la igualdad.")
+
+    def __init__(self, text: Optional[str] = None, first_token_delay: float = 0.0,
+                 token_delay: float = 0.0, error: Optional[Exception] = None,
+                 error_after: int = 0, name: str = "fake"):
+        self.name = name
+        self.text = text or self.DEFAULT_TEXT
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.error = error
+        self.error_after = error_after  # tokens streamed before the error is raised
+        self.calls = 0
+
+    def tokens(self) -> list[str]:
+        """The canned text split into word tokens (spaces kept)"""
+        words = self.text.split(" ")
+        return [word + " " for word in words[:-1]] + [words[-1]]
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self.tokens()):
+            if self.error is not None and i == self.error_after:
+                raise self.error
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    async def complete(self, request: LLMRequest) -> str:
+        return "".join([fragment async for fragment in self.stream(request)])
+
+    async def aclose(self) -> None:
+        pass
+
+
+def build_provider(name: str):
+    """Provider for one LLM_PROVIDERS entry"""
+    if name == "anthropic":
+        return AnthropicProvider()
+    if name == "google":
+        return GoogleProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
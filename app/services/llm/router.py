@@ -0,0 +1,264 @@
+"""Routing of LLM requests across providers with limits, hedging and failover"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import LatencySummary, metrics
+from app.services.llm.providers import LLMRequest, LLMUnavailable, build_provider
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """Requests-per-second limit with bursts (refilled lazily on each check)"""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take one token if available"""
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def seconds_until_available(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate) if self.rate else math.inf
+
+
+class ProviderSlot:
+    """A provider with its concurrency limit, rate limit and first-token latencies"""
+
+    def __init__(self, provider, max_concurrency: int, rate_per_second: float, burst: int):
+        self.provider = provider
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.first_token = LatencySummary(reservoir_size=256)
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+
+@dataclass
+class _Started:
+    """A provider stream that produced its first fragment"""
+    slot: ProviderSlot
+    stream: AsyncIterator[str]
+    first: Optional[str]  # None when the provider returned no text at all
+
+    async def close(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self.slot.semaphore.release()
+
+
+class RoutedStream:
+    """Fragments of the provider that won the request; .provider is set once it starts"""
+
+    def __init__(self, router: "LLMRouter", request: LLMRequest):
+        self.provider = None
+        self._router = router
+        self._request = request
+        self._fragments = self._run()
+
+    def __aiter__(self) -> "RoutedStream":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._fragments.__anext__()
+
+    async def aclose(self) -> None:
+        await self._fragments.aclose()
+
+    async def _run(self) -> AsyncIterator[str]:
+        started = await self._router.start(self._request)
+        self.provider = started.slot.provider
+        try:
+            if started.first is not None:
+                yield started.first
+            async for fragment in started.stream:
+                yield fragment
+        finally:
+            await started.close()
+
+
+class LLMRouter:
+    """
+    Provider front end used by the scaffold service
+
+    Providers are tried in LLM_PROVIDERS order. Each one has an asyncio
+    semaphore (LLM_MAX_CONCURRENCY in-flight requests) and a token bucket
+    (LLM_RATE_LIMIT_PER_SECOND, bursts of LLM_RATE_LIMIT_BURST); a provider
+    whose bucket is empty is skipped. If the chosen provider has not sent a
+    first token after its recent p95 first-token latency, one hedged request
+    goes to the next provider and the first to answer wins; the other is
+    cancelled. A provider that fails before its first token is replaced by
+    the next one. All of this happens within AI_TIMEOUT_SECONDS. Once the
+    first token arrives the stream stays on that provider.
+    """
+
+    name = "router"
+
+    def __init__(self, providers: Sequence, max_concurrency: Optional[int] = None,
+                 rate_per_second: Optional[float] = None, burst: Optional[int] = None,
+                 hedge_enabled: Optional[bool] = None, hedge_delay: Optional[float] = None,
+                 hedge_min_samples: Optional[int] = None,
+                 hedge_percentile: Optional[float] = None,
+                 timeout_seconds: Optional[float] = None):
+        self.slots = [ProviderSlot(
+            provider,
+            max_concurrency or settings.LLM_MAX_CONCURRENCY,
+            rate_per_second or settings.LLM_RATE_LIMIT_PER_SECOND,
+            burst or settings.LLM_RATE_LIMIT_BURST,
+        ) for provider in providers]
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.initial_hedge_delay = hedge_delay or settings.LLM_HEDGE_DELAY_SECONDS
+        self.hedge_min_samples = hedge_min_samples or settings.LLM_HEDGE_MIN_SAMPLES
+        self.hedge_percentile = hedge_percentile or settings.LLM_HEDGE_PERCENTILE
+        self.timeout_seconds = timeout_seconds or settings.AI_TIMEOUT_SECONDS
+
+    @property
+    def model(self) -> str:
+        return self.slots[0].provider.model if self.slots else ""
+
+    def hedge_delay(self, slot: ProviderSlot) -> float:
+        """Seconds to wait for a provider's first token before hedging"""
+        if slot.first_token.count < self.hedge_min_samples:
+            return self.initial_hedge_delay
+        return slot.first_token.percentile(self.hedge_percentile)
+
+    async def _first_fragment(self, slot: ProviderSlot, request: LLMRequest) -> _Started:
+        start = time.perf_counter()
+        await slot.semaphore.acquire()
+        stream = slot.provider.stream(request)
+        try:
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+        except BaseException:
+            try:
+                await stream.aclose()
+            finally:
+                slot.semaphore.release()
+            raise
+        slot.first_token.observe(time.perf_counter() - start)
+        metrics.observe(f"llm.{slot.name}.first_token", time.perf_counter() - start)
+        return _Started(slot, stream, first)
+
+    async def start(self, request: LLMRequest) -> _Started:
+        """
+        Run the request until one provider sends its first fragment
+
+        Raises:
+            LLMUnavailable: If every provider failed, was rate limited or
+                timed out
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_seconds
+        candidates = iter(self.slots)
+        pending: dict[asyncio.Task, ProviderSlot] = {}
+        rate_limited: list[ProviderSlot] = []
+        hedged = False
+
+        def launch() -> Optional[ProviderSlot]:
+            for slot in candidates:
+                if not slot.bucket.try_acquire():
+                    metrics.increment(f"llm.{slot.name}.rate_limited")
+                    rate_limited.append(slot)
+                    continue
+                metrics.increment(f"llm.{slot.name}.requests")
+                pending[asyncio.create_task(self._first_fragment(slot, request))] = slot
+                return slot
+            return None
+
+        primary = launch()
+        hedge_at = loop.time() + self.hedge_delay(primary) if primary else deadline
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    metrics.increment("llm.timeouts")
+                    raise LLMUnavailable("LLM providers timed out")
+                can_hedge = self.hedge_enabled and not hedged
+                wake_at = min(deadline, hedge_at) if can_hedge else deadline
+                done, _ = await asyncio.wait(pending, timeout=max(0.0, wake_at - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_hedge and loop.time() >= hedge_at:
+                        hedged = True
+                        if launch() is not None:
+                            metrics.increment("llm.hedges")
+                    continue
+
+                winner: Optional[_Started] = None
+                for task in done:
+                    slot = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except LLMUnavailable as e:
+                        metrics.increment(f"llm.{slot.name}.failures")
+                        log_error(logger, e, {"operation": "llm_start", "provider": slot.name})
+                        continue
+                    if winner is None:
+                        winner = result
+                    else:
+                        await result.close()
+                if winner is not None:
+                    if hedged:
+                        metrics.increment(f"llm.hedge_wins.{winner.slot.name}")
+                    return winner
+                if not pending:
+                    # Fail over: the next provider gets a full hedge delay of its own
+                    failover = launch()
+                    if failover is not None:
+                        metrics.increment("llm.failovers")
+                        hedge_at = loop.time() + self.hedge_delay(failover)
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    started = await task
+                except BaseException:
+                    continue
+                await started.close()
+
+        retry_after = min((slot.bucket.seconds_until_available() for slot in rate_limited),
+                          default=5)
+        raise LLMUnavailable("No LLM provider available", retry_after=max(1, math.ceil(retry_after)))
+
+    def stream(self, request: LLMRequest) -> RoutedStream:
+        """Fragments from the first provider to answer"""
+        return RoutedStream(self, request)
+
+    async def complete(self, request: LLMRequest) -> str:
+        return "".join([fragment async for fragment in self.stream(request)])
+
+    async def aclose(self) -> None:
+        for slot in self.slots:
+            await slot.provider.aclose()
+
+
+@lru_cache
+def get_llm_provider() -> LLMRouter:
+    """Shared router over LLM_PROVIDERS"""
+    return LLMRouter([build_provider(name) for name in settings.LLM_PROVIDERS.split(",")])
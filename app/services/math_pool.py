@@ -0,0 +1,281 @@
+"""Process pool for SymPy checks with hard timeouts and memory limits"""
+
+import importlib
+import multiprocessing
+import queue
+import resource
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Functions a worker may run, resolved inside the worker
+TASK_MODULE = "app.services.math_verifier"
+TASKS = ("parse_step", "symbolic_check")
+
+# Seconds a new worker may take to import SymPy and report ready
+WORKER_START_TIMEOUT_SECONDS = 60.0
+
+
+class MathCheckAborted(TimeoutError):
+    """Raised when a check was killed (timeout, memory budget or crash) or no worker was free"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Math check aborted: {reason}")
+        self.reason = reason
+
+
+def _worker_main(conn: Connection, memory_mb: int) -> None:
+    """
+    Worker loop: import SymPy once, then run tasks until told to stop
+
+    The address-space limit is applied after the imports so only the
+    checks themselves count against the budget. A MemoryError ends the
+    worker; the parent starts a fresh one.
+    """
+    module = importlib.import_module(TASK_MODULE)
+    functions = {name: getattr(module, name) for name in TASKS}
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if task is None:
+            return
+        name, args = task
+        try:
+            conn.send(("ok", functions[name](*args)))
+        except MemoryError:
+            conn.send(("memory", None))
+            return
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                conn.send(("error", RuntimeError(repr(e))))
+
+
+class _Worker:
+    """Parent-side handle of one worker process"""
+
+    __slots__ = ("process", "conn", "tasks")
+
+    def __init__(self, process: multiprocessing.Process, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.tasks = 0
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class MathWorkerPool:
+    """
+    Fixed set of warm SymPy worker processes
+
+    Every check runs in a worker with a hard wall-clock timeout: if it
+    does not answer in time the process is killed (SymPy cannot be
+    interrupted cooperatively) and replaced in the background. Workers
+    that exceed MATH_WORKER_MEMORY_MB, crash, or reach
+    MATH_WORKER_MAX_TASKS are replaced the same way.
+    """
+
+    def __init__(self, workers: Optional[int] = None, memory_mb: Optional[int] = None,
+                 max_tasks: Optional[int] = None):
+        self.size = workers or settings.MATH_POOL_WORKERS
+        self.memory_mb = settings.MATH_WORKER_MEMORY_MB if memory_mb is None else memory_mb
+        self.max_tasks = max_tasks or settings.MATH_WORKER_MAX_TASKS
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._starting: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._stopping = threading.Event()
+        self._counts = {"completed": 0, "errors": 0, "timeouts": 0, "memory": 0,
+                        "crashes": 0, "respawns": 0, "busy": 0}
+
+    @property
+    def started(self) -> bool:
+        return self._started_at is not None
+
+    # ------------------------------------------------------------------
+    # Worker lifecycle
+    # ------------------------------------------------------------------
+
+    def _spawn(self) -> None:
+        """Start one worker and make it available once SymPy is imported"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.memory_mb),
+            name="math-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        with self._lock:
+            self._starting.add(worker)
+        try:
+            if not parent_conn.poll(WORKER_START_TIMEOUT_SECONDS):
+                raise RuntimeError("math worker did not become ready")
+            parent_conn.recv()
+        except Exception as e:
+            if not self._stopping.is_set():  # killed by shutdown otherwise
+                log_error(logger, e, {"operation": "math_worker_start"})
+            worker.kill()
+            return
+        finally:
+            with self._lock:
+                self._starting.discard(worker)
+        self._release(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        """Return a worker to the idle queue, or stop it if the pool is shutting down"""
+        if self._stopping.is_set():
+            worker.kill()
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker: _Worker, reason: str) -> None:
+        """Kill a worker and start a replacement in the background"""
+        worker.kill()
+        with self._lock:
+            self._counts["respawns"] += 1
+        metrics.increment("math_pool.respawns")
+        if not self._stopping.is_set():
+            threading.Thread(target=self._spawn, daemon=True).start()
+        logger.info("Replaced math worker", extra={"extra": {"reason": reason}})
+
+    def start(self) -> None:
+        """Start the workers (they become available as they finish importing)"""
+        if self.started:
+            return
+        self._stopping.clear()
+        self._started_at = time.monotonic()
+        for _ in range(self.size):
+            threading.Thread(target=self._spawn, daemon=True).start()
+
+    def wait_ready(self, timeout: float = WORKER_START_TIMEOUT_SECONDS) -> bool:
+        """Block until every worker is idle (used by scripts and tests)"""
+        deadline = time.monotonic() + timeout
+        while self._idle.qsize() < self.size:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def shutdown(self) -> None:
+        """Stop idle and starting workers (busy ones stop when their check ends)"""
+        if not self.started:
+            return
+        self._stopping.set()
+        with self._lock:
+            starting = list(self._starting)
+        for worker in starting:
+            worker.kill()
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+        self._started_at = None
+
+    # ------------------------------------------------------------------
+    # Running checks
+    # ------------------------------------------------------------------
+
+    def run(self, name: str, args: tuple, timeout: float) -> Any:
+        """
+        Run a verifier function in a worker
+
+        Args:
+            name: One of TASKS
+            args: Picklable arguments
+            timeout: Hard wall-clock limit in seconds (including queueing)
+
+        Returns:
+            The function's return value
+
+        Raises:
+            MathCheckAborted: On timeout, memory budget, crash or no free worker
+            Exception: Whatever the function raised (e.g. ExpressionParseError)
+        """
+        start = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self._count("busy")
+            raise MathCheckAborted("busy")
+
+        remaining = max(0.0, timeout - (time.perf_counter() - start))
+        metrics.observe("math_pool.queue_wait", time.perf_counter() - start)
+        try:
+            worker.conn.send((name, args))
+            answered = worker.conn.poll(remaining)
+            status, payload = worker.conn.recv() if answered else (None, None)
+        except (EOFError, OSError):
+            self._count("crashes")
+            self._replace(worker, "crash")
+            raise MathCheckAborted("crash")
+        if not answered:
+            self._count("timeouts")
+            self._replace(worker, "timeout")
+            raise MathCheckAborted("timeout")
+
+        metrics.observe(f"math_pool.{name}_time", time.perf_counter() - start)
+        if status == "memory":
+            self._count("memory")
+            self._replace(worker, "memory")
+            raise MathCheckAborted("memory")
+
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks:
+            self._replace(worker, "max_tasks")
+        else:
+            self._release(worker)
+
+        if status == "error":
+            self._count("errors")
+            raise payload
+        self._count("completed")
+        return payload
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+        metrics.increment(f"math_pool.{key}")
+
+    def stats(self) -> dict[str, Any]:
+        """Throughput, failure counts and latency summaries"""
+        with self._lock:
+            counts = dict(self._counts)
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize(),
+            "uptime_seconds": round(uptime, 2),
+            "throughput_per_second": round(counts["completed"] / uptime, 2) if uptime else 0.0,
+            **counts,
+            "latency": {name: metrics.latency(f"math_pool.{name}_time") for name in TASKS},
+        }
+
+
+# Global pool, started with the application when MATH_POOL_ENABLED
+math_pool = MathWorkerPool()
@@ -0,0 +1,425 @@
+"""Equivalence checking of math steps with SymPy"""
+
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+import sympy
+from sympy.parsing.sympy_parser import (
+    convert_xor,
+    implicit_multiplication_application,
+    parse_expr,
+    standard_transformations,
+)
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.services.math_pool import MathWorkerPool, math_pool
+
+logger = get_logger(__name__)
+
+TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+
+# Only these names are visible while parsing; no builtins are reachable
+ALLOWED_NAMES: dict[str, Any] = {
+    "__builtins__": {},
+    **{name: getattr(sympy, name) for name in (
+        "Integer", "Float", "Rational", "Symbol", "Function",
+        "sin", "cos", "tan", "cot", "sec", "csc", "asin", "acos", "atan",
+        "sinh", "cosh", "tanh", "exp", "log", "sqrt", "Abs", "factorial",
+        "pi", "E", "I", "oo",
+    )},
+    "ln": sympy.log,
+    "abs": sympy.Abs,
+    "e": sympy.E,
+}
+
+_ALLOWED_CHARS = re.compile(r"^[0-9A-Za-z\s+\-*/^().,=]*$")
+_ATTRIBUTE_ACCESS = re.compile(r"\.\s*[A-Za-z]")
+
+# Relative tolerance for numeric comparison
+NUMERIC_TOLERANCE = 1e-8
+
+
+class ExpressionParseError(ValueError):
+    """Raised when a step cannot be parsed safely"""
+
+
+@dataclass(frozen=True)
+class ParsedStep:
+    """Canonical form of one step (equations are stored as lhs - rhs)"""
+    text: str
+    expr: Any
+    is_equation: bool
+    key: str  # srepr of the canonical form, used for structural checks
+
+    @property
+    def symbols(self) -> tuple:
+        return tuple(sorted(self.expr.free_symbols, key=lambda symbol: symbol.name))
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of checking a student step against the reference"""
+    equivalent: bool
+    method: str  # structural, numeric, symbolic, parse_error, timeout or mismatch
+    matched_step: Optional[int] = None
+    detail: Optional[str] = None
+
+
+def parse_step(text: str) -> ParsedStep:
+    """
+    Parse a step safely into its canonical form
+
+    Args:
+        text: Expression ("2x + 1") or equation ("2x = 6")
+
+    Returns:
+        Parsed step
+
+    Raises:
+        ExpressionParseError: If the text is too long, uses characters or
+            names outside the allowed set, or is not valid math
+    """
+    text = text.strip()
+    if not text or len(text) > settings.MATH_MAX_EXPRESSION_LENGTH:
+        raise ExpressionParseError("Expresión vacía o demasiado larga")
+    if not _ALLOWED_CHARS.match(text) or _ATTRIBUTE_ACCESS.search(text):
+        raise ExpressionParseError("La expresión contiene caracteres no permitidos")
+
+    sides = text.split("=")
+    if len(sides) > 2:
+        raise ExpressionParseError("La expresión contiene más de un '='")
+    try:
+        parsed = [parse_expr(side, local_dict={}, global_dict=dict(ALLOWED_NAMES),
+                             transformations=TRANSFORMATIONS, evaluate=True) for side in sides]
+    except Exception as e:
+        raise ExpressionParseError(f"Expresión no válida: {text}") from e
+    if not all(isinstance(side, sympy.Basic) for side in parsed):
+        raise ExpressionParseError(f"Expresión no válida: {text}")
+
+    is_equation = len(parsed) == 2
+    expr = parsed[0] - parsed[1] if is_equation else parsed[0]
+    try:
+        key = sympy.srepr(expr)
+    except ValueError as e:  # integers beyond the int-to-str digit limit
+        raise ExpressionParseError(f"Expresión no válida: {text}") from e
+    return ParsedStep(text=text, expr=expr, is_equation=is_equation, key=key)
+
+
+@dataclass(frozen=True)
+class CompiledStep:
+    """NumPy-callable form of a step (func is None when it cannot be lambdified)"""
+    symbols: tuple
+    func: Optional[Callable[..., Any]]
+
+
+def compile_step(step: ParsedStep) -> CompiledStep:
+    """Lambdify a step for vectorized evaluation (worth it for reused steps)"""
+    symbols = step.symbols
+    try:
+        func = sympy.lambdify(symbols, step.expr, modules="numpy", docstring_limit=0)
+    except Exception:
+        func = None
+    return CompiledStep(symbols=symbols, func=func)
+
+
+def _cot(values: np.ndarray) -> np.ndarray:
+    return 1 / np.tan(values)
+
+
+def _sec(values: np.ndarray) -> np.ndarray:
+    return 1 / np.cos(values)
+
+
+def _csc(values: np.ndarray) -> np.ndarray:
+    return 1 / np.sin(values)
+
+
+# NumPy counterparts of the functions allowed by the parser
+NUMPY_FUNCTIONS: dict[Any, Callable[..., Any]] = {
+    sympy.sin: np.sin, sympy.cos: np.cos, sympy.tan: np.tan,
+    sympy.cot: _cot, sympy.sec: _sec, sympy.csc: _csc,
+    sympy.asin: np.arcsin, sympy.acos: np.arccos, sympy.atan: np.arctan,
+    sympy.sinh: np.sinh, sympy.cosh: np.cosh, sympy.tanh: np.tanh,
+    sympy.exp: np.exp, sympy.log: np.log, sympy.Abs: np.abs,
+}
+
+
+class _NotVectorizable(Exception):
+    pass
+
+
+def _evaluate_tree(expr: Any, columns: dict) -> Any:
+    """
+    Evaluate an expression tree directly with NumPy ufuncs
+
+    Used for one-off student answers, where the code generation done by
+    lambdify costs more than the evaluation itself.
+    """
+    if expr.is_Symbol:
+        return columns[expr]
+    if expr.is_number and not expr.args:
+        return complex(expr)
+    args = [_evaluate_tree(arg, columns) for arg in expr.args]
+    if expr.is_Add:
+        return sum(args[1:], args[0])
+    if expr.is_Mul:
+        result = args[0]
+        for arg in args[1:]:
+            result = result * arg
+        return result
+    if expr.is_Pow:
+        return np.power(args[0], args[1])
+    function = NUMPY_FUNCTIONS.get(expr.func)
+    if function is None:
+        raise _NotVectorizable(expr.func)
+    return function(*args)
+
+
+def _evaluate_batch(step: ParsedStep, compiled: Optional[CompiledStep], columns: dict,
+                    size: int) -> Optional[np.ndarray]:
+    """Values of a step at every sample point (nan where undefined)"""
+    try:
+        with np.errstate(all="ignore"):
+            if compiled is None or compiled.func is None:
+                values = _evaluate_tree(step.expr, columns)
+            else:
+                values = compiled.func(*(columns[symbol] for symbol in compiled.symbols))
+        return np.broadcast_to(np.asarray(values, dtype=complex), (size,))
+    except (_NotVectorizable, TypeError, ValueError, OverflowError, NameError):
+        return None  # functions NumPy has no counterpart for (e.g. factorial)
+
+
+def _close(a: np.ndarray, b: Any) -> np.ndarray:
+    return np.abs(a - b) <= NUMERIC_TOLERANCE * np.maximum(1.0, np.maximum(np.abs(a), np.abs(b)))
+
+
+def numeric_check(reference: ParsedStep, answer: ParsedStep,
+                  compiled_reference: Optional[CompiledStep] = None) -> Optional[bool]:
+    """
+    Compare two steps on a batch of random points
+
+    Both steps are evaluated once on the whole batch. Expressions must
+    agree at every point; equations must be proportional (lhs - rhs of
+    one is a non-zero constant multiple of the other).
+
+    Args:
+        reference: Reference step
+        answer: Student step
+        compiled_reference: Cached compile_step(reference); the reference
+            is evaluated like the answer when not given
+
+    Returns:
+        True or False, or None when too few points could be evaluated
+    """
+    symbols = sorted(reference.expr.free_symbols | answer.expr.free_symbols,
+                     key=lambda symbol: symbol.name)
+    samples = settings.MATH_NUMERIC_SAMPLES
+    size = samples * 2
+    seed = int(hashlib.sha256((reference.key + answer.key).encode()).hexdigest()[:8], 16)
+    points = np.random.default_rng(seed).uniform(-3, 3, (len(symbols), size)).astype(complex)
+    columns = dict(zip(symbols, points))
+
+    ref_values = _evaluate_batch(reference, compiled_reference, columns, size)
+    answer_values = _evaluate_batch(answer, None, columns, size)
+    if ref_values is None or answer_values is None:
+        return None
+    defined = np.isfinite(ref_values) & np.isfinite(answer_values)
+    ref_values, answer_values = ref_values[defined][:samples], answer_values[defined][:samples]
+    if len(ref_values) < max(3, samples // 2):
+        return None
+
+    if not reference.is_equation:
+        return bool(np.all(_close(ref_values, answer_values)))
+
+    # Equations: ratio answer/reference must be the same non-zero constant
+    ref_zero, answer_zero = _close(ref_values, 0), _close(answer_values, 0)
+    if np.any(ref_zero != answer_zero):
+        return False
+    if np.all(ref_zero):
+        return None
+    ratios = answer_values[~ref_zero] / ref_values[~ref_zero]
+    return bool(np.all(_close(ratios, ratios[0])))
+
+
+def symbolic_check(reference: ParsedStep, answer: ParsedStep) -> bool:
+    """Decide equivalence with simplify (slow)"""
+    if reference.is_equation:
+        if answer.expr == 0 or reference.expr == 0:
+            return answer.expr == reference.expr
+        ratio = sympy.simplify(answer.expr / reference.expr)
+        return not ratio.free_symbols and ratio != 0
+    return sympy.simplify(reference.expr - answer.expr) == 0
+
+
+class MathVerifier:
+    """
+    Staged equivalence checks with caching
+
+    Student answers are parsed once (LRU by text), reference steps are
+    parsed and canonicalized once per problem (LRU by problem and steps
+    hash) and lambdified once per canonical form, and every
+    (reference, answer) verdict is memoized. Checks run from cheapest to
+    most expensive: structural equality of canonical forms, vectorized
+    numeric sampling in the calling thread, and ``simplify`` only when
+    sampling is inconclusive.
+
+    Parsing and ``simplify`` have their own timeouts. With a started
+    worker pool (MATH_POOL_ENABLED) they run in separate processes and are
+    killed at the timeout; otherwise they run in threads and a timed-out
+    check keeps running in the background.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_workers: int = 4,
+                 pool: Optional[MathWorkerPool] = None):
+        max_entries = max_entries or settings.MATH_CACHE_MAX_ENTRIES
+        self.pool = pool
+        self.parsed_answers: LRUCache[ParsedStep] = LRUCache("math.parse_cache", max_entries)
+        self.references: LRUCache[list] = LRUCache("math.reference_cache", max_entries)
+        self.compiled: LRUCache[CompiledStep] = LRUCache("math.compiled_cache", max_entries)
+        self.verdicts: LRUCache[VerificationResult] = LRUCache("math.verdict_cache", max_entries)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="math-verifier")
+
+    def _with_timeout(self, func: Callable[..., Any], timeout: float, *args: Any) -> Any:
+        """
+        Run a check with a timeout
+
+        Raises:
+            TimeoutError: If the check did not finish in time (or its
+                worker process was killed)
+        """
+        pool = self.pool if self.pool is not None else math_pool
+        if pool.started:
+            return pool.run(func.__name__, args, timeout)
+        # SymPy cannot be interrupted from another thread: the caller gets
+        # an answer at the timeout while the check finishes in the background
+        future = self._executor.submit(func, *args)
+        return future.result(timeout=timeout)
+
+    def parse_answer(self, text: str) -> ParsedStep:
+        """Parse a student answer (cached by text)"""
+        return self.parsed_answers.get_or_compute(
+            text.strip(),
+            lambda: self._with_timeout(parse_step, settings.MATH_PARSE_TIMEOUT_SECONDS, text),
+        )
+
+    def reference_steps(self, problem_id: UUID, steps: Sequence[str]) -> list[Optional[ParsedStep]]:
+        """
+        Canonical forms of a problem's solution steps (cached per problem version)
+
+        Raises:
+            TimeoutError: If a step could not be parsed in time (or the pool
+                was busy); nothing is cached so the next call retries
+        """
+        digest = hashlib.sha256("\x1f".join(steps).encode("utf-8")).hexdigest()
+
+        def parse_all() -> list[Optional[ParsedStep]]:
+            parsed = []
+            for step in steps:
+                try:
+                    parsed.append(self._with_timeout(
+                        parse_step, settings.MATH_PARSE_TIMEOUT_SECONDS, step))
+                except ExpressionParseError:
+                    parsed.append(None)  # prose steps are not checked
+            return parsed
+
+        return self.references.get_or_compute((problem_id, digest), parse_all)
+
+    def compiled_step(self, step: ParsedStep) -> CompiledStep:
+        """Lambdified form of a reference step (cached by canonical form)"""
+        return self.compiled.get_or_compute(step.key, lambda: compile_step(step))
+
+    def compare(self, reference: ParsedStep, answer: ParsedStep) -> VerificationResult:
+        """Check one reference step against an answer, cheapest check first"""
+        key = (reference.key, reference.is_equation, answer.key, answer.is_equation)
+        cached = self.verdicts.get(key)
+        if cached is not None:
+            return cached
+
+        if reference.is_equation != answer.is_equation:
+            result = VerificationResult(equivalent=False, method="mismatch",
+                                        detail="Se esperaba una ecuación" if reference.is_equation
+                                        else "Se esperaba una expresión")
+        elif reference.key == answer.key:
+            result = VerificationResult(equivalent=True, method="structural")
+        else:
+            result = self._numeric_then_symbolic(reference, answer)
+
+        if result.method != "timeout":
+            self.verdicts.put(key, result)
+        metrics.increment(f"math.verify.{result.method}")
+        return result
+
+    def _numeric_then_symbolic(self, reference: ParsedStep, answer: ParsedStep) -> VerificationResult:
+        numeric = numeric_check(reference, answer, self.compiled_step(reference))
+        if numeric is not None:
+            return VerificationResult(equivalent=numeric, method="numeric")
+
+        try:
+            symbolic = self._with_timeout(
+                symbolic_check, settings.MATH_SYMBOLIC_TIMEOUT_SECONDS, reference, answer)
+        except FutureTimeoutError:
+            return VerificationResult(equivalent=False, method="timeout",
+                                      detail="No se pudo verificar a tiempo")
+        return VerificationResult(equivalent=bool(symbolic), method="symbolic")
+
+    def verify(self, problem_id: UUID, steps: Sequence[str], answer: str,
+               step_index: Optional[int] = None) -> VerificationResult:
+        """
+        Verify a student step against a problem's solution steps
+
+        Args:
+            problem_id: Problem ID (cache key of its reference steps)
+            steps: Problem.solution_steps
+            answer: Student input
+            step_index: Reference step to compare with; any step when None
+
+        Returns:
+            Verification result (with the matching step index on success)
+        """
+        try:
+            parsed = self.parse_answer(answer)
+        except ExpressionParseError as e:
+            return VerificationResult(equivalent=False, method="parse_error", detail=str(e))
+        except FutureTimeoutError:
+            return VerificationResult(equivalent=False, method="timeout",
+                                      detail="No se pudo interpretar la expresión a tiempo")
+
+        try:
+            references = self.reference_steps(problem_id, steps)
+        except FutureTimeoutError:
+            return VerificationResult(equivalent=False, method="timeout",
+                                      detail="No se pudo verificar a tiempo")
+        indexes = [step_index] if step_index is not None else range(len(references))
+
+        # Cheap pass first: an exact canonical match anywhere wins
+        for index in indexes:
+            reference = references[index]
+            if (reference is not None and reference.key == parsed.key
+                    and reference.is_equation == parsed.is_equation):
+                metrics.increment("math.verify.structural")
+                return VerificationResult(equivalent=True, method="structural", matched_step=index)
+
+        last = VerificationResult(equivalent=False, method="mismatch")
+        for index in indexes:
+            reference = references[index]
+            if reference is None:
+                continue
+            result = self.compare(reference, parsed)
+            if result.equivalent:
+                return VerificationResult(equivalent=True, method=result.method,
+                                          matched_step=index)
+            last = result
+        return last
+
+
+# Global verifier
+math_verifier = MathVerifier()
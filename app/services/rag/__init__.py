@@ -0,0 +1,60 @@
+"""Retrieval of teacher content for Level-2 scaffolds"""
+from app.services.rag.embeddings import (
+    DiskEmbeddingCache,
+    EmbeddingService,
+    EmbeddingUnavailable,
+    embedding_service,
+)
+from app.services.rag.ingestion import (
+    NotionIngestor,
+    NotionSyncJobs,
+    NotionSyncLock,
+    NotionSyncService,
+    notion_sync_jobs,
+)
+from app.services.rag.notion_source import (
+    DirectorySource,
+    NotionAPISource,
+    NotionSourceError,
+    get_notion_source,
+)
+from app.services.rag.retrieval import (
+    QueryBucketer,
+    RetrievalCache,
+    RetrievalService,
+    retrieval_cache,
+    retrieval_service,
+)
+from app.services.rag.vector_store import (
+    ChromaVectorStore,
+    LocalVectorStore,
+    MemoryVectorStore,
+    RetrievedChunk,
+    get_vector_store,
+)
+
+__all__ = [
+    "ChromaVectorStore",
+    "DirectorySource",
+    "DiskEmbeddingCache",
+    "EmbeddingService",
+    "EmbeddingUnavailable",
+    "LocalVectorStore",
+    "MemoryVectorStore",
+    "NotionAPISource",
+    "NotionIngestor",
+    "NotionSourceError",
+    "NotionSyncJobs",
+    "NotionSyncLock",
+    "NotionSyncService",
+    "QueryBucketer",
+    "RetrievalCache",
+    "RetrievalService",
+    "RetrievedChunk",
+    "embedding_service",
+    "get_notion_source",
+    "get_vector_store",
+    "notion_sync_jobs",
+    "retrieval_cache",
+    "retrieval_service",
+]
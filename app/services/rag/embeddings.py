@@ -0,0 +1,302 @@
+"""Sentence embeddings with micro-batching and a two-tier cache"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Texts -> float32 matrix of shape (len(texts), dimension)
+Encoder = Callable[[list[str]], np.ndarray]
+
+
+class EmbeddingUnavailable(Exception):
+    """Raised when the embedding queue is full or the model cannot answer"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _sentence_transformer_encoder(model_name: str) -> Encoder:
+    """Load the sentence-transformers model (CPU) and wrap it as an encoder"""
+    from sentence_transformers import SentenceTransformer
+
+    if settings.EMBEDDING_TORCH_THREADS:
+        import torch
+        torch.set_num_threads(settings.EMBEDDING_TORCH_THREADS)
+
+    model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(texts: list[str]) -> np.ndarray:
+        return model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                            normalize_embeddings=True, show_progress_bar=False)
+
+    return encode
+
+
+class DiskEmbeddingCache:
+    """
+    One ``.npy`` file per embedding, sharded by key prefix
+
+    Shared by every worker process on the host. Writes go through a
+    temporary file and ``os.replace`` so readers never see partial files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._path(key), allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # truncated or corrupt entry: recompute it
+            log_error(logger, e, {"operation": "embedding_disk_get"})
+            return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as handle:
+                np.save(handle, vector, allow_pickle=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            log_error(logger, e, {"operation": "embedding_disk_put"})
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding model behind a micro-batching queue
+
+    The model is loaded once per process by start(), at app startup, so no
+    request waits for it inside a batch. Concurrent callers enqueue texts; the thread waits up to
+    EMBEDDING_BATCH_WAIT_MS for more work and encodes up to
+    EMBEDDING_BATCH_SIZE texts per forward pass, which is far cheaper on
+    CPU than one pass per request.
+
+    Embeddings are cached by sha256(model version, text): an in-memory LRU
+    in front of an optional disk tier (EMBEDDING_DISK_CACHE_DIR), so
+    repeated queries and problem texts are never re-encoded.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[Encoder] = None,
+        model_name: Optional[str] = None,
+        model_version: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        batch_wait_ms: Optional[float] = None,
+        queue_depth: Optional[int] = None,
+        cache_max_entries: Optional[int] = None,
+        disk_cache_dir: Optional[str] = None,
+    ):
+        self.model_name = model_name or settings.EMBEDDING_MODEL_NAME
+        self.model_version = f"{self.model_name}@{model_version or settings.EMBEDDING_MODEL_VERSION}"
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.batch_wait = (settings.EMBEDDING_BATCH_WAIT_MS if batch_wait_ms is None
+                           else batch_wait_ms) / 1000
+        self.memory: LRUCache[np.ndarray] = LRUCache(
+            "embedding.memory_cache", cache_max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        disk_cache_dir = settings.EMBEDDING_DISK_CACHE_DIR if disk_cache_dir is None else disk_cache_dir
+        self.disk = DiskEmbeddingCache(disk_cache_dir) if disk_cache_dir else None
+        self._encoder = encoder
+        self._queue: queue.Queue[tuple[str, Future]] = queue.Queue(
+            maxsize=queue_depth or settings.EMBEDDING_QUEUE_DEPTH)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Load the model, then start the batching thread"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+        try:
+            self._get_encoder()
+        except Exception as e:
+            # Batches retry the load and fail with EmbeddingUnavailable meanwhile
+            log_error(logger, e, {"operation": "embedding_load", "model": self.model_version})
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the batching thread; queued requests fail"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout=5)
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(EmbeddingUnavailable("Servicio de embeddings detenido"))
+
+    def _get_encoder(self) -> Encoder:
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    start = time.perf_counter()
+                    self._encoder = _sentence_transformer_encoder(self.model_name)
+                    logger.info("Loaded embedding model", extra={"extra": {
+                        "model": self.model_version,
+                        "seconds": round(time.perf_counter() - start, 2),
+                    }})
+        return self._encoder
+
+    # ------------------------------------------------------------------
+    # Batching thread
+    # ------------------------------------------------------------------
+
+    def _next_batch(self) -> list[tuple[str, Future]]:
+        """Block for the first request, then gather more for up to batch_wait"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._encode_batch(batch)
+
+    def _encode_batch(self, batch: list[tuple[str, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        start = time.perf_counter()
+        try:
+            vectors = np.asarray(self._get_encoder()(texts), dtype=np.float32)
+        except Exception as e:
+            log_error(logger, e, {"operation": "embedding_encode", "batch_size": len(texts)})
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        metrics.observe("embedding.encode_time", time.perf_counter() - start)
+        metrics.observe("embedding.batch_size", len(texts))
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def key(self, text: str) -> str:
+        """Cache key of a text under the current model version"""
+        digest = hashlib.sha256(self.model_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cached(self, key: str) -> Optional[np.ndarray]:
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                metrics.increment("embedding.disk_cache.hits")
+                self.memory.put(key, vector)
+        return vector
+
+    def embed(self, texts: Sequence[str], timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Embed texts, encoding only those not cached
+
+        Args:
+            texts: Texts to embed (duplicates are encoded once)
+            timeout: Seconds to wait for the model (default EMBEDDING_TIMEOUT_SECONDS)
+
+        Returns:
+            float32 matrix with one L2-normalized row per text
+
+        Raises:
+            EmbeddingUnavailable: If the queue is full, the batch does not
+                finish in time or the model failed
+        """
+        timeout = timeout or settings.EMBEDDING_TIMEOUT_SECONDS
+        keys = [self.key(text) for text in texts]
+        vectors: dict[str, np.ndarray] = {}
+        pending: dict[str, tuple[str, Future]] = {}
+        for text, key in zip(texts, keys):
+            if key in vectors or key in pending:
+                continue
+            cached = self._cached(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                pending[key] = (text, Future())
+
+        if pending:
+            self.start()
+            for text, future in pending.values():
+                try:
+                    self._queue.put_nowait((text, future))
+                except queue.Full:
+                    metrics.increment("embedding.rejected")
+                    raise EmbeddingUnavailable(
+                        "Servicio de embeddings saturado, inténtalo de nuevo en unos segundos")
+            deadline = time.monotonic() + timeout
+            for key, (_, future) in pending.items():
+                try:
+                    vector = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except TimeoutError:
+                    metrics.increment("embedding.timeouts")
+                    raise EmbeddingUnavailable("El servicio de embeddings no respondió a tiempo")
+                except EmbeddingUnavailable:
+                    raise
+                except Exception as e:  # model failed to load or encode
+                    raise EmbeddingUnavailable("El servicio de embeddings no está disponible") from e
+                vectors[key] = vector
+                self.memory.put(key, vector)
+                if self.disk is not None:
+                    self.disk.put(key, vector)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def embed_one(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embed a single text"""
+        return self.embed([text], timeout=timeout)[0]
+
+
+# Global embedding service (the app loads the model at startup)
+embedding_service = EmbeddingService()
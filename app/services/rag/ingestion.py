@@ -0,0 +1,459 @@
+"""Incremental ingestion of teacher Notion pages into the vector store"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.db.base import SessionLocal
+from app.models.notion import NotionPage
+from app.models.user import Teacher
+from app.schemas.rag import NotionPageError, NotionSyncResult, NotionSyncStatus
+from app.services.rag.embeddings import embedding_service
+from app.services.rag.notion_source import Block, NotionSource, NotionSourceError, get_notion_source
+from app.services.rag.retrieval import retrieval_cache
+from app.services.rag.vector_store import get_vector_store
+
+logger = get_logger(__name__)
+
+STATUS_KEY_PREFIX = "notion_sync"
+
+
+@dataclass
+class Chunk:
+    """Unit of text embedded and stored in the vector store"""
+    id: str
+    text: str
+    hash: str
+    metadata: dict[str, Any]
+
+
+@dataclass
+class PageState:
+    """What the vector store currently holds for one page"""
+    title: Optional[str]
+    last_edited_time: Optional[datetime]
+    content_hash: str
+    chunk_hashes: dict[str, str] = field(default_factory=dict)
+
+
+def _split(text: str, max_chars: int) -> list[str]:
+    """Split a long block at whitespace into pieces of at most max_chars"""
+    pieces, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_page(teacher_id: UUID, page_id: str, title: Optional[str], blocks: Sequence[Block],
+               max_chars: Optional[int] = None) -> list[Chunk]:
+    """
+    Turn the blocks of a page into chunks
+
+    Each text block becomes one chunk (long blocks are split), prefixed by
+    the heading it sits under. Chunk ids derive from block ids, so only
+    the chunks of edited blocks get a new hash.
+    """
+    max_chars = max_chars or settings.RAG_CHUNK_MAX_CHARS
+    chunks = []
+    section = None
+    for block in blocks:
+        if block.is_heading:
+            section = block.text
+            continue
+        for n, piece in enumerate(_split(block.text, max_chars)):
+            text = f"{section}\n{piece}" if section else piece
+            digest = hashlib.sha256(f"{title or ''}\0{text}".encode("utf-8")).hexdigest()
+            chunks.append(Chunk(
+                id=f"{teacher_id}:{page_id}:{block.id}:{n}",
+                text=text,
+                hash=digest,
+                metadata={"teacher_id": str(teacher_id), "page_id": page_id,
+                          "block_id": block.id, "title": title or ""},
+            ))
+    return chunks
+
+
+def _content_hash(chunk_hashes: dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(sorted(chunk_hashes.items())).encode("utf-8")).hexdigest()
+
+
+class NotionIngestor:
+    """
+    Diff pages against their stored state and update the vector store
+
+    A page whose ``last_edited_time`` did not move is skipped without
+    reading its blocks. Otherwise the page is re-chunked and only chunks
+    whose hash changed are embedded; chunks of removed blocks are deleted.
+    Upserts and deletes are sent in batches of RAG_UPSERT_BATCH_SIZE.
+    Once the store is updated, cached retrievals of the teacher are
+    dropped if anything changed.
+    """
+
+    def __init__(self, source: NotionSource, store=None, embedder=None,
+                 batch_size: Optional[int] = None, cache=None):
+        self.source = source
+        self.store = store if store is not None else get_vector_store()
+        self.embedder = embedder if embedder is not None else embedding_service
+        self.cache = cache if cache is not None else retrieval_cache
+        self.batch_size = batch_size or settings.RAG_UPSERT_BATCH_SIZE
+        self._upserts: list[Chunk] = []
+        self._deletes: list[str] = []
+
+    def _flush_upserts(self) -> None:
+        for start in range(0, len(self._upserts), self.batch_size):
+            batch = self._upserts[start:start + self.batch_size]
+            vectors = self.embedder.embed([chunk.text for chunk in batch])
+            self.store.upsert([chunk.id for chunk in batch], vectors,
+                              [chunk.text for chunk in batch],
+                              [chunk.metadata for chunk in batch])
+        self._upserts = []
+
+    def _flush_deletes(self) -> None:
+        for start in range(0, len(self._deletes), self.batch_size):
+            self.store.delete(self._deletes[start:start + self.batch_size])
+        self._deletes = []
+
+    def _queue(self, upserts: list[Chunk], deletes: list[str]) -> None:
+        self._upserts.extend(upserts)
+        self._deletes.extend(deletes)
+        if len(self._upserts) >= self.batch_size:
+            self._flush_upserts()
+        if len(self._deletes) >= self.batch_size:
+            self._flush_deletes()
+
+    def _sync_page(self, teacher_id: UUID, page_id: str, state: Optional[PageState],
+                   force: bool, result: NotionSyncResult) -> Optional[PageState]:
+        """Sync one page; returns its new state (None when unchanged)"""
+        info = self.source.page_info(page_id)
+        if (state is not None and not force and info.last_edited_time is not None
+                and state.last_edited_time == info.last_edited_time):
+            result.pages_unchanged += 1
+            return None
+
+        blocks = self.source.blocks(page_id)
+        title = info.title or next((block.text for block in blocks if block.is_heading), None)
+        chunks = chunk_page(teacher_id, page_id, title, blocks)
+        hashes = {chunk.id: chunk.hash for chunk in chunks}
+        content_hash = _content_hash(hashes)
+        new_state = PageState(title=title, last_edited_time=info.last_edited_time,
+                              content_hash=content_hash, chunk_hashes=hashes)
+        if state is not None and not force and state.content_hash == content_hash:
+            result.pages_unchanged += 1  # touched but not edited: remember the new time
+            return new_state
+
+        old = state.chunk_hashes if state is not None else {}
+        upserts = [chunk for chunk in chunks if force or old.get(chunk.id) != chunk.hash]
+        deletes = [chunk_id for chunk_id in old if chunk_id not in hashes]
+        self._queue(upserts, deletes)
+        result.pages_synced += 1
+        result.chunks_upserted += len(upserts)
+        result.chunks_deleted += len(deletes)
+        return new_state
+
+    def sync_pages(self, teacher_id: UUID, page_ids: Sequence[str], states: dict[str, PageState],
+                   force: bool = False) -> tuple[dict[str, PageState], NotionSyncResult]:
+        """
+        Bring the vector store in line with a teacher's pages
+
+        Args:
+            teacher_id: Owner of the pages
+            page_ids: Teacher.notion_page_ids
+            states: Stored state per page id
+            force: Re-embed every chunk even if unchanged
+
+        Returns:
+            Tuple of (new state per page id, sync result). Pages that failed
+            to load keep their previous state and are listed in the errors.
+        """
+        result = NotionSyncResult()
+        new_states = dict(states)
+        wanted = list(dict.fromkeys(page_ids))
+
+        for page_id in [page_id for page_id in states if page_id not in set(wanted)]:
+            removed = new_states.pop(page_id)
+            self._queue([], list(removed.chunk_hashes))
+            result.pages_removed += 1
+            result.chunks_deleted += len(removed.chunk_hashes)
+
+        for page_id in wanted:
+            try:
+                state = self._sync_page(teacher_id, page_id, states.get(page_id), force, result)
+            except NotionSourceError as e:
+                result.errors.append(NotionPageError(page_id=page_id, detail=str(e)))
+                continue
+            if state is not None:
+                new_states[page_id] = state
+
+        self._flush_upserts()
+        self._flush_deletes()
+        if result.chunks_upserted or result.chunks_deleted:
+            self.cache.invalidate_teacher(teacher_id)
+        metrics.increment("rag.chunks_upserted", result.chunks_upserted)
+        metrics.increment("rag.chunks_deleted", result.chunks_deleted)
+        return new_states, result
+
+
+class NotionSyncService:
+    """Notion sync of a teacher, with page state kept in notion_pages"""
+
+    @staticmethod
+    def sync_teacher(db: Session, teacher_id: UUID, source: Optional[NotionSource] = None,
+                     store=None, embedder=None, force: bool = False) -> NotionSyncResult:
+        """
+        Sync a teacher's Notion pages and commit the new page states
+
+        Raises:
+            HTTPException: If the teacher does not exist
+            NotionSourceError: If no source is available (e.g. no token)
+        """
+        teacher = db.get(Teacher, teacher_id)
+        if teacher is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profesor no encontrado",
+            )
+
+        rows = {row.page_id: row for row in db.scalars(
+            select(NotionPage).where(NotionPage.teacher_id == teacher_id))}
+        states = {
+            page_id: PageState(title=row.title, last_edited_time=row.last_edited_time,
+                               content_hash=row.content_hash, chunk_hashes=dict(row.chunk_hashes))
+            for page_id, row in rows.items()
+        }
+        ingestor = NotionIngestor(source or get_notion_source(teacher.notion_token),
+                                  store=store, embedder=embedder)
+        new_states, result = ingestor.sync_pages(
+            teacher_id, teacher.notion_page_ids or [], states, force=force)
+
+        now = datetime.utcnow()
+        for page_id, row in rows.items():
+            if page_id not in new_states:
+                db.delete(row)
+        for page_id, state in new_states.items():
+            if states.get(page_id) == state:
+                continue
+            row = rows.get(page_id) or NotionPage(teacher_id=teacher_id, page_id=page_id)
+            row.title = state.title
+            row.last_edited_time = state.last_edited_time
+            row.content_hash = state.content_hash
+            row.chunk_hashes = state.chunk_hashes
+            row.synced_at = now
+            db.add(row)
+        db.commit()
+
+        logger.info("Notion sync finished", extra={"extra": {
+            "teacher_id": str(teacher_id), **result.model_dump(exclude={"errors"}),
+            "errors": len(result.errors),
+        }})
+        return result
+
+
+def _run_sync(teacher_id: UUID, force: bool) -> NotionSyncResult:
+    db = SessionLocal()
+    try:
+        return NotionSyncService.sync_teacher(db, teacher_id, force=force)
+    finally:
+        db.close()
+
+
+class NotionSyncLock:
+    """
+    Shared per-teacher lock: one sync per teacher across all processes
+
+    Taken with SET NX and a TTL that a heartbeat thread refreshes while the
+    lock is held, so the lock of a crashed process expires on its own.
+    Release only deletes the key while it still holds this owner's token.
+    If the store fails, the sync proceeds (the notion_pages unique
+    constraint still rejects duplicate rows).
+    """
+
+    def __init__(self, teacher_id: UUID, store=None, ttl_seconds: Optional[int] = None):
+        self.teacher_id = teacher_id
+        self._store = store
+        self.ttl_seconds = ttl_seconds or settings.NOTION_SYNC_LOCK_TTL_SECONDS
+        self.key = f"{STATUS_KEY_PREFIX}:lock:{teacher_id}"
+        self.token = uuid4().hex.encode()
+        self.held = False
+        self._released = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    def acquire(self) -> bool:
+        """Take the lock; False if another sync of the teacher holds it"""
+        try:
+            self.held = self.store.set_nx(self.key, self.token, ttl=self.ttl_seconds)
+        except Exception as e:
+            log_error(logger, e, {"operation": "notion_sync_lock",
+                                  "teacher_id": str(self.teacher_id)})
+            self.held = True
+        if self.held:
+            self._heartbeat = threading.Thread(target=self._refresh, daemon=True,
+                                               name="notion-sync-lock")
+            self._heartbeat.start()
+        return self.held
+
+    def _refresh(self) -> None:
+        while not self._released.wait(self.ttl_seconds / 3):
+            try:
+                kept = self.store.update(
+                    self.key, lambda value: value if value == self.token else None,
+                    ttl=self.ttl_seconds)
+            except Exception as e:
+                log_error(logger, e, {"operation": "notion_sync_lock_refresh"})
+                continue
+            if kept is None:
+                logger.warning("Notion sync lock lost",
+                               extra={"extra": {"teacher_id": str(self.teacher_id)}})
+                return
+
+    def release(self) -> None:
+        if not self.held:
+            return
+        self.held = False
+        self._released.set()
+        try:
+            self.store.delete_if(self.key, self.token)
+        except Exception as e:
+            log_error(logger, e, {"operation": "notion_sync_lock_release"})
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class NotionSyncJobs:
+    """
+    Background Notion syncs, at most one per teacher at a time
+
+    Jobs run on a small thread pool; their status is kept in the shared
+    key-value store so any API process can report it. A job holds the
+    teacher's NotionSyncLock from submit until it finishes, so another API
+    process or ``scripts/sync_notion.py`` never syncs the same teacher
+    meanwhile.
+    """
+
+    def __init__(self, store=None, workers: Optional[int] = None,
+                 runner: Optional[Callable[[UUID, bool], NotionSyncResult]] = None):
+        self._store = store
+        self._runner = runner or _run_sync
+        self._workers = workers or settings.NOTION_SYNC_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._active: dict[UUID, NotionSyncStatus] = {}  # queued or running here
+        self._locks: dict[UUID, NotionSyncLock] = {}
+        self._futures: dict[UUID, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    @staticmethod
+    def _key(teacher_id: UUID) -> str:
+        return f"{STATUS_KEY_PREFIX}:{teacher_id}"
+
+    def _save(self, job: NotionSyncStatus) -> None:
+        try:
+            self.store.set(self._key(job.teacher_id), job.model_dump_json().encode("utf-8"),
+                           ttl=settings.NOTION_SYNC_STATUS_TTL_SECONDS)
+        except Exception as e:
+            log_error(logger, e, {"operation": "notion_sync_status_save"})
+
+    def status(self, teacher_id: UUID) -> Optional[NotionSyncStatus]:
+        """Status of the teacher's latest sync, or None"""
+        try:
+            data = self.store.get(self._key(teacher_id))
+        except Exception as e:
+            log_error(logger, e, {"operation": "notion_sync_status_get"})
+            return None
+        return NotionSyncStatus.model_validate_json(data) if data is not None else None
+
+    def submit(self, teacher_id: UUID, force: bool = False) -> NotionSyncStatus:
+        """Queue a sync unless one is already queued or running for the teacher"""
+        with self._lock:
+            active = self._active.get(teacher_id)
+            if active is not None:
+                # The shared status may be missing (store error, expired) or
+                # left over from an earlier run; the local job is authoritative
+                current = self.status(teacher_id)
+                if current is not None and current.state in ("queued", "running"):
+                    return current
+                return active
+            lock = NotionSyncLock(teacher_id, store=self._store)
+            if not lock.acquire():
+                # Queued or running in another process
+                return self.status(teacher_id) or NotionSyncStatus(
+                    teacher_id=teacher_id, state="running", queued_at=datetime.utcnow())
+            job = NotionSyncStatus(teacher_id=teacher_id, state="queued",
+                                   queued_at=datetime.utcnow())
+            self._active[teacher_id] = job
+            self._locks[teacher_id] = lock
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                    thread_name_prefix="notion-sync")
+            self._save(job)
+            self._futures[teacher_id] = self._executor.submit(self._run, job, force)
+        return job
+
+    def _finish(self, teacher_id: UUID) -> None:
+        with self._lock:
+            self._active.pop(teacher_id, None)
+            self._futures.pop(teacher_id, None)
+            lock = self._locks.pop(teacher_id, None)
+        if lock is not None:
+            lock.release()
+
+    def _run(self, job: NotionSyncStatus, force: bool) -> None:
+        job = job.model_copy(update={"state": "running", "started_at": datetime.utcnow()})
+        with self._lock:
+            self._active[job.teacher_id] = job
+        self._save(job)
+        try:
+            result = self._runner(job.teacher_id, force)
+            job = job.model_copy(update={"state": "done", "result": result})
+        except Exception as e:
+            log_error(logger, e, {"operation": "notion_sync", "teacher_id": str(job.teacher_id)})
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            job = job.model_copy(update={"state": "failed", "detail": detail})
+        self._save(job.model_copy(update={"finished_at": datetime.utcnow()}))
+        self._finish(job.teacher_id)
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs; queued jobs are dropped, running ones finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            cancelled = [teacher_id for teacher_id, future in self._futures.items()
+                         if future.cancelled()]
+        for teacher_id in cancelled:
+            self._finish(teacher_id)
+
+
+# Global job runner
+notion_sync_jobs = NotionSyncJobs()
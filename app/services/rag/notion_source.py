@@ -0,0 +1,183 @@
+"""Sources of teacher pages: the Notion API or a directory of exported pages"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Protocol
+
+from app.core.config import settings
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_API_VERSION = "2022-06-28"
+
+# Block types whose text lives in ``rich_text``
+_TEXT_BLOCKS = {
+    "paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item",
+    "numbered_list_item", "to_do", "toggle", "quote", "callout", "code",
+}
+_HEADING_BLOCKS = {"heading_1", "heading_2", "heading_3"}
+
+
+class NotionSourceError(Exception):
+    """Raised when a page cannot be read from its source"""
+
+
+@dataclass(frozen=True)
+class PageInfo:
+    """Page metadata, cheap to fetch before deciding whether to read the blocks"""
+    page_id: str
+    title: Optional[str]
+    last_edited_time: Optional[datetime]  # naive UTC, like the rest of the models
+
+
+@dataclass(frozen=True)
+class Block:
+    """One block of text; ids are stable across edits of other blocks"""
+    id: str
+    text: str
+    is_heading: bool = False
+
+
+class NotionSource(Protocol):
+    def page_info(self, page_id: str) -> PageInfo: ...
+
+    def blocks(self, page_id: str) -> list[Block]: ...
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class NotionAPISource:
+    """Pages read through the Notion REST API with a teacher's integration token"""
+
+    def __init__(self, token: str, client=None):
+        if client is None:
+            import httpx
+            client = httpx.Client(
+                base_url=NOTION_API_URL,
+                timeout=settings.NOTION_API_TIMEOUT_SECONDS,
+                headers={"Authorization": f"Bearer {token}",
+                         "Notion-Version": NOTION_API_VERSION},
+            )
+        self.client = client
+
+    def _get(self, path: str, params: Optional[dict] = None) -> dict:
+        try:
+            response = self.client.get(path, params=params)
+        except Exception as e:
+            raise NotionSourceError(f"Notion no responde: {e}") from e
+        if response.status_code != 200:
+            raise NotionSourceError(f"Notion respondió {response.status_code} para {path}")
+        return response.json()
+
+    def page_info(self, page_id: str) -> PageInfo:
+        page = self._get(f"/pages/{page_id}")
+        title = None
+        for prop in page.get("properties", {}).values():
+            if prop.get("type") == "title":
+                title = "".join(part.get("plain_text", "") for part in prop.get("title", []))
+                break
+        edited = page.get("last_edited_time")
+        return PageInfo(
+            page_id=page_id,
+            title=title or None,
+            last_edited_time=_utc_naive(datetime.fromisoformat(edited.replace("Z", "+00:00")))
+            if edited else None,
+        )
+
+    def _children(self, block_id: str) -> list[dict]:
+        results, cursor = [], None
+        while True:
+            params = {"page_size": 100}
+            if cursor:
+                params["start_cursor"] = cursor
+            data = self._get(f"/blocks/{block_id}/children", params)
+            results.extend(data.get("results", []))
+            if not data.get("has_more"):
+                return results
+            cursor = data.get("next_cursor")
+
+    def blocks(self, page_id: str) -> list[Block]:
+        found: list[Block] = []
+        pending = self._children(page_id)
+        while pending:
+            block = pending.pop(0)
+            kind = block.get("type")
+            body = block.get(kind, {})
+            if kind in _TEXT_BLOCKS:
+                text = "".join(part.get("plain_text", "") for part in body.get("rich_text", []))
+            elif kind == "equation":
+                text = body.get("expression", "")
+            else:
+                text = ""
+            if text.strip():
+                found.append(Block(id=block["id"], text=text.strip(),
+                                   is_heading=kind in _HEADING_BLOCKS))
+            if block.get("has_children") and kind != "child_page":
+                pending[:0] = self._children(block["id"])
+        return found
+
+
+class DirectorySource:
+    """
+    Offline stand-in for Notion: ``<root>/<page_id>.md`` exported pages
+
+    Blocks are separated by blank lines; lines starting with ``#`` are
+    headings. Block ids are content hashes, so editing one block leaves
+    the ids of the others untouched. The file modification time plays the
+    role of Notion's ``last_edited_time``.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.NOTION_EXPORT_DIR)
+
+    def _path(self, page_id: str) -> Path:
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", page_id):
+            raise NotionSourceError(f"Identificador de página no válido: {page_id}")
+        return self.root / f"{page_id}.md"
+
+    def _read(self, page_id: str) -> str:
+        try:
+            return self._path(page_id).read_text(encoding="utf-8")
+        except OSError as e:
+            raise NotionSourceError(f"Página no encontrada: {page_id}") from e
+
+    def page_info(self, page_id: str) -> PageInfo:
+        path = self._path(page_id)
+        try:
+            mtime = path.stat().st_mtime
+        except OSError as e:
+            raise NotionSourceError(f"Página no encontrada: {page_id}") from e
+        # The title (first heading) is taken from the blocks when the page is read
+        return PageInfo(page_id=page_id, title=None,
+                        last_edited_time=datetime.utcfromtimestamp(mtime))
+
+    def blocks(self, page_id: str) -> list[Block]:
+        found: list[Block] = []
+        seen: dict[str, int] = {}
+        for raw in re.split(r"\n\s*\n", self._read(page_id)):
+            text = raw.strip()
+            if not text:
+                continue
+            is_heading = text.startswith("#")
+            if is_heading:
+                text = text.lstrip("#").strip()
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+            seen[digest] = seen.get(digest, 0) + 1
+            block_id = digest if seen[digest] == 1 else f"{digest}-{seen[digest]}"
+            found.append(Block(id=block_id, text=text, is_heading=is_heading))
+        return found
+
+
+def get_notion_source(token: Optional[str]) -> NotionSource:
+    """Source selected by NOTION_SOURCE for a teacher's integration token"""
+    if settings.NOTION_SOURCE == "directory":
+        return DirectorySource()
+    if not token:
+        raise NotionSourceError("El profesor no tiene configurado un token de Notion")
+    return NotionAPISource(token)
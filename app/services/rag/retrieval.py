@@ -0,0 +1,197 @@
+"""Top-k retrieval of teacher content with a shared result cache"""
+
+import json
+import threading
+from dataclasses import asdict
+from typing import Optional
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.services.rag.embeddings import embedding_service
+from app.services.rag.vector_store import RetrievedChunk, get_vector_store
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "retrieval"
+
+# Fixed seed: every process must draw the same hyperplanes
+_LSH_SEED = 20240611
+
+
+class QueryBucketer:
+    """
+    Sign-random-projection hash of normalized query embeddings
+
+    Embeddings on the same side of every hyperplane share a bucket, so a
+    query and its near-duplicates (same concept, different whitespace or
+    casing) map to one cache entry.
+    """
+
+    def __init__(self, bits: Optional[int] = None):
+        self.bits = bits or settings.RETRIEVAL_CACHE_LSH_BITS
+        self._planes: dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _hyperplanes(self, dimension: int) -> np.ndarray:
+        with self._lock:
+            planes = self._planes.get(dimension)
+            if planes is None:
+                rng = np.random.default_rng(_LSH_SEED + dimension)
+                planes = rng.standard_normal((self.bits, dimension)).astype(np.float32)
+                self._planes[dimension] = planes
+        return planes
+
+    def bucket(self, embedding: np.ndarray) -> str:
+        """Hex bucket id of an embedding"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        signs = self._hyperplanes(vector.shape[0]) @ vector > 0
+        return np.packbits(signs).tobytes().hex()
+
+
+def _to_json(chunks: list[RetrievedChunk]) -> bytes:
+    return json.dumps([asdict(chunk) for chunk in chunks]).encode("utf-8")
+
+
+def _from_json(data: bytes) -> list[RetrievedChunk]:
+    return [RetrievedChunk(**chunk) for chunk in json.loads(data)]
+
+
+class RetrievalCache:
+    """
+    Top-k results per (teacher, problem, query bucket, k) in the shared store
+
+    Keys include a per-teacher generation that re-ingesting the teacher's
+    content bumps, so a hit never predates the current content, even for
+    a query that started before the bump and stores its results after it
+    (they land under the old generation and are never read). Old entries
+    expire with their TTL. Store errors are treated as misses.
+    """
+
+    def __init__(self, store=None, ttl_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self._store = store
+        self.ttl_seconds = ttl_seconds or settings.RETRIEVAL_CACHE_TTL_SECONDS
+        self.enabled = settings.RETRIEVAL_CACHE_ENABLED if enabled is None else enabled
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    @staticmethod
+    def key(teacher_id: UUID, generation: int, problem_id: Optional[UUID], bucket: str,
+            top_k: int) -> str:
+        return f"{KEY_PREFIX}:{teacher_id}:{generation}:{problem_id or '-'}:{bucket}:{top_k}"
+
+    @staticmethod
+    def _generation_key(teacher_id: UUID) -> str:
+        return f"{KEY_PREFIX}:generation:{teacher_id}"
+
+    def generation(self, teacher_id: UUID) -> Optional[int]:
+        """Current content generation of a teacher, or None if the store fails"""
+        try:
+            return int(self.store.get(self._generation_key(teacher_id)) or 0)
+        except Exception as e:
+            log_error(logger, e, {"operation": "retrieval_cache_generation"})
+            return None
+
+    def get(self, key: str) -> Optional[list[RetrievedChunk]]:
+        """Cached results or None"""
+        try:
+            data = self.store.get(key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "retrieval_cache_get"})
+            data = None
+        metrics.increment("retrieval_cache.hits" if data is not None else "retrieval_cache.misses")
+        return _from_json(data) if data is not None else None
+
+    def put(self, key: str, chunks: list[RetrievedChunk]) -> None:
+        """Store results"""
+        try:
+            self.store.set(key, _to_json(chunks), ttl=self.ttl_seconds)
+        except Exception as e:
+            log_error(logger, e, {"operation": "retrieval_cache_put"})
+
+    def invalidate_teacher(self, teacher_id: UUID) -> Optional[int]:
+        """
+        Start a new content generation for a teacher, orphaning its cached results
+
+        Returns:
+            New generation, or None if the store failed
+        """
+        try:
+            generation = self.store.incr(self._generation_key(teacher_id))
+        except Exception as e:
+            log_error(logger, e, {"operation": "retrieval_cache_invalidate",
+                                  "teacher_id": str(teacher_id)})
+            return None
+        metrics.increment("retrieval_cache.invalidations")
+        return generation
+
+
+class RetrievalService:
+    """Embed a hint query and fetch the closest chunks of the teacher's content"""
+
+    def __init__(self, cache: Optional[RetrievalCache] = None, store=None, embedder=None,
+                 bucketer: Optional[QueryBucketer] = None):
+        self.cache = cache or RetrievalCache()
+        self._store = store
+        self.embedder = embedder if embedder is not None else embedding_service
+        self.bucketer = bucketer or QueryBucketer()
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_vector_store()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case and whitespace do not change what a hint is about"""
+        return " ".join(query.lower().split())
+
+    def retrieve(self, teacher_id: UUID, query: str, problem_id: Optional[UUID] = None,
+                 top_k: Optional[int] = None) -> list[RetrievedChunk]:
+        """
+        Closest chunks of a teacher's content to a query
+
+        Args:
+            teacher_id: Owner of the content
+            query: Hint query (e.g. the ErrorDiagnosis.affected_concept and step)
+            problem_id: Problem the hint is for (part of the cache key)
+            top_k: Number of chunks (default RETRIEVAL_TOP_K)
+
+        Returns:
+            Chunks ordered by similarity, best first
+        """
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+        embedding = self.embedder.embed([self.normalize_query(query)])[0]
+        if not self.cache.enabled:
+            return self._query(teacher_id, embedding, top_k)
+
+        # Read before querying: results of content replaced meanwhile are
+        # stored under the generation they were computed for
+        generation = self.cache.generation(teacher_id)
+        if generation is None:
+            return self._query(teacher_id, embedding, top_k)
+        key = self.cache.key(teacher_id, generation, problem_id,
+                             self.bucketer.bucket(embedding), top_k)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        chunks = self._query(teacher_id, embedding, top_k)
+        self.cache.put(key, chunks)
+        return chunks
+
+    def _query(self, teacher_id: UUID, embedding: np.ndarray, top_k: int) -> list[RetrievedChunk]:
+        return self.store.query(embedding, top_k, where={"teacher_id": str(teacher_id)})
+
+
+# Global retrieval cache and service
+retrieval_cache = RetrievalCache()
+retrieval_service = RetrievalService(cache=retrieval_cache)
@@ -0,0 +1,426 @@
+"""Vector stores for RAG chunks (ChromaDB, memory-mapped local files, in-memory)"""
+
+import fcntl
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+from uuid import uuid4
+
+import numpy as np
+
+from app.core.config import settings
+
+
+@dataclass
+class RetrievedChunk:
+    """A stored chunk returned by a similarity query"""
+    id: str
+    text: str
+    metadata: dict[str, Any]
+    score: float  # cosine similarity, higher is closer
+
+
+class MemoryVectorStore:
+    """
+    Process-local store with brute-force cosine search
+
+    Used when VECTOR_STORE_BACKEND is "memory" (development and tests).
+    """
+
+    def __init__(self):
+        self._rows: dict[str, tuple[np.ndarray, str, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[dict[str, Any]]) -> None:
+        with self._lock:
+            for chunk_id, vector, text, metadata in zip(ids, embeddings, documents, metadatas):
+                self._rows[chunk_id] = (np.asarray(vector, dtype=np.float32), text, dict(metadata))
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for chunk_id in ids:
+                self._rows.pop(chunk_id, None)
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              where: Optional[dict[str, Any]] = None) -> list[RetrievedChunk]:
+        with self._lock:
+            rows = [(chunk_id, row) for chunk_id, row in self._rows.items()
+                    if not where or all(row[2].get(k) == v for k, v in where.items())]
+        if not rows:
+            return []
+        matrix = np.stack([row[0] for _, row in rows])
+        query = np.asarray(embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        best = np.argsort(-scores)[:top_k]
+        return [RetrievedChunk(id=rows[i][0], text=rows[i][1][1], metadata=rows[i][1][2],
+                               score=float(scores[i])) for i in best]
+
+
+class ChromaVectorStore:
+    """Chunks in the CHROMA_COLLECTION_NAME collection of a ChromaDB server"""
+
+    def __init__(self, collection=None):
+        if collection is None:
+            import chromadb
+            client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            collection = client.get_or_create_collection(
+                settings.CHROMA_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+        self.collection = collection
+
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[dict[str, Any]]) -> None:
+        self.collection.upsert(ids=list(ids), embeddings=np.asarray(embeddings).tolist(),
+                               documents=list(documents), metadatas=list(metadatas))
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              where: Optional[dict[str, Any]] = None) -> list[RetrievedChunk]:
+        result = self.collection.query(
+            query_embeddings=[np.asarray(embedding).tolist()], n_results=top_k,
+            where=where or None, include=["documents", "metadatas", "distances"])
+        return [
+            RetrievedChunk(id=chunk_id, text=text, metadata=metadata or {}, score=1.0 - distance)
+            for chunk_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0],
+                result["distances"][0])
+        ]
+
+
+MANIFEST = "chunks.json"
+SHARED_COLLECTION = "_shared"
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+Row = tuple[np.ndarray, str, dict[str, Any]]
+
+
+@dataclass
+class _Segment:
+    """The rows written by one upsert; immutable, the vectors stay memory-mapped"""
+    version: str
+    ids: list[str]
+    documents: list[str]
+    metadatas: list[dict[str, Any]]
+    vectors: np.ndarray  # (n, d) unit rows in the collection dtype
+    scales: Optional[np.ndarray]  # per-row scale of int8 segments
+
+    def unit_vectors(self) -> np.ndarray:
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        return vectors * self.scales[:, None] if self.scales is not None else vectors
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        scores = np.asarray(self.vectors @ query, dtype=np.float32)
+        return scores * self.scales if self.scales is not None else scores
+
+
+@dataclass
+class _Collection:
+    """A loaded collection: its segments, oldest first, flattened for queries"""
+    stamp: tuple[int, int]  # (mtime_ns, size) of the manifest it was read from
+    segments: list[_Segment]
+    deleted: list[str]
+    ids: list[str]
+    documents: list[str]
+    metadatas: list[dict[str, Any]]
+    live: np.ndarray  # rows neither replaced by a later segment nor deleted
+
+    @classmethod
+    def build(cls, stamp: tuple[int, int], segments: list[_Segment],
+              deleted: list[str]) -> "_Collection":
+        ids = [chunk_id for segment in segments for chunk_id in segment.ids]
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        removed = set(deleted)
+        live = np.array([latest[chunk_id] == i and chunk_id not in removed
+                         for i, chunk_id in enumerate(ids)], dtype=bool)
+        return cls(stamp=stamp, segments=segments, deleted=deleted, ids=ids,
+                   documents=[text for segment in segments for text in segment.documents],
+                   metadatas=[metadata for segment in segments for metadata in segment.metadatas],
+                   live=live)
+
+    def __len__(self) -> int:
+        return int(self.live.sum())
+
+    @property
+    def dead(self) -> int:
+        return len(self.ids) - len(self)
+
+    def live_ids(self) -> set[str]:
+        return {chunk_id for chunk_id, live in zip(self.ids, self.live) if live}
+
+    def rows(self) -> dict[str, Row]:
+        vectors = np.concatenate([segment.unit_vectors() for segment in self.segments])
+        return {self.ids[i]: (vectors[i], self.documents[i], self.metadatas[i])
+                for i in np.flatnonzero(self.live)}
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        scores = np.concatenate([segment.scores(query) for segment in self.segments])
+        return np.where(self.live, scores, -np.inf)
+
+
+class LocalVectorStore:
+    """
+    Per-teacher collections memory-mapped from VECTOR_STORE_DIR
+
+    A collection is a list of segments. Each upsert appends one segment with
+    only its rows: unit-normalized embeddings quantized to VECTOR_STORE_DTYPE
+    in vectors-<version>.npy, and ids, documents and metadata in
+    segment-<version>.json. The chunks.json manifest lists the segments and
+    the deleted ids; a row is live when no later segment replaces it and it
+    was not deleted. A query maps the teacher's segments read-only and
+    scores them exactly with one matrix product each, which for per-teacher
+    corpora is cheaper than the network hop to ChromaDB.
+
+    Writes happen under a file lock and swap the manifest atomically, so
+    other processes see them on their next query. An incremental sync costs
+    the size of its batch; the collection is rewritten into one segment only
+    when dead rows outnumber live ones or there are more than
+    VECTOR_STORE_MAX_SEGMENTS segments.
+    This suits corpora of up to some tens of thousands of chunks per teacher.
+    """
+
+    def __init__(self, root: Optional[str] = None, dtype: Optional[str] = None,
+                 max_segments: Optional[int] = None):
+        self.root = Path(root or settings.VECTOR_STORE_DIR)
+        self.dtype = dtype or settings.VECTOR_STORE_DTYPE
+        self.max_segments = max_segments or settings.VECTOR_STORE_MAX_SEGMENTS
+        self._collections: dict[str, _Collection] = {}
+        self._segments: dict[tuple[str, str], _Segment] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(collection) for collection in map(self._load, self._names())
+                   if collection is not None)
+
+    @staticmethod
+    def collection_name(metadata: dict[str, Any]) -> str:
+        """Collection of a chunk: its teacher, or the shared one"""
+        teacher_id = str(metadata.get("teacher_id") or "")
+        return teacher_id if _COLLECTION_NAME.match(teacher_id) else SHARED_COLLECTION
+
+    def _names(self) -> list[str]:
+        try:
+            return sorted(entry.name for entry in os.scandir(self.root)
+                          if entry.is_dir() and _COLLECTION_NAME.match(entry.name))
+        except FileNotFoundError:
+            return []
+
+    def _load_segment(self, directory: Path, version: str,
+                      data: Optional[dict[str, Any]] = None) -> _Segment:
+        # Segments never change once written, so a mapping is reused across manifests
+        key = (directory.name, version)
+        with self._lock:
+            cached = self._segments.get(key)
+        if cached is not None:
+            return cached
+        if data is None:
+            data = json.loads((directory / f"segment-{version}.json").read_text(encoding="utf-8"))
+        scales = data.get("scales")
+        segment = _Segment(
+            version=version, ids=data["ids"], documents=data["documents"],
+            metadatas=data["metadatas"],
+            vectors=np.load(directory / f"vectors-{version}.npy", mmap_mode="r"),
+            scales=np.asarray(scales, dtype=np.float32) if scales is not None else None)
+        with self._lock:
+            self._segments[key] = segment
+        return segment
+
+    def _load(self, name: str) -> Optional[_Collection]:
+        manifest = self.root / name / MANIFEST
+        # A concurrent compaction may delete the segments the manifest pointed to: retry once
+        for _ in range(2):
+            try:
+                stat = manifest.stat()
+            except FileNotFoundError:
+                return None
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            with self._lock:
+                cached = self._collections.get(name)
+            if cached is not None and cached.stamp == stamp:
+                return cached
+            try:
+                data = json.loads(manifest.read_text(encoding="utf-8"))
+                if "segments" in data:
+                    segments = [self._load_segment(manifest.parent, version)
+                                for version in data["segments"]]
+                else:
+                    # Manifest written before segments: the whole collection in one file
+                    segments = [self._load_segment(manifest.parent, data["version"], data)]
+            except FileNotFoundError:
+                continue
+            collection = _Collection.build(stamp, segments, data.get("deleted", []))
+            versions = {segment.version for segment in segments}
+            with self._lock:
+                self._collections[name] = collection
+                for key in [key for key in self._segments
+                            if key[0] == name and key[1] not in versions]:
+                    del self._segments[key]
+            return collection
+        return None
+
+    def _quantize(self, vectors: np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = vectors / np.where(norms == 0, 1.0, norms)
+        if self.dtype != "int8":
+            return unit.astype(self.dtype), None
+        scales = np.abs(unit).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(unit / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    @contextmanager
+    def _writing(self, name: str) -> Iterator[Path]:
+        directory = self.root / name
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, open(directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_segment(self, directory: Path, rows: dict[str, Row]) -> str:
+        # Not visible to readers until a manifest lists it
+        version = uuid4().hex
+        vectors, scales = self._quantize(np.stack([row[0] for row in rows.values()]))
+        np.save(directory / f"vectors-{version}.npy", vectors)
+        (directory / f"segment-{version}.json").write_text(json.dumps({
+            "ids": list(rows),
+            "documents": [row[1] for row in rows.values()],
+            "metadatas": [row[2] for row in rows.values()],
+            "scales": scales.tolist() if scales is not None else None,
+        }), encoding="utf-8")
+        return version
+
+    @staticmethod
+    def _write_manifest(directory: Path, versions: list[str], deleted: set[str]) -> None:
+        manifest = directory / MANIFEST
+        if not versions:
+            manifest.unlink(missing_ok=True)
+            return
+        tmp = directory / f"{MANIFEST}.{uuid4().hex}.tmp"
+        tmp.write_text(json.dumps({"segments": versions, "deleted": sorted(deleted)}),
+                       encoding="utf-8")
+        os.replace(tmp, manifest)
+
+    def _compact(self, directory: Path, collection: _Collection) -> None:
+        rows = collection.rows()
+        versions = [self._write_segment(directory, rows)] if rows else []
+        self._write_manifest(directory, versions, set())
+        # Readers that already mapped an old segment keep their open mapping
+        for path in [*directory.glob("vectors-*.npy"), *directory.glob("segment-*.*")]:
+            if path.stem.split("-", 1)[1] not in versions:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _versions(directory: Path, collection: Optional[_Collection]) -> list[str]:
+        if collection is None:
+            return []
+        for segment in collection.segments:
+            path = directory / f"segment-{segment.version}.json"
+            if not path.exists():
+                # Collections written before segments kept their rows in the manifest
+                path.write_text(json.dumps({
+                    "ids": segment.ids, "documents": segment.documents,
+                    "metadatas": segment.metadatas,
+                    "scales": segment.scales.tolist() if segment.scales is not None else None,
+                }), encoding="utf-8")
+        return [segment.version for segment in collection.segments]
+
+    def _commit(self, directory: Path, versions: list[str], deleted: set[str]) -> None:
+        self._write_manifest(directory, versions, deleted)
+        collection = self._load(directory.name)
+        if collection is not None and (len(collection.segments) > self.max_segments
+                                       or collection.dead > len(collection)):
+            self._compact(directory, collection)
+
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[dict[str, Any]]) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        groups: dict[str, list[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.collection_name(metadata), []).append(i)
+        for name, positions in groups.items():
+            with self._writing(name) as directory:
+                collection = self._load(name)
+                rows = {ids[i]: (embeddings[i], documents[i], dict(metadatas[i]))
+                        for i in positions}
+                versions = self._versions(directory, collection)
+                deleted = set(collection.deleted) - rows.keys() if collection is not None \
+                    else set()
+                self._commit(directory, versions + [self._write_segment(directory, rows)],
+                             deleted)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        remaining = set(ids)
+        # Chunk ids start with the teacher id (see chunk_page), so try that collection first
+        likely = {chunk_id.split(":", 1)[0] for chunk_id in remaining}
+        for name in sorted(likely) + [name for name in self._names() if name not in likely]:
+            if not remaining:
+                break
+            if self._load(name) is None:
+                continue
+            with self._writing(name) as directory:
+                collection = self._load(name)
+                if collection is None:
+                    continue
+                found = remaining & collection.live_ids()
+                if found:
+                    self._commit(directory, self._versions(directory, collection),
+                                 set(collection.deleted) | found)
+                remaining -= found
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              where: Optional[dict[str, Any]] = None) -> list[RetrievedChunk]:
+        where = where or {}
+        names = [self.collection_name(where)] if "teacher_id" in where else self._names()
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        candidates: list[tuple[float, _Collection, int]] = []
+        for name in names:
+            collection = self._load(name)
+            if collection is None:
+                continue
+            scores = collection.scores(query)
+            # Rows of a teacher collection all belong to that teacher
+            filters = {k: v for k, v in where.items()
+                       if k != "teacher_id" or name == SHARED_COLLECTION}
+            if filters:
+                keep = np.array([all(metadata.get(k) == v for k, v in filters.items())
+                                 for metadata in collection.metadatas], dtype=bool)
+                scores = np.where(keep, scores, -np.inf)
+            best = np.argpartition(-scores, top_k)[:top_k] if len(scores) > top_k \
+                else np.arange(len(scores))
+            candidates.extend((float(scores[i]), collection, int(i)) for i in best
+                              if scores[i] != -np.inf)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [RetrievedChunk(id=collection.ids[i], text=collection.documents[i],
+                               metadata=collection.metadatas[i], score=score)
+                for score, collection, i in candidates[:top_k]]
+
+
+@lru_cache
+def get_vector_store():
+    """Shared store selected by VECTOR_STORE_BACKEND"""
+    if settings.VECTOR_STORE_BACKEND == "chroma":
+        return ChromaVectorStore()
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore()
+    return MemoryVectorStore()
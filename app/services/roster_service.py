@@ -0,0 +1,261 @@
+"""Class roster import service for bulk student onboarding"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Any
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.password_hashing import password_hasher
+from app.models.class_model import Class, ClassStudent
+from app.models.user import Student, User, UserRole
+from app.schemas.roster import (
+    MAX_ROSTER_ROWS,
+    RosterCreatedStudent,
+    RosterImportResponse,
+    RosterRowError,
+    RosterStudentIn,
+)
+from app.schemas.user import UserRegister
+
+# Rows per multi-row INSERT statement
+INSERT_CHUNK_SIZE = 1000
+
+
+class RosterService:
+    """Service for importing whole class rosters at once"""
+
+    @staticmethod
+    def parse_csv(content: bytes) -> list[RosterStudentIn]:
+        """
+        Parse a roster CSV with ``email`` and ``password`` columns
+
+        Args:
+            content: Raw CSV file content (UTF-8, optional BOM)
+
+        Returns:
+            Roster rows in file order
+
+        Raises:
+            HTTPException: If the file cannot be decoded, lacks the columns,
+                has a row with more fields than the header or too many rows
+        """
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El archivo CSV debe estar codificado en UTF-8",
+            )
+
+        reader = csv.DictReader(io.StringIO(text))
+        fieldnames = {name.strip().lower() for name in reader.fieldnames or []}
+        if not {"email", "password"} <= fieldnames:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El CSV debe tener las columnas 'email' y 'password'",
+            )
+
+        rows = []
+        for row_number, record in enumerate(reader, start=1):
+            if None in record:
+                # csv puts fields beyond the header under the None key; an
+                # unquoted comma would otherwise silently cut a password
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"La fila {row_number} tiene más campos que la cabecera",
+                )
+            normalized = {
+                key.strip().lower(): (value or "").strip()
+                for key, value in record.items()
+            }
+            rows.append(RosterStudentIn(
+                email=normalized["email"], password=normalized["password"]))
+
+        if not rows or len(rows) > MAX_ROSTER_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El CSV debe tener entre 1 y {MAX_ROSTER_ROWS} alumnos",
+            )
+        return rows
+
+    @staticmethod
+    def validate_rows(
+        rows: list[RosterStudentIn],
+    ) -> tuple[list[tuple[int, UserRegister]], list[RosterRowError]]:
+        """
+        Validate roster rows with the same rules as single registration
+
+        Args:
+            rows: Roster rows
+
+        Returns:
+            Tuple of (valid (row number, registration data) pairs, row errors)
+        """
+        valid: list[tuple[int, UserRegister]] = []
+        errors: list[RosterRowError] = []
+        seen: set[str] = set()
+
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                user_data = UserRegister(
+                    email=row.email, password=row.password, role=UserRole.STUDENT)
+            except ValidationError as e:
+                detail = "; ".join(error["msg"] for error in e.errors())
+                errors.append(RosterRowError(row=row_number, email=row.email, detail=detail))
+                continue
+
+            if user_data.email in seen:
+                errors.append(RosterRowError(
+                    row=row_number, email=user_data.email,
+                    detail="Email duplicado en el listado"))
+                continue
+
+            seen.add(user_data.email)
+            valid.append((row_number, user_data))
+
+        return valid, errors
+
+    @staticmethod
+    def _existing_emails(db: Session, emails: list[str]) -> set[str]:
+        """Get which of the given emails are already registered"""
+        existing: set[str] = set()
+        for i in range(0, len(emails), INSERT_CHUNK_SIZE):
+            chunk = emails[i:i + INSERT_CHUNK_SIZE]
+            existing.update(db.scalars(select(User.email).where(User.email.in_(chunk))))
+        return existing
+
+    @staticmethod
+    def import_students(
+        db: Session, class_id: UUID, rows: list[RosterStudentIn]
+    ) -> RosterImportResponse:
+        """
+        Create student accounts for a class roster and enroll them
+
+        Passwords are hashed in parallel in the hashing pool and rows are
+        written with multi-row INSERTs (``users``, ``students`` and
+        ``class_students``) in one transaction. Invalid, duplicated or
+        already registered emails are reported per row and skipped.
+
+        The read transaction is ended before hashing, which can take
+        minutes for a large roster, so no connection sits idle in
+        transaction meanwhile; emails registered during the hashing are
+        skipped by the inserts (ON CONFLICT DO NOTHING).
+
+        Args:
+            db: Database session
+            class_id: Class to enroll the students in
+            rows: Roster rows
+
+        Returns:
+            Import summary with created students and row errors
+
+        Raises:
+            HTTPException: If the class does not exist or the import fails
+        """
+        class_obj = db.get(Class, class_id)
+        if class_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Clase no encontrada",
+            )
+
+        valid, errors = RosterService.validate_rows(rows)
+
+        existing = RosterService._existing_emails(db, [data.email for _, data in valid])
+        pending: list[tuple[int, UserRegister]] = []
+        for row_number, data in valid:
+            if data.email in existing:
+                errors.append(RosterRowError(
+                    row=row_number, email=data.email, detail="Email ya está registrado"))
+            else:
+                pending.append((row_number, data))
+
+        teacher_id = class_obj.teacher_id
+        db.rollback()  # release the connection's snapshot while hashing
+
+        hashes = password_hasher.hash_many([data.password for _, data in pending])
+
+        now = datetime.utcnow()
+        user_rows: list[dict[str, Any]] = [
+            {
+                "id": uuid4(),
+                "email": data.email,
+                "password_hash": hashed,
+                "role": UserRole.STUDENT,
+                "created_at": now,
+            }
+            for (_, data), hashed in zip(pending, hashes)
+        ]
+
+        users = User.__table__
+        created: dict[str, UUID] = {}
+        try:
+            for i in range(0, len(user_rows), INSERT_CHUNK_SIZE):
+                chunk = user_rows[i:i + INSERT_CHUNK_SIZE]
+                # A concurrent registration may take an email between the
+                # existence check and here: skip it instead of aborting
+                statement = (
+                    pg_insert(users)
+                    .values(chunk)
+                    .on_conflict_do_nothing(index_elements=[users.c.email])
+                    .returning(users.c.id, users.c.email)
+                )
+                created.update({email: user_id for user_id, email in db.execute(statement)})
+
+            student_rows = [
+                {
+                    "id": user_id,
+                    "teacher_id": teacher_id,
+                    "total_problems_solved": 0,
+                    "average_scaffold_level": 0.0,
+                    "bkt_parameters": {},
+                }
+                for user_id in created.values()
+            ]
+            membership_rows = [
+                {
+                    "id": uuid4(),
+                    "class_id": class_id,
+                    "student_id": user_id,
+                    "joined_at": now,
+                }
+                for user_id in created.values()
+            ]
+            for i in range(0, len(student_rows), INSERT_CHUNK_SIZE):
+                db.execute(insert(Student.__table__).values(student_rows[i:i + INSERT_CHUNK_SIZE]))
+                db.execute(
+                    insert(ClassStudent.__table__).values(membership_rows[i:i + INSERT_CHUNK_SIZE]))
+
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error interno al importar la clase: {str(e)}",
+            )
+
+        for row_number, data in pending:
+            if data.email not in created:
+                errors.append(RosterRowError(
+                    row=row_number, email=data.email, detail="Email ya está registrado"))
+
+        errors.sort(key=lambda error: error.row)
+        return RosterImportResponse(
+            class_id=class_id,
+            created=len(created),
+            failed=len(errors),
+            students=[
+                RosterCreatedStudent(id=created[data.email], email=data.email)
+                for _, data in pending
+                if data.email in created
+            ],
+            errors=errors,
+        )
@@ -0,0 +1,25 @@
+"""Sandboxed execution of code submissions"""
+from app.services.sandbox.backends import (
+    DockerBackend,
+    ExecutionResult,
+    LocalBackend,
+    SandboxError,
+)
+from app.services.sandbox.harness import SubmissionResult, TestCaseResult, TestHarness
+from app.services.sandbox.pool import SandboxPool, SandboxUnavailable, sandbox_pool
+from app.services.sandbox.verdict_cache import VerdictCache, verdict_cache
+
+__all__ = [
+    "DockerBackend",
+    "ExecutionResult",
+    "LocalBackend",
+    "SandboxError",
+    "SandboxPool",
+    "SandboxUnavailable",
+    "SubmissionResult",
+    "TestCaseResult",
+    "TestHarness",
+    "VerdictCache",
+    "sandbox_pool",
+    "verdict_cache",
+]
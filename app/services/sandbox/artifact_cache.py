@@ -0,0 +1,189 @@
+"""Content-addressed disk cache of compiled CPP/JAVA submissions"""
+
+import hashlib
+import io
+import os
+import tarfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.models.problem import Language
+from app.services.sandbox.backends import SandboxWorker
+
+logger = get_logger(__name__)
+
+# Member holding the compiler output of a submission that failed to compile
+COMPILE_ERROR_MEMBER = "__compile_error__"
+
+
+class CachedBuild:
+    """Result of compiling one source: artifacts or a compile error"""
+
+    __slots__ = ("files", "compile_error")
+
+    def __init__(self, files: dict[str, bytes], compile_error: Optional[str] = None):
+        self.files = files
+        self.compile_error = compile_error
+
+
+class ArtifactCache:
+    """
+    LRU cache of compiled artifacts bounded by total size on disk
+
+    Entries are gzipped tar files named by sha256(language, toolchain version,
+    source), so identical resubmissions reuse the build and a toolchain
+    upgrade never serves stale binaries. Compile errors are cached too.
+    Writes go through a temporary file and ``os.replace``; the LRU order
+    is rebuilt from modification times on start-up.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.directory = Path(directory or settings.ARTIFACT_CACHE_DIR)
+        self.max_bytes = max_bytes or settings.ARTIFACT_CACHE_MAX_BYTES
+        self.enabled = settings.ARTIFACT_CACHE_ENABLED if enabled is None else enabled
+        self._entries: Optional[OrderedDict[str, int]] = None  # key -> size, oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(language: Language, toolchain_version: str, source: str) -> str:
+        """Content address of a build"""
+        digest = hashlib.sha256()
+        for part in (language.value, toolchain_version, source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.tar.gz"
+
+    def _index(self) -> OrderedDict[str, int]:
+        """Load the LRU index from disk on first use (lock held)"""
+        if self._entries is None:
+            found = []
+            if self.directory.exists():
+                for path in self.directory.glob("*/*.tar.gz"):
+                    stat = path.stat()
+                    found.append((stat.st_mtime, path.name.split(".")[0], stat.st_size))
+            self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._size = sum(self._entries.values())
+        return self._entries
+
+    def _record(self, hit: bool) -> None:
+        metrics.increment("artifact_cache.hits" if hit else "artifact_cache.misses")
+        hits = metrics.counter("artifact_cache.hits")
+        total = hits + metrics.counter("artifact_cache.misses")
+        metrics.set_gauge("artifact_cache.hit_rate", hits / total if total else 0.0)
+
+    def get(self, key: str) -> Optional[CachedBuild]:
+        """
+        Look up a build
+
+        Returns:
+            Cached build or None on a miss
+        """
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                self._record(hit=False)
+                return None
+            entries.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            with tarfile.open(path, mode="r:gz") as archive:
+                files = {member.name: archive.extractfile(member).read()
+                         for member in archive.getmembers() if member.isfile()}
+            os.utime(path)
+        except (OSError, tarfile.TarError) as e:
+            log_error(logger, e, {"operation": "artifact_cache_read", "key": key})
+            with self._lock:
+                self._size -= self._index().pop(key, 0)
+            self._record(hit=False)
+            return None
+
+        self._record(hit=True)
+        error = files.pop(COMPILE_ERROR_MEMBER, None)
+        return CachedBuild(files, error.decode("utf-8") if error is not None else None)
+
+    def put(self, key: str, build: CachedBuild) -> None:
+        """Store a build and evict least recently used entries above max_bytes"""
+        files = dict(build.files)
+        if build.compile_error is not None:
+            files[COMPILE_ERROR_MEMBER] = build.compile_error.encode("utf-8")
+
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = 0o755
+                archive.addfile(info, io.BytesIO(data))
+        data = buffer.getvalue()
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{key}.tmp{threading.get_ident()}")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            entries = self._index()
+            self._size += len(data) - entries.pop(key, 0)
+            entries[key] = len(data)
+            while self._size > self.max_bytes and entries:
+                old_key, old_size = entries.popitem(last=False)
+                self._path(old_key).unlink(missing_ok=True)
+                self._size -= old_size
+                metrics.increment("artifact_cache.evictions")
+            metrics.set_gauge("artifact_cache.bytes", self._size)
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            self._index()
+            return self._size
+
+    def compile(self, worker: SandboxWorker, source: str) -> Optional[str]:
+        """
+        Compile through the cache
+
+        On a hit the cached artifacts are copied into the worker instead of
+        compiling; on a miss the worker compiles and the result is stored.
+
+        Args:
+            worker: Borrowed sandbox worker
+            source: Source code
+
+        Returns:
+            Compiler output on failure, None on success
+        """
+        if not self.enabled or worker.spec.compile_cmd is None:
+            return worker.compile(source)
+
+        key = self.key(worker.language, worker.toolchain_version(), source)
+        build = self.get(key)
+        if build is not None:
+            if build.compile_error is None:
+                worker.import_artifacts(build.files)
+            return build.compile_error
+
+        compile_error = worker.compile(source)
+        try:
+            files = {} if compile_error is not None else worker.export_artifacts()
+            self.put(key, CachedBuild(files, compile_error))
+        except Exception as e:
+            log_error(logger, e, {"operation": "artifact_cache_write", "key": key})
+        return compile_error
+
+
+# Global artifact cache
+artifact_cache = ArtifactCache()
@@ -0,0 +1,476 @@
+"""Execution backends for the code sandbox"""
+
+import fnmatch
+import io
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.models.problem import Language
+
+# Exit codes reported by `timeout -s KILL` and by SIGKILL'd processes
+TIMEOUT_EXIT_CODES = (124, 137, -9)
+
+
+@dataclass(frozen=True)
+class LanguageSpec:
+    """How to build and run one language inside a sandbox"""
+    image: str
+    source_file: str
+    compile_cmd: Optional[list[str]]
+    run_cmd: list[str]
+    # Files produced by compile_cmd (glob patterns) and the toolchain version command
+    artifacts: tuple[str, ...] = ()
+    version_cmd: Optional[list[str]] = None
+
+
+# CPP and JAVA images are built from docker/sandbox (`make sandbox-images`)
+# so that they also ship python3 for the test harness driver
+LANGUAGE_SPECS: dict[Language, LanguageSpec] = {
+    Language.PYTHON: LanguageSpec(
+        image="python:3.11-slim",
+        source_file="main.py",
+        compile_cmd=None,
+        run_cmd=["python3", "-I", "main.py"],
+    ),
+    Language.CPP: LanguageSpec(
+        image="elenchos/sandbox-cpp:latest",
+        source_file="main.cpp",
+        compile_cmd=["g++", "-O2", "-std=c++17", "-o", "main", "main.cpp"],
+        run_cmd=["./main"],
+        artifacts=("main",),
+        version_cmd=["g++", "--version"],
+    ),
+    Language.JAVA: LanguageSpec(
+        image="elenchos/sandbox-java:latest",
+        source_file="Main.java",
+        compile_cmd=["javac", "Main.java"],
+        run_cmd=["java", "-Xss64m", "-XX:+UseSerialGC", "-cp", ".", "Main"],
+        artifacts=("*.class",),
+        version_cmd=["javac", "-version"],
+    ),
+}
+
+
+@dataclass
+class ExecutionResult:
+    """Outcome of running a submission once"""
+    stdout: str
+    stderr: str
+    exit_code: Optional[int]
+    timed_out: bool
+    duration_seconds: float
+    compile_error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.compile_error is None and not self.timed_out and self.exit_code == 0
+
+
+class SandboxError(Exception):
+    """Raised when a sandbox worker cannot be created or used"""
+
+
+def parse_memory_limit(limit: str) -> int:
+    """
+    Convert a Docker-style memory limit ("256m", "1g") to bytes
+
+    Args:
+        limit: Memory limit string
+
+    Returns:
+        Limit in bytes
+    """
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    limit = limit.strip().lower()
+    if limit and limit[-1] in units:
+        return int(float(limit[:-1]) * units[limit[-1]])
+    return int(limit)
+
+
+def _truncate(data: bytes) -> str:
+    return data[:settings.SANDBOX_MAX_OUTPUT_BYTES].decode("utf-8", errors="replace")
+
+
+class SandboxWorker(ABC):
+    """A pre-started sandbox bound to one language"""
+
+    def __init__(self, language: Language):
+        self.language = language
+        self.spec = LANGUAGE_SPECS[language]
+        self.runs = 0
+        self._toolchain_version: Optional[str] = None
+
+    def toolchain_version(self) -> str:
+        """Compiler version string (queried once per worker)"""
+        if self._toolchain_version is None:
+            if self.spec.version_cmd is None:
+                self._toolchain_version = ""
+            else:
+                result = self.run_command(self.spec.version_cmd, {},
+                                          settings.SANDBOX_COMPILE_TIMEOUT_SECONDS)
+                self._toolchain_version = (result.stdout + result.stderr).strip()
+        return self._toolchain_version
+
+    @abstractmethod
+    def export_artifacts(self) -> dict[str, bytes]:
+        """Read the compiled files matching the language's artifact patterns"""
+
+    @abstractmethod
+    def import_artifacts(self, files: dict[str, bytes]) -> None:
+        """Write previously compiled files so the submission can run without compiling"""
+
+    @abstractmethod
+    def compile(self, source: str) -> Optional[str]:
+        """
+        Write the source and compile it when the language needs it
+
+        Returns:
+            Compiler output on failure, None on success
+        """
+
+    @abstractmethod
+    def run(self, stdin: str, timeout: float) -> ExecutionResult:
+        """Run the compiled submission once with the given input"""
+
+    @abstractmethod
+    def run_command(self, command: list[str], files: dict[str, str],
+                    timeout: float) -> ExecutionResult:
+        """Copy extra files into the work directory and run an arbitrary command"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Remove files and processes left by the previous submission"""
+
+    @abstractmethod
+    def healthy(self) -> bool:
+        """Whether the worker can still accept submissions"""
+
+    @abstractmethod
+    def destroy(self) -> None:
+        """Release the underlying container or directory"""
+
+
+class SandboxBackend(ABC):
+    """Factory of sandbox workers"""
+
+    name = "base"
+
+    @abstractmethod
+    def create(self, language: Language) -> SandboxWorker:
+        """Start a worker for a language"""
+
+
+# ----------------------------------------------------------------------
+# Docker
+# ----------------------------------------------------------------------
+
+
+class DockerWorker(SandboxWorker):
+    """
+    Long-lived container running ``sleep infinity``
+
+    Submissions are copied into a tmpfs work directory and executed with
+    ``docker exec`` as an unprivileged user; the container itself is
+    reused until the pool recycles it.
+    """
+
+    workdir = "/sandbox"
+
+    def __init__(self, language: Language, container: Any):
+        super().__init__(language)
+        self.container = container
+
+    def _put_files(self, files: dict[str, str | bytes], mode: int = 0o644) -> None:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as archive:
+            for name, content in files.items():
+                data = content.encode("utf-8") if isinstance(content, str) else content
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = mode
+                info.uid = info.gid = 65534
+                archive.addfile(info, io.BytesIO(data))
+        if not self.container.put_archive(self.workdir, buffer.getvalue()):
+            raise SandboxError("No se pudo copiar el código al sandbox")
+
+    def _exec(self, command: list[str], timeout: float) -> tuple[int, bytes, bytes, float]:
+        start = time.perf_counter()
+        result = self.container.exec_run(
+            ["timeout", "-s", "KILL", str(timeout), *command],
+            workdir=self.workdir,
+            user="65534",
+            demux=True,
+        )
+        stdout, stderr = result.output
+        return result.exit_code, stdout or b"", stderr or b"", time.perf_counter() - start
+
+    def compile(self, source: str) -> Optional[str]:
+        self._put_files({self.spec.source_file: source})
+        if self.spec.compile_cmd is None:
+            return None
+        exit_code, stdout, stderr, _ = self._exec(
+            self.spec.compile_cmd, settings.SANDBOX_COMPILE_TIMEOUT_SECONDS)
+        if exit_code != 0:
+            return _truncate(stderr or stdout) or "Error de compilación"
+        return None
+
+    def run(self, stdin: str, timeout: float) -> ExecutionResult:
+        self._put_files({"input.txt": stdin})
+        command = " ".join(self.spec.run_cmd) + " < input.txt"
+        exit_code, stdout, stderr, elapsed = self._exec(["sh", "-c", command], timeout)
+        return ExecutionResult(
+            stdout=_truncate(stdout),
+            stderr=_truncate(stderr),
+            exit_code=exit_code,
+            timed_out=exit_code in TIMEOUT_EXIT_CODES,
+            duration_seconds=elapsed,
+        )
+
+    def run_command(self, command: list[str], files: dict[str, str],
+                    timeout: float) -> ExecutionResult:
+        self._put_files(files)
+        exit_code, stdout, stderr, elapsed = self._exec(command, timeout)
+        return ExecutionResult(
+            stdout=stdout.decode("utf-8", errors="replace"),
+            stderr=_truncate(stderr),
+            exit_code=exit_code,
+            timed_out=exit_code in TIMEOUT_EXIT_CODES,
+            duration_seconds=elapsed,
+        )
+
+    def export_artifacts(self) -> dict[str, bytes]:
+        stream, _ = self.container.get_archive(f"{self.workdir}/.")
+        files = {}
+        with tarfile.open(fileobj=io.BytesIO(b"".join(stream)), mode="r") as archive:
+            for member in archive.getmembers():
+                name = os.path.basename(member.name)
+                if member.isfile() and any(fnmatch.fnmatch(name, p) for p in self.spec.artifacts):
+                    files[name] = archive.extractfile(member).read()
+        return files
+
+    def import_artifacts(self, files: dict[str, bytes]) -> None:
+        self._put_files(files, mode=0o755)
+
+    def reset(self) -> None:
+        # Kill leftovers except PID 1 (sleep) and this shell, then wipe files
+        script = (
+            "for p in /proc/[0-9]*; do pid=${p#/proc/}; "
+            "[ \"$pid\" != 1 ] && [ \"$pid\" != $$ ] && kill -9 \"$pid\" 2>/dev/null; done; "
+            f"rm -rf {self.workdir}/* {self.workdir}/.[!.]*; true"
+        )
+        result = self.container.exec_run(["sh", "-c", script], user="65534")
+        if result.exit_code != 0:
+            raise SandboxError("No se pudo reiniciar el sandbox")
+
+    def healthy(self) -> bool:
+        try:
+            self.container.reload()
+            if self.container.status != "running":
+                return False
+            return self.container.exec_run(["true"]).exit_code == 0
+        except Exception:
+            return False
+
+    def destroy(self) -> None:
+        try:
+            self.container.remove(force=True)
+        except Exception:
+            pass
+
+
+class DockerBackend(SandboxBackend):
+    """Creates hardened, network-less containers through the Docker daemon"""
+
+    name = "docker"
+
+    def __init__(self, client: Any = None):
+        if client is None:
+            import docker  # imported lazily: only needed when Docker is used
+            client = docker.from_env()
+        self.client = client
+
+    def create(self, language: Language) -> DockerWorker:
+        spec = LANGUAGE_SPECS[language]
+        try:
+            container = self.client.containers.run(
+                spec.image,
+                ["sleep", "infinity"],
+                detach=True,
+                auto_remove=False,
+                network_disabled=True,
+                mem_limit=settings.DOCKER_MEMORY_LIMIT,
+                memswap_limit=settings.DOCKER_MEMORY_LIMIT,
+                nano_cpus=int(settings.DOCKER_CPU_LIMIT * 1e9),
+                pids_limit=64,
+                read_only=True,
+                tmpfs={DockerWorker.workdir: "rw,exec,size=64m,mode=1777"},
+                cap_drop=["ALL"],
+                security_opt=["no-new-privileges"],
+                labels={"elenchos.sandbox": language.value},
+            )
+        except Exception as e:
+            raise SandboxError(f"No se pudo crear el contenedor: {e}") from e
+        return DockerWorker(language, container)
+
+
+# ----------------------------------------------------------------------
+# Local (subprocess + rlimits)
+# ----------------------------------------------------------------------
+
+
+def _limit_resources(memory_bytes: Optional[int], cpu_seconds: int) -> None:
+    """Applied in the child before exec"""
+    os.setsid()
+    if memory_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (16 * 1024 ** 2, 16 * 1024 ** 2))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+class LocalWorker(SandboxWorker):
+    """
+    Stand-in sandbox using a private directory and a resource-limited subprocess
+
+    Offers no isolation from the host filesystem or network: it exists so
+    the pool can be developed and tested without a Docker daemon.
+    """
+
+    def __init__(self, language: Language):
+        super().__init__(language)
+        self.workdir = tempfile.mkdtemp(prefix=f"elenchos-sandbox-{language.value.lower()}-")
+        self.memory_bytes = parse_memory_limit(settings.DOCKER_MEMORY_LIMIT)
+
+    def _command(self, command: list[str]) -> list[str]:
+        if command[0] == "python3":
+            return [sys.executable, *command[1:]]
+        return command
+
+    def _popen(self, command: list[str], stdin: str, timeout: float) -> tuple[
+            Optional[int], bytes, bytes, bool, float]:
+        # The JVM reserves far more address space than it uses
+        memory = None if self.language == Language.JAVA else self.memory_bytes
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                self._command(command),
+                cwd=self.workdir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                preexec_fn=lambda: _limit_resources(memory, max(1, int(timeout) + 1)),
+            )
+        except OSError as e:
+            return None, b"", str(e).encode(), False, time.perf_counter() - start
+        try:
+            stdout, stderr = process.communicate(stdin.encode("utf-8"), timeout=timeout)
+            # RLIMIT_CPU delivers SIGXCPU, then SIGKILL
+            timed_out = process.returncode in (-signal.SIGXCPU, -signal.SIGKILL)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            stdout, stderr = process.communicate()
+            timed_out = True
+        return process.returncode, stdout, stderr, timed_out, time.perf_counter() - start
+
+    def compile(self, source: str) -> Optional[str]:
+        with open(os.path.join(self.workdir, self.spec.source_file), "w", encoding="utf-8") as f:
+            f.write(source)
+        if self.spec.compile_cmd is None:
+            return None
+        exit_code, stdout, stderr, _, _ = self._popen(
+            self.spec.compile_cmd, "", settings.SANDBOX_COMPILE_TIMEOUT_SECONDS)
+        if exit_code != 0:
+            return _truncate(stderr or stdout) or "Error de compilación"
+        return None
+
+    def run(self, stdin: str, timeout: float) -> ExecutionResult:
+        exit_code, stdout, stderr, timed_out, elapsed = self._popen(self.spec.run_cmd, stdin, timeout)
+        return ExecutionResult(
+            stdout=_truncate(stdout),
+            stderr=_truncate(stderr),
+            exit_code=exit_code,
+            timed_out=timed_out,
+            duration_seconds=elapsed,
+        )
+
+    def run_command(self, command: list[str], files: dict[str, str],
+                    timeout: float) -> ExecutionResult:
+        for name, content in files.items():
+            with open(os.path.join(self.workdir, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        exit_code, stdout, stderr, timed_out, elapsed = self._popen(command, "", timeout)
+        return ExecutionResult(
+            stdout=stdout.decode("utf-8", errors="replace"),
+            stderr=_truncate(stderr),
+            exit_code=exit_code,
+            timed_out=timed_out,
+            duration_seconds=elapsed,
+        )
+
+    def export_artifacts(self) -> dict[str, bytes]:
+        files = {}
+        for name in os.listdir(self.workdir):
+            path = os.path.join(self.workdir, name)
+            if os.path.isfile(path) and any(fnmatch.fnmatch(name, p) for p in self.spec.artifacts):
+                with open(path, "rb") as f:
+                    files[name] = f.read()
+        return files
+
+    def import_artifacts(self, files: dict[str, bytes]) -> None:
+        for name, data in files.items():
+            path = os.path.join(self.workdir, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            os.chmod(path, 0o755)
+
+    def reset(self) -> None:
+        for name in os.listdir(self.workdir):
+            path = os.path.join(self.workdir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+
+    def healthy(self) -> bool:
+        return os.path.isdir(self.workdir)
+
+    def destroy(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class LocalBackend(SandboxBackend):
+    """Creates LocalWorker instances"""
+
+    name = "local"
+
+    def create(self, language: Language) -> LocalWorker:
+        return LocalWorker(language)
+
+
+def create_backend(name: Optional[str] = None) -> SandboxBackend:
+    """
+    Build the configured backend
+
+    Args:
+        name: "docker" or "local" (defaults to SANDBOX_BACKEND)
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = name or settings.SANDBOX_BACKEND
+    if name == "docker":
+        return DockerBackend()
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown sandbox backend: {name}")
@@ -0,0 +1,225 @@
+"""Run every test case of a submission in one sandbox invocation"""
+
+import json
+import secrets
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Protocol, Sequence
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.models.problem import Language, TestCase
+from app.services.sandbox.backends import LANGUAGE_SPECS
+from app.services.sandbox.pool import SandboxPool, sandbox_pool
+
+logger = get_logger(__name__)
+
+DRIVER_SOURCE = Path(__file__).with_name("harness_driver.py").read_text(encoding="utf-8")
+DRIVER_FILE = "elenchos_harness.py"
+MANIFEST_FILE = "cases.json"
+
+# Seconds added to the sum of per-case limits for the whole invocation
+HARNESS_OVERHEAD_SECONDS = 2.0
+
+
+def normalize_output(output: str) -> str:
+    """Ignore trailing whitespace on each line and trailing blank lines"""
+    lines = [line.rstrip() for line in output.replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+class TestCaseLike(Protocol):
+    """Attributes used from a TestCase row"""
+    id: UUID
+    input: str
+    expected_output: str
+    is_hidden: bool
+
+
+@dataclass
+class TestCaseResult:
+    """Outcome of one test case"""
+    test_case_id: str
+    hidden: bool
+    status: str  # passed, wrong_answer, runtime_error, timeout or skipped
+    exit_code: Optional[int] = None
+    duration_seconds: float = 0.0
+    stdout: str = ""
+    stderr: str = ""
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "passed"
+
+
+@dataclass
+class SubmissionResult:
+    """Outcome of a submission against all test cases of a problem"""
+    compile_error: Optional[str] = None
+    cases: list[TestCaseResult] = field(default_factory=list)
+
+    @property
+    def passed(self) -> int:
+        return sum(case.passed for case in self.cases)
+
+    @property
+    def total(self) -> int:
+        return len(self.cases)
+
+    @property
+    def accepted(self) -> bool:
+        return self.compile_error is None and self.passed == self.total
+
+
+class TestHarness:
+    """Batches all test cases of a submission into a single sandbox run"""
+
+    __test__ = False  # not a pytest test class
+
+    @staticmethod
+    def build_manifest(language: Language, test_cases: Sequence[TestCaseLike], timeout: float,
+                       stop_on_hidden_failure: bool) -> dict:
+        """
+        Build the manifest of a run (host side, with expected outputs)
+
+        Visible cases run first so students always get their feedback, and
+        an early stop only ever skips hidden cases.
+        """
+        ordered = sorted(test_cases, key=lambda case: case.is_hidden)
+        return {
+            "token": secrets.token_hex(16),
+            "command": LANGUAGE_SPECS[language].run_cmd,
+            "timeout": timeout,
+            "max_output_bytes": settings.SANDBOX_MAX_OUTPUT_BYTES,
+            "stop_on_hidden_failure": stop_on_hidden_failure,
+            "cases": [
+                {"id": str(case.id), "input": case.input, "expected": case.expected_output,
+                 "hidden": case.is_hidden}
+                for case in ordered
+            ],
+        }
+
+    @staticmethod
+    def sandbox_manifest(manifest: dict) -> dict:
+        """The manifest copied into the sandbox: expected outputs never leave the host"""
+        return {**manifest, "cases": [
+            {"id": case["id"], "input": case["input"], "hidden": case["hidden"]}
+            for case in manifest["cases"]
+        ]}
+
+    @staticmethod
+    def parse_results(output: str, manifest: dict) -> list[TestCaseResult]:
+        """
+        Parse the driver's JSON lines and compare outputs with the expected ones
+
+        Only lines carrying the run's token count, and the first line of a
+        case wins, so the submission cannot forge results. Cases without a
+        line (the invocation was killed) are reported as timeouts; hidden
+        cases never expose their output.
+        """
+        hidden = {case["id"]: case["hidden"] for case in manifest["cases"]}
+        prefix = manifest["token"] + " "
+        reported: dict[str, dict] = {}
+        for line in output.splitlines():
+            if not line.startswith(prefix):
+                continue
+            try:
+                record = json.loads(line[len(prefix):])
+            except json.JSONDecodeError:
+                continue
+            if record.get("id") in hidden:
+                reported.setdefault(record["id"], record)
+
+        results = []
+        for case in manifest["cases"]:
+            record = reported.get(case["id"])
+            if record is None:
+                results.append(TestCaseResult(test_case_id=case["id"], hidden=case["hidden"],
+                                              status="timeout"))
+                continue
+            status = record["status"]
+            if status == "completed":
+                matches = (not record.get("stdout_truncated")
+                           and normalize_output(record["stdout"]) == normalize_output(case["expected"]))
+                status = "passed" if matches else "wrong_answer"
+            results.append(TestCaseResult(
+                test_case_id=case["id"],
+                hidden=case["hidden"],
+                status=status,
+                exit_code=record["exit_code"],
+                duration_seconds=record["duration_seconds"],
+                stdout="" if case["hidden"] else record["stdout"],
+                stderr="" if case["hidden"] else record["stderr"],
+            ))
+        return results
+
+    @staticmethod
+    def run(
+        language: Language,
+        source: str,
+        test_cases: Sequence[TestCaseLike],
+        pool: Optional[SandboxPool] = None,
+        timeout: Optional[float] = None,
+        stop_on_hidden_failure: Optional[bool] = None,
+    ) -> SubmissionResult:
+        """
+        Compile a submission once (or reuse a cached build) and run all its test cases
+
+        Args:
+            language: Submission language
+            source: Source code
+            test_cases: Test cases of the problem
+            pool: Sandbox pool (defaults to the global pool)
+            timeout: Time limit per case (defaults to DOCKER_TIMEOUT_SECONDS)
+            stop_on_hidden_failure: Skip remaining cases after the first
+                hidden case that crashes or times out (defaults to
+                SANDBOX_STOP_ON_HIDDEN_FAILURE); wrong answers are only
+                detected on the host, after the run
+
+        Returns:
+            Compile error or one result per test case
+
+        Raises:
+            SandboxUnavailable: If no sandbox is available
+        """
+        pool = pool or sandbox_pool
+        timeout = timeout or settings.DOCKER_TIMEOUT_SECONDS
+        if stop_on_hidden_failure is None:
+            stop_on_hidden_failure = settings.SANDBOX_STOP_ON_HIDDEN_FAILURE
+
+        manifest = TestHarness.build_manifest(language, test_cases, timeout, stop_on_hidden_failure)
+        with pool.acquire(language) as worker:
+            compile_error = pool.compile(worker, source)
+            if compile_error is not None:
+                metrics.increment("sandbox.compile_errors")
+                return SubmissionResult(compile_error=compile_error)
+
+            execution = worker.run_command(
+                ["python3", DRIVER_FILE, MANIFEST_FILE],
+                {DRIVER_FILE: DRIVER_SOURCE,
+                 MANIFEST_FILE: json.dumps(TestHarness.sandbox_manifest(manifest))},
+                timeout * len(test_cases) + HARNESS_OVERHEAD_SECONDS,
+            )
+
+        if execution.timed_out or execution.exit_code != 0:
+            logger.warning("Test harness did not finish", extra={"extra": {
+                "language": language.value,
+                "exit_code": execution.exit_code,
+                "timed_out": execution.timed_out,
+            }})
+        metrics.observe(f"sandbox.{language.value.lower()}.harness_time", execution.duration_seconds)
+        return SubmissionResult(cases=TestHarness.parse_results(execution.stdout, manifest))
+
+    @staticmethod
+    def run_problem(db: Session, problem_id: UUID, language: Language, source: str,
+                    **options) -> SubmissionResult:
+        """Load the test cases of a problem and run a submission against them"""
+        test_cases = db.scalars(select(TestCase).where(TestCase.problem_id == problem_id)).all()
+        return TestHarness.run(language, source, test_cases, **options)
@@ -0,0 +1,108 @@
+"""Test harness driver executed inside the sandbox
+
+Standalone script (standard library only): it is copied next to the
+compiled submission and runs every test case of a manifest in one
+sandbox invocation, printing one JSON line per case as soon as it
+finishes so partial results survive an outer timeout.
+
+The manifest holds inputs only: expected outputs never enter the sandbox
+and outputs are compared on the host. The driver deletes the manifest and
+makes itself non-dumpable before running the submission, so the program
+can neither read other cases' inputs nor write to the driver's stdout
+through /proc; result lines carry a per-run token the program never sees.
+
+Manifest (``cases.json``)::
+
+    {
+        "token": "...",
+        "command": ["./main"],
+        "timeout": 1.0,
+        "max_output_bytes": 65536,
+        "stop_on_hidden_failure": true,
+        "cases": [{"id": "...", "input": "...", "hidden": false}]
+    }
+"""
+import ctypes
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+PR_SET_DUMPABLE = 4
+
+
+def make_non_dumpable():
+    """Hide /proc/<pid>/fd and /proc/<pid>/mem of this process from same-uid children"""
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)
+    except (OSError, AttributeError):
+        pass  # not Linux
+
+
+def run_case(command, case, timeout, max_output_bytes):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    timed_out = False
+    try:
+        stdout, stderr = process.communicate(case["input"].encode("utf-8"), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        stdout, stderr = process.communicate()
+        timed_out = True
+    elapsed = time.perf_counter() - start
+
+    if timed_out:
+        status = "timeout"
+    elif process.returncode != 0:
+        status = "runtime_error"
+    else:
+        status = "completed"  # compared with the expected output on the host
+
+    return {
+        "id": case["id"],
+        "status": status,
+        "exit_code": process.returncode,
+        "duration_seconds": round(elapsed, 4),
+        "stdout": stdout[:max_output_bytes].decode("utf-8", errors="replace"),
+        "stdout_truncated": len(stdout) > max_output_bytes,
+        "stderr": stderr[:max_output_bytes].decode("utf-8", errors="replace"),
+    }
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "cases.json"
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    os.unlink(path)
+    make_non_dumpable()
+
+    command = manifest["command"]
+    if command[0] == "python3":
+        command = [sys.executable, *command[1:]]
+
+    stopped = False
+    for case in manifest["cases"]:
+        if stopped:
+            result = {"id": case["id"], "status": "skipped", "exit_code": None,
+                      "duration_seconds": 0.0, "stdout": "", "stdout_truncated": False,
+                      "stderr": ""}
+        else:
+            result = run_case(command, case, manifest["timeout"], manifest["max_output_bytes"])
+            # Wrong answers are only known on the host; crashes and timeouts stop here
+            if (case["hidden"] and result["status"] != "completed"
+                    and manifest["stop_on_hidden_failure"]):
+                stopped = True
+        sys.stdout.write(manifest["token"] + " " + json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Warm pool of sandbox workers per language"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.models.problem import Language
+from app.services.sandbox.artifact_cache import ArtifactCache, artifact_cache
+from app.services.sandbox.backends import (
+    ExecutionResult,
+    SandboxBackend,
+    SandboxWorker,
+    create_backend,
+)
+
+logger = get_logger(__name__)
+
+
+class SandboxUnavailable(Exception):
+    """Raised when no sandbox becomes free within the acquire timeout"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def default_pool_sizes() -> dict[Language, int]:
+    """Pool size per language from the settings"""
+    return {
+        Language.PYTHON: settings.SANDBOX_POOL_SIZE_PYTHON,
+        Language.CPP: settings.SANDBOX_POOL_SIZE_CPP,
+        Language.JAVA: settings.SANDBOX_POOL_SIZE_JAVA,
+    }
+
+
+class SandboxPool:
+    """
+    Pre-started sandboxes per language, reset on return
+
+    Each language keeps ``size`` workers. Submissions borrow an idle one
+    and wait (up to the acquire timeout) when all are busy. Workers are
+    reset after every submission, replaced after ``max_runs`` submissions
+    or a failed reset, and checked periodically by a health thread.
+    Container start-up happens in the background, never on a request.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SandboxBackend] = None,
+        sizes: Optional[dict[Language, int]] = None,
+        max_runs: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+        health_check_interval: Optional[float] = None,
+        enabled: Optional[bool] = None,
+        cache: Optional[ArtifactCache] = None,
+    ):
+        self.backend = backend
+        self.artifact_cache = cache or artifact_cache
+        self.sizes = sizes or default_pool_sizes()
+        self.max_runs = max_runs or settings.SANDBOX_MAX_RUNS_PER_WORKER
+        self.acquire_timeout = acquire_timeout or settings.SANDBOX_ACQUIRE_TIMEOUT_SECONDS
+        self.health_check_interval = (health_check_interval
+                                      or settings.SANDBOX_HEALTH_CHECK_INTERVAL_SECONDS)
+        self.enabled = settings.SANDBOX_ENABLED if enabled is None else enabled
+
+        self._idle: dict[Language, queue.Queue] = {language: queue.Queue() for language in self.sizes}
+        self._total: dict[Language, int] = {language: 0 for language in self.sizes}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    # ------------------------------------------------------------------
+    # Worker lifecycle
+    # ------------------------------------------------------------------
+
+    def _spawn(self, language: Language) -> None:
+        """Create one worker, counting it before creation to bound the pool"""
+        with self._lock:
+            if self._total[language] >= self.sizes[language]:
+                return
+            self._total[language] += 1
+        start = time.perf_counter()
+        try:
+            worker = self.backend.create(language)
+        except Exception as e:
+            with self._lock:
+                self._total[language] -= 1
+            log_error(logger, e, {"operation": "sandbox_create", "language": language.value})
+            metrics.increment("sandbox.create_errors")
+            return
+        metrics.observe("sandbox.create_time", time.perf_counter() - start)
+        self._idle[language].put(worker)
+        self._update_gauges(language)
+
+    def _retire(self, worker: SandboxWorker) -> None:
+        """Destroy a worker and start a replacement in the background"""
+        with self._lock:
+            self._total[worker.language] -= 1
+        worker.destroy()
+        self._update_gauges(worker.language)
+        if not self._stopping.is_set():
+            threading.Thread(target=self._spawn, args=(worker.language,), daemon=True).start()
+
+    def _fill(self) -> None:
+        for language, size in self.sizes.items():
+            for _ in range(size - self._total[language]):
+                self._spawn(language)
+
+    def _update_gauges(self, language: Language) -> None:
+        name = language.value.lower()
+        metrics.set_gauge(f"sandbox.{name}.idle", self._idle[language].qsize())
+        metrics.set_gauge(f"sandbox.{name}.total", self._total[language])
+
+    # ------------------------------------------------------------------
+    # Borrowing
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def acquire(self, language: Language) -> Iterator[SandboxWorker]:
+        """
+        Borrow an idle worker for one submission
+
+        Raises:
+            SandboxUnavailable: If the pool is not running or no worker frees
+                up within the acquire timeout
+        """
+        if not self.started or language not in self._idle:
+            raise SandboxUnavailable("El entorno de ejecución no está disponible")
+
+        start = time.perf_counter()
+        try:
+            worker = self._idle[language].get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            metrics.increment("sandbox.acquire_timeouts")
+            raise SandboxUnavailable("Todos los entornos de ejecución están ocupados")
+        metrics.observe("sandbox.queue_wait", time.perf_counter() - start)
+        self._update_gauges(language)
+
+        discard = False
+        try:
+            yield worker
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.release(worker, discard=discard)
+
+    def release(self, worker: SandboxWorker, discard: bool = False) -> None:
+        """Reset a worker and return it, or replace it when worn out"""
+        worker.runs += 1
+        if discard or worker.runs >= self.max_runs:
+            metrics.increment("sandbox.recycled")
+            self._retire(worker)
+            return
+        try:
+            worker.reset()
+        except Exception as e:
+            log_error(logger, e, {"operation": "sandbox_reset", "language": worker.language.value})
+            metrics.increment("sandbox.reset_errors")
+            self._retire(worker)
+            return
+        self._idle[worker.language].put(worker)
+        self._update_gauges(worker.language)
+
+    def compile(self, worker: SandboxWorker, source: str) -> Optional[str]:
+        """Compile a submission in a borrowed worker, reusing cached builds"""
+        return self.artifact_cache.compile(worker, source)
+
+    def execute(self, language: Language, source: str, stdin: str = "",
+                timeout: Optional[float] = None) -> ExecutionResult:
+        """
+        Compile (if needed) and run a submission with one input
+
+        Args:
+            language: Submission language
+            source: Source code
+            stdin: Standard input for the run
+            timeout: Run time limit (defaults to DOCKER_TIMEOUT_SECONDS)
+
+        Returns:
+            Execution result
+
+        Raises:
+            SandboxUnavailable: If no worker is available
+        """
+        timeout = timeout or settings.DOCKER_TIMEOUT_SECONDS
+        with self.acquire(language) as worker:
+            compile_error = self.compile(worker, source)
+            if compile_error is not None:
+                return ExecutionResult(stdout="", stderr="", exit_code=None, timed_out=False,
+                                       duration_seconds=0.0, compile_error=compile_error)
+            result = worker.run(stdin, timeout)
+        metrics.observe(f"sandbox.{language.value.lower()}.run_time", result.duration_seconds)
+        return result
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+
+    def check_health(self) -> int:
+        """
+        Check every idle worker and replace the unhealthy ones
+
+        Returns:
+            Number of workers replaced
+        """
+        replaced = 0
+        for language, idle in self._idle.items():
+            for _ in range(idle.qsize()):
+                try:
+                    worker = idle.get_nowait()
+                except queue.Empty:
+                    break
+                if worker.healthy():
+                    idle.put(worker)
+                else:
+                    metrics.increment("sandbox.unhealthy")
+                    self._retire(worker)
+                    replaced += 1
+        # Top up pools that lost workers to failed creations
+        self._fill()
+        return replaced
+
+    def _run(self) -> None:
+        self._fill()
+        while not self._stopping.wait(self.health_check_interval):
+            self.check_health()
+
+    def start(self) -> None:
+        """Start filling the pools and the health check thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        if self.backend is None:
+            try:
+                self.backend = create_backend()
+            except Exception as e:
+                log_error(logger, e, {"operation": "sandbox_backend"})
+                return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sandbox-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the health thread and destroy idle workers"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        for language, idle in self._idle.items():
+            while True:
+                try:
+                    worker = idle.get_nowait()
+                except queue.Empty:
+                    break
+                worker.destroy()
+                with self._lock:
+                    self._total[language] -= 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Idle and total workers per language"""
+        return {
+            language.value: {"idle": self._idle[language].qsize(), "total": self._total[language]}
+            for language in self.sizes
+        }
+
+
+# Global pool, started with the application
+sandbox_pool = SandboxPool()
@@ -0,0 +1,289 @@
+"""Cache of submission verdicts keyed by problem, test-case set and normalized source"""
+
+import hashlib
+import io
+import json
+import tokenize
+from dataclasses import asdict
+from typing import Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.models.problem import Language, TestCase
+from app.services.sandbox.harness import SubmissionResult, TestCaseLike, TestCaseResult, TestHarness
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "verdict"
+
+_BRACKETS = set("(){}[];,")
+
+
+def _normalize_python(source: str) -> str:
+    """Token stream without comments, blank lines or indentation width"""
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENCODING,
+                              tokenize.ENDMARKER):
+                continue
+            if token.type == tokenize.INDENT:
+                tokens.append("<indent>")
+            elif token.type == tokenize.DEDENT:
+                tokens.append("<dedent>")
+            elif token.type == tokenize.NEWLINE:
+                tokens.append("<newline>")
+            else:
+                tokens.append(token.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return source  # unparsable: only identical sources share a verdict
+    return "\x1f".join(tokens)
+
+
+def _normalize_c_like(source: str) -> str:
+    """
+    Strip comments and collapse whitespace outside string/char literals
+
+    A single space is kept between two tokens unless one side is a
+    bracket or separator, so ``a - -b`` and ``a--b`` stay distinct.
+    Preprocessor directives end at a line break, so the newline closing a
+    ``#`` line (also after a ``//`` comment) and its ``\\`` continuations
+    are kept.
+    """
+    out: list[str] = []
+    pending_space = False
+    at_line_start = True
+    in_directive = False
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = n if end == -1 else end
+            pending_space = True
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+        if char == "\n":
+            at_line_start = True
+            if in_directive:
+                in_directive = False
+                out.append("\n")
+                pending_space = False
+            else:
+                pending_space = True
+            i += 1
+            continue
+        if char.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if in_directive and source.startswith("\\\n", i):
+            out.append("\\\n")
+            pending_space = False
+            i += 2
+            continue
+        if char == "#" and at_line_start:
+            in_directive = True
+        at_line_start = False
+        if (pending_space and out and out[-1][-1] not in _BRACKETS and out[-1][-1] != "\n"
+                and char not in _BRACKETS):
+            out.append(" ")
+        pending_space = False
+        if char in "\"'":
+            j = i + 1
+            while j < n and source[j] != char:
+                j += 2 if source[j] == "\\" else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def normalize_source(language: Language, source: str) -> str:
+    """
+    Normalize a submission so formatting-only changes share a verdict
+
+    Args:
+        language: Submission language
+        source: Source code
+
+    Returns:
+        Normalized source
+    """
+    if language == Language.PYTHON:
+        return _normalize_python(source)
+    return _normalize_c_like(source)
+
+
+def hash_test_cases(test_cases: Sequence[TestCaseLike]) -> str:
+    """Hash of the test-case rows (any edit changes it)"""
+    digest = hashlib.sha256()
+    for case in sorted(test_cases, key=lambda case: str(case.id)):
+        for part in (str(case.id), case.input, case.expected_output, str(case.is_hidden)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _result_to_json(result: SubmissionResult) -> bytes:
+    return json.dumps(asdict(result)).encode("utf-8")
+
+
+def _result_from_json(data: bytes) -> SubmissionResult:
+    raw = json.loads(data)
+    return SubmissionResult(
+        compile_error=raw["compile_error"],
+        cases=[TestCaseResult(**case) for case in raw["cases"]],
+    )
+
+
+class VerdictCache:
+    """
+    Verdicts of code submissions in the shared key-value store
+
+    Keys combine the problem, a hash of its test-case rows and the
+    normalized source, so an edited test-case set never matches an old
+    verdict. Keys of each problem are also tracked in a set that is
+    dropped when a session commits changes to its test cases.
+    Store errors are treated as misses.
+    """
+
+    def __init__(self, store=None, ttl_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self._store = store
+        self.ttl_seconds = ttl_seconds or settings.VERDICT_CACHE_TTL_SECONDS
+        self.enabled = settings.VERDICT_CACHE_ENABLED if enabled is None else enabled
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    @staticmethod
+    def key(problem_id: UUID, language: Language, test_cases: Sequence[TestCaseLike],
+            source: str, timeout: Optional[float] = None,
+            stop_on_hidden_failure: Optional[bool] = None) -> str:
+        """Cache key of a submission under the given run options"""
+        timeout = timeout or settings.DOCKER_TIMEOUT_SECONDS
+        if stop_on_hidden_failure is None:
+            stop_on_hidden_failure = settings.SANDBOX_STOP_ON_HIDDEN_FAILURE
+        source_hash = hashlib.sha256(
+            normalize_source(language, source).encode("utf-8")).hexdigest()
+        return (f"{KEY_PREFIX}:{problem_id}:{hash_test_cases(test_cases)[:16]}:"
+                f"{language.value}:{timeout:g}:{int(stop_on_hidden_failure)}:{source_hash}")
+
+    @staticmethod
+    def _index_key(problem_id: UUID) -> str:
+        return f"{KEY_PREFIX}:index:{problem_id}"
+
+    def get(self, key: str) -> Optional[SubmissionResult]:
+        """Cached verdict or None"""
+        try:
+            data = self.store.get(key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "verdict_cache_get"})
+            data = None
+        metrics.increment("verdict_cache.hits" if data is not None else "verdict_cache.misses")
+        return _result_from_json(data) if data is not None else None
+
+    def put(self, problem_id: UUID, key: str, result: SubmissionResult) -> None:
+        """Store a verdict and register its key under the problem"""
+        try:
+            self.store.set(key, _result_to_json(result), ttl=self.ttl_seconds)
+            self.store.sadd(self._index_key(problem_id), key, ttl=self.ttl_seconds)
+        except Exception as e:
+            log_error(logger, e, {"operation": "verdict_cache_put"})
+
+    def invalidate_problem(self, problem_id: UUID) -> int:
+        """
+        Drop every cached verdict of a problem
+
+        Returns:
+            Number of verdicts removed
+        """
+        try:
+            index_key = self._index_key(problem_id)
+            keys = self.store.smembers(index_key)
+            removed = self.store.delete(*keys) if keys else 0
+            self.store.delete(index_key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "verdict_cache_invalidate",
+                                  "problem_id": str(problem_id)})
+            return 0
+        metrics.increment("verdict_cache.invalidations")
+        return removed
+
+    @staticmethod
+    def cacheable(result: SubmissionResult) -> bool:
+        """Timeouts may come from load, not from the code: never cache them"""
+        return all(case.status != "timeout" for case in result.cases)
+
+    def run(self, problem_id: UUID, language: Language, source: str,
+            test_cases: Sequence[TestCaseLike], **options) -> SubmissionResult:
+        """
+        Run a submission through the cache
+
+        Args:
+            problem_id: Problem ID
+            language: Submission language
+            source: Source code
+            test_cases: Current test cases of the problem
+            **options: Forwarded to TestHarness.run
+
+        Returns:
+            Cached or freshly computed verdict
+        """
+        if not self.enabled:
+            return TestHarness.run(language, source, test_cases, **options)
+
+        key = self.key(problem_id, language, test_cases, source,
+                       timeout=options.get("timeout"),
+                       stop_on_hidden_failure=options.get("stop_on_hidden_failure"))
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        result = TestHarness.run(language, source, test_cases, **options)
+        if self.cacheable(result):
+            self.put(problem_id, key, result)
+        return result
+
+    def run_problem(self, db: Session, problem_id: UUID, language: Language, source: str,
+                    **options) -> SubmissionResult:
+        """Load the test cases of a problem and run a submission through the cache"""
+        test_cases = db.scalars(select(TestCase).where(TestCase.problem_id == problem_id)).all()
+        return self.run(problem_id, language, source, test_cases, **options)
+
+
+# Global verdict cache
+verdict_cache = VerdictCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_edited_problems(session, flush_context) -> None:
+    """Remember problems whose test cases changed in this transaction"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TestCase) and obj.problem_id is not None:
+            session.info.setdefault("verdict_cache_problems", set()).add(obj.problem_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_edited_problems(session) -> None:
+    for problem_id in session.info.pop("verdict_cache_problems", ()):
+        verdict_cache.invalidate_problem(problem_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_edited_problems(session) -> None:
+    session.info.pop("verdict_cache_problems", None)
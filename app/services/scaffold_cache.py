@@ -0,0 +1,213 @@
+"""Two-tier cache of generated scaffolds: exact answer key, then answer similarity"""
+
+import base64
+import hashlib
+import json
+import re
+import time
+from typing import TYPE_CHECKING, Any, Optional
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.services.rag import EmbeddingUnavailable, embedding_service
+
+if TYPE_CHECKING:
+    from app.services.scaffold_service import ScaffoldContext
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "scaffold"
+
+# The TTL is split into this many index buckets per teacher
+INDEX_BUCKETS = 24
+
+_OPERATOR_SPACES = re.compile(r"\s*([=+\-*/^(),<>])\s*")
+
+
+def normalize_answer(answer: str) -> str:
+    """Case and spacing (also around operators) do not change the mistake"""
+    return _OPERATOR_SPACES.sub(r"\1", " ".join(answer.lower().split()))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class ScaffoldCache:
+    """
+    Generated scaffolds in the shared key-value store
+
+    Entries are grouped by (problem, step, error type, affected concept,
+    scaffold level). Within a group, the exact tier matches the normalized
+    student answer by hash; on a miss, the semantic tier compares the
+    answer's embedding with the last SCAFFOLD_CACHE_GROUP_SIZE answers of the
+    group and reuses the closest scaffold above SCAFFOLD_CACHE_SIMILARITY.
+
+    Keys of each teacher are tracked in time-bucketed sets so opting out
+    drops them. A bucket only receives keys written during its window and
+    expires one window after the TTL, so indexes never outlive their keys.
+    Groups are updated atomically in the store, so concurrent puts from
+    several workers keep every answer. Store and embedding errors are
+    treated as misses.
+    """
+
+    def __init__(self, store=None, embedder=None, ttl_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None, similarity: Optional[float] = None,
+                 group_size: Optional[int] = None):
+        self._store = store
+        self.embedder = embedder if embedder is not None else embedding_service
+        self.ttl_seconds = ttl_seconds or settings.SCAFFOLD_CACHE_TTL_SECONDS
+        self.enabled = settings.SCAFFOLD_CACHE_ENABLED if enabled is None else enabled
+        self.similarity = similarity or settings.SCAFFOLD_CACHE_SIMILARITY
+        self.group_size = group_size or settings.SCAFFOLD_CACHE_GROUP_SIZE
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    @staticmethod
+    def group_key(context: "ScaffoldContext") -> str:
+        """Key of the answers sharing a problem step, diagnosis and level"""
+        concept = _digest(" ".join((context.affected_concept or "").lower().split()))
+        return (f"{KEY_PREFIX}:{context.problem_id}:{context.step_number}:"
+                f"{context.error_type or '-'}:{concept}:{context.level.value}")
+
+    @classmethod
+    def exact_key(cls, context: "ScaffoldContext") -> str:
+        """Key of one normalized answer within its group"""
+        return f"{cls.group_key(context)}:{_digest(normalize_answer(context.student_answer))}"
+
+    @property
+    def _bucket_seconds(self) -> int:
+        return max(1, -(-self.ttl_seconds // INDEX_BUCKETS))
+
+    def _index_key(self, teacher_id: UUID, bucket: Optional[int] = None) -> str:
+        if bucket is None:
+            bucket = int(time.time()) // self._bucket_seconds
+        return f"{KEY_PREFIX}:index:{teacher_id}:{bucket}"
+
+    def _index(self, teacher_id: UUID, key: str) -> None:
+        # The current bucket outlives every key added to it, then expires
+        self.store.sadd(self._index_key(teacher_id), key,
+                        ttl=self.ttl_seconds + self._bucket_seconds)
+
+    def _active(self, context: "ScaffoldContext") -> bool:
+        if self.enabled and context.cache_enabled:
+            return True
+        metrics.increment("scaffold_cache.bypass")
+        return False
+
+    def _embed(self, context: "ScaffoldContext") -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self.embedder.embed([normalize_answer(context.student_answer)])[0],
+                                dtype=np.float32)
+        except EmbeddingUnavailable as e:
+            log_error(logger, e, {"operation": "scaffold_cache_embed"})
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _decode_group(data: Optional[bytes]) -> tuple[list[dict[str, Any]], Optional[np.ndarray]]:
+        if data is None:
+            return [], None
+        group = json.loads(data)
+        vectors = np.frombuffer(base64.b64decode(group["vectors"]), dtype=np.float32)
+        return group["scaffolds"], vectors.reshape(len(group["scaffolds"]), -1)
+
+    def _read_group(self, key: str) -> tuple[list[dict[str, Any]], Optional[np.ndarray]]:
+        return self._decode_group(self.store.get(key))
+
+    def get(self, context: "ScaffoldContext") -> Optional[dict[str, Any]]:
+        """
+        Cached scaffold for a context, or None
+
+        Returns:
+            The stored scaffold with "cache" set to "exact" or "semantic"
+        """
+        if not self._active(context):
+            return None
+        try:
+            data = self.store.get(self.exact_key(context))
+            if data is not None:
+                metrics.increment("scaffold_cache.hits.exact")
+                return {**json.loads(data), "cache": "exact"}
+
+            vector = self._embed(context)
+            if vector is not None:
+                scaffolds, vectors = self._read_group(self.group_key(context))
+                if scaffolds and vectors.shape[1] == vector.shape[0]:
+                    scores = vectors @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        metrics.increment("scaffold_cache.hits.semantic")
+                        # The next identical answer skips the embedding and the group read
+                        self._set_exact(context, scaffolds[best])
+                        return {**scaffolds[best], "cache": "semantic"}
+        except Exception as e:
+            log_error(logger, e, {"operation": "scaffold_cache_get"})
+        metrics.increment("scaffold_cache.misses")
+        return None
+
+    def put(self, context: "ScaffoldContext", scaffold: dict[str, Any]) -> None:
+        """Store a freshly generated scaffold under its answer and in its group"""
+        if not self._active(context):
+            return
+        scaffold = {k: v for k, v in scaffold.items() if k != "cache"}
+        group_key = self.group_key(context)
+        try:
+            self._set_exact(context, scaffold)
+            vector = self._embed(context)
+            if vector is not None:
+                def append(data: Optional[bytes]) -> bytes:
+                    scaffolds, vectors = self._decode_group(data)
+                    if vectors is None or vectors.shape[1] != vector.shape[0]:
+                        scaffolds, vectors = [], np.empty((0, vector.shape[0]), dtype=np.float32)
+                    # Most recent answers win when the group is full
+                    scaffolds = (scaffolds + [scaffold])[-self.group_size:]
+                    vectors = np.vstack([vectors, vector[None, :]])[-self.group_size:]
+                    return json.dumps({
+                        "scaffolds": scaffolds,
+                        "vectors": base64.b64encode(vectors.astype(np.float32).tobytes()).decode(),
+                    }).encode("utf-8")
+
+                self.store.update(group_key, append, ttl=self.ttl_seconds)
+                self._index(context.teacher_id, group_key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "scaffold_cache_put"})
+
+    def _set_exact(self, context: "ScaffoldContext", scaffold: dict[str, Any]) -> None:
+        key = self.exact_key(context)
+        self.store.set(key, json.dumps(scaffold).encode("utf-8"), ttl=self.ttl_seconds)
+        self._index(context.teacher_id, key)
+
+    def invalidate_teacher(self, teacher_id: UUID) -> int:
+        """
+        Drop every cached scaffold of a teacher's problems
+
+        Returns:
+            Number of entries removed
+        """
+        try:
+            # Older buckets have expired together with their keys
+            current = int(time.time()) // self._bucket_seconds
+            index_keys = [self._index_key(teacher_id, bucket)
+                          for bucket in range(current - INDEX_BUCKETS - 1, current + 1)]
+            keys = set().union(*(self.store.smembers(key) for key in index_keys))
+            removed = self.store.delete(*keys) if keys else 0
+            self.store.delete(*index_keys)
+        except Exception as e:
+            log_error(logger, e, {"operation": "scaffold_cache_invalidate",
+                                  "teacher_id": str(teacher_id)})
+            return 0
+        metrics.increment("scaffold_cache.invalidations")
+        return removed
+
+
+# Global scaffold cache
+scaffold_cache = ScaffoldCache()
@@ -0,0 +1,228 @@
+"""Socratic scaffold generation streamed from the LLM provider"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.db.base import SessionLocal
+from app.models.session import ScaffoldLevel, StepAttempt
+from app.services.llm import UNAVAILABLE_DETAIL, LLMRequest, LLMUnavailable, get_llm_provider
+from app.services.rag import EmbeddingUnavailable, retrieval_service
+from app.services.scaffold_cache import scaffold_cache
+
+logger = get_logger(__name__)
+
+SYSTEM_PROMPT = (
+    "Eres un tutor socrático para alumnos de secundaria. Nunca des la solución ni "
+    "el paso correcto: ayuda al alumno a encontrar su error por sí mismo. "
+    "Responde en español, en dos o tres frases."
+)
+
+LEVEL_INSTRUCTIONS = {
+    ScaffoldLevel.LEVEL_1: "Haz una única pregunta de reflexión sobre el paso del alumno.",
+    ScaffoldLevel.LEVEL_2: "Da una pista concreta apoyándote en los apuntes del profesor.",
+    ScaffoldLevel.LEVEL_3: "Explica la idea con una analogía sencilla de la vida cotidiana.",
+}
+
+
+@dataclass
+class ScaffoldContext:
+    """Everything the prompt needs, loaded before the stream starts"""
+    attempt_id: UUID
+    teacher_id: UUID
+    problem_id: UUID
+    step_number: int
+    level: ScaffoldLevel
+    student_answer: str
+    problem_text: str
+    expected_step: Optional[str] = None
+    error_type: Optional[str] = None
+    affected_concept: Optional[str] = None
+    error_details: Optional[str] = None
+    notes: list[str] = field(default_factory=list)
+    cache_enabled: bool = True  # the teacher's opt-in to shared scaffolds
+
+
+def format_sse(event: str, data: dict[str, Any]) -> str:
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ScaffoldService:
+    """
+    Stream scaffold hints token by token and persist them when complete
+
+    The text is written to StepAttempt.scaffold_provided only once the
+    provider finishes; an interrupted stream leaves the attempt untouched.
+    Scaffolds already generated for the same mistake are served from the
+    scaffold cache without calling the provider.
+    """
+
+    def __init__(self, provider=None, retriever=None,
+                 saver: Optional[Callable[[UUID, dict[str, Any]], None]] = None, cache=None):
+        self._provider = provider
+        self.retriever = retriever if retriever is not None else retrieval_service
+        self.saver = saver or self.save
+        self.cache = cache if cache is not None else scaffold_cache
+
+    @property
+    def provider(self):
+        return self._provider if self._provider is not None else get_llm_provider()
+
+    @staticmethod
+    def load_context(db: Session, attempt_id: UUID,
+                     level: Optional[ScaffoldLevel] = None) -> ScaffoldContext:
+        """
+        Load the attempt, its problem and diagnosis
+
+        Args:
+            db: Database session
+            attempt_id: Step attempt to scaffold
+            level: Scaffold level (default: the session's level, else LEVEL_1)
+
+        Raises:
+            HTTPException: If the attempt does not exist
+        """
+        attempt = db.get(StepAttempt, attempt_id)
+        if attempt is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Intento no encontrado",
+            )
+        session = attempt.session
+        problem = session.problem
+        content = problem.content
+        steps = problem.solution_steps or []
+        diagnosis = attempt.error_diagnosis
+        return ScaffoldContext(
+            attempt_id=attempt.id,
+            teacher_id=problem.created_by,
+            problem_id=problem.id,
+            step_number=attempt.step_number,
+            level=level or session.scaffold_level or ScaffoldLevel.LEVEL_1,
+            student_answer=attempt.student_answer,
+            problem_text=(content.text or content.latex or "") if content else "",
+            expected_step=(str(steps[attempt.step_number - 1])
+                           if 1 <= attempt.step_number <= len(steps) else None),
+            error_type=diagnosis.error_type.value if diagnosis else None,
+            affected_concept=diagnosis.affected_concept if diagnosis else None,
+            error_details=diagnosis.error_details if diagnosis else None,
+            cache_enabled=problem.created_by_teacher.scaffold_cache_enabled,
+        )
+
+    @staticmethod
+    def build_request(context: ScaffoldContext) -> LLMRequest:
+        """Prompt for the context's scaffold level"""
+        lines = [
+            f"Enunciado: {context.problem_text}",
+            f"Paso {context.step_number} del alumno: {context.student_answer}",
+        ]
+        if context.expected_step:
+            lines.append(f"Paso esperado (no lo reveles): {context.expected_step}")
+        if context.error_type:
+            lines.append(f"Tipo de error: {context.error_type}")
+        if context.affected_concept:
+            lines.append(f"Concepto afectado: {context.affected_concept}")
+        if context.error_details:
+            lines.append(f"Detalle del error: {context.error_details}")
+        if context.notes:
+            lines.append("Apuntes del profesor:\n" + "\n---\n".join(context.notes))
+        lines.append(LEVEL_INSTRUCTIONS[context.level])
+        return LLMRequest(system=SYSTEM_PROMPT, prompt="\n".join(lines),
+                          max_tokens=settings.SCAFFOLD_MAX_TOKENS)
+
+    async def _with_notes(self, context: ScaffoldContext) -> ScaffoldContext:
+        """Attach the teacher's closest notes to Level-2 hints"""
+        if context.level != ScaffoldLevel.LEVEL_2 or context.notes:
+            return context
+        query = " ".join(filter(None, [context.affected_concept, context.student_answer]))
+        try:
+            chunks = await asyncio.to_thread(self.retriever.retrieve, context.teacher_id, query,
+                                             context.problem_id)
+        except EmbeddingUnavailable as e:
+            # A hint without notes beats no hint at all
+            log_error(logger, e, {"operation": "scaffold_notes",
+                                  "attempt_id": str(context.attempt_id)})
+            chunks = []
+        context.notes = [chunk.text for chunk in chunks]
+        return context
+
+    async def stream(self, context: ScaffoldContext) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """
+        Yield ("token", {"text"}) events, then ("done", {"scaffold"})
+
+        A cache hit is sent as a single token. A provider failure after the
+        first token ends the stream with an ("error", {"detail"}) event
+        instead.
+
+        Raises:
+            LLMUnavailable: If the provider fails before the first token
+        """
+        cached = await asyncio.to_thread(self.cache.get, context)
+        if cached is not None:
+            yield "token", {"text": cached["text"]}
+            await asyncio.to_thread(self.saver, context.attempt_id, cached)
+            yield "done", {"scaffold": cached}
+            return
+
+        context = await self._with_notes(context)
+        start = time.perf_counter()
+        stream = self.provider.stream(self.build_request(context))
+        fragments: list[str] = []
+        try:
+            async for fragment in stream:
+                if not fragments:
+                    metrics.observe("scaffold.first_token", time.perf_counter() - start)
+                fragments.append(fragment)
+                yield "token", {"text": fragment}
+        except LLMUnavailable as e:
+            metrics.increment("scaffold.errors")
+            log_error(logger, e, {"operation": "scaffold_stream",
+                                  "attempt_id": str(context.attempt_id)})
+            if not fragments:
+                raise
+            yield "error", {"detail": UNAVAILABLE_DETAIL}
+            return
+        finally:
+            # Frees the provider's concurrency slot even if the client went away
+            await stream.aclose()
+        metrics.observe("scaffold.stream", time.perf_counter() - start)
+
+        # The router reports which provider actually answered
+        provider = getattr(stream, "provider", None) or self.provider
+        scaffold = {
+            "level": context.level.value,
+            "text": "".join(fragments).strip(),
+            "provider": provider.name,
+            "model": provider.model,
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+        await asyncio.to_thread(self.saver, context.attempt_id, scaffold)
+        await asyncio.to_thread(self.cache.put, context, scaffold)
+        yield "done", {"scaffold": scaffold}
+
+    @staticmethod
+    def save(attempt_id: UUID, scaffold: dict[str, Any]) -> None:
+        """Store a completed scaffold on its attempt (own session: the request's is closed)"""
+        db = SessionLocal()
+        try:
+            attempt = db.get(StepAttempt, attempt_id)
+            if attempt is not None:
+                attempt.scaffold_provided = scaffold
+                db.commit()
+        finally:
+            db.close()
+
+
+# Global scaffold service
+scaffold_service = ScaffoldService()
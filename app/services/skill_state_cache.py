@@ -0,0 +1,727 @@
+"""Incremental BKT updates with write-behind persistence to skill_states"""
+
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+from uuid import UUID
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.db.base import SessionLocal
+from app.models.problem import Problem
+from app.models.session import Session as ProblemSession, StepAttempt
+from app.models.skill import SkillState, SkillStatus
+from app.services.bkt_service import (
+    PARAMS_GENERATION_KEY,
+    STATES_GENERATION_KEY,
+    bkt_update,
+    derive_status,
+    resolve_params,
+)
+from app.services.skill_tree_service import propagate_mastered_students
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "bkt:state"
+
+Loader = Callable[[UUID, str], Optional[dict[str, Any]]]
+Writer = Callable[[list[dict[str, Any]]], None]
+MasteryHook = Callable[[set[UUID]], dict[UUID, set[str]]]
+
+
+class CachedSkillState:
+    """Cached BKT state of one (student, skill) pair"""
+
+    __slots__ = ("state_id", "probability", "status", "params", "params_generation",
+                 "last_activity")
+
+    def __init__(self, state_id: UUID, probability: float, status: SkillStatus,
+                 params: dict[str, float], params_generation: int = 0,
+                 last_activity: Optional[datetime] = None):
+        self.state_id = state_id
+        self.probability = probability
+        self.status = status
+        self.params = params
+        self.params_generation = params_generation
+        self.last_activity = last_activity
+
+    def copy(self) -> "CachedSkillState":
+        return CachedSkillState(self.state_id, self.probability, self.status, self.params,
+                                self.params_generation, self.last_activity)
+
+    def as_row(self) -> dict[str, Any]:
+        """Values for the bulk UPDATE of skill_states"""
+        return {
+            "id": self.state_id,
+            "domain_probability": self.probability,
+            "status": self.status,
+            "last_activity": self.last_activity,
+        }
+
+    def to_json(self) -> bytes:
+        return json.dumps({
+            "id": str(self.state_id),
+            "probability": self.probability,
+            "status": self.status.value,
+            "params": self.params,
+            "params_generation": self.params_generation,
+            "last_activity": self.last_activity.isoformat() if self.last_activity else None,
+        }).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "CachedSkillState":
+        raw = json.loads(data)
+        return cls(
+            state_id=UUID(raw["id"]),
+            probability=raw["probability"],
+            status=SkillStatus(raw["status"]),
+            params=raw["params"],
+            params_generation=raw["params_generation"],
+            last_activity=(datetime.fromisoformat(raw["last_activity"])
+                           if raw["last_activity"] else None),
+        )
+
+
+def load_skill_state(student_id: UUID, skill_id: str) -> Optional[dict[str, Any]]:
+    """Load one skill state from the database"""
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(SkillState.id, SkillState.domain_probability, SkillState.status,
+                   SkillState.bkt_params, SkillState.last_activity)
+            .where(SkillState.student_id == student_id, SkillState.skill_id == skill_id)
+        ).first()
+        return dict(row._mapping) if row else None
+    finally:
+        db.close()
+
+
+def write_skill_states(rows: list[dict[str, Any]]) -> None:
+    """Persist a batch of skill states with one bulk UPDATE"""
+    db = SessionLocal()
+    try:
+        db.execute(update(SkillState), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _newest(rows: dict[UUID, dict[str, Any]], row: dict[str, Any]) -> None:
+    """Keep the most recent row of a state (journals of several processes may overlap)"""
+    current = rows.get(row["id"])
+    if (current is None or current["last_activity"] is None
+            or (row["last_activity"] is not None
+                and row["last_activity"] >= current["last_activity"])):
+        rows[row["id"]] = row
+
+
+class SkillStateCache:
+    """
+    Shared BKT state cache with write-behind flushing
+
+    Cached states live in the shared key-value store and every attempt is
+    applied to them atomically (an optimistic WATCH/MULTI update on Redis),
+    so workers handling the same student never lose each other's updates.
+    Each attempt also marks the state dirty on this process and is appended
+    to its journal before returning; the background flusher fsyncs the
+    journal every BKT_JOURNAL_FSYNC_INTERVAL_SECONDS, one fsync for all
+    attempts since the last one, instead of once per attempt. Dirty states are written to ``skill_states`` in
+    batches every flush interval (or once the batch is full), taking the
+    latest shared value so no worker writes an older state over another's.
+
+    Every process journals to its own file (BKT_JOURNAL_PATH with the pid
+    before the extension) and holds a lock on it while alive. On startup,
+    journals whose lock is free, left by a process that died, are replayed
+    so a process crash loses no acknowledged update (a machine crash loses
+    at most the last fsync interval).
+
+    Batch jobs invalidate cached states through the generations in
+    ``bkt_service``: a nightly recompute starts a new states generation
+    (cached states and unflushed rows of older ones are discarded), a
+    parameter fit starts a new params generation (cached states reload
+    their BKT parameters on next use). Store errors fall back to the
+    database.
+
+    Students whose skills reached MASTERED are handed to ``on_mastered``
+    once the batch is written; the skills it unlocks are applied to the
+    cached states so a later flush does not lock them again.
+    """
+
+    def __init__(
+        self,
+        loader: Loader = load_skill_state,
+        writer: Writer = write_skill_states,
+        store=None,
+        journal_path: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        fsync: Optional[bool] = None,
+        fsync_interval: Optional[float] = None,
+        on_mastered: Optional[MasteryHook] = propagate_mastered_students,
+    ):
+        self.loader = loader
+        self.writer = writer
+        self._store = store
+        self.journal_base = Path(journal_path or settings.BKT_JOURNAL_PATH)
+        self.flush_interval = flush_interval or settings.BKT_FLUSH_INTERVAL_SECONDS
+        self.max_batch = max_batch or settings.BKT_FLUSH_MAX_BATCH
+        self.ttl_seconds = ttl_seconds or settings.BKT_CACHE_TTL_SECONDS
+        self.fsync = settings.BKT_JOURNAL_FSYNC if fsync is None else fsync
+        self.fsync_interval = fsync_interval or settings.BKT_JOURNAL_FSYNC_INTERVAL_SECONDS
+        self.on_mastered = on_mastered
+
+        # state_id -> (store key, row, states generation)
+        self._dirty: dict[UUID, tuple[str, dict[str, Any], int]] = {}
+        self._mastered: set[UUID] = set()
+        self._generations = (0, 0)  # last known (states, params)
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._journal = None
+        self._unsynced = False  # journal writes not fsynced yet
+        self._journal_lock = None
+        self._journal_lock_pid: Optional[int] = None
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+
+    @property
+    def journal_path(self) -> Path:
+        """This process's journal (resolved per call: workers may be forked)"""
+        base = self.journal_base
+        return base.with_name(f"{base.stem}.{os.getpid()}{base.suffix}")
+
+    @staticmethod
+    def _sibling(journal: Path, suffix: str) -> Path:
+        return journal.with_name(journal.name + suffix)
+
+    @property
+    def _flushing_path(self) -> Path:
+        return self._sibling(self.journal_path, ".flushing")
+
+    def _hold_journal_lock(self) -> None:
+        """Mark this process's journal as owned by a live process"""
+        if self._journal_lock is not None and self._journal_lock_pid == os.getpid():
+            return
+        path = self._sibling(self.journal_path, ".lock")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(path, "a")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()  # another cache of this same process holds it
+            return
+        self._journal_lock, self._journal_lock_pid = lock, os.getpid()
+
+    def _open_journal(self) -> None:
+        self._hold_journal_lock()
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _append_journal(self, rows: list[dict[str, Any]], generation: int) -> None:
+        if self._journal is None:
+            self._open_journal()
+        for row in rows:
+            self._journal.write(json.dumps({
+                "id": str(row["id"]),
+                "domain_probability": row["domain_probability"],
+                "status": row["status"].value,
+                "last_activity": row["last_activity"].isoformat() if row["last_activity"] else None,
+                "generation": generation,
+            }) + "\n")
+        self._journal.flush()
+        self._unsynced = self.fsync
+
+    def _close_journal(self) -> None:
+        """Close this process's journal, syncing pending writes first (caller holds the lock)"""
+        if self._journal is None:
+            return
+        if self._unsynced:
+            os.fsync(self._journal.fileno())
+            self._unsynced = False
+        self._journal.close()
+        self._journal = None
+
+    def _sync_journal(self) -> None:
+        """Group commit: one fsync for every attempt journaled since the last one"""
+        with self._lock:
+            if not self._unsynced or self._journal is None:
+                return
+            fd = os.dup(self._journal.fileno())
+            self._unsynced = False
+        try:
+            os.fsync(fd)  # outside the lock: attempts keep appending meanwhile
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_journal(path: Path, generation: int) -> dict[UUID, dict[str, Any]]:
+        """Read a journal file; the last record of each state wins"""
+        rows: dict[UUID, dict[str, Any]] = {}
+        if not path.exists():
+            return rows
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                if record.get("generation", generation) != generation:
+                    continue  # superseded by a recompute
+                state_id = UUID(record["id"])
+                rows[state_id] = {
+                    "id": state_id,
+                    "domain_probability": record["domain_probability"],
+                    "status": SkillStatus(record["status"]),
+                    "last_activity": (datetime.fromisoformat(record["last_activity"])
+                                      if record["last_activity"] else None),
+                }
+        return rows
+
+    def _orphaned_journals(self) -> list[tuple[Path, Any]]:
+        """Journals of other processes that are no longer running, with their locks held"""
+        base = self.journal_base
+        if not base.parent.exists():
+            return []
+        own = self.journal_path
+        pattern = re.compile(rf"{re.escape(base.stem)}\.\d+{re.escape(base.suffix)}")
+        names = set()
+        for path in base.parent.iterdir():
+            name = re.sub(r"\.(flushing|lock)$", "", path.name)
+            if name == base.name or pattern.fullmatch(name):
+                names.add(name)
+
+        orphans = []
+        for name in sorted(names - {own.name}):
+            journal = base.with_name(name)
+            lock = open(self._sibling(journal, ".lock"), "a")
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()  # its process is alive
+                continue
+            orphans.append((journal, lock))
+        return orphans
+
+    def recover(self) -> int:
+        """
+        Replay journaled updates left over by dead processes (and this pid's previous run)
+
+        Returns:
+            Number of skill states written back
+        """
+        with self._flush_lock:
+            generation = self._current_generations()[0]
+            self._hold_journal_lock()
+            orphans = self._orphaned_journals()
+            rows: dict[UUID, dict[str, Any]] = {}
+            try:
+                for journal in [self.journal_path, *(path for path, _ in orphans)]:
+                    for path in (self._sibling(journal, ".flushing"), journal):
+                        for row in self._read_journal(path, generation).values():
+                            _newest(rows, row)
+                if rows:
+                    self.writer(list(rows.values()))
+                    logger.info("Recovered BKT journal", extra={"extra": {
+                        "states": len(rows), "journals": len(orphans) + 1}})
+                with self._lock:
+                    self._close_journal()
+                    self._flushing_path.unlink(missing_ok=True)
+                    self.journal_path.unlink(missing_ok=True)
+                for journal, _ in orphans:
+                    self._sibling(journal, ".flushing").unlink(missing_ok=True)
+                    journal.unlink(missing_ok=True)
+                    self._sibling(journal, ".lock").unlink(missing_ok=True)
+            finally:
+                for _, lock in orphans:
+                    lock.close()
+            return len(rows)
+
+    # ------------------------------------------------------------------
+    # Cache operations
+    # ------------------------------------------------------------------
+
+    def _current_generations(self) -> tuple[int, int]:
+        """(states, params) generations; the last known ones if the store fails"""
+        try:
+            states = self.store.get(STATES_GENERATION_KEY)
+            params = self.store.get(PARAMS_GENERATION_KEY)
+            self._generations = (int(states or 0), int(params or 0))
+        except Exception as e:
+            log_error(logger, e, {"operation": "bkt_cache_generations"})
+        return self._generations
+
+    @staticmethod
+    def _key(generation: int, student_id: UUID, skill_id: str) -> str:
+        return f"{KEY_PREFIX}:{generation}:{student_id}:{skill_id}"
+
+    def _read(self, key: str) -> Optional[CachedSkillState]:
+        try:
+            data = self.store.get(key)
+        except Exception as e:
+            log_error(logger, e, {"operation": "bkt_cache_get"})
+            return None
+        return CachedSkillState.from_json(data) if data is not None else None
+
+    def _update(self, key: str,
+                func: Callable[[Optional[CachedSkillState]], Optional[CachedSkillState]]
+                ) -> Optional[CachedSkillState]:
+        """
+        Atomically apply ``func`` to the shared entry
+
+        The store retries ``func`` if another worker wrote the entry
+        meanwhile (Redis) or runs it under its lock (memory), so no update
+        is lost. If the store fails, ``func`` is applied to no entry and
+        the result is not shared.
+        """
+        result: Optional[CachedSkillState] = None
+
+        def apply(data: Optional[bytes]) -> Optional[bytes]:
+            nonlocal result
+            result = func(CachedSkillState.from_json(data) if data is not None else None)
+            return result.to_json() if result is not None else None
+
+        try:
+            self.store.update(key, apply, ttl=self.ttl_seconds)
+        except Exception as e:
+            log_error(logger, e, {"operation": "bkt_cache_update"})
+            apply(None)
+        return result
+
+    def _load(self, student_id: UUID, skill_id: str,
+              params_generation: int) -> Optional[CachedSkillState]:
+        """State from the database, with the BKT parameters of the current generation"""
+        row = self.loader(student_id, skill_id)
+        if row is None:
+            return None
+        return CachedSkillState(
+            state_id=row["id"],
+            probability=row["domain_probability"],
+            status=row["status"],
+            params=resolve_params(row.get("bkt_params")),
+            params_generation=params_generation,
+            last_activity=row.get("last_activity"),
+        )
+
+    def _current(self, key: str, student_id: UUID, skill_id: str,
+                 params_generation: int) -> Optional[CachedSkillState]:
+        """
+        Fresh database state for a missing or outdated shared entry
+
+        Returns:
+            None when the shared entry is current (or the state is unknown)
+        """
+        entry = self._read(key)
+        if entry is not None and entry.params_generation == params_generation:
+            metrics.increment("bkt_cache.hits")
+            return None
+        metrics.increment("bkt_cache.misses" if entry is None else "bkt_cache.params_reloads")
+        return self._load(student_id, skill_id, params_generation)
+
+    @staticmethod
+    def _merge(entry: Optional[CachedSkillState], loaded: Optional[CachedSkillState],
+               params_generation: int) -> Optional[CachedSkillState]:
+        """Shared entry brought up to date with a database load"""
+        if entry is None:
+            # Copied: the store may retry the update with the same load
+            return loaded.copy() if loaded is not None else None
+        if entry.params_generation != params_generation and loaded is not None:
+            # Fitted parameters were written: keep L(t), take the new parameters
+            entry.params = loaded.params
+            entry.params_generation = params_generation
+        return entry
+
+    def get(self, student_id: UUID, skill_id: str) -> Optional[CachedSkillState]:
+        """
+        Get the latest state of a (student, skill) pair
+
+        Args:
+            student_id: Student UUID
+            skill_id: Skill identifier
+
+        Returns:
+            Cached state (including unflushed updates) or None if unknown
+        """
+        generation, params_generation = self._current_generations()
+        key = self._key(generation, student_id, skill_id)
+        entry = self._read(key)
+        if entry is not None and entry.params_generation == params_generation:
+            metrics.increment("bkt_cache.hits")
+            return entry
+        metrics.increment("bkt_cache.misses" if entry is None else "bkt_cache.params_reloads")
+        loaded = self._load(student_id, skill_id, params_generation)
+        if loaded is None:
+            return None
+
+        def fill(entry: Optional[CachedSkillState]) -> Optional[CachedSkillState]:
+            if entry is not None and entry.params_generation == params_generation:
+                return None  # written meanwhile: keep it
+            return self._merge(entry, loaded, params_generation)
+
+        return self._update(key, fill) or self._read(key) or loaded
+
+    def record_attempt(self, student_id: UUID, skill_id: str,
+                       is_correct: bool) -> Optional[CachedSkillState]:
+        """
+        Apply one attempt to the shared BKT state
+
+        Args:
+            student_id: Student UUID
+            skill_id: Skill of the attempted problem
+            is_correct: Whether the attempt was correct
+
+        Returns:
+            Updated state, or None if the student has no state for the skill
+        """
+        generation, params_generation = self._current_generations()
+        key = self._key(generation, student_id, skill_id)
+        # Database reads happen before the atomic update, never inside it
+        loaded = self._current(key, student_id, skill_id, params_generation)
+        mastered = False
+
+        def apply(entry: Optional[CachedSkillState]) -> Optional[CachedSkillState]:
+            nonlocal mastered
+            entry = self._merge(entry, loaded, params_generation)
+            if entry is None:
+                return None
+            params = entry.params
+            previous = entry.status
+            entry.probability = bkt_update(
+                entry.probability, is_correct, params["P_T"], params["P_S"], params["P_G"])
+            entry.status = derive_status(entry.probability, entry.status, attempted=True)
+            mastered = entry.status == SkillStatus.MASTERED and previous != SkillStatus.MASTERED
+            entry.last_activity = datetime.utcnow()
+            return entry
+
+        entry = self._update(key, apply)
+        if entry is None and loaded is None:
+            # Expired between the read and the update: load it and retry once
+            loaded = self._load(student_id, skill_id, params_generation)
+            if loaded is not None:
+                entry = self._update(key, apply)
+        if entry is None:
+            logger.warning("No skill state for attempt",
+                           extra={"extra": {"student_id": str(student_id), "skill_id": skill_id}})
+            return None
+
+        with self._lock:
+            if mastered:
+                self._mastered.add(student_id)
+            row = entry.as_row()
+            self._append_journal([row], generation)
+            self._dirty[entry.state_id] = (key, row, generation)
+            pending = len(self._dirty)
+
+        metrics.increment("bkt_cache.attempts")
+        if pending >= self.max_batch:
+            self._wakeup.set()
+        return entry
+
+    def apply_statuses(self, changes: dict[UUID, dict[str, SkillStatus]]) -> None:
+        """
+        Apply LOCKED/AVAILABLE changes already written to the database
+
+        Only cached states that are still LOCKED or AVAILABLE are touched;
+        pending (dirty) rows are updated too so the next flush keeps them.
+
+        Args:
+            changes: New status per skill ID, per student
+        """
+        generation = self._current_generations()[0]
+        rows = []
+        for student_id, statuses in changes.items():
+            for skill_id, status in statuses.items():
+                def set_status(entry: Optional[CachedSkillState],
+                               status: SkillStatus = status) -> Optional[CachedSkillState]:
+                    if entry is None or entry.status not in (SkillStatus.LOCKED,
+                                                             SkillStatus.AVAILABLE):
+                        return None
+                    entry.status = status
+                    return entry
+
+                key = self._key(generation, student_id, skill_id)
+                entry = self._update(key, set_status)
+                if entry is not None:
+                    rows.append((key, entry.as_row()))
+
+        with self._lock:
+            pending = [row for key, row in rows if row["id"] in self._dirty]
+            for key, row in rows:
+                if row["id"] in self._dirty:
+                    self._dirty[row["id"]] = (key, row, generation)
+            if pending:
+                self._append_journal(pending, generation)
+
+    def _propagate(self, student_ids: set[UUID]) -> None:
+        """Run the mastery hook and mirror the unlocks in the cache"""
+        try:
+            unlocked = self.on_mastered(student_ids)
+        except Exception as e:
+            log_error(logger, e, {"operation": "skill_unlock", "students": len(student_ids)})
+            metrics.increment("bkt_cache.unlock_errors")
+            with self._lock:
+                self._mastered |= student_ids
+            return
+        self.apply_statuses({
+            student_id: {skill_id: SkillStatus.AVAILABLE for skill_id in skill_ids}
+            for student_id, skill_ids in unlocked.items()
+        })
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self) -> int:
+        """
+        Write all dirty states to the database in one batch
+
+        Returns:
+            Number of skill states written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty and not self._mastered:
+                    return 0
+                batch, self._dirty = self._dirty, {}
+                mastered, self._mastered = self._mastered, set()
+                # Rotate the journal: updates recorded during the write go
+                # to a fresh file and survive a failure of this batch
+                self._close_journal()
+                if self.journal_path.exists():
+                    os.replace(self.journal_path, self._flushing_path)
+
+            generation = self._current_generations()[0]
+            rows: dict[UUID, dict[str, Any]] = {}
+            for state_id, (key, row, row_generation) in batch.items():
+                if row_generation != generation:
+                    metrics.increment("bkt_cache.superseded")
+                    continue
+                # Other workers may have applied newer attempts to the shared state
+                latest = self._read(key)
+                rows[state_id] = (latest.as_row() if latest is not None
+                                  and latest.state_id == state_id else row)
+
+            start = time.perf_counter()
+            try:
+                if rows:
+                    self.writer(list(rows.values()))
+            except Exception as e:
+                log_error(logger, e, {"operation": "bkt_flush", "states": len(rows)})
+                metrics.increment("bkt_cache.flush_errors")
+                with self._lock:
+                    # Keep updates recorded during the failed write: they
+                    # are newer than the batch rows
+                    restored = [row for state_id, row in rows.items()
+                                if state_id not in self._dirty]
+                    for row in restored:
+                        self._dirty[row["id"]] = (batch[row["id"]][0], row, generation)
+                    self._append_journal(restored, generation)
+                    self._mastered |= mastered
+                self._flushing_path.unlink(missing_ok=True)
+                return 0
+
+            self._flushing_path.unlink(missing_ok=True)
+            if mastered and self.on_mastered is not None:
+                self._propagate(mastered)
+
+            metrics.observe("bkt_cache.flush_time", time.perf_counter() - start)
+            metrics.increment("bkt_cache.flushed", len(rows))
+            return len(rows)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stopping.is_set():
+            timeout = max(0.0, next_flush - time.monotonic())
+            if self.fsync:
+                timeout = min(timeout, self.fsync_interval)
+            woken = self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            self._sync_journal()
+            if woken or time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def start(self) -> None:
+        """Replay orphaned journals and start the background flusher"""
+        if self._thread is not None:
+            return
+        self.recover()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="bkt-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background flusher and write pending states"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            self._close_journal()
+            if self._journal_lock is not None:
+                self._journal_lock.close()
+                self._journal_lock = None
+
+
+# Global cache, started with the application
+skill_state_cache = SkillStateCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_attempts(session, flush_context) -> None:
+    """Remember the student and skill of step attempts inserted in this transaction"""
+    attempts = [obj for obj in session.new if isinstance(obj, StepAttempt)]
+    if not attempts:
+        return
+    owners = {
+        row.id: (row.student_id, row.skill_id)
+        for row in session.connection().execute(
+            select(ProblemSession.id, ProblemSession.student_id, Problem.skill_id)
+            .join(Problem, ProblemSession.problem_id == Problem.id)
+            .where(ProblemSession.id.in_({attempt.session_id for attempt in attempts}))
+        )
+    }
+    session.info.setdefault("skill_state_attempts", []).extend(
+        (*owners[attempt.session_id], attempt.is_correct)
+        for attempt in attempts if attempt.session_id in owners
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _record_committed_attempts(session) -> None:
+    # Only committed attempts reach BKT, so a recompute can always replay them
+    for student_id, skill_id, is_correct in session.info.pop("skill_state_attempts", ()):
+        try:
+            skill_state_cache.record_attempt(student_id, skill_id, is_correct)
+        except Exception as e:
+            log_error(logger, e, {"operation": "bkt_record_attempt",
+                                  "student_id": str(student_id), "skill_id": skill_id})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_new_attempts(session) -> None:
+    session.info.pop("skill_state_attempts", None)
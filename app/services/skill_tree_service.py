@@ -0,0 +1,450 @@
+"""Skill tree DAG index and unlock computation"""
+
+import itertools
+import threading
+import time
+from typing import Iterable, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import case, event, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.kvstore import get_kvstore
+from app.core.logging import get_logger, log_error
+from app.core.metrics import metrics
+from app.db.base import SessionLocal
+from app.models.class_model import ClassStudent
+from app.models.skill import Skill, SkillDependency, SkillState, SkillStatus
+
+logger = get_logger(__name__)
+
+class SkillGraphIndex:
+    """
+    Immutable, integer-encoded index of the skill prerequisite DAG
+
+    Skills are numbered 0..n-1. Direct edges are kept as CSR adjacency
+    arrays and every skill gets two bitsets (Python ints): its direct
+    prerequisites and the transitive closure of its prerequisites. Unlock
+    checks become ``prereqs & ~mastered == 0`` instead of graph walks.
+    """
+
+    def __init__(self, skill_ids: list[str], edges: Iterable[tuple[str, str]], version: int = 0):
+        """
+        Build the index
+
+        Args:
+            skill_ids: All skill identifiers
+            edges: (skill_id, depends_on_skill_id) pairs
+            version: Version stamp of the data the index was built from
+
+        Raises:
+            ValueError: If an edge references an unknown skill or the graph has a cycle
+        """
+        self.version = version
+        self.skill_ids = list(skill_ids)
+        self.index = {skill_id: i for i, skill_id in enumerate(self.skill_ids)}
+        size = len(self.skill_ids)
+
+        pairs = []
+        for skill_id, depends_on in edges:
+            if skill_id not in self.index or depends_on not in self.index:
+                raise ValueError(f"Dependencia con habilidad desconocida: {skill_id} -> {depends_on}")
+            pairs.append((self.index[skill_id], self.index[depends_on]))
+        edge_array = np.array(sorted(set(pairs)), dtype=np.int32).reshape(-1, 2)
+
+        # CSR adjacency: prerequisites (skill -> depends_on) and dependents
+        self.prereq_indptr, self.prereq_indices = self._csr(edge_array[:, 0], edge_array[:, 1], size)
+        self.dependent_indptr, self.dependent_indices = self._csr(
+            edge_array[:, 1], edge_array[:, 0], size)
+
+        self.topological_order = self._topological_sort(size)
+
+        self.prereq_mask = [0] * size
+        self.ancestor_mask = [0] * size
+        for node in self.topological_order.tolist():
+            direct = 0
+            closure = 0
+            for parent in self.prerequisites_of(node).tolist():
+                direct |= 1 << parent
+                closure |= (1 << parent) | self.ancestor_mask[parent]
+            self.prereq_mask[node] = direct
+            self.ancestor_mask[node] = closure
+
+    @staticmethod
+    def _csr(sources: np.ndarray, targets: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(size + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+        return indptr, targets[order].astype(np.int32)
+
+    def _topological_sort(self, size: int) -> np.ndarray:
+        """Kahn's algorithm; prerequisites come before their dependents"""
+        in_degree = np.diff(self.prereq_indptr).copy()
+        ready = np.flatnonzero(in_degree == 0).tolist()
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for dependent in self.dependents_of(node).tolist():
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != size:
+            raise ValueError("El árbol de habilidades contiene un ciclo")
+        return np.array(order, dtype=np.int32)
+
+    def prerequisites_of(self, node: int) -> np.ndarray:
+        """Direct prerequisites of a node (integer ids)"""
+        return self.prereq_indices[self.prereq_indptr[node]:self.prereq_indptr[node + 1]]
+
+    def dependents_of(self, node: int) -> np.ndarray:
+        """Direct dependents of a node (integer ids)"""
+        return self.dependent_indices[self.dependent_indptr[node]:self.dependent_indptr[node + 1]]
+
+    # ------------------------------------------------------------------
+    # Bitset helpers
+    # ------------------------------------------------------------------
+
+    def mask_of(self, skill_ids: Iterable[str]) -> int:
+        """Encode skills as a bitset (unknown skills are ignored)"""
+        mask = 0
+        for skill_id in skill_ids:
+            node = self.index.get(skill_id)
+            if node is not None:
+                mask |= 1 << node
+        return mask
+
+    def skills_in(self, mask: int) -> set[str]:
+        """Decode a bitset into skill identifiers"""
+        skills = set()
+        while mask:
+            low = mask & -mask
+            skills.add(self.skill_ids[low.bit_length() - 1])
+            mask ^= low
+        return skills
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def ancestors(self, skill_id: str) -> set[str]:
+        """All transitive prerequisites of a skill"""
+        return self.skills_in(self.ancestor_mask[self.index[skill_id]])
+
+    def descendants(self, skill_id: str) -> set[str]:
+        """All skills that transitively depend on a skill"""
+        bit = 1 << self.index[skill_id]
+        return {self.skill_ids[node] for node, mask in enumerate(self.ancestor_mask) if mask & bit}
+
+    def unlocked_mask(self, mastered_mask: int) -> int:
+        """Bitset of skills whose direct prerequisites are all mastered"""
+        unlocked = 0
+        for node, prereqs in enumerate(self.prereq_mask):
+            if prereqs & ~mastered_mask == 0:
+                unlocked |= 1 << node
+        return unlocked
+
+    def is_unlocked(self, skill_id: str, mastered: set[str]) -> bool:
+        """Whether all direct prerequisites of a skill are mastered"""
+        return self.prereq_mask[self.index[skill_id]] & ~self.mask_of(mastered) == 0
+
+    def available_skills(self, mastered: set[str]) -> set[str]:
+        """Skills that are unlocked but not yet mastered"""
+        mastered_mask = self.mask_of(mastered)
+        return self.skills_in(self.unlocked_mask(mastered_mask) & ~mastered_mask)
+
+    def unlock_changes(self, statuses: dict[str, SkillStatus]) -> tuple[set[str], set[str]]:
+        """
+        Compute the LOCKED/AVAILABLE transitions for one student
+
+        IN_PROGRESS and MASTERED states are never changed.
+
+        Args:
+            statuses: Current status per skill ID of the student's states
+
+        Returns:
+            Tuple of (skills to unlock, skills to lock again)
+        """
+        mastered_mask = self.mask_of(
+            skill_id for skill_id, status in statuses.items() if status == SkillStatus.MASTERED)
+        unlocked = self.unlocked_mask(mastered_mask)
+
+        to_unlock, to_lock = set(), set()
+        for skill_id, status in statuses.items():
+            node = self.index.get(skill_id)
+            if node is None:
+                continue
+            is_unlocked = unlocked >> node & 1
+            if status == SkillStatus.LOCKED and is_unlocked:
+                to_unlock.add(skill_id)
+            elif status == SkillStatus.AVAILABLE and not is_unlocked:
+                to_lock.add(skill_id)
+        return to_unlock, to_lock
+
+
+GENERATION_KEY = "skill_graph:generation"
+
+
+class SkillGraphCache:
+    """
+    Process-wide cache of the SkillGraphIndex with version-stamped invalidation
+
+    The version is a generation counter in the shared key-value store,
+    bumped once a transaction that touched Skill or SkillDependency rows
+    commits, so every process rebuilds its index on the next ``get``. If
+    the store fails, the last known version is used and changes made by
+    other processes are picked up after SKILL_GRAPH_TTL_SECONDS.
+    """
+
+    def __init__(self, store=None, ttl_seconds: Optional[float] = None):
+        self._store = store
+        self.ttl_seconds = settings.SKILL_GRAPH_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._version = 0  # last known shared generation
+        self._index: Optional[SkillGraphIndex] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_kvstore()
+
+    @property
+    def version(self) -> int:
+        """Current shared generation (the last known one if the store fails)"""
+        try:
+            version = int(self.store.get(GENERATION_KEY) or 0)
+        except Exception as e:
+            log_error(logger, e, {"operation": "skill_graph_version"})
+            return self._version
+        with self._lock:
+            self._version = version
+        return version
+
+    def invalidate(self) -> None:
+        """Mark the cached index as stale in every process"""
+        with self._lock:
+            self._index = None  # at least this process rebuilds if the store fails
+        try:
+            self.store.incr(GENERATION_KEY)
+        except Exception as e:
+            log_error(logger, e, {"operation": "skill_graph_invalidate"})
+
+    def get(self, db: Session) -> SkillGraphIndex:
+        """
+        Get an up-to-date index, rebuilding it if stale
+
+        Args:
+            db: Database session used to load skills and dependencies
+
+        Returns:
+            Skill graph index
+        """
+        version = self.version
+        with self._lock:
+            index = self._index
+            fresh = (
+                index is not None
+                and index.version == version
+                and time.monotonic() - self._built_at < self.ttl_seconds
+            )
+        if fresh:
+            metrics.increment("skill_graph.hits")
+            return index
+
+        metrics.increment("skill_graph.rebuilds")
+        skill_ids = list(db.scalars(select(Skill.id).order_by(Skill.id)))
+        edges = db.execute(
+            select(SkillDependency.skill_id, SkillDependency.depends_on_skill_id)).all()
+        index = SkillGraphIndex(skill_ids, edges, version=version)
+
+        with self._lock:
+            # An older version read before a concurrent bump must not win
+            if self._index is None or self._index.version <= version:
+                self._index = index
+                self._built_at = time.monotonic()
+        return index
+
+
+# Global skill graph cache
+skill_graph_cache = SkillGraphCache()
+
+
+class SkillTreeService:
+    """Service for skill tree unlock computation"""
+
+    @staticmethod
+    def compute_statuses(db: Session, student_id: UUID) -> dict[str, SkillStatus]:
+        """
+        Compute the LOCKED/AVAILABLE/IN_PROGRESS/MASTERED status of every skill
+
+        Loads the student's states in one query and resolves unlocks with
+        bitset operations on the cached index; no relationship is loaded.
+
+        Args:
+            db: Database session
+            student_id: Student ID
+
+        Returns:
+            Status per skill ID
+        """
+        graph = skill_graph_cache.get(db)
+        states = dict(db.execute(
+            select(SkillState.skill_id, SkillState.status)
+            .where(SkillState.student_id == student_id)
+        ).all())
+
+        mastered_mask = graph.mask_of(
+            skill_id for skill_id, status in states.items() if status == SkillStatus.MASTERED)
+        unlocked_mask = graph.unlocked_mask(mastered_mask)
+
+        statuses = {}
+        for node, skill_id in enumerate(graph.skill_ids):
+            current = states.get(skill_id)
+            if current in (SkillStatus.MASTERED, SkillStatus.IN_PROGRESS):
+                statuses[skill_id] = current
+            elif unlocked_mask >> node & 1:
+                statuses[skill_id] = SkillStatus.AVAILABLE
+            else:
+                statuses[skill_id] = SkillStatus.LOCKED
+        return statuses
+
+    @staticmethod
+    def _load_statuses(db: Session, condition) -> dict[UUID, dict[str, tuple[UUID, SkillStatus]]]:
+        """Load (state id, status) per skill for every matching student in one query"""
+        rows = db.execute(
+            select(SkillState.id, SkillState.student_id, SkillState.skill_id, SkillState.status)
+            .where(condition)
+        )
+        by_student: dict[UUID, dict[str, tuple[UUID, SkillStatus]]] = {}
+        for state_id, student_id, skill_id, status in rows:
+            by_student.setdefault(student_id, {})[skill_id] = (state_id, status)
+        return by_student
+
+    @staticmethod
+    def propagate_mastery(db: Session, student_ids: Iterable[UUID]) -> dict[UUID, set[str]]:
+        """
+        Unlock every skill whose prerequisites are now mastered
+
+        Computes the whole frontier for all given students in one pass and
+        flips it from LOCKED to AVAILABLE with a single UPDATE. The caller
+        commits.
+
+        Args:
+            db: Database session
+            student_ids: Students that mastered at least one skill
+
+        Returns:
+            Unlocked skill IDs per student
+        """
+        student_ids = list(set(student_ids))
+        if not student_ids:
+            return {}
+
+        graph = skill_graph_cache.get(db)
+        by_student = SkillTreeService._load_statuses(
+            db, SkillState.student_id.in_(student_ids))
+
+        unlocked: dict[UUID, set[str]] = {}
+        state_ids: list[UUID] = []
+        for student_id, states in by_student.items():
+            to_unlock, _ = graph.unlock_changes(
+                {skill_id: status for skill_id, (_, status) in states.items()})
+            if to_unlock:
+                unlocked[student_id] = to_unlock
+                state_ids.extend(states[skill_id][0] for skill_id in to_unlock)
+
+        if state_ids:
+            db.execute(
+                update(SkillState)
+                .where(SkillState.id.in_(state_ids), SkillState.status == SkillStatus.LOCKED)
+                .values(status=SkillStatus.AVAILABLE)
+                .execution_options(synchronize_session=False)
+            )
+        metrics.increment("skill_tree.unlocked", len(state_ids))
+        return unlocked
+
+    @staticmethod
+    def recalculate_class(db: Session, class_id: UUID) -> dict[UUID, dict[str, SkillStatus]]:
+        """
+        Recompute LOCKED/AVAILABLE for every student of a class
+
+        Used after a teacher edits the skill tree: skills can be unlocked
+        or locked again. Loads all states of the class in one query and
+        applies every change with a single UPDATE ... CASE. The caller
+        commits.
+
+        Args:
+            db: Database session
+            class_id: Class ID
+
+        Returns:
+            New status per changed skill ID, per student
+        """
+        graph = skill_graph_cache.get(db)
+        members = select(ClassStudent.student_id).where(ClassStudent.class_id == class_id)
+        by_student = SkillTreeService._load_statuses(db, SkillState.student_id.in_(members))
+
+        changes: dict[UUID, dict[str, SkillStatus]] = {}
+        unlock_ids: list[UUID] = []
+        lock_ids: list[UUID] = []
+        for student_id, states in by_student.items():
+            to_unlock, to_lock = graph.unlock_changes(
+                {skill_id: status for skill_id, (_, status) in states.items()})
+            if not to_unlock and not to_lock:
+                continue
+            changes[student_id] = {
+                **{skill_id: SkillStatus.AVAILABLE for skill_id in to_unlock},
+                **{skill_id: SkillStatus.LOCKED for skill_id in to_lock},
+            }
+            unlock_ids.extend(states[skill_id][0] for skill_id in to_unlock)
+            lock_ids.extend(states[skill_id][0] for skill_id in to_lock)
+
+        if unlock_ids or lock_ids:
+            db.execute(
+                update(SkillState)
+                .where(SkillState.id.in_(unlock_ids + lock_ids),
+                       SkillState.status.in_([SkillStatus.LOCKED, SkillStatus.AVAILABLE]))
+                .values(status=case(
+                    (SkillState.id.in_(unlock_ids), SkillStatus.AVAILABLE),
+                    else_=SkillStatus.LOCKED,
+                ))
+                .execution_options(synchronize_session=False)
+            )
+        return changes
+
+
+def propagate_mastered_students(student_ids: set[UUID]) -> dict[UUID, set[str]]:
+    """Run mastery propagation in its own transaction (skill state cache hook)"""
+    db = SessionLocal()
+    try:
+        unlocked = SkillTreeService.propagate_mastery(db, student_ids)
+        db.commit()
+        return unlocked
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_skill_graph_changes(session, flush_context) -> None:
+    """Remember that this transaction changed skills or dependencies"""
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Skill, SkillDependency)):
+            session.info["skill_graph_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_skill_graph(session) -> None:
+    # After commit, so a rebuild under the new version reads the new rows
+    if session.info.pop("skill_graph_changed", False):
+        skill_graph_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_skill_graph_changes(session) -> None:
+    session.info.pop("skill_graph_changed", None)
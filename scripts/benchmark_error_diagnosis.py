@@ -0,0 +1,200 @@
+"""Benchmark of the error diagnosis cascade: LLM calls avoided and accuracy
+
+Trains the local classifier on the older part of a diagnosis log and
+replays the rest through rules -> classifier -> LLM. The LLM is an offline
+fake that returns the stored diagnosis after --llm-latency seconds, so the
+report shows how many calls the local stages avoid, how often they agree
+with the stored label, and their latency.
+
+The log is either the database (--from-db), a JSONL file with one
+{"problem_type", "student_answer", "expected_step", "skill_id", "language",
+"error_type", "affected_concept", "severity"} object per line (--corpus),
+or a synthetic log of algebra and Python mistakes.
+
+Usage:
+    python scripts/benchmark_error_diagnosis.py --attempts 3000
+    python scripts/benchmark_error_diagnosis.py --from-db --threshold 0.9
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.problem import Language, ProblemType
+from app.models.session import ErrorType
+from app.services.error_diagnosis import (
+    DiagnosisInput,
+    ErrorClassifier,
+    ErrorDiagnosisService,
+    LabeledAttempt,
+    diagnose_with_rules,
+)
+from app.services.llm import FakeProvider
+from scripts.benchmark_registration import report
+
+# (skill, error type, concept, severity, expected step, wrong answer) templates
+MATH_MISTAKES = [
+    ("ecuaciones_1", ErrorType.PROCEDURE, "transposición de términos", 2,
+     "{a}*x = {c} - {b}", "{a}*x = {c} + {b}"),
+    ("ecuaciones_1", ErrorType.PROCEDURE, "transposición de términos", 2,
+     "x = {c}/{a}", "x = {c}*{a}"),
+    ("ecuaciones_1", ErrorType.CONCEPT, "igualdad como balanza", 3,
+     "{a}*x = {c} - {b}", "{a}*x + {b} = {c} - {b}"),
+    ("potencias", ErrorType.CONCEPT, "producto de potencias", 4,
+     "x**{m}", "x**{n}"),
+    ("potencias", ErrorType.PROCEDURE, "signo de la potencia", 2,
+     "{a}*x**2", "-{a}*x**2"),
+    ("fracciones", ErrorType.CONCEPT, "suma de fracciones", 4,
+     "({a} + {b})/{c}", "({a} + {b})/({c} + {c})"),
+    ("fracciones", ErrorType.PROCEDURE, "simplificación", 2,
+     "{a}/{c}", "{b}/{c}"),
+    ("fracciones", ErrorType.SYNTAX, "notación matemática", 1,
+     "{a}/{c}", "{a}//{c}("),
+]
+
+PYTHON_MISTAKES = [
+    ("bucles", ErrorType.PROCEDURE, "límites de range", 2,
+     "for i in range({n}):", "for i in range({n} + 1):"),
+    ("bucles", ErrorType.CONCEPT, "acumuladores", 3,
+     "total += valores[i]", "total = valores[i]"),
+    ("condicionales", ErrorType.CONCEPT, "comparación frente a asignación", 3,
+     "if x == {n}:", "if x is {n}:"),
+    ("condicionales", ErrorType.SYNTAX, "sintaxis de Python", 1,
+     "if x == {n}:", "if x == {n}"),
+    ("funciones", ErrorType.CONCEPT, "valor de retorno", 4,
+     "return total", "print(total)"),
+]
+
+
+def synthetic_log(attempts: int, noise: float, seed: int) -> list[LabeledAttempt]:
+    """Templated mistakes; a share of the non-syntax ones gets a random label"""
+    rng = random.Random(seed)
+    log = []
+    for _ in range(attempts):
+        is_math = rng.random() < 0.7
+        skill, error_type, concept, severity, expected, answer = rng.choice(
+            MATH_MISTAKES if is_math else PYTHON_MISTAKES)
+        values = {"a": rng.randint(2, 9), "b": rng.randint(1, 20), "c": rng.randint(1, 30),
+                  "m": rng.randint(5, 9), "n": rng.randint(10, 40)}
+        if error_type != ErrorType.SYNTAX and rng.random() < noise:
+            error_type = rng.choice([ErrorType.PROCEDURE, ErrorType.CONCEPT])
+        log.append(LabeledAttempt(
+            item=DiagnosisInput(
+                problem_type=ProblemType.MATH if is_math else ProblemType.CODE,
+                student_answer=answer.format(**values),
+                expected_step=expected.format(**values),
+                skill_id=skill,
+                language=None if is_math else Language.PYTHON,
+            ),
+            error_type=error_type, affected_concept=concept, severity=severity,
+        ))
+    return log
+
+
+def corpus_log(path: str) -> list[LabeledAttempt]:
+    log = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            log.append(LabeledAttempt(
+                item=DiagnosisInput(
+                    problem_type=ProblemType(row["problem_type"]),
+                    student_answer=row["student_answer"],
+                    expected_step=row.get("expected_step"),
+                    skill_id=row.get("skill_id"),
+                    language=Language(row["language"]) if row.get("language") else None,
+                ),
+                error_type=ErrorType(row["error_type"]),
+                affected_concept=row["affected_concept"],
+                severity=int(row["severity"]),
+            ))
+    return log
+
+
+def db_log() -> list[LabeledAttempt]:
+    from app.db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return ErrorDiagnosisService.load_examples(db)
+    finally:
+        db.close()
+
+
+async def replay(classifier: ErrorClassifier, log: list[LabeledAttempt], threshold: float,
+                 llm_latency: float) -> None:
+    sources: Counter = Counter()
+    agreements: Counter = Counter()
+    latencies: dict[str, list[float]] = {"rule": [], "model": [], "llm": []}
+    for example in log:
+        answer = json.dumps({"error_type": example.error_type.value,
+                             "affected_concept": example.affected_concept,
+                             "severity": example.severity, "error_details": ""})
+        service = ErrorDiagnosisService(
+            classifier=classifier, threshold=threshold,
+            provider=FakeProvider(text=answer, first_token_delay=llm_latency),
+        )
+        start = time.perf_counter()
+        diagnosis = await service.diagnose(example.item)
+        latencies[diagnosis.source].append(time.perf_counter() - start)
+        sources[diagnosis.source] += 1
+        agreements[diagnosis.source] += diagnosis.error_type == example.error_type
+
+    total = len(log)
+    avoided = sources["rule"] + sources["model"]
+    print(f"replayed attempts:   {total}")
+    print(f"LLM calls avoided:   {avoided} ({avoided / total:.1%})")
+    for source in ("rule", "model", "llm"):
+        if sources[source]:
+            print(f"  {source:<6} {sources[source]:>6} diagnoses, "
+                  f"{agreements[source] / sources[source]:.1%} match the stored error type")
+    for source, samples in latencies.items():
+        report(source, samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from-db", action="store_true",
+                        help="Use the stored diagnoses instead of a synthetic log")
+    parser.add_argument("--corpus", default=None, help="JSONL diagnosis log")
+    parser.add_argument("--attempts", type=int, default=3000, help="Synthetic log size")
+    parser.add_argument("--noise", type=float, default=0.15,
+                        help="Share of synthetic attempts with a random label")
+    parser.add_argument("--train-fraction", type=float, default=0.7,
+                        help="Oldest part of the log used for training")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Classifier confidence that skips the LLM "
+                             "(default: DIAGNOSIS_CONFIDENCE_THRESHOLD)")
+    parser.add_argument("--llm-latency", type=float, default=0.05,
+                        help="Seconds the fake LLM takes to answer")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.from_db:
+        log = db_log()
+    elif args.corpus:
+        log = corpus_log(args.corpus)
+    else:
+        log = synthetic_log(args.attempts, args.noise, args.seed)
+
+    split = int(len(log) * args.train_fraction)
+    train = [example for example in log[:split] if diagnose_with_rules(example.item) is None]
+    start = time.perf_counter()
+    classifier = ErrorClassifier.fit(train)
+    print(f"trained on {len(train)} diagnoses in {time.perf_counter() - start:.2f}s")
+
+    service = ErrorDiagnosisService(classifier=classifier, threshold=args.threshold)
+    asyncio.run(replay(classifier, log[split:], service.threshold, args.llm_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark of the math verifier over real student answers
+
+Replays math step attempts (from the database or a JSONL corpus) through
+the verifier, once in the worker process pool and once with checks in
+threads, and reports throughput, p50/p95/p99 latencies and timeouts.
+Pathological inputs can be mixed in to show that they no longer stall
+the workers.
+
+Corpus records (one JSON object per line):
+    {"problem_id": "...", "steps": ["2x = 4", "x = 2"], "answer": "x = 2",
+     "step_index": 1}
+
+Usage:
+    python scripts/benchmark_math_verifier.py --from-db --limit 5000
+    python scripts/benchmark_math_verifier.py --corpus answers.jsonl \
+        --concurrency 8 --adversarial 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import UUID, uuid4
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.benchmark_registration import report
+
+# Inputs that blow up in SymPy (huge integers, deep nesting, slow simplify)
+ADVERSARIAL_ANSWERS = [
+    "factorial(10^7)",
+    "2^(2^30)",
+    "(x + 1)^200 = 0",
+    "sin(sin(sin(sin(sin(sin(x)))))) + (x + y + z)^40",
+]
+
+
+def load_db_corpus(limit: int) -> list[dict]:
+    """Math step attempts joined with their problem's solution steps"""
+    from sqlalchemy import select
+
+    from app.db.base import SessionLocal
+    from app.models.problem import Problem, ProblemType
+    from app.models.session import Session, StepAttempt
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Problem.id, Problem.solution_steps, StepAttempt.student_answer,
+                   StepAttempt.step_number)
+            .join(Session, Session.problem_id == Problem.id)
+            .join(StepAttempt, StepAttempt.session_id == Session.id)
+            .where(Problem.type == ProblemType.MATH)
+            .limit(limit)
+        ).all()
+    finally:
+        db.close()
+
+    corpus = []
+    for problem_id, steps, answer, step_number in rows:
+        steps = [str(step) for step in steps or []]
+        if not steps:
+            continue
+        index = step_number - 1 if 1 <= step_number <= len(steps) else None
+        corpus.append({"problem_id": problem_id, "steps": steps, "answer": answer,
+                       "step_index": index})
+    return corpus
+
+
+def load_file_corpus(path: Path, limit: int) -> list[dict]:
+    """Corpus records from a JSONL file"""
+    corpus = []
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record["problem_id"] = UUID(record["problem_id"]) if record.get("problem_id") else uuid4()
+            record.setdefault("step_index", None)
+            corpus.append(record)
+            if len(corpus) >= limit:
+                break
+    return corpus
+
+
+def with_adversarial(corpus: list[dict], fraction: float, seed: int) -> list[dict]:
+    """Replace a fraction of the answers with pathological inputs"""
+    rng = random.Random(seed)
+    mixed = []
+    for record in corpus:
+        if rng.random() < fraction:
+            record = {**record, "answer": rng.choice(ADVERSARIAL_ANSWERS), "step_index": None}
+        mixed.append(record)
+    return mixed
+
+
+def run(label: str, corpus: list[dict], concurrency: int, pool) -> None:
+    """Verify the whole corpus with a fresh verifier and print a summary"""
+    from app.services.math_verifier import MathVerifier
+
+    verifier = MathVerifier(pool=pool, max_workers=concurrency)
+    latencies: list[float] = []
+    methods: Counter = Counter()
+
+    def verify_one(record: dict) -> None:
+        start = time.perf_counter()
+        result = verifier.verify(record["problem_id"], record["steps"], record["answer"],
+                                 record["step_index"])
+        latencies.append(time.perf_counter() - start)
+        methods[result.method] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(verify_one, corpus))
+    wall = time.perf_counter() - wall_start
+
+    print(f"{label}: {len(corpus)} answers in {wall:.2f}s ({len(corpus) / wall:.1f} answers/s)")
+    print(f"  methods: {dict(methods)}")
+    report(label, latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-db", action="store_true",
+                        help="Read math step attempts from the database")
+    source.add_argument("--corpus", type=Path, help="JSONL corpus file")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--adversarial", type=float, default=0.0,
+                        help="Fraction of answers replaced by pathological inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("threads", "pool", "both"), default="both")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services.math_pool import MathWorkerPool
+
+    corpus = load_db_corpus(args.limit) if args.from_db else load_file_corpus(args.corpus, args.limit)
+    if args.adversarial:
+        corpus = with_adversarial(corpus, args.adversarial, args.seed)
+    if not corpus:
+        print("Empty corpus")
+        return
+
+    if args.mode in ("pool", "both"):
+        pool = MathWorkerPool(workers=settings.MATH_POOL_WORKERS)
+        pool.start()
+        if not pool.wait_ready():
+            print("Math workers did not start")
+            return
+        try:
+            run(f"process pool ({pool.size} workers)", corpus, args.concurrency, pool)
+            print(f"  pool stats: {json.dumps(pool.stats(), default=str)}")
+        finally:
+            pool.shutdown()
+    if args.mode in ("threads", "both"):
+        # A pool that is never started keeps the verifier on threads
+        run("threads", corpus, args.concurrency, MathWorkerPool(workers=1))
+        # Timed-out checks keep running in their threads and would block exit
+        sys.stdout.flush()
+        os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Load benchmark for user registration under concurrency
+
+Fires concurrent registrations against a running server while probing
+/health, and reports p50/p95/p99 latencies for both. Run it once with
+PASSWORD_HASH_POOL_ENABLED=false and once with the pool enabled to compare.
+
+Usage:
+    python scripts/benchmark_registration.py --url http://localhost:8000 \
+        --requests 300 --concurrency 50
+    python scripts/benchmark_registration.py --local --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Get a percentile from a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, samples: list[float]) -> None:
+    """Print a latency summary in milliseconds"""
+    if not samples:
+        print(f"{name:<24} no samples")
+        return
+    print(
+        f"{name:<24} n={len(samples):<5} "
+        f"mean={statistics.mean(samples) * 1000:8.1f}ms "
+        f"p50={percentile(samples, 50) * 1000:8.1f}ms "
+        f"p95={percentile(samples, 95) * 1000:8.1f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.1f}ms"
+    )
+
+
+async def run_http(url: str, total: int, concurrency: int) -> None:
+    """Register users over HTTP while probing the health endpoint"""
+    import httpx
+
+    register_latencies: list[float] = []
+    health_latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        async def register_one() -> None:
+            async with semaphore:
+                payload = {
+                    "email": f"bench-{uuid.uuid4().hex[:12]}@example.com",
+                    "password": "password123",
+                    "role": "STUDENT",
+                }
+                start = time.perf_counter()
+                response = await client.post("/api/v1/auth/register", json=payload)
+                register_latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe_health() -> None:
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe_health())
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(register_one() for _ in range(total)))
+        wall = time.perf_counter() - wall_start
+        done.set()
+        await prober
+
+    print(f"Registrations: {total} in {wall:.2f}s ({total / wall:.1f} req/s)")
+    print(f"Status codes: {statuses}")
+    report("POST /auth/register", register_latencies)
+    report("GET /health", health_latencies)
+
+
+def run_local(total: int, concurrency: int) -> None:
+    """Compare inline hashing on a threadpool with the process pool"""
+    from app.core.password_hashing import PasswordHashingPool
+
+    for label, enabled in (("inline (threadpool)", False), ("process pool", True)):
+        pool = PasswordHashingPool(enabled=enabled, queue_depth=total)
+        pool.start()
+        pool.hash("warm-up-password1")
+
+        latencies: list[float] = []
+
+        def hash_one(_: int) -> None:
+            start = time.perf_counter()
+            pool.hash("password123")
+            latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(hash_one, range(total)))
+        wall = time.perf_counter() - wall_start
+        pool.shutdown()
+
+        print(f"{label}: {total} hashes in {wall:.2f}s ({total / wall:.1f} hash/s)")
+        report(label, latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--local", action="store_true",
+                        help="Benchmark hashing only, without a running server")
+    args = parser.parse_args()
+
+    if args.local:
+        run_local(args.requests, args.concurrency)
+    else:
+        asyncio.run(run_http(args.url, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Count SQL statements and round trips per registration
+
+Compares the previous check-then-insert ORM flow (SELECT, INSERT users,
+INSERT students, refresh SELECT) with the single INSERT ... ON CONFLICT
+... RETURNING statement used by AuthService.register_user.
+
+Requires a reachable PostgreSQL database (defaults to the test database).
+
+Usage:
+    python scripts/benchmark_registration_statements.py --users 200
+"""
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.password_hashing import PasswordHashingPool
+from app.db.base import Base
+from app.models.user import Student, User, UserRole
+from app.schemas.user import UserRegister
+from app.services import auth_service
+from app.services.auth_service import AuthService
+
+
+class StatementCounter:
+    """Count statements and commits issued through an engine"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+def legacy_register(db, user_data: UserRegister, hashed_password: str) -> User:
+    """Previous flow: duplicate check, ORM insert and refresh"""
+    existing = db.query(User).filter(User.email == user_data.email.lower()).first()
+    if existing:
+        raise ValueError("duplicate")
+    user = Student(
+        email=user_data.email.lower(),
+        password_hash=hashed_password,
+        role=UserRole.STUDENT,
+        total_problems_solved=0,
+        average_scaffold_level=0.0,
+        bkt_parameters={},
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def run(label: str, register, session_factory, counter: StatementCounter, users: int) -> None:
+    """Register users with one strategy and print per-registration costs"""
+    counter.reset()
+    start = time.perf_counter()
+    for _ in range(users):
+        user_data = UserRegister(
+            email=f"bench-{uuid.uuid4().hex[:12]}@example.com",
+            password="password123",
+            role=UserRole.STUDENT,
+        )
+        db = session_factory()
+        try:
+            register(db, user_data)
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - start
+
+    statements = counter.statements / users
+    round_trips = (counter.statements + counter.commits) / users
+    print(
+        f"{label:<28} statements/registration={statements:.2f} "
+        f"round trips (incl. COMMIT)={round_trips:.2f} "
+        f"avg={elapsed / users * 1000:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument(
+        "--database-url",
+        default=str(settings.DATABASE_URL).replace("/elenchos", "/elenchos_test"),
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counter = StatementCounter(engine)
+
+    # Hashing is not what is being measured here: hash once, inline
+    auth_service.password_hasher = PasswordHashingPool(enabled=False)
+    hashed_password = auth_service.password_hasher.hash("password123")
+    auth_service.password_hasher.hash = lambda password: hashed_password
+
+    try:
+        run("before: check-then-insert",
+            lambda db, data: legacy_register(db, data, hashed_password),
+            session_factory, counter, args.users)
+        run("after: INSERT ... RETURNING", AuthService.register_user,
+            session_factory, counter, args.users)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
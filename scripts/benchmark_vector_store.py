@@ -0,0 +1,125 @@
+"""Benchmark of vector store backends on per-teacher corpora
+
+Loads the same synthetic corpus (clustered unit vectors, one collection
+per teacher) into every backend and reports query latency and recall@k
+against exact float32 search. ChromaDB is included with --chroma and is
+queried at CHROMA_HOST:CHROMA_PORT through a throwaway collection.
+
+Usage:
+    python scripts/benchmark_vector_store.py --teachers 20 --chunks 2000
+    python scripts/benchmark_vector_store.py --chunks 500 --dimension 384 --chroma
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.benchmark_registration import report
+
+
+def build_corpus(teachers: int, chunks: int, dimension: int, seed: int):
+    """Clustered embeddings per teacher, like topics within a course's notes"""
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    for _ in range(teachers):
+        teacher_id = str(uuid4())
+        centers = rng.standard_normal((max(1, chunks // 50), dimension))
+        embeddings = (centers[rng.integers(len(centers), size=chunks)]
+                      + 0.5 * rng.standard_normal((chunks, dimension))).astype(np.float32)
+        corpus[teacher_id] = (
+            [f"{teacher_id}:page:block{i}:0" for i in range(chunks)],
+            embeddings,
+            [f"Bloque {i}" for i in range(chunks)],
+            [{"teacher_id": teacher_id, "page_id": "page"} for _ in range(chunks)],
+        )
+    return corpus
+
+
+def load(store, corpus, batch_size: int = 256) -> float:
+    """Upsert the corpus in ingestion-sized batches, returns seconds"""
+    start = time.perf_counter()
+    for ids, embeddings, documents, metadatas in corpus.values():
+        for offset in range(0, len(ids), batch_size):
+            end = offset + batch_size
+            store.upsert(ids[offset:end], embeddings[offset:end], documents[offset:end],
+                         metadatas[offset:end])
+    return time.perf_counter() - start
+
+
+def run(name: str, store, corpus, queries, top_k: int, truth) -> None:
+    """Query every teacher's collection and report latency and recall"""
+    print(f"{name}: loaded in {load(store, corpus):.2f}s")
+    latencies, hits = [], 0
+    for (teacher_id, query), expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = store.query(query, top_k, where={"teacher_id": teacher_id})
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {chunk.id for chunk in result})
+    report(f"  {name}", latencies)
+    print(f"  recall@{top_k}: {hits / (len(truth) * top_k):.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teachers", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per teacher")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chroma", action="store_true", help="Include the ChromaDB server")
+    args = parser.parse_args()
+
+    from app.services.rag.vector_store import (
+        ChromaVectorStore,
+        LocalVectorStore,
+        MemoryVectorStore,
+    )
+
+    corpus = build_corpus(args.teachers, args.chunks, args.dimension, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    teacher_ids = list(corpus)
+    queries = []
+    for _ in range(args.queries):
+        teacher_id = teacher_ids[rng.integers(len(teacher_ids))]
+        # Queries land near existing chunks, as hint queries land near the notes
+        anchor = corpus[teacher_id][1][rng.integers(args.chunks)]
+        queries.append((teacher_id, anchor + 0.5 * rng.standard_normal(args.dimension)))
+
+    exact = MemoryVectorStore()
+    load(exact, corpus)
+    truth = [{chunk.id for chunk in exact.query(query, args.top_k, {"teacher_id": teacher_id})}
+             for teacher_id, query in queries]
+
+    run("memory (exact)", exact, {}, queries, args.top_k, truth)
+    for dtype in ("float32", "float16", "int8"):
+        with tempfile.TemporaryDirectory() as root:
+            store = LocalVectorStore(root, dtype=dtype)
+            run(f"local {dtype}", store, corpus, queries, args.top_k, truth)
+            size = sum(path.stat().st_size for path in Path(root).rglob("vectors-*.npy"))
+            print(f"  on disk: {size / 1e6:.1f} MB of vectors")
+
+    if args.chroma:
+        import chromadb
+
+        from app.core.config import settings
+
+        client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        name = f"benchmark_{uuid4().hex[:8]}"
+        collection = client.create_collection(name, metadata={"hnsw:space": "cosine"})
+        try:
+            run("chroma (HNSW)", ChromaVectorStore(collection), corpus, queries, args.top_k,
+                truth)
+        finally:
+            client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
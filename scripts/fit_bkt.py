@@ -0,0 +1,54 @@
+"""Batch job: fit BKT parameters from historical step attempts
+
+Fits P(L0), P(T), P(S) and P(G) per skill (and optionally per student)
+and writes them to SkillState.bkt_params / Student.bkt_parameters.
+
+Usage:
+    python scripts/fit_bkt.py [--workers 8] [--per-student-min-attempts 30]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.logging import setup_logging, get_logger
+from app.db.base import SessionLocal
+from app.services.bkt_fitting_service import BKTFittingService
+
+logger = get_logger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per core)")
+    parser.add_argument("--per-student-min-attempts", type=int, default=None,
+                        help="Also fit students with at least this many attempts on a skill")
+    parser.add_argument("--batch-size", type=int, default=20000,
+                        help="Rows fetched per round trip from the server-side cursor")
+    args = parser.parse_args()
+
+    setup_logging()
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        results = BKTFittingService.fit_all(
+            db,
+            workers=args.workers,
+            per_student_min_attempts=args.per_student_min_attempts,
+            batch_size=args.batch_size,
+        )
+    finally:
+        db.close()
+
+    logger.info("BKT fitting finished", extra={"extra": {
+        "skills": len(results),
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Nightly recomputation of BKT mastery probabilities
+
+Replays every StepAttempt through the vectorized BKT engine and writes
+SkillState.domain_probability and status back in bulk.
+
+Usage:
+    python scripts/recompute_bkt.py [--batch-size 50000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.logging import setup_logging, get_logger
+from app.db.base import SessionLocal
+from app.services.bkt_service import BKTService
+
+logger = get_logger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=50000,
+                        help="Attempts fetched per round trip")
+    args = parser.parse_args()
+
+    setup_logging()
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        summary = BKTService.recompute(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    summary["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+    logger.info("BKT recompute summary", extra={"extra": summary})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Incremental Notion sync of teacher pages into the RAG vector store
+
+Runs the same sync as POST /api/v1/teacher/{id}/sync-notion, in the
+foreground. Suitable for a periodic job.
+
+Usage:
+    python scripts/sync_notion.py --teacher-id <uuid> [--force]
+    python scripts/sync_notion.py --all
+"""
+import argparse
+import sys
+from pathlib import Path
+from uuid import UUID
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select
+
+from app.core.logging import setup_logging, get_logger
+from app.db.base import SessionLocal
+from app.models.user import Teacher
+from app.services.rag import NotionSyncLock, NotionSyncService, embedding_service
+
+logger = get_logger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--teacher-id", type=UUID)
+    target.add_argument("--all", action="store_true",
+                        help="Every teacher with Notion pages configured")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-embed every chunk, not only changed ones")
+    args = parser.parse_args()
+
+    setup_logging()
+    db = SessionLocal()
+    try:
+        if args.all:
+            teacher_ids = [teacher.id for teacher in db.scalars(select(Teacher))
+                           if teacher.notion_page_ids]
+        else:
+            teacher_ids = [args.teacher_id]
+        for teacher_id in teacher_ids:
+            with NotionSyncLock(teacher_id) as acquired:
+                if not acquired:
+                    print(f"{teacher_id}: skipped, a sync is already running")
+                    continue
+                try:
+                    result = NotionSyncService.sync_teacher(db, teacher_id, force=args.force)
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Notion sync failed for {teacher_id}: {e}")
+                    continue
+            print(f"{teacher_id}: {result.model_dump_json()}")
+    finally:
+        db.close()
+        embedding_service.stop()
+
+
+if __name__ == "__main__":
+    main()
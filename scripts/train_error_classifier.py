@@ -0,0 +1,69 @@
+"""Batch job: train the local error classifier from stored diagnoses
+
+Fits the classifier that answers confident ErrorDiagnosis cases before the
+LLM (see app/services/error_diagnosis.py) and writes it to
+DIAGNOSIS_MODEL_PATH. Rule-diagnosable attempts are left out: the rules
+already handle them.
+
+Usage:
+    python scripts/train_error_classifier.py [--limit 200000] [--holdout 0.2]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.core.logging import setup_logging, get_logger
+from app.db.base import SessionLocal
+from app.services.error_diagnosis import ErrorClassifier, ErrorDiagnosisService, diagnose_with_rules
+
+logger = get_logger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Train on at most this many diagnoses (oldest first)")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Fraction of the most recent diagnoses kept for evaluation")
+    parser.add_argument("--output", default=settings.DIAGNOSIS_MODEL_PATH,
+                        help="Where to write the trained classifier")
+    args = parser.parse_args()
+
+    setup_logging()
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        examples = ErrorDiagnosisService.load_examples(db, limit=args.limit)
+    finally:
+        db.close()
+    examples = [example for example in examples if diagnose_with_rules(example.item) is None]
+
+    split = int(len(examples) * (1 - args.holdout))
+    classifier = ErrorClassifier.fit(examples[:split])
+    held_out = examples[split:]
+    confident = correct = 0
+    for example in held_out:
+        guess = classifier.predict(example.item)
+        if guess.confidence >= settings.DIAGNOSIS_CONFIDENCE_THRESHOLD:
+            confident += 1
+            correct += guess.error_type == example.error_type
+
+    # Evaluated on the holdout, shipped trained on everything
+    ErrorClassifier.fit(examples).save(args.output)
+    logger.info("Error classifier trained", extra={"extra": {
+        "examples": len(examples),
+        "holdout": len(held_out),
+        "holdout_confident": confident,
+        "holdout_confident_accuracy": round(correct / confident, 3) if confident else None,
+        "output": args.output,
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }})
+
+
+if __name__ == "__main__":
+    main()
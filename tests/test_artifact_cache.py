@@ -0,0 +1,88 @@
+"""Tests for the compiled artifact cache"""
+import os
+import shutil
+
+import pytest
+
+from app.core.metrics import metrics
+from app.models.problem import Language
+from app.services.sandbox import LocalBackend, SandboxPool
+from app.services.sandbox.artifact_cache import ArtifactCache, CachedBuild
+
+CPP_SOURCE = """
+#include <iostream>
+int main() { long n; std::cin >> n; std::cout << n * 3 << std::endl; }
+"""
+
+requires_gxx = pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(directory=str(tmp_path / "artifacts"), max_bytes=10_000, enabled=True)
+
+
+class TestArtifactCache:
+    """Test content addressing and LRU eviction"""
+
+    def test_key_depends_on_toolchain(self):
+        """Test a toolchain upgrade changes the key"""
+        first = ArtifactCache.key(Language.CPP, "g++ 13.2", CPP_SOURCE)
+
+        assert first == ArtifactCache.key(Language.CPP, "g++ 13.2", CPP_SOURCE)
+        assert first != ArtifactCache.key(Language.CPP, "g++ 14.1", CPP_SOURCE)
+        assert first != ArtifactCache.key(Language.JAVA, "g++ 13.2", CPP_SOURCE)
+
+    def test_round_trip(self, cache):
+        """Test artifacts and compile errors are stored and read back"""
+        cache.put("a" * 64, CachedBuild({"main": b"\x7fELF"}))
+        cache.put("b" * 64, CachedBuild({}, compile_error="error: expected ';'"))
+
+        assert cache.get("a" * 64).files == {"main": b"\x7fELF"}
+        assert cache.get("b" * 64).compile_error == "error: expected ';'"
+        assert cache.get("c" * 64) is None
+
+    def test_lru_eviction_by_size(self, cache):
+        """Test least recently used entries are evicted above max_bytes"""
+        for key in ("a", "b", "c"):
+            cache.put(key * 64, CachedBuild({"main": os.urandom(3000)}))
+        cache.get("a" * 64)  # a becomes most recently used
+
+        cache.put("d" * 64, CachedBuild({"main": os.urandom(3000)}))
+
+        assert cache.size_bytes <= 10_000
+        assert cache.get("b" * 64) is None
+        assert cache.get("a" * 64) is not None
+
+    def test_index_rebuilt_from_disk(self, cache):
+        """Test a new process sees entries written by a previous one"""
+        cache.put("a" * 64, CachedBuild({"main": b"binary"}))
+
+        reopened = ArtifactCache(directory=str(cache.directory), max_bytes=10_000, enabled=True)
+
+        assert reopened.get("a" * 64).files == {"main": b"binary"}
+
+
+@requires_gxx
+class TestCachedCompilation:
+    """Test sandbox runs reuse cached builds"""
+
+    def test_resubmission_skips_compile(self, tmp_path):
+        """Test an identical resubmission is served from the cache"""
+        cache = ArtifactCache(directory=str(tmp_path / "artifacts"), enabled=True)
+        pool = SandboxPool(backend=LocalBackend(), sizes={Language.CPP: 1},
+                           acquire_timeout=10, health_check_interval=60, enabled=True, cache=cache)
+        pool.start()
+        try:
+            hits = metrics.counter("artifact_cache.hits")
+            first = pool.execute(Language.CPP, CPP_SOURCE, stdin="5", timeout=5)
+            second = pool.execute(Language.CPP, CPP_SOURCE, stdin="7", timeout=5)
+            broken = pool.execute(Language.CPP, "int main( {", timeout=5)
+            broken_again = pool.execute(Language.CPP, "int main( {", timeout=5)
+        finally:
+            pool.stop()
+
+        assert first.stdout.strip() == "15"
+        assert second.stdout.strip() == "21"
+        assert broken.compile_error and broken_again.compile_error == broken.compile_error
+        assert metrics.counter("artifact_cache.hits") == hits + 2
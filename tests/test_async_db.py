@@ -0,0 +1,45 @@
+"""Tests for the async database configuration"""
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings
+from app.db.base import get_async_engine, get_async_sessionmaker
+
+
+class TestAsyncDatabaseSettings:
+    """Test the database driver switch"""
+
+    def test_default_driver_is_sync(self):
+        """Test psycopg2 remains the default driver"""
+        settings = Settings(DATABASE_URL="postgresql://u:p@db:5432/elenchos")
+
+        assert settings.DATABASE_DRIVER == "psycopg2"
+        assert settings.USE_ASYNC_DATABASE is False
+
+    def test_async_url_uses_asyncpg(self):
+        """Test the async URL keeps credentials, host and database"""
+        settings = Settings(
+            DATABASE_URL="postgresql://u:p@db:5432/elenchos",
+            DATABASE_DRIVER="asyncpg",
+        )
+
+        assert settings.USE_ASYNC_DATABASE is True
+        assert settings.ASYNC_DATABASE_URL == "postgresql+asyncpg://u:p@db:5432/elenchos"
+
+    def test_invalid_driver_rejected(self):
+        """Test unknown drivers fail validation"""
+        with pytest.raises(ValidationError):
+            Settings(DATABASE_DRIVER="mysql")
+
+
+def test_async_sessionmaker_builds_async_sessions():
+    """Test the async session factory is bound to the asyncpg engine"""
+    pytest.importorskip("asyncpg")
+
+    engine = get_async_engine()
+    factory = get_async_sessionmaker()
+
+    assert engine.dialect.driver == "asyncpg"
+    assert factory.class_ is AsyncSession
+    assert factory.kw["expire_on_commit"] is False
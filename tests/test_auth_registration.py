@@ -349,3 +349,35 @@ class TestUserRegistration:
         assert teacher.notion_page_ids == []
         assert teacher.alert_preferences == {}
         assert teacher.notion_token is None
+
+
+class TestRegistrationStatement:
+    """Test the single-statement registration query"""
+
+    def _compile(self, role):
+        from sqlalchemy.dialects import postgresql
+        from app.schemas.user import UserRegister
+        from app.services.auth_service import AuthService
+
+        user_data = UserRegister(
+            email="Student@Example.com", password="password123", role=role)
+        statement = AuthService.build_register_statement(user_data, "hashed")
+        return statement.compile(dialect=postgresql.dialect())
+
+    def test_student_statement_inserts_both_tables(self):
+        """Test students are registered with one upsert-style statement"""
+        compiled = self._compile(UserRole.STUDENT)
+        sql = str(compiled)
+
+        assert "INSERT INTO users" in sql
+        assert "ON CONFLICT (email) DO NOTHING" in sql
+        assert "INSERT INTO students" in sql
+        assert "RETURNING" in sql
+        assert "student@example.com" in compiled.params.values()
+
+    def test_teacher_statement_inserts_both_tables(self):
+        """Test teachers are registered with one upsert-style statement"""
+        sql = str(self._compile(UserRole.TEACHER))
+
+        assert "INSERT INTO teachers" in sql
+        assert "INSERT INTO students" not in sql
@@ -0,0 +1,123 @@
+"""Tests for the vectorized BKT engine"""
+import numpy as np
+import pytest
+from hypothesis import given, settings as hypothesis_settings, strategies as st
+
+from app.core.config import settings
+from app.models.skill import SkillStatus
+from app.services.bkt_service import (
+    BKTEngine,
+    bkt_update,
+    derive_status,
+    resolve_params,
+)
+
+
+def scalar_replay(prior, observations, p_transit, p_slip, p_guess):
+    """Reference per-row loop the vectorized engine must match"""
+    p_known = prior
+    for correct in observations:
+        p_known = bkt_update(p_known, correct, p_transit, p_slip, p_guess)
+    return p_known
+
+
+class TestBKTUpdate:
+    """Test the single-step BKT formula"""
+
+    def test_correct_answer_matches_formula(self):
+        """Test L(t+1) after a correct answer"""
+        posterior = 0.1 * 0.9 / (0.1 * 0.9 + 0.9 * 0.2)
+        expected = posterior + (1 - posterior) * 0.3
+
+        assert bkt_update(0.1, True, 0.3, 0.1, 0.2) == pytest.approx(expected)
+
+    def test_incorrect_answer_lowers_posterior(self):
+        """Test an incorrect answer yields a lower estimate than a correct one"""
+        assert bkt_update(0.5, False, 0.3, 0.1, 0.2) < bkt_update(0.5, True, 0.3, 0.1, 0.2)
+
+    def test_resolve_params_honours_overrides(self):
+        """Test per-skill overrides replace only the given parameters"""
+        params = resolve_params({"P_T": 0.5, "unknown": 1.0})
+
+        assert params["P_T"] == 0.5
+        assert params["P_S"] == settings.BKT_P_S
+        assert "unknown" not in params
+
+
+class TestBKTEngine:
+    """Test batch application across many pairs"""
+
+    def test_interleaved_pairs_match_scalar_replay(self):
+        """Test interleaved observations are applied per pair in order"""
+        prior = np.array([0.1, 0.2, 0.3])
+        p_transit = np.array([0.3, 0.1, 0.2])
+        p_slip = np.array([0.1, 0.2, 0.1])
+        p_guess = np.array([0.2, 0.2, 0.3])
+        pair_index = np.array([0, 1, 0, 2, 0, 1])
+        correct = np.array([True, False, False, True, True, True])
+
+        result = BKTEngine.apply_observations(
+            prior, pair_index, correct, p_transit, p_slip, p_guess)
+
+        for pair in range(3):
+            observations = correct[pair_index == pair]
+            expected = scalar_replay(prior[pair], observations,
+                                     p_transit[pair], p_slip[pair], p_guess[pair])
+            assert result[pair] == pytest.approx(expected)
+
+    def test_pairs_without_observations_keep_prior(self):
+        """Test untouched pairs are returned unchanged"""
+        prior = np.array([0.1, 0.4])
+        params = np.array([0.3, 0.3])
+
+        result = BKTEngine.apply_observations(
+            prior, np.array([0]), np.array([True]), params, params * 0 + 0.1, params * 0 + 0.2)
+
+        assert result[1] == 0.4
+        assert prior[0] == 0.1  # input is not modified
+
+    def test_params_arrays_per_pair(self):
+        """Test overrides are resolved per pair"""
+        params = BKTEngine.params_arrays([{}, {"P_L0": 0.5}])
+
+        assert params["P_L0"].tolist() == [settings.BKT_P_L0, 0.5]
+
+    @hypothesis_settings(max_examples=100, deadline=None)
+    @given(
+        st.lists(st.tuples(st.integers(min_value=0, max_value=4), st.booleans()),
+                 min_size=1, max_size=60),
+    )
+    def test_property_29_vectorized_equals_sequential(self, observations):
+        """
+        Feature: elenchos, Property 29: Actualización BKT tras Interacción
+        """
+        pair_index = np.array([pair for pair, _ in observations])
+        correct = np.array([outcome for _, outcome in observations])
+        prior = np.full(5, settings.BKT_P_L0)
+        p_transit = np.full(5, settings.BKT_P_T)
+        p_slip = np.full(5, settings.BKT_P_S)
+        p_guess = np.full(5, settings.BKT_P_G)
+
+        result = BKTEngine.apply_observations(
+            prior, pair_index, correct, p_transit, p_slip, p_guess)
+
+        for pair in range(5):
+            expected = scalar_replay(settings.BKT_P_L0, correct[pair_index == pair],
+                                     settings.BKT_P_T, settings.BKT_P_S, settings.BKT_P_G)
+            assert result[pair] == pytest.approx(expected)
+            assert 0.0 <= result[pair] <= 1.0
+
+
+class TestDeriveStatus:
+    """Test status derivation from mastery probability"""
+
+    def test_above_threshold_is_mastered(self):
+        """Test probabilities at the threshold are MASTERED"""
+        assert derive_status(settings.BKT_MASTERY_THRESHOLD, SkillStatus.AVAILABLE, True) \
+            == SkillStatus.MASTERED
+
+    def test_practised_skill_in_progress(self):
+        """Test attempted skills below the threshold are IN_PROGRESS"""
+        assert derive_status(0.3, SkillStatus.AVAILABLE, True) == SkillStatus.IN_PROGRESS
+        assert derive_status(0.3, SkillStatus.LOCKED, True) == SkillStatus.LOCKED
+        assert derive_status(0.3, SkillStatus.AVAILABLE, False) == SkillStatus.AVAILABLE
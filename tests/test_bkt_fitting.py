@@ -0,0 +1,79 @@
+"""Tests for offline BKT parameter fitting"""
+import numpy as np
+import pytest
+
+from app.services.bkt_fitting_service import (
+    COARSE_GRID,
+    _grid,
+    fit_sequences,
+    fit_skill,
+    log_likelihood,
+)
+from app.services.bkt_service import PARAM_KEYS, bkt_update
+
+
+def simulate(params, students, attempts, seed=0):
+    """Generate attempts from a known BKT model"""
+    rng = np.random.default_rng(seed)
+    codes, outcomes = [], []
+    for student in range(students):
+        known = rng.random() < params["P_L0"]
+        for _ in range(attempts):
+            p_correct = 1 - params["P_S"] if known else params["P_G"]
+            outcomes.append(rng.random() < p_correct)
+            codes.append(student)
+            if not known and rng.random() < params["P_T"]:
+                known = True
+    return np.array(codes), np.array(outcomes)
+
+
+class TestBKTFitting:
+    """Test grid-search fitting"""
+
+    def test_log_likelihood_matches_sequential(self):
+        """Test the vectorized likelihood against a per-attempt loop"""
+        grid = {"P_L0": np.array([0.2]), "P_T": np.array([0.3]),
+                "P_S": np.array([0.1]), "P_G": np.array([0.2])}
+        codes = np.array([0, 1, 0, 0, 1])
+        outcomes = np.array([True, False, False, True, True])
+
+        expected = 0.0
+        for student in (0, 1):
+            p_known = 0.2
+            for correct in outcomes[codes == student]:
+                p_correct = p_known * 0.9 + (1 - p_known) * 0.2
+                expected += np.log(p_correct if correct else 1 - p_correct)
+                p_known = bkt_update(p_known, correct, 0.3, 0.1, 0.2)
+
+        assert log_likelihood(codes, outcomes, grid)[0] == pytest.approx(expected, rel=1e-6)
+
+    def test_recovers_known_parameters(self):
+        """Test parameters used to simulate the data are recovered"""
+        true_params = {"P_L0": 0.2, "P_T": 0.15, "P_S": 0.1, "P_G": 0.25}
+        codes, outcomes = simulate(true_params, students=400, attempts=15)
+
+        fitted = fit_sequences(codes, outcomes)
+
+        assert set(fitted) == set(PARAM_KEYS)
+        for key in PARAM_KEYS:
+            assert fitted[key] == pytest.approx(true_params[key], abs=0.08)
+
+    def test_fit_skill_per_student(self):
+        """Test students with enough attempts get individual parameters"""
+        codes, outcomes = simulate(
+            {"P_L0": 0.3, "P_T": 0.2, "P_S": 0.1, "P_G": 0.2}, students=3, attempts=10)
+        codes[codes == 2] = 1  # student 1 now has 20 attempts
+
+        skill_id, skill_params, student_params = fit_skill(
+            "algebra-1", codes, outcomes, per_student_min_attempts=15)
+
+        assert skill_id == "algebra-1"
+        assert set(student_params) == {1}
+        assert 0 < student_params[1]["P_T"] < 1
+
+    def test_grid_respects_identifiability(self):
+        """Test slip and guess stay below 0.5"""
+        grid = _grid(COARSE_GRID)
+
+        assert grid["P_S"].max() < 0.5
+        assert grid["P_G"].max() < 0.5
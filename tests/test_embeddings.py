@@ -0,0 +1,155 @@
+"""Tests for the batched, cached embedding service"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.rag import EmbeddingService, EmbeddingUnavailable
+
+
+class RecordingEncoder:
+    """Deterministic encoder that records the batches it receives"""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        self.batches.append(list(texts))
+        rows = []
+        for text in texts:
+            seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).normal(size=8)
+            rows.append(vector / np.linalg.norm(vector))
+        return np.array(rows, dtype=np.float32)
+
+    @property
+    def encoded(self) -> list[str]:
+        return [text for batch in self.batches for text in batch]
+
+
+@pytest.fixture
+def encoder():
+    return RecordingEncoder()
+
+
+@pytest.fixture
+def service(encoder):
+    service = EmbeddingService(encoder=encoder, batch_wait_ms=50, disk_cache_dir="")
+    yield service
+    service.stop()
+
+
+class TestEmbeddingService:
+    """Test micro-batching and caching"""
+
+    def test_embeds_in_input_order(self, service, encoder):
+        """Test rows follow the input order and duplicates are encoded once"""
+        vectors = service.embed(["derivada", "integral", "derivada"])
+
+        assert vectors.shape == (3, 8)
+        assert np.array_equal(vectors[0], vectors[2])
+        assert sorted(encoder.encoded) == ["derivada", "integral"]
+
+    def test_concurrent_requests_share_batches(self, service, encoder):
+        """Test concurrent callers are encoded together"""
+        texts = [f"pregunta {i}" for i in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(service.embed_one, texts))
+
+        assert sorted(encoder.encoded) == sorted(texts)
+        assert len(encoder.batches) < len(texts)
+
+    def test_repeated_texts_hit_memory_cache(self, service, encoder):
+        """Test a cached text is never re-encoded"""
+        first = service.embed_one("¿Qué es una derivada?")
+        second = service.embed_one("¿Qué es una derivada?")
+
+        assert np.array_equal(first, second)
+        assert len(encoder.batches) == 1
+
+    def test_model_version_is_part_of_the_key(self, encoder):
+        """Test vectors of another model version are not reused"""
+        old = EmbeddingService(encoder=encoder, model_version="1", disk_cache_dir="")
+        new = EmbeddingService(encoder=encoder, model_version="2", disk_cache_dir="")
+
+        assert old.key("límite") != new.key("límite")
+
+    def test_disk_tier_survives_restart(self, encoder, tmp_path):
+        """Test a new process reuses embeddings from the disk tier"""
+        first = EmbeddingService(encoder=encoder, disk_cache_dir=str(tmp_path))
+        vector = first.embed_one("teorema de Pitágoras")
+        first.stop()
+
+        restarted_encoder = RecordingEncoder()
+        restarted = EmbeddingService(encoder=restarted_encoder, disk_cache_dir=str(tmp_path))
+        try:
+            assert np.array_equal(restarted.embed_one("teorema de Pitágoras"), vector)
+            assert restarted_encoder.batches == []
+        finally:
+            restarted.stop()
+
+    def test_model_failure_is_unavailable(self):
+        """Test encoder errors surface as EmbeddingUnavailable"""
+        def failing(texts):
+            raise RuntimeError("model not found")
+
+        service = EmbeddingService(encoder=failing, disk_cache_dir="")
+        try:
+            with pytest.raises(EmbeddingUnavailable):
+                service.embed_one("x")
+        finally:
+            service.stop()
+
+    def test_start_loads_the_model(self, encoder, monkeypatch):
+        """Test the model is loaded at startup, before any text is embedded"""
+        loads = []
+        monkeypatch.setattr("app.services.rag.embeddings._sentence_transformer_encoder",
+                            lambda model_name: loads.append(model_name) or encoder)
+        service = EmbeddingService(model_name="modelo", disk_cache_dir="")
+        try:
+            service.start()
+            assert loads == ["modelo"]
+            assert encoder.batches == []
+
+            service.embed_one("x")
+            assert loads == ["modelo"]
+        finally:
+            service.stop()
+
+    def test_failed_load_is_retried_by_batches(self, encoder, monkeypatch):
+        """Test a model that fails to load at startup is loaded on a later batch"""
+        loads = []
+
+        def load(model_name):
+            loads.append(model_name)
+            if len(loads) == 1:
+                raise OSError("model not downloaded")
+            return encoder
+
+        monkeypatch.setattr("app.services.rag.embeddings._sentence_transformer_encoder", load)
+        service = EmbeddingService(model_name="modelo", disk_cache_dir="")
+        try:
+            service.start()
+            assert service.embed_one("x").shape == (8,)
+            assert len(loads) == 2
+        finally:
+            service.stop()
+
+    def test_full_queue_is_rejected(self):
+        """Test requests fail fast when the queue is full"""
+        release = threading.Event()
+
+        def blocking(texts):
+            release.wait(5)
+            return np.ones((len(texts), 2), dtype=np.float32)
+
+        service = EmbeddingService(encoder=blocking, queue_depth=1, batch_size=1,
+                                   disk_cache_dir="")
+        try:
+            with pytest.raises(EmbeddingUnavailable):
+                service.embed([f"texto {i}" for i in range(4)], timeout=1)
+        finally:
+            release.set()
+            service.stop()
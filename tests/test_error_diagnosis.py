@@ -0,0 +1,163 @@
+"""Tests for the error diagnosis cascade (rules, local classifier, LLM)"""
+import asyncio
+import json
+
+import pytest
+
+from app.models.problem import Language, ProblemType
+from app.models.session import ErrorType
+from app.services.error_diagnosis import (
+    DiagnosisInput,
+    ErrorClassifier,
+    ErrorDiagnosisService,
+    LabeledAttempt,
+    diagnose_with_rules,
+)
+from app.services.llm import FakeProvider, LLMUnavailable
+
+LLM_ANSWER = json.dumps({"error_type": "CONCEPT", "affected_concept": "igualdad",
+                         "severity": 3, "error_details": "Suma en un solo lado"})
+
+
+def math(answer: str, expected: str = None, skill: str = "ecuaciones") -> DiagnosisInput:
+    return DiagnosisInput(problem_type=ProblemType.MATH, student_answer=answer,
+                          expected_step=expected, skill_id=skill)
+
+
+def labeled(answer: str, expected: str, skill: str, error_type: ErrorType,
+            concept: str, severity: int) -> LabeledAttempt:
+    return LabeledAttempt(math(answer, expected, skill), error_type, concept, severity)
+
+
+@pytest.fixture(scope="module")
+def classifier() -> ErrorClassifier:
+    examples = []
+    for n in range(2, 40):
+        examples.append(labeled(f"x = {n}*3", f"x = {n}/3", "ecuaciones", ErrorType.PROCEDURE,
+                                "transposición de términos", 2))
+        examples.append(labeled(f"x**{n + 2}", f"x**{2 * n}", "potencias", ErrorType.CONCEPT,
+                                "producto de potencias", 4))
+    return ErrorClassifier.fit(examples)
+
+
+class TestRules:
+    """Test diagnoses that need no model"""
+
+    def test_unparsable_math_is_syntax(self):
+        """Test an answer SymPy cannot parse is a certain SYNTAX error"""
+        diagnosis = diagnose_with_rules(math("2x + = 3"))
+        assert diagnosis.error_type == ErrorType.SYNTAX
+        assert diagnosis.source == "rule"
+        assert diagnosis.confidence == 1.0
+
+    def test_expression_instead_of_equation_is_procedure(self):
+        """Test dropping one side of the equation is a PROCEDURE error"""
+        diagnosis = diagnose_with_rules(math("2*x", expected="2*x = 4"))
+        assert diagnosis.error_type == ErrorType.PROCEDURE
+        assert diagnosis.error_details == "Se esperaba una ecuación"
+
+    def test_well_formed_wrong_step_is_not_decided(self):
+        """Test a parsable wrong step is left to the classifier"""
+        assert diagnose_with_rules(math("x = 3", expected="x = 2")) is None
+
+    def test_python_fragments(self):
+        """Test block headers and returns are valid steps, a missing colon is not"""
+        def code(answer):
+            return DiagnosisInput(problem_type=ProblemType.CODE, student_answer=answer,
+                                  language=Language.PYTHON)
+
+        assert diagnose_with_rules(code("for i in range(10):")) is None
+        assert diagnose_with_rules(code("return total")) is None
+        diagnosis = diagnose_with_rules(code("if x == 3"))
+        assert diagnosis.error_type == ErrorType.SYNTAX
+        assert diagnosis.affected_concept == "sintaxis de Python"
+
+    def test_compile_error_is_syntax(self):
+        """Test compiler output of CPP/JAVA submissions decides SYNTAX"""
+        diagnosis = diagnose_with_rules(DiagnosisInput(
+            problem_type=ProblemType.CODE, student_answer="int main() { return 0 }",
+            language=Language.CPP, compile_error="main.cpp:1:25: error: expected ';'\n"))
+        assert diagnosis.error_type == ErrorType.SYNTAX
+        assert diagnosis.error_details == "main.cpp:1:25: error: expected ';'"
+
+
+class TestErrorClassifier:
+    """Test the local classifier"""
+
+    def test_predicts_type_concept_and_severity(self, classifier):
+        """Test a familiar mistake gets its learned concept and severity"""
+        diagnosis = classifier.predict(math("x**9", "x**14", "potencias"))
+        assert diagnosis.error_type == ErrorType.CONCEPT
+        assert diagnosis.affected_concept == "producto de potencias"
+        assert diagnosis.severity == 4
+        assert diagnosis.source == "model"
+
+    def test_needs_two_error_types(self):
+        """Test training on a single label is rejected"""
+        with pytest.raises(ValueError):
+            ErrorClassifier.fit([labeled("x = 3", "x = 2", "ecuaciones", ErrorType.PROCEDURE,
+                                         "despejar", 2)] * 5)
+
+    def test_save_and_load(self, classifier, tmp_path):
+        """Test a saved classifier predicts the same after loading"""
+        path = str(tmp_path / "models" / "classifier.joblib")
+        classifier.save(path)
+        loaded = ErrorClassifier.load(path)
+        item = math("x = 7*3", "x = 7/3")
+        assert loaded.predict(item) == classifier.predict(item)
+        assert ErrorClassifier.load(str(tmp_path / "missing.joblib")) is None
+
+
+class TestErrorDiagnosisService:
+    """Test the cascade only reaches the LLM when the local stages are unsure"""
+
+    def test_rule_skips_classifier_and_llm(self, classifier):
+        """Test a rule diagnosis makes no LLM call"""
+        provider = FakeProvider(text=LLM_ANSWER)
+        service = ErrorDiagnosisService(classifier=classifier, provider=provider)
+        diagnosis = asyncio.run(service.diagnose(math("2x + = 3")))
+        assert diagnosis.source == "rule"
+        assert provider.calls == 0
+
+    def test_confident_model_skips_llm(self, classifier):
+        """Test a prediction above the threshold is accepted"""
+        provider = FakeProvider(text=LLM_ANSWER)
+        service = ErrorDiagnosisService(classifier=classifier, provider=provider, threshold=0.6)
+        diagnosis = asyncio.run(service.diagnose(math("x = 5*3", "x = 5/3")))
+        assert diagnosis.source == "model"
+        assert diagnosis.error_type == ErrorType.PROCEDURE
+        assert provider.calls == 0
+
+    def test_unsure_model_asks_llm(self, classifier):
+        """Test a prediction below the threshold goes to the LLM"""
+        provider = FakeProvider(text=f"Diagnóstico: {LLM_ANSWER}")
+        service = ErrorDiagnosisService(classifier=classifier, provider=provider,
+                                        threshold=0.999)
+        diagnosis = asyncio.run(service.diagnose(math("y = 1", "y = 2")))
+        assert diagnosis.source == "llm"
+        assert diagnosis.error_type == ErrorType.CONCEPT
+        assert diagnosis.error_details == "Suma en un solo lado"
+        assert provider.calls == 1
+
+    def test_without_classifier_asks_llm(self, tmp_path):
+        """Test an untrained deployment sends every non-rule case to the LLM"""
+        provider = FakeProvider(text=LLM_ANSWER)
+        service = ErrorDiagnosisService(provider=provider,
+                                        model_path=str(tmp_path / "missing.joblib"))
+        assert asyncio.run(service.diagnose(math("x = 3", "x = 2"))).source == "llm"
+
+    def test_llm_failure_falls_back_to_model_guess(self, classifier):
+        """Test the classifier's guess is kept when the LLM is unavailable"""
+        provider = FakeProvider(error=LLMUnavailable("down"))
+        service = ErrorDiagnosisService(classifier=classifier, provider=provider,
+                                        threshold=0.999)
+        diagnosis = asyncio.run(service.diagnose(math("x = 5*3", "x = 5/3")))
+        assert diagnosis.source == "model"
+        assert diagnosis.error_type == ErrorType.PROCEDURE
+
+    def test_invalid_llm_answer_without_guess_raises(self, tmp_path):
+        """Test an unusable LLM answer with no classifier surfaces LLMUnavailable"""
+        service = ErrorDiagnosisService(provider=FakeProvider(text="No sé"),
+                                        model_path=str(tmp_path / "missing.joblib"))
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(service.diagnose(math("x = 3", "x = 2")))
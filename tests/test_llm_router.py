@@ -0,0 +1,136 @@
+"""Tests for the LLM provider router"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm import FakeProvider, LLMRequest, LLMRouter, LLMUnavailable, TokenBucket
+
+REQUEST = LLMRequest(system="s", prompt="p")
+
+
+def make_router(*providers, **options) -> LLMRouter:
+    options.setdefault("hedge_delay", 0.05)
+    options.setdefault("timeout_seconds", 2.0)
+    options.setdefault("rate_per_second", 100.0)
+    options.setdefault("burst", 100)
+    return LLMRouter(providers, **options)
+
+
+async def consume(router: LLMRouter):
+    """Full text, serving provider name and elapsed seconds"""
+    start = time.perf_counter()
+    stream = router.stream(REQUEST)
+    text = "".join([fragment async for fragment in stream])
+    return text, stream.provider.name, time.perf_counter() - start
+
+
+class TestLLMRouter:
+    """Test hedging, failover and limits"""
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test a provider answering within the hedge delay serves alone"""
+        primary, secondary = FakeProvider(name="a"), FakeProvider(name="b")
+
+        text, served_by, _ = asyncio.run(consume(make_router(primary, secondary)))
+
+        assert (text, served_by) == (FakeProvider.DEFAULT_TEXT, "a")
+        assert secondary.calls == 0
+
+    def test_slow_primary_is_hedged(self):
+        """Test a second request after the hedge delay wins over a stalled provider"""
+        primary = FakeProvider(name="a", first_token_delay=1.0)
+        secondary = FakeProvider(name="b")
+        router = make_router(primary, secondary)
+
+        _, served_by, elapsed = asyncio.run(consume(router))
+
+        assert served_by == "b"
+        assert elapsed < 0.5
+        assert not router.slots[0].semaphore.locked()
+
+    def test_failure_fails_over_without_waiting(self):
+        """Test a provider error moves to the next provider immediately"""
+        primary = FakeProvider(name="a", error=LLMUnavailable("HTTP 500"))
+        secondary = FakeProvider(name="b")
+
+        _, served_by, elapsed = asyncio.run(consume(make_router(primary, secondary,
+                                                                hedge_delay=1.0)))
+
+        assert served_by == "b"
+        assert elapsed < 0.5
+
+    def test_every_provider_failing_is_unavailable(self):
+        """Test the request fails when no provider can answer"""
+        router = make_router(FakeProvider(name="a", error=LLMUnavailable("down")),
+                             FakeProvider(name="b", error=LLMUnavailable("down")))
+
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(consume(router))
+
+    def test_timeout(self):
+        """Test nothing waits past the router timeout"""
+        router = make_router(FakeProvider(name="a", first_token_delay=5),
+                             FakeProvider(name="b", first_token_delay=5), timeout_seconds=0.2)
+        start = time.perf_counter()
+
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(consume(router))
+        assert time.perf_counter() - start < 1.0
+
+    def test_rate_limited_provider_is_skipped(self):
+        """Test an empty token bucket sends the request to the next provider"""
+        router = make_router(FakeProvider(name="a"), FakeProvider(name="b"),
+                             rate_per_second=0.01, burst=1)
+
+        async def scenario():
+            return [(await consume(router))[1] for _ in range(2)]
+
+        assert asyncio.run(scenario()) == ["a", "b"]
+
+    def test_all_rate_limited_reports_retry_after(self):
+        """Test exhausted buckets fail fast with the time until the next token"""
+        router = make_router(FakeProvider(name="a"), rate_per_second=0.1, burst=1)
+        asyncio.run(consume(router))
+
+        with pytest.raises(LLMUnavailable) as excinfo:
+            asyncio.run(consume(router))
+        assert 5 <= excinfo.value.retry_after <= 10
+
+    def test_concurrency_limit_hedges_queued_requests(self):
+        """Test a request waiting for a saturated provider is hedged elsewhere"""
+        primary = FakeProvider(name="a", token_delay=0.05)
+        router = make_router(primary, FakeProvider(name="b"), max_concurrency=1)
+
+        async def scenario():
+            first = asyncio.create_task(consume(router))
+            await asyncio.sleep(0.01)
+            second = await consume(router)
+            return (await first)[1], second[1]
+
+        assert asyncio.run(scenario()) == ("a", "b")
+        assert not router.slots[0].semaphore.locked()
+
+    def test_hedge_delay_follows_first_token_percentile(self):
+        """Test the hedge delay becomes the provider's p95 with enough samples"""
+        router = make_router(FakeProvider(name="a"), hedge_delay=2.0, hedge_min_samples=10)
+        slot = router.slots[0]
+        assert router.hedge_delay(slot) == 2.0
+
+        for i in range(101):
+            slot.first_token.observe(i / 100)
+
+        assert router.hedge_delay(slot) == pytest.approx(0.95, abs=0.01)
+
+
+class TestTokenBucket:
+    """Test the requests-per-second limit"""
+
+    def test_burst_then_refill(self):
+        """Test the bucket allows a burst and refills over time"""
+        bucket = TokenBucket(rate_per_second=50, burst=2)
+
+        assert bucket.try_acquire() and bucket.try_acquire()
+        assert not bucket.try_acquire()
+        time.sleep(0.05)
+        assert bucket.try_acquire()
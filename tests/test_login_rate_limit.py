@@ -0,0 +1,127 @@
+"""Tests for the sliding-window login rate limiter"""
+import time
+
+import pytest
+import redis
+
+from app.core.config import settings
+from app.core.rate_limit import (
+    LoginRateLimited,
+    LoginRateLimiter,
+    MemorySlidingWindow,
+    RedisSlidingWindow,
+)
+from app.services import auth_service
+from app.services.auth_service import AuthService
+
+
+@pytest.fixture
+def limiter() -> LoginRateLimiter:
+    return LoginRateLimiter(backend=MemorySlidingWindow(), attempts=3, ip_attempts=5,
+                            window_seconds=0.3)
+
+
+@pytest.fixture
+def redis_client():
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=15,
+                         socket_connect_timeout=0.3)
+    try:
+        client.ping()
+    except redis.RedisError:
+        pytest.skip("Redis not reachable")
+    client.flushdb()
+    yield client
+    client.flushdb()
+
+
+class TestLoginRateLimiter:
+    """Test per-email and per-address limits"""
+
+    def test_rejects_after_limit(self, limiter):
+        """Test the attempt after the limit is rejected with a retry delay"""
+        for _ in range(3):
+            limiter.check("alumno@example.com", "10.0.0.1")
+        with pytest.raises(LoginRateLimited) as exc:
+            limiter.check("alumno@example.com", "10.0.0.1")
+        assert exc.value.retry_after == 1
+
+    def test_email_is_case_insensitive(self, limiter):
+        """Test the same account in different case shares its window"""
+        for email in ("alumno@example.com", "Alumno@Example.com", " ALUMNO@example.com"):
+            limiter.check(email)
+        with pytest.raises(LoginRateLimited):
+            limiter.check("alumno@example.com")
+
+    def test_window_slides(self, limiter):
+        """Test attempts are allowed again once the oldest leave the window"""
+        for _ in range(3):
+            limiter.check("alumno@example.com")
+        time.sleep(0.35)
+        limiter.check("alumno@example.com")
+
+    def test_address_limit_spans_emails(self, limiter):
+        """Test one address trying many accounts is limited"""
+        for i in range(5):
+            limiter.check(f"alumno{i}@example.com", "10.0.0.1")
+        with pytest.raises(LoginRateLimited):
+            limiter.check("otro@example.com", "10.0.0.1")
+        limiter.check("otro@example.com", "10.0.0.2")
+
+    def test_rejected_attempts_are_not_recorded(self, limiter):
+        """Test a blocked email does not use up its address's attempts"""
+        for _ in range(3):
+            limiter.check("alumno@example.com", "10.0.0.1")
+        for _ in range(10):
+            with pytest.raises(LoginRateLimited):
+                limiter.check("alumno@example.com", "10.0.0.1")
+        limiter.check("otro@example.com", "10.0.0.1")
+
+    def test_reset_clears_email(self, limiter):
+        """Test a successful login gives the email a fresh window"""
+        for _ in range(3):
+            limiter.check("alumno@example.com")
+        limiter.reset("alumno@example.com")
+        limiter.check("alumno@example.com")
+
+    def test_redis_failure_falls_back_to_memory(self):
+        """Test an unreachable Redis still enforces the limit in process"""
+        client = redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1)
+        limiter = LoginRateLimiter(backend=RedisSlidingWindow(client), attempts=2,
+                                   window_seconds=60)
+        limiter.check("alumno@example.com")
+        limiter.check("alumno@example.com")
+        with pytest.raises(LoginRateLimited):
+            limiter.check("alumno@example.com")
+
+    def test_rejected_before_password_check(self, limiter, monkeypatch):
+        """Test a limited login never reaches the database or bcrypt"""
+        monkeypatch.setattr(auth_service, "login_rate_limiter", limiter)
+        for _ in range(3):
+            limiter.check("alumno@example.com")
+        with pytest.raises(LoginRateLimited):
+            AuthService.authenticate_user(None, "alumno@example.com", "password123")
+
+
+class TestRedisSlidingWindow:
+    """Test the Lua sliding window against a live Redis"""
+
+    def test_limits_and_retry_after(self, redis_client):
+        """Test the script allows up to the limit and reports the wait"""
+        window = RedisSlidingWindow(redis_client)
+        limits = {"ratelimit:login:email:a": 2, "ratelimit:login:ip:b": 10}
+        assert window.hit(limits, 60) == 0
+        assert window.hit(limits, 60) == 0
+        retry = window.hit(limits, 60)
+        assert 59 < retry <= 60
+        # The rejected attempt was not recorded
+        assert redis_client.zcard("ratelimit:login:ip:b") == 2
+        assert 0 < redis_client.pttl("ratelimit:login:email:a") <= 60000
+
+    def test_window_slides(self, redis_client):
+        """Test old attempts expire from the window"""
+        window = RedisSlidingWindow(redis_client)
+        limits = {"ratelimit:login:email:a": 1}
+        assert window.hit(limits, 0.2) == 0
+        assert window.hit(limits, 0.2) > 0
+        time.sleep(0.25)
+        assert window.hit(limits, 0.2) == 0
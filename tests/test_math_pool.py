@@ -0,0 +1,95 @@
+"""Tests for the SymPy worker process pool"""
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.services.math_pool import MathCheckAborted, MathWorkerPool
+from app.services.math_verifier import ExpressionParseError, MathVerifier, parse_step
+
+# Runs for far longer than any check timeout (computes a huge factorial)
+PATHOLOGICAL = "factorial(10^7)"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = MathWorkerPool(workers=1, memory_mb=0, max_tasks=1000)
+    pool.start()
+    assert pool.wait_ready()
+    yield pool
+    pool.shutdown()
+
+
+class TestMathWorkerPool:
+    """Test checks run in worker processes"""
+
+    def test_runs_checks_in_worker(self, pool):
+        """Test results come back from the worker unchanged"""
+        parsed = pool.run("parse_step", ("2x + 1",), 5)
+
+        assert parsed.key == parse_step("2*x + 1").key
+        assert pool.run("symbolic_check", (parsed, parse_step("1 + 2x")), 5) is True
+
+    def test_propagates_check_errors(self, pool):
+        """Test exceptions raised by a check reach the caller"""
+        with pytest.raises(ExpressionParseError):
+            pool.run("parse_step", ("x = 1 = 2",), 5)
+
+    def test_hard_timeout_kills_and_replaces_worker(self, pool):
+        """Test a runaway check is aborted at the timeout and the worker respawned"""
+        respawns = pool.stats()["respawns"]
+        start = time.perf_counter()
+
+        with pytest.raises(MathCheckAborted) as excinfo:
+            pool.run("parse_step", (PATHOLOGICAL,), 0.5)
+
+        assert excinfo.value.reason == "timeout"
+        assert time.perf_counter() - start < 2
+        assert pool.stats()["respawns"] == respawns + 1
+        assert pool.wait_ready()
+        assert pool.run("parse_step", ("x",), 5).key == parse_step("x").key
+
+    def test_stats(self, pool):
+        """Test throughput and latency are reported"""
+        pool.run("parse_step", ("y^2",), 5)
+        stats = pool.stats()
+
+        assert stats["workers"] == 1
+        assert stats["completed"] >= 1
+        assert stats["throughput_per_second"] > 0
+        assert stats["latency"]["parse_step"]["count"] >= 1
+
+    def test_worker_recycled_after_max_tasks(self):
+        """Test a worker is replaced after MATH_WORKER_MAX_TASKS checks"""
+        pool = MathWorkerPool(workers=1, memory_mb=0, max_tasks=2)
+        pool.start()
+        try:
+            assert pool.wait_ready()
+            pool.run("parse_step", ("x",), 5)
+            pool.run("parse_step", ("x",), 5)
+
+            assert pool.stats()["respawns"] == 1
+            assert pool.wait_ready()
+        finally:
+            pool.shutdown()
+
+
+class TestVerifierWithPool:
+    """Test the verifier routes checks through a started pool"""
+
+    def test_pathological_answer_times_out(self, pool, monkeypatch):
+        """Test a runaway parse yields a timeout verdict instead of stalling"""
+        monkeypatch.setattr("app.core.config.settings.MATH_PARSE_TIMEOUT_SECONDS", 0.5)
+        verifier = MathVerifier(max_entries=10, pool=pool)
+
+        result = verifier.verify(uuid4(), ["x = 2"], PATHOLOGICAL)
+
+        assert result.method == "timeout"
+        assert not result.equivalent
+        assert pool.wait_ready()
+
+    def test_verifies_through_pool(self, pool):
+        """Test normal answers are verified by the workers"""
+        verifier = MathVerifier(max_entries=10, pool=pool)
+
+        assert verifier.verify(uuid4(), ["2x = 4"], "4 = 2x").equivalent
@@ -0,0 +1,193 @@
+"""Tests for the SymPy math verifier"""
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.services.math_pool import MathCheckAborted
+from app.services.math_verifier import (
+    ExpressionParseError,
+    MathVerifier,
+    compile_step,
+    numeric_check,
+    parse_step,
+)
+
+STEPS = ["2*x + 6 = 10", "2*x = 4", "x = 2"]
+
+
+@pytest.fixture
+def verifier():
+    return MathVerifier(max_entries=100)
+
+
+class TestParsing:
+    """Test safe parsing"""
+
+    def test_implicit_multiplication_and_powers(self):
+        """Test common student notation is accepted"""
+        assert parse_step("2x^2 + 3x").key == parse_step("2*x**2 + 3*x").key
+
+    def test_equation_is_stored_as_difference(self):
+        """Test equations are canonicalized as lhs - rhs"""
+        step = parse_step("x = 2")
+
+        assert step.is_equation
+        assert step.key == parse_step("x - 2").key
+
+    @pytest.mark.parametrize("text", [
+        "__import__('os').system('true')",
+        "x.func",
+        "x = 1 = 2",
+        "10^5000",
+        "x" * (settings.MATH_MAX_EXPRESSION_LENGTH + 1),
+    ])
+    def test_rejects_unsafe_or_invalid_input(self, text):
+        """Test code injection and malformed input are rejected"""
+        with pytest.raises(ExpressionParseError):
+            parse_step(text)
+
+
+    def test_names_are_never_evaluated(self):
+        """Test unknown names become symbols instead of being called"""
+        step = parse_step("eval(chr(49))")
+
+        assert step.expr.free_symbols
+        assert step.expr != 1
+
+
+class TestNumericCheck:
+    """Test vectorized numeric sampling"""
+
+    def test_lambdified_and_tree_evaluation_agree(self):
+        """Test a compiled reference gives the same verdict as direct evaluation"""
+        reference, answer = parse_step("sqrt(x^2 + 1) * exp(y)"), parse_step("exp(y) sqrt(1 + x^2)")
+
+        assert numeric_check(reference, answer, compile_step(reference)) is True
+        assert numeric_check(reference, answer) is True
+
+    def test_rejects_different_expressions(self):
+        """Test expressions that differ at the sample points are rejected"""
+        reference = parse_step("(x + 1)^2")
+
+        assert numeric_check(reference, parse_step("x^2 + 1"), compile_step(reference)) is False
+
+    def test_proportional_equations(self):
+        """Test equations are compared up to a constant factor"""
+        reference = parse_step("2x + 6 = 10")
+
+        assert numeric_check(reference, parse_step("x = 2"), compile_step(reference)) is True
+        assert numeric_check(reference, parse_step("x = 3"), compile_step(reference)) is False
+
+    def test_unsupported_function_is_inconclusive(self):
+        """Test functions without a NumPy counterpart defer to the symbolic check"""
+        reference = parse_step("factorial(x) * x")
+
+        assert numeric_check(reference, parse_step("x factorial(x)"), compile_step(reference)) is None
+
+
+class TestMathVerifier:
+    """Test staged equivalence checks"""
+
+    def test_structural_match(self, verifier):
+        """Test identical canonical forms skip evaluation"""
+        result = verifier.verify(uuid4(), STEPS, "x = 2")
+
+        assert result.equivalent
+        assert result.method == "structural"
+        assert result.matched_step == 2
+
+    def test_numeric_match(self, verifier):
+        """Test algebraically equal expressions are accepted by sampling"""
+        result = verifier.verify(uuid4(), ["(x + 1)**2"], "x^2 + 2x + 1")
+
+        assert result.equivalent
+        assert result.method == "numeric"
+
+    def test_equivalent_equations(self, verifier):
+        """Test scaled equations are equivalent"""
+        result = verifier.verify(uuid4(), STEPS, "4x = 8", step_index=1)
+
+        assert result.equivalent
+        assert result.matched_step == 1
+
+    def test_wrong_answer(self, verifier):
+        """Test a non-equivalent step is rejected"""
+        result = verifier.verify(uuid4(), STEPS, "x = 3")
+
+        assert not result.equivalent
+
+    def test_trigonometric_identity(self, verifier):
+        """Test identities are recognized"""
+        result = verifier.verify(uuid4(), ["1"], "sin(x)^2 + cos(x)^2")
+
+        assert result.equivalent
+
+    def test_parse_error(self, verifier):
+        """Test unparsable input is reported, not raised"""
+        result = verifier.verify(uuid4(), STEPS, "x = (")
+
+        assert result.method == "parse_error"
+
+    def test_unsupported_function_falls_back_to_symbolic(self, verifier):
+        """Test inconclusive sampling falls back to simplify"""
+        result = verifier.verify(uuid4(), ["factorial(x + 1)"], "(x + 1) factorial(x)")
+
+        assert result.equivalent
+        assert result.method == "symbolic"
+
+    def test_reference_compiled_once(self, verifier):
+        """Test a reference step is lambdified once for all answers"""
+        problem_id = uuid4()
+        for answer in ("x^2 + 2x + 1", "x^2 + 2x + 2", "1 + x(x + 2)"):
+            verifier.verify(problem_id, ["(x + 1)^2"], answer)
+
+        assert len(verifier.compiled) == 1
+
+    def test_reference_steps_cached_per_problem(self, verifier):
+        """Test reference steps are parsed once per problem version"""
+        problem_id = uuid4()
+        first = verifier.reference_steps(problem_id, STEPS)
+
+        assert verifier.reference_steps(problem_id, STEPS) is first
+        assert verifier.reference_steps(problem_id, STEPS + ["x + 0 = 2"]) is not first
+
+    def test_prose_steps_are_skipped(self, verifier):
+        """Test non-math reference steps never match"""
+        result = verifier.verify(uuid4(), ["Restar 6 en ambos lados", "x = 2"], "x = 2")
+
+        assert result.matched_step == 1
+
+    def test_busy_pool_is_not_cached(self):
+        """Test a reference step aborted by a busy pool is parsed again later"""
+        class FlakyPool:
+            started = True
+            calls = 0
+
+            def run(self, name, args, timeout):
+                self.calls += 1
+                if self.calls == 2:
+                    raise MathCheckAborted("busy")
+                return parse_step(*args)
+
+        verifier = MathVerifier(max_entries=100, pool=FlakyPool())
+        problem_id = uuid4()
+
+        busy = verifier.verify(problem_id, ["x = 2"], "x = 2")
+        results = [verifier.verify(problem_id, ["x = 2"], answer)
+                   for answer in ("x = 2", "2x = 4")]
+
+        assert busy.method == "timeout"
+        assert all(result.equivalent for result in results)
+
+    def test_verdicts_are_memoized(self, verifier):
+        """Test a repeated comparison is served from the verdict cache"""
+        steps = ["(x + 1)**3"]
+        verifier.verify(uuid4(), steps, "x^3 + 3x^2 + 3x + 1")
+        start = time.perf_counter()
+        result = verifier.verify(uuid4(), steps, "x^3 + 3x^2 + 3x + 1")
+
+        assert result.equivalent
+        assert len(verifier.verdicts) == 1
+        assert time.perf_counter() - start < 0.05
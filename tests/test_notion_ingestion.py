@@ -0,0 +1,309 @@
+"""Tests for incremental Notion ingestion"""
+import itertools
+import os
+import threading
+import time
+from uuid import UUID, uuid4
+
+import numpy as np
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.schemas.rag import NotionSyncResult
+from app.services.rag import (
+    DirectorySource,
+    MemoryVectorStore,
+    NotionIngestor,
+    NotionSyncJobs,
+    NotionSyncLock,
+    RetrievalCache,
+)
+from app.services.rag.ingestion import chunk_page
+from app.services.rag.notion_source import Block
+
+PAGE = """# Derivadas
+
+La derivada mide la tasa de cambio instantánea de una función.
+
+La regla de la cadena se aplica a funciones compuestas.
+
+# Integrales
+
+La integral definida acumula el área bajo la curva.
+"""
+
+
+class CountingEmbedder:
+    """Deterministic embedder that records what it encodes"""
+
+    def __init__(self):
+        self.texts: list[str] = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return np.array([[len(text), text.count(" ") + 1.0] for text in texts], dtype=np.float32)
+
+
+_edits = itertools.count(1)
+
+
+def write_page(root, page_id: str, content: str) -> None:
+    path = root / f"{page_id}.md"
+    path.write_text(content, encoding="utf-8")
+    # Every edit gets a distinct last_edited_time, even within one clock tick
+    stamp = time.time() + next(_edits)
+    os.utime(path, (stamp, stamp))
+
+
+@pytest.fixture
+def teacher_id() -> UUID:
+    return uuid4()
+
+
+@pytest.fixture
+def store():
+    return MemoryVectorStore()
+
+
+@pytest.fixture
+def embedder():
+    return CountingEmbedder()
+
+
+@pytest.fixture
+def ingestor(tmp_path, store, embedder):
+    def build():
+        return NotionIngestor(DirectorySource(str(tmp_path)), store=store, embedder=embedder,
+                              batch_size=2, cache=RetrievalCache(store=MemoryStore()))
+    return build
+
+
+class TestChunking:
+    """Test pages are split into block-level chunks"""
+
+    def test_blocks_become_chunks_under_their_heading(self, teacher_id):
+        """Test every text block is one chunk prefixed by its section"""
+        blocks = [Block("h1", "Derivadas", is_heading=True), Block("b1", "Texto uno"),
+                  Block("h2", "Integrales", is_heading=True), Block("b2", "Texto dos")]
+
+        chunks = chunk_page(teacher_id, "page", "Apuntes", blocks)
+
+        assert [chunk.text for chunk in chunks] == ["Derivadas\nTexto uno", "Integrales\nTexto dos"]
+        assert chunks[0].id == f"{teacher_id}:page:b1:0"
+
+    def test_long_blocks_are_split(self, teacher_id):
+        """Test blocks longer than the limit produce several chunks"""
+        chunks = chunk_page(teacher_id, "page", None, [Block("b", "palabra " * 100)], max_chars=100)
+
+        assert len(chunks) > 1
+        assert all(len(chunk.text) <= 100 for chunk in chunks)
+
+
+class TestDirectorySource:
+    """Test the offline stand-in for Notion"""
+
+    def test_block_ids_survive_edits_elsewhere(self, tmp_path):
+        """Test inserting a block keeps the ids of the others"""
+        source = DirectorySource(str(tmp_path))
+        write_page(tmp_path, "apuntes", PAGE)
+        before = {block.text: block.id for block in source.blocks("apuntes")}
+
+        write_page(tmp_path, "apuntes", PAGE.replace("# Integrales", "Nuevo bloque.\n\n# Integrales"))
+        after = {block.text: block.id for block in source.blocks("apuntes")}
+
+        assert all(after[text] == block_id for text, block_id in before.items())
+
+    def test_rejects_path_traversal(self, tmp_path):
+        """Test page ids cannot escape the export directory"""
+        from app.services.rag import NotionSourceError
+
+        with pytest.raises(NotionSourceError):
+            DirectorySource(str(tmp_path)).blocks("../secret")
+
+
+class TestNotionIngestor:
+    """Test incremental sync against the vector store"""
+
+    def test_first_sync_embeds_every_chunk(self, tmp_path, ingestor, store, embedder, teacher_id):
+        """Test a new page is fully indexed"""
+        write_page(tmp_path, "apuntes", PAGE)
+
+        states, result = ingestor().sync_pages(teacher_id, ["apuntes"], {})
+
+        assert result.pages_synced == 1
+        assert result.chunks_upserted == 3
+        assert len(store) == 3
+        assert states["apuntes"].title == "Derivadas"
+
+    def test_unchanged_page_is_skipped(self, tmp_path, ingestor, embedder, teacher_id):
+        """Test a page with the same last_edited_time is not read again"""
+        write_page(tmp_path, "apuntes", PAGE)
+        states, _ = ingestor().sync_pages(teacher_id, ["apuntes"], {})
+        embedder.texts.clear()
+
+        _, result = ingestor().sync_pages(teacher_id, ["apuntes"], states)
+
+        assert result.pages_unchanged == 1
+        assert embedder.texts == []
+
+    def test_only_edited_blocks_are_reembedded(self, tmp_path, ingestor, store, embedder,
+                                               teacher_id):
+        """Test editing one block re-embeds one chunk and deletes its old version"""
+        write_page(tmp_path, "apuntes", PAGE)
+        states, _ = ingestor().sync_pages(teacher_id, ["apuntes"], {})
+        embedder.texts.clear()
+
+        write_page(tmp_path, "apuntes", PAGE.replace("área bajo la curva", "área con signo"))
+        states, result = ingestor().sync_pages(teacher_id, ["apuntes"], states)
+
+        assert result.chunks_upserted == 1
+        assert result.chunks_deleted == 1
+        assert embedder.texts == ["Integrales\nLa integral definida acumula el área con signo."]
+        assert len(store) == 3
+
+    def test_removed_pages_are_deleted(self, tmp_path, ingestor, store, teacher_id):
+        """Test pages dropped from notion_page_ids leave the vector store"""
+        write_page(tmp_path, "apuntes", PAGE)
+        write_page(tmp_path, "otros", "Un solo bloque.")
+        states, _ = ingestor().sync_pages(teacher_id, ["apuntes", "otros"], {})
+
+        states, result = ingestor().sync_pages(teacher_id, ["apuntes"], states)
+
+        assert result.pages_removed == 1
+        assert set(states) == {"apuntes"}
+        assert len(store) == 3
+
+    def test_missing_page_is_reported(self, tmp_path, ingestor, teacher_id):
+        """Test a page that cannot be read is listed without failing the sync"""
+        write_page(tmp_path, "apuntes", PAGE)
+
+        states, result = ingestor().sync_pages(teacher_id, ["apuntes", "no-existe"], {})
+
+        assert [error.page_id for error in result.errors] == ["no-existe"]
+        assert set(states) == {"apuntes"}
+
+
+class TestNotionSyncJobs:
+    """Test background sync jobs"""
+
+    def test_job_runs_in_background(self, teacher_id):
+        """Test a submitted sync reports its result when done"""
+        jobs = NotionSyncJobs(store=MemoryStore(),
+                              runner=lambda _, force: NotionSyncResult(pages_synced=2))
+        try:
+            assert jobs.submit(teacher_id).state == "queued"
+            for _ in range(100):
+                status = jobs.status(teacher_id)
+                if status.state == "done":
+                    break
+                time.sleep(0.01)
+
+            assert status.state == "done"
+            assert status.result.pages_synced == 2
+        finally:
+            jobs.shutdown()
+
+    def test_failed_job_reports_detail(self, teacher_id):
+        """Test errors end the job as failed"""
+        def failing(_, force):
+            raise RuntimeError("sin token")
+
+        jobs = NotionSyncJobs(store=MemoryStore(), runner=failing)
+        try:
+            jobs.submit(teacher_id)
+            for _ in range(100):
+                status = jobs.status(teacher_id)
+                if status.state == "failed":
+                    break
+                time.sleep(0.01)
+
+            assert status.state == "failed"
+            assert status.detail == "sin token"
+        finally:
+            jobs.shutdown()
+
+    def test_running_job_is_not_queued_twice(self, teacher_id):
+        """Test a second submit returns the running job even if its status was lost"""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def blocking(_, force):
+            calls.append(force)
+            started.set()
+            release.wait(5)
+            return NotionSyncResult()
+
+        kv = MemoryStore()
+        jobs = NotionSyncJobs(store=kv, runner=blocking)
+        try:
+            jobs.submit(teacher_id)
+            assert started.wait(5)
+            kv.delete(jobs._key(teacher_id))  # expired or failed to save
+
+            assert jobs.submit(teacher_id, force=True).state == "running"
+        finally:
+            release.set()
+            jobs.shutdown()
+
+        assert calls == [False]
+
+    def test_other_process_does_not_sync_same_teacher(self, teacher_id):
+        """Test a job queued by another process blocks a second sync of the teacher"""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def blocking(_, force):
+            calls.append(force)
+            started.set()
+            release.wait(5)
+            return NotionSyncResult()
+
+        kv = MemoryStore()
+        first = NotionSyncJobs(store=kv, runner=blocking)
+        second = NotionSyncJobs(store=kv, runner=blocking)  # another API process
+        try:
+            first.submit(teacher_id)
+            assert started.wait(5)
+
+            assert second.submit(teacher_id).state == "running"
+        finally:
+            release.set()
+            first.shutdown()
+            second.shutdown()
+
+        assert calls == [False]
+
+    def test_lock_released_when_job_finishes(self, teacher_id):
+        """Test the teacher can be synced again once the job is done"""
+        kv = MemoryStore()
+        jobs = NotionSyncJobs(store=kv, runner=lambda _, force: NotionSyncResult())
+        try:
+            jobs.submit(teacher_id)
+            for _ in range(100):
+                if jobs.status(teacher_id).state == "done" and not jobs._active:
+                    break
+                time.sleep(0.01)
+
+            with NotionSyncLock(teacher_id, store=kv) as acquired:
+                assert acquired
+        finally:
+            jobs.shutdown()
+
+
+class TestNotionSyncLock:
+    """Test the shared per-teacher sync lock"""
+
+    def test_held_lock_is_exclusive(self, teacher_id):
+        """Test only one owner holds the lock and only the owner releases it"""
+        kv = MemoryStore()
+        owner = NotionSyncLock(teacher_id, store=kv)
+        other = NotionSyncLock(teacher_id, store=kv)
+
+        assert owner.acquire()
+        assert not other.acquire()
+        other.release()
+        assert not NotionSyncLock(teacher_id, store=kv).acquire()
+
+        owner.release()
+        assert other.acquire()
+        other.release()
@@ -0,0 +1,84 @@
+"""Tests for the bounded password hashing pool"""
+import asyncio
+
+import pytest
+
+from app.core.metrics import metrics
+from app.core.password_hashing import PasswordHashingPool, PasswordHashingUnavailable
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """Create a small process pool shared by the tests in this module"""
+    hashing_pool = PasswordHashingPool(max_workers=1, queue_depth=0, enabled=True)
+    hashing_pool.start()
+    yield hashing_pool
+    hashing_pool.shutdown()
+
+
+class TestPasswordHashingPool:
+    """Test hashing offloaded to worker processes"""
+
+    def test_hash_and_verify_roundtrip(self, pool):
+        """Test that hashes produced by the pool verify correctly"""
+        hashed = pool.hash("password123")
+
+        assert hashed.startswith("$2b$")
+        assert pool.verify("password123", hashed)
+        assert not pool.verify("wrong-password1", hashed)
+
+    def test_metrics_recorded(self, pool):
+        """Test that queue wait and hash time are tracked"""
+        metrics.reset()
+        pool.hash("password123")
+
+        assert metrics.latency("password_hash.hash_time")["count"] == 1
+        assert metrics.latency("password_hash.queue_wait")["count"] == 1
+
+    def test_saturated_pool_rejects(self, pool):
+        """Test backpressure once workers and queue are full"""
+        async def scenario():
+            first = asyncio.create_task(pool.hash_async("password123"))
+            await asyncio.sleep(0)  # let the first job take the only slot
+
+            with pytest.raises(PasswordHashingUnavailable):
+                await pool.hash_async("password456")
+
+            return await first
+
+        hashed = asyncio.run(scenario())
+        assert pool.verify("password123", hashed)
+
+    def test_hash_many_waits_for_admission(self, pool):
+        """Test batch chunks take admission slots, waiting for busy ones"""
+        async def scenario():
+            interactive = asyncio.create_task(pool.hash_async("password123"))
+            await asyncio.sleep(0)  # the interactive hash holds the only slot
+            hashes = await asyncio.to_thread(pool.hash_many, ["password456", "password789"], 1)
+            return await interactive, hashes
+
+        hashed, hashes = asyncio.run(scenario())
+
+        assert pool.verify("password123", hashed)
+        assert pool.verify("password789", hashes[1])
+        assert pool._slots.acquire(blocking=False)
+        pool._slots.release()
+
+    def test_hash_many_times_out(self):
+        """Test a batch that cannot be admitted in time fails instead of hanging"""
+        busy_pool = PasswordHashingPool(max_workers=1, queue_depth=0, timeout_seconds=0.01,
+                                        enabled=True)
+        busy_pool._slots.acquire()
+
+        with pytest.raises(PasswordHashingUnavailable):
+            busy_pool.hash_many(["password123"])
+        assert busy_pool._executor is None
+
+    def test_inline_mode_without_pool(self):
+        """Test that disabling the pool hashes in the calling thread"""
+        inline_pool = PasswordHashingPool(enabled=False)
+
+        hashed = inline_pool.hash("password123")
+
+        assert inline_pool.verify("password123", hashed)
+        assert inline_pool._executor is None
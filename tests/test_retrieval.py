@@ -0,0 +1,177 @@
+"""Tests for cached retrieval of teacher content"""
+import os
+import time
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.services.rag import (
+    DirectorySource,
+    MemoryVectorStore,
+    NotionIngestor,
+    QueryBucketer,
+    RetrievalCache,
+    RetrievalService,
+)
+
+VOCABULARY = ["derivada", "integral", "límite", "cadena", "área"]
+
+
+class BagOfWordsEmbedder:
+    """Deterministic embedder over a tiny vocabulary"""
+
+    def embed(self, texts):
+        rows = []
+        for text in texts:
+            lowered = text.lower()
+            rows.append([lowered.count(word) for word in VOCABULARY] + [0.1])
+        return np.array(rows, dtype=np.float32)
+
+
+class CountingVectorStore(MemoryVectorStore):
+    """Memory store that counts similarity queries"""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = 0
+
+    def query(self, embedding, top_k, where=None):
+        self.queries += 1
+        return super().query(embedding, top_k, where)
+
+
+@pytest.fixture
+def kv():
+    return MemoryStore()
+
+
+@pytest.fixture
+def store():
+    return CountingVectorStore()
+
+
+@pytest.fixture
+def cache(kv):
+    return RetrievalCache(store=kv)
+
+
+@pytest.fixture
+def service(cache, store):
+    return RetrievalService(cache=cache, store=store, embedder=BagOfWordsEmbedder())
+
+
+def write_page(root, content: str, stamp: float) -> None:
+    path = root / "apuntes.md"
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, (stamp, stamp))
+
+
+class TestQueryBucketer:
+    """Test query embeddings are bucketed"""
+
+    def test_scaled_vectors_share_bucket(self):
+        """Test the bucket only depends on the direction of the embedding"""
+        bucketer = QueryBucketer(bits=16)
+        vector = np.random.default_rng(0).normal(size=32)
+
+        assert bucketer.bucket(vector) == bucketer.bucket(vector * 3)
+        assert len(bucketer.bucket(vector)) == 4
+
+    def test_different_queries_differ(self):
+        """Test unrelated embeddings fall in different buckets"""
+        bucketer = QueryBucketer(bits=32)
+
+        assert bucketer.bucket(np.eye(8)[0]) != bucketer.bucket(np.eye(8)[1])
+
+
+class TestRetrievalService:
+    """Test cached top-k retrieval"""
+
+    @pytest.fixture
+    def ingest(self, tmp_path, store, cache):
+        def sync(teacher_id, states):
+            ingestor = NotionIngestor(DirectorySource(str(tmp_path)), store=store,
+                                      embedder=BagOfWordsEmbedder(), cache=cache)
+            return ingestor.sync_pages(teacher_id, ["apuntes"], states)[0]
+        return sync
+
+    @pytest.fixture
+    def teacher_id(self, tmp_path, ingest):
+        teacher_id = uuid4()
+        write_page(tmp_path, "La derivada y la regla de la cadena.\n\nLa integral mide el área.",
+                   time.time())
+        ingest(teacher_id, {})
+        return teacher_id
+
+    def test_returns_closest_chunk(self, service, teacher_id):
+        """Test the best match comes first"""
+        chunks = service.retrieve(teacher_id, "¿Qué es una integral?", top_k=1)
+
+        assert "integral" in chunks[0].text
+
+    def test_repeated_query_is_served_from_cache(self, service, store, teacher_id):
+        """Test a repeat hint query does not reach the vector store"""
+        problem_id = uuid4()
+        first = service.retrieve(teacher_id, "Regla de la cadena", problem_id)
+        second = service.retrieve(teacher_id, "  regla de la CADENA ", problem_id)
+
+        assert store.queries == 1
+        assert [chunk.id for chunk in second] == [chunk.id for chunk in first]
+
+    def test_results_are_scoped_to_teacher(self, service, teacher_id):
+        """Test another teacher never sees this teacher's content"""
+        assert service.retrieve(uuid4(), "derivada") == []
+
+    def test_unchanged_sync_keeps_cache(self, service, store, ingest, teacher_id):
+        """Test a sync that changes nothing does not drop cached results"""
+        states = ingest(teacher_id, {})
+        service.retrieve(teacher_id, "integral")
+        ingest(teacher_id, states)
+        service.retrieve(teacher_id, "integral")
+
+        assert store.queries == 1
+
+    def test_reingestion_invalidates_teacher(self, tmp_path, service, store, ingest, teacher_id):
+        """Test changed content drops the teacher's cached results only"""
+        other_teacher = uuid4()
+        states = ingest(teacher_id, {})
+        service.retrieve(teacher_id, "integral")
+        service.retrieve(other_teacher, "integral")
+
+        write_page(tmp_path, "La integral definida y el límite.", time.time() + 60)
+        ingest(teacher_id, states)
+        chunks = service.retrieve(teacher_id, "integral")
+        service.retrieve(other_teacher, "integral")
+
+        assert store.queries == 3
+        assert chunks[0].text == "La integral definida y el límite."
+
+    def test_query_racing_reingestion_is_not_served(self, tmp_path, cache, store, ingest,
+                                                    teacher_id):
+        """Test results computed before a re-ingest are never served after it"""
+        states = ingest(teacher_id, {})
+
+        class ReingestDuringQuery(RetrievalService):
+            def _query(self, teacher_id, embedding, top_k):
+                chunks = super()._query(teacher_id, embedding, top_k)
+                write_page(tmp_path, "La integral definida y el límite.", time.time() + 60)
+                ingest(teacher_id, states)
+                return chunks
+
+        ReingestDuringQuery(cache=cache, store=store, embedder=BagOfWordsEmbedder()) \
+            .retrieve(teacher_id, "integral")
+        service = RetrievalService(cache=cache, store=store, embedder=BagOfWordsEmbedder())
+        chunks = service.retrieve(teacher_id, "integral")
+
+        assert chunks[0].text == "La integral definida y el límite."
+
+    def test_cache_disabled(self, store, teacher_id, kv):
+        """Test every lookup queries the store when the cache is off"""
+        service = RetrievalService(cache=RetrievalCache(store=kv, enabled=False), store=store,
+                                   embedder=BagOfWordsEmbedder())
+        service.retrieve(teacher_id, "derivada")
+        service.retrieve(teacher_id, "derivada")
+
+        assert store.queries == 2
@@ -0,0 +1,190 @@
+"""Tests for bulk class roster import"""
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base, get_db
+from app.main import app
+from app.models.class_model import Class, ClassStudent
+from app.models.user import Student, Teacher, UserRole
+from app.core.config import settings
+from app.schemas.roster import RosterStudentIn
+from app.services.roster_service import RosterService
+
+# Use PostgreSQL test database
+TEST_DATABASE_URL = str(settings.DATABASE_URL).replace(
+    "/elenchos", "/elenchos_test")
+engine = create_engine(TEST_DATABASE_URL)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine)
+
+
+class TestRosterParsing:
+    """Test roster CSV parsing and row validation"""
+
+    def test_parse_csv(self):
+        """Test CSV rows are parsed in order with normalized headers"""
+        content = "﻿Email, Password\na@example.com,password123\nb@example.com,password456\n"
+
+        rows = RosterService.parse_csv(content.encode("utf-8"))
+
+        assert [row.email for row in rows] == ["a@example.com", "b@example.com"]
+        assert rows[1].password == "password456"
+
+    def test_parse_csv_missing_columns(self):
+        """Test CSV without the required columns is rejected"""
+        with pytest.raises(HTTPException) as exc_info:
+            RosterService.parse_csv(b"email\na@example.com\n")
+
+        assert exc_info.value.status_code == 400
+
+    def test_parse_csv_extra_fields(self):
+        """Test a row with more fields than the header is rejected, not a 500"""
+        with pytest.raises(HTTPException) as exc_info:
+            RosterService.parse_csv(b"email,password\na@b.com,secret123,extra\n")
+
+        assert exc_info.value.status_code == 400
+        assert "fila 1" in exc_info.value.detail
+
+    def test_validate_rows_reports_each_error(self):
+        """Test invalid and duplicated rows are reported by row number"""
+        rows = [
+            RosterStudentIn(email="Ok@Example.com", password="password123"),
+            RosterStudentIn(email="not-an-email", password="password123"),
+            RosterStudentIn(email="weak@example.com", password="short"),
+            RosterStudentIn(email="ok@example.com", password="password456"),
+        ]
+
+        valid, errors = RosterService.validate_rows(rows)
+
+        assert [(row, data.email) for row, data in valid] == [(1, "ok@example.com")]
+        assert [error.row for error in errors] == [2, 3, 4]
+        assert "duplicado" in errors[2].detail
+
+    def test_read_transaction_ends_before_hashing(self, monkeypatch):
+        """Test no transaction stays open while the roster is hashed"""
+        calls = []
+
+        class FakeSession:
+            def get(self, model, key):
+                calls.append("get")
+                return Class(id=key, teacher_id=None, name="Álgebra 1")
+
+            def scalars(self, statement):
+                calls.append("select")
+                return []
+
+            def rollback(self):
+                calls.append("rollback")
+
+        def hash_many(passwords):
+            calls.append("hash")
+            raise RuntimeError("stop before inserting")
+
+        monkeypatch.setattr("app.services.roster_service.password_hasher.hash_many", hash_many)
+        with pytest.raises(RuntimeError):
+            RosterService.import_students(
+                FakeSession(), uuid4(),
+                [RosterStudentIn(email="s1@example.com", password="password123")])
+
+        assert calls == ["get", "select", "rollback", "hash"]
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    """Create a fresh database for each test"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+        db.rollback()
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def client(db_session):
+    """Create a test client with database override"""
+    def override_get_db():
+        try:
+            yield db_session
+        finally:
+            pass
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def class_obj(db_session):
+    """Create a teacher with one class"""
+    teacher = Teacher(email="teacher@example.com", password_hash="x" * 60,
+                      role=UserRole.TEACHER)
+    db_session.add(teacher)
+    db_session.flush()
+    class_obj = Class(teacher_id=teacher.id, name="Álgebra 1",
+                      invitation_code="ALG-001")
+    db_session.add(class_obj)
+    db_session.commit()
+    return class_obj
+
+
+class TestRosterImport:
+    """Test the roster import endpoints"""
+
+    def test_import_json_roster(self, client, db_session, class_obj):
+        """Test students are created, assigned and enrolled"""
+        response = client.post(
+            f"/api/v1/classes/{class_obj.id}/roster",
+            json={"students": [
+                {"email": "s1@example.com", "password": "password123"},
+                {"email": "s2@example.com", "password": "password123"},
+                {"email": "bad", "password": "password123"},
+            ]}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 2
+        assert data["failed"] == 1
+        assert data["errors"][0]["row"] == 3
+
+        students = db_session.query(Student).all()
+        assert {student.email for student in students} == {"s1@example.com", "s2@example.com"}
+        assert all(student.teacher_id == class_obj.teacher_id for student in students)
+        assert db_session.query(ClassStudent).filter(
+            ClassStudent.class_id == class_obj.id).count() == 2
+
+    def test_import_csv_skips_registered_emails(self, client, class_obj):
+        """Test already registered emails are reported, not duplicated"""
+        client.post(
+            "/api/v1/auth/register",
+            json={"email": "s1@example.com", "password": "password123", "role": "STUDENT"}
+        )
+
+        response = client.post(
+            f"/api/v1/classes/{class_obj.id}/roster/csv",
+            files={"file": ("roster.csv",
+                            b"email,password\ns1@example.com,password123\ns2@example.com,password123\n",
+                            "text/csv")}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert data["errors"][0]["email"] == "s1@example.com"
+
+    def test_unknown_class(self, client):
+        """Test importing into a missing class returns 404"""
+        response = client.post(
+            "/api/v1/classes/00000000-0000-0000-0000-000000000000/roster",
+            json={"students": [{"email": "s1@example.com", "password": "password123"}]}
+        )
+
+        assert response.status_code == 404
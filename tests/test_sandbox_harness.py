@@ -0,0 +1,149 @@
+"""Tests for the single-invocation test harness"""
+import json
+from dataclasses import dataclass
+from uuid import uuid4
+
+import pytest
+
+from app.models.problem import Language
+from app.services.sandbox import LocalBackend, SandboxPool, TestHarness
+
+DOUBLE = "print(int(input()) * 2)"
+
+
+@dataclass
+class Case:
+    input: str
+    expected_output: str
+    is_hidden: bool = False
+    id: str = ""
+
+    def __post_init__(self):
+        self.id = self.id or str(uuid4())
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(backend=LocalBackend(), sizes={Language.PYTHON: 1},
+                       acquire_timeout=10, health_check_interval=60, enabled=True)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+class TestHarnessRun:
+    """Test running all cases in one sandbox invocation"""
+
+    def test_all_cases_pass(self, pool):
+        """Test every case is run and compared in one invocation"""
+        cases = [Case("1", "2"), Case("5\n", "10\n\n"), Case("7", "14", is_hidden=True)]
+
+        result = TestHarness.run(Language.PYTHON, DOUBLE, cases, pool=pool, timeout=5)
+
+        assert result.accepted
+        assert [case.status for case in result.cases] == ["passed"] * 3
+
+    def test_statuses(self, pool):
+        """Test wrong answers, runtime errors and timeouts are told apart"""
+        source = (
+            "n = int(input())\n"
+            "if n == 0:\n    raise SystemExit(3)\n"
+            "while n < 0:\n    pass\n"
+            "print(n + 1)\n"
+        )
+        cases = [Case("1", "2"), Case("2", "4"), Case("0", "1"), Case("-1", "0")]
+
+        result = TestHarness.run(Language.PYTHON, source, cases, pool=pool, timeout=0.5)
+
+        assert [case.status for case in result.cases] == [
+            "passed", "wrong_answer", "runtime_error", "timeout"]
+        assert result.passed == 1
+
+    def test_stop_on_first_hidden_failure(self, pool):
+        """Test cases after a hidden case that crashed are skipped"""
+        source = "n = int(input())\nif n == 3:\n    raise SystemExit(1)\nprint(n * 2)\n"
+        cases = [Case("3", "6", is_hidden=True), Case("1", "2"), Case("4", "8", is_hidden=True)]
+
+        result = TestHarness.run(Language.PYTHON, source, cases, pool=pool, timeout=5,
+                                 stop_on_hidden_failure=True)
+
+        # Visible cases run first, then hidden ones in order
+        assert [case.status for case in result.cases] == ["passed", "runtime_error", "skipped"]
+
+    def test_expected_outputs_stay_on_host(self, pool):
+        """Test the submission cannot read the manifest to copy hidden answers"""
+        source = (
+            "import json, os\n"
+            "input()\n"
+            "if os.path.exists('cases.json'):\n"
+            "    cases = json.load(open('cases.json'))['cases']\n"
+            "    print(cases[-1].get('expected', 'missing'))\n"
+            "else:\n"
+            "    print('missing')\n"
+        )
+        cases = [Case("1", "missing"), Case("2", "secret", is_hidden=True)]
+
+        result = TestHarness.run(Language.PYTHON, source, cases, pool=pool, timeout=5)
+
+        assert [case.status for case in result.cases] == ["passed", "wrong_answer"]
+
+    def test_forged_result_lines_are_ignored(self, pool):
+        """Test lines written without the run's token do not count as results"""
+        cases = [Case("2", "secret", is_hidden=True)]
+        forged = json.dumps({"id": cases[0].id, "status": "completed", "exit_code": 0,
+                             "duration_seconds": 0.0, "stdout": "secret", "stderr": ""})
+        source = (
+            "import os\n"
+            f"line = {forged!r} + '\\n'\n"
+            "try:\n"
+            "    with open(f'/proc/{os.getppid()}/fd/1', 'w') as out:\n"
+            "        out.write(line)\n"
+            "except OSError:\n"
+            "    pass\n"
+            "print('wrong')\n"
+        )
+
+        result = TestHarness.run(Language.PYTHON, source, cases, pool=pool, timeout=5)
+
+        assert result.cases[0].status == "wrong_answer"
+
+    def test_hidden_output_is_not_exposed(self, pool):
+        """Test hidden cases never return the submission's output"""
+        cases = [Case("3", "7", is_hidden=True)]
+
+        result = TestHarness.run(Language.PYTHON, DOUBLE, cases, pool=pool, timeout=5)
+
+        assert result.cases[0].stdout == ""
+
+    def test_syntax_error_reported_per_case(self, pool):
+        """Test an interpreted language failing to parse fails every case"""
+        result = TestHarness.run(Language.PYTHON, "print(", [Case("1", "2")], pool=pool, timeout=5)
+
+        assert result.cases[0].status == "runtime_error"
+        assert "SyntaxError" in result.cases[0].stderr
+
+
+class TestParseResults:
+    """Test parsing of the driver output"""
+
+    def test_missing_lines_are_timeouts(self):
+        """Test cases not reported before the invocation was killed time out"""
+        cases = [Case("1", "2"), Case("2", "4")]
+        manifest = TestHarness.build_manifest(Language.PYTHON, cases, 1.0, True)
+        line = json.dumps({"id": cases[0].id, "status": "completed", "exit_code": 0,
+                           "duration_seconds": 0.01, "stdout": "2\n", "stderr": ""})
+        output = f"{manifest['token']} {line}\n{manifest['token']} {{torn"
+
+        results = TestHarness.parse_results(output, manifest)
+
+        assert [result.status for result in results] == ["passed", "timeout"]
+
+    def test_sandbox_manifest_has_no_expected_outputs(self):
+        """Test only inputs are copied into the sandbox"""
+        manifest = TestHarness.build_manifest(Language.PYTHON, [Case("1", "2", is_hidden=True)],
+                                              1.0, True)
+
+        sandbox = TestHarness.sandbox_manifest(manifest)
+
+        assert "expected" not in json.dumps(sandbox)
+        assert manifest["cases"][0]["expected"] == "2"
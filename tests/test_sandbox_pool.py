@@ -0,0 +1,199 @@
+"""Tests for the warm sandbox pool"""
+import os
+import threading
+import time
+
+import pytest
+
+from app.models.problem import Language
+from app.services.sandbox import LocalBackend, SandboxPool, SandboxUnavailable
+from app.services.sandbox.backends import ExecutionResult, SandboxBackend, SandboxWorker
+
+
+class FakeWorker(SandboxWorker):
+    """Worker that records its lifecycle"""
+
+    def __init__(self, language, backend):
+        super().__init__(language)
+        self.backend = backend
+        self.alive = True
+        self.resets = 0
+
+    def compile(self, source):
+        return "syntax error" if "error" in source else None
+
+    def run(self, stdin, timeout):
+        return ExecutionResult(stdout=stdin, stderr="", exit_code=0,
+                               timed_out=False, duration_seconds=0.0)
+
+    def run_command(self, command, files, timeout):
+        return ExecutionResult(stdout="", stderr="", exit_code=0,
+                               timed_out=False, duration_seconds=0.0)
+
+    def export_artifacts(self):
+        return {}
+
+    def import_artifacts(self, files):
+        pass
+
+    def reset(self):
+        self.resets += 1
+
+    def healthy(self):
+        return self.alive
+
+    def destroy(self):
+        self.backend.destroyed.append(self)
+
+
+class IncompleteWorker(SandboxWorker):
+    """Worker missing most of the interface"""
+
+    def run(self, stdin, timeout):
+        return None
+
+
+class FakeBackend(SandboxBackend):
+    name = "fake"
+
+    def __init__(self):
+        self.created = []
+        self.destroyed = []
+
+    def create(self, language):
+        worker = FakeWorker(language, self)
+        self.created.append(worker)
+        return worker
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def pool(backend):
+    pool = SandboxPool(backend=backend, sizes={Language.PYTHON: 2}, max_runs=3,
+                       acquire_timeout=0.2, health_check_interval=60, enabled=True)
+    pool.start()
+    wait_for(lambda: pool.stats()["PYTHON"]["idle"] == 2)
+    yield pool
+    pool.stop()
+
+
+class TestSandboxPool:
+    """Test pooling, recycling and health checks"""
+
+    def test_incomplete_worker_fails_on_creation(self):
+        """Test a worker missing part of the interface cannot be created"""
+        with pytest.raises(TypeError):
+            IncompleteWorker(Language.PYTHON)
+
+    def test_workers_are_prestarted_and_reused(self, pool, backend):
+        """Test submissions reuse warm workers and reset them on return"""
+        for _ in range(2):
+            assert pool.execute(Language.PYTHON, "print(1)", stdin="42").stdout == "42"
+
+        assert len(backend.created) == 2
+        assert sum(worker.resets for worker in backend.created) == 2
+
+    def test_compile_error(self, pool):
+        """Test compile errors are reported without running"""
+        result = pool.execute(Language.PYTHON, "error")
+
+        assert result.compile_error == "syntax error"
+        assert not result.ok
+
+    def test_recycle_after_max_runs(self, backend):
+        """Test a worker is replaced after max_runs submissions"""
+        pool = SandboxPool(backend=backend, sizes={Language.PYTHON: 1}, max_runs=3,
+                           acquire_timeout=2, health_check_interval=60, enabled=True)
+        pool.start()
+        try:
+            for _ in range(4):
+                pool.execute(Language.PYTHON, "print(1)")
+        finally:
+            pool.stop()
+
+        assert len(backend.created) == 2
+        assert backend.created[0] in backend.destroyed
+        assert backend.created[0].runs == 3
+
+    def test_queue_timeout(self, pool):
+        """Test callers wait for a free worker and then fail with 503 semantics"""
+        with pool.acquire(Language.PYTHON), pool.acquire(Language.PYTHON):
+            with pytest.raises(SandboxUnavailable):
+                with pool.acquire(Language.PYTHON):
+                    pass
+
+    def test_waiting_caller_gets_released_worker(self, pool):
+        """Test a queued caller is served as soon as a worker returns"""
+        pool.acquire_timeout = 2
+        results = []
+        with pool.acquire(Language.PYTHON), pool.acquire(Language.PYTHON):
+            waiter = threading.Thread(
+                target=lambda: results.append(pool.execute(Language.PYTHON, "x", stdin="ok")))
+            waiter.start()
+            time.sleep(0.05)
+        waiter.join()
+
+        assert results[0].stdout == "ok"
+
+    def test_unhealthy_worker_is_replaced(self, pool, backend):
+        """Test the health check swaps dead workers for new ones"""
+        backend.created[0].alive = False
+
+        assert pool.check_health() == 1
+        wait_for(lambda: len(backend.created) == 3)
+        assert pool.stats()["PYTHON"]["total"] == 2
+
+    def test_unknown_language_is_unavailable(self, pool):
+        """Test languages without a pool are rejected"""
+        with pytest.raises(SandboxUnavailable):
+            pool.execute(Language.JAVA, "class Main {}")
+
+
+class TestLocalBackend:
+    """Test the subprocess stand-in backend"""
+
+    @pytest.fixture
+    def worker(self):
+        worker = LocalBackend().create(Language.PYTHON)
+        yield worker
+        worker.destroy()
+
+    def test_runs_python(self, worker):
+        """Test a submission reads stdin and writes stdout"""
+        assert worker.compile("print(int(input()) * 2)") is None
+
+        result = worker.run("21\n", timeout=5)
+
+        assert result.ok
+        assert result.stdout.strip() == "42"
+
+    def test_timeout(self, worker):
+        """Test infinite loops are killed at the time limit"""
+        worker.compile("while True:\n    pass\n")
+
+        result = worker.run("", timeout=0.5)
+
+        assert result.timed_out
+        assert result.duration_seconds < 3
+
+    def test_reset_removes_files(self, worker):
+        """Test reset leaves an empty work directory"""
+        worker.compile("open('leftover.txt', 'w').write('x')")
+        worker.run("", timeout=5)
+
+        worker.reset()
+
+        assert worker.healthy()
+        assert os.listdir(worker.workdir) == []
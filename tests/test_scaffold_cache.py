@@ -0,0 +1,187 @@
+"""Tests for the two-tier scaffold cache"""
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import replace
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.models.session import ScaffoldLevel
+from app.services.llm import FakeProvider
+from app.services.rag import EmbeddingUnavailable
+from app.services.scaffold_cache import ScaffoldCache, normalize_answer
+from app.services.scaffold_service import ScaffoldContext, ScaffoldService
+
+SCAFFOLD = {"level": "LEVEL_1", "text": "¿Qué has hecho con el 1?", "provider": "fake",
+            "model": "fake", "generated_at": "2024-01-01T00:00:00"}
+
+
+class SlowStore(MemoryStore):
+    """Reads take long enough for another worker to write in between"""
+
+    def get(self, key):
+        value = super().get(key)
+        time.sleep(0.01)
+        return value
+
+
+class TrigramEmbedder:
+    """Hashed character trigrams: answers sharing most characters are close"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        rows = np.zeros((len(texts), 128), dtype=np.float32)
+        for row, text in zip(rows, texts):
+            for i in range(len(text) - 2):
+                row[int(hashlib.md5(text[i:i + 3].encode()).hexdigest(), 16) % 128] += 1
+        return rows
+
+
+@pytest.fixture
+def context() -> ScaffoldContext:
+    return ScaffoldContext(
+        attempt_id=uuid4(), teacher_id=uuid4(), problem_id=uuid4(), step_number=2,
+        level=ScaffoldLevel.LEVEL_1, student_answer="resto 1 en los dos lados: 2x = 6",
+        problem_text="Resuelve 2x + 1 = 5", error_type="PROCEDURE", affected_concept="despejar",
+    )
+
+
+@pytest.fixture
+def cache() -> ScaffoldCache:
+    return ScaffoldCache(store=MemoryStore(), embedder=TrigramEmbedder(), enabled=True,
+                         similarity=0.8, group_size=4)
+
+
+class TestScaffoldCache:
+    """Test exact and semantic lookups"""
+
+    def test_normalize_answer(self):
+        """Test case and spacing around operators are ignored"""
+        assert normalize_answer("  2X + 1 =  5 ") == normalize_answer("2x+1=5") == "2x+1=5"
+
+    def test_exact_hit(self, cache, context):
+        """Test the same answer with different spacing hits the exact tier"""
+        cache.put(context, SCAFFOLD)
+
+        cached = cache.get(replace(context, attempt_id=uuid4(),
+                                   student_answer="RESTO 1 en los  dos lados: 2x=6"))
+
+        assert cached == {**SCAFFOLD, "cache": "exact"}
+
+    def test_semantic_hit(self, cache, context):
+        """Test a close rewording reuses the scaffold through the embedding tier"""
+        cache.put(context, SCAFFOLD)
+
+        cached = cache.get(replace(context, student_answer="resto 1 en los dos lados, 2x = 6"))
+
+        assert cached["cache"] == "semantic"
+        assert cached["text"] == SCAFFOLD["text"]
+
+    def test_different_answer_misses(self, cache, context):
+        """Test an unrelated answer is generated again"""
+        cache.put(context, SCAFFOLD)
+
+        assert cache.get(replace(context, student_answer="x = 3")) is None
+
+    def test_diagnosis_and_level_are_part_of_the_key(self, cache, context):
+        """Test another error type or scaffold level never shares a scaffold"""
+        cache.put(context, SCAFFOLD)
+
+        assert cache.get(replace(context, error_type="CONCEPT")) is None
+        assert cache.get(replace(context, level=ScaffoldLevel.LEVEL_3)) is None
+
+    def test_teacher_opt_out(self, cache, context):
+        """Test a teacher who opted out neither reads nor writes the cache"""
+        opted_out = replace(context, cache_enabled=False)
+        cache.put(opted_out, SCAFFOLD)
+
+        assert cache.get(context) is None
+        cache.put(context, SCAFFOLD)
+        assert cache.get(opted_out) is None
+
+    def test_invalidate_teacher(self, cache, context):
+        """Test opting out drops the teacher's stored scaffolds"""
+        cache.put(context, SCAFFOLD)
+
+        assert cache.invalidate_teacher(context.teacher_id) == 2
+        assert cache.get(context) is None
+
+    def test_group_keeps_recent_answers(self, cache, context):
+        """Test the semantic tier only remembers the last group_size answers"""
+        cache.put(context, SCAFFOLD)
+        for i in range(4):
+            cache.put(replace(context, student_answer=f"respuesta distinta número {i}"),
+                      {**SCAFFOLD, "text": str(i)})
+        cache.store.delete(cache.exact_key(context))
+
+        assert cache.get(context) is None
+
+    def test_concurrent_puts_keep_every_answer(self, context):
+        """Test puts from several workers to one group do not overwrite each other"""
+        cache = ScaffoldCache(store=SlowStore(), embedder=TrigramEmbedder(), enabled=True,
+                              group_size=8)
+        threads = [threading.Thread(target=cache.put, args=(
+            replace(context, student_answer=f"respuesta distinta número {i}"),
+            {**SCAFFOLD, "text": str(i)})) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        scaffolds, _ = cache._read_group(cache.group_key(context))
+        assert sorted(scaffold["text"] for scaffold in scaffolds) == ["0", "1", "2", "3"]
+
+    def test_index_expires_with_its_keys(self, cache, context, monkeypatch):
+        """Test a teacher's index does not keep keys written longer than the TTL ago"""
+        cache.put(context, SCAFFOLD)
+        index_key = cache._index_key(context.teacher_id)
+        expires_at = cache.store._values[index_key][1]
+
+        assert expires_at <= time.monotonic() + cache.ttl_seconds + cache._bucket_seconds
+        later = time.time() + cache.ttl_seconds + 2 * cache._bucket_seconds
+        monkeypatch.setattr(time, "time", lambda: later)
+        cache.put(replace(context, student_answer="x = 3"), SCAFFOLD)
+        assert cache._index_key(context.teacher_id) != index_key
+        assert cache.store.smembers(cache._index_key(context.teacher_id)) == {
+            cache.exact_key(replace(context, student_answer="x = 3")), cache.group_key(context)}
+
+    def test_embedding_outage_keeps_exact_tier(self, context):
+        """Test the exact tier works when the embedding model is unavailable"""
+        cache = ScaffoldCache(store=MemoryStore(), enabled=True,
+                              embedder=TrigramEmbedder(error=EmbeddingUnavailable("busy")))
+        cache.put(context, SCAFFOLD)
+
+        assert cache.get(context)["cache"] == "exact"
+        assert cache.get(replace(context, student_answer="otra cosa")) is None
+
+
+class TestCachedScaffoldService:
+    """Test the service skips the provider on cache hits"""
+
+    def test_second_student_is_served_from_cache(self, cache, context):
+        """Test the same mistake by another student does not call the LLM"""
+        provider, saved = FakeProvider(), []
+        service = ScaffoldService(provider=provider, cache=cache,
+                                  saver=lambda *args: saved.append(args))
+
+        async def run(ctx):
+            return [event async for event in service.stream(ctx)]
+
+        asyncio.run(run(context))
+        other = replace(context, attempt_id=uuid4())
+        events = asyncio.run(run(other))
+
+        assert provider.calls == 1
+        assert events[-1][1]["scaffold"]["cache"] == "exact"
+        assert saved[-1][0] == other.attempt_id
+        assert saved[-1][1]["text"] == FakeProvider.DEFAULT_TEXT
@@ -0,0 +1,184 @@
+"""Tests for streamed scaffold generation"""
+import asyncio
+import json
+import time
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.models.session import ScaffoldLevel
+from app.services.llm import (
+    AnthropicProvider,
+    FakeProvider,
+    GoogleProvider,
+    LLMRequest,
+    LLMUnavailable,
+)
+from app.services.rag import RetrievedChunk
+from app.services.scaffold_cache import ScaffoldCache
+from app.services.scaffold_service import ScaffoldContext, ScaffoldService, format_sse
+
+
+def make_context(level: ScaffoldLevel = ScaffoldLevel.LEVEL_1) -> ScaffoldContext:
+    return ScaffoldContext(
+        attempt_id=uuid4(), teacher_id=uuid4(), problem_id=uuid4(), step_number=2, level=level,
+        student_answer="x = 4", problem_text="Resuelve 2x + 1 = 5", expected_step="2x = 4",
+        error_type="PROCEDURE", affected_concept="despejar",
+    )
+
+
+def make_service(**kwargs) -> ScaffoldService:
+    kwargs.setdefault("saver", lambda *args: None)
+    kwargs.setdefault("cache", ScaffoldCache(store=MemoryStore(), enabled=False))
+    return ScaffoldService(**kwargs)
+
+
+def collect(service: ScaffoldService, context: ScaffoldContext):
+    """Events with the time each arrived, relative to the start"""
+    async def scenario():
+        start = time.perf_counter()
+        return [(event, data, time.perf_counter() - start)
+                async for event, data in service.stream(context)]
+    return asyncio.run(scenario())
+
+
+class NotesRetriever:
+    """Retriever returning fixed notes and recording queries"""
+
+    def __init__(self):
+        self.queries = []
+
+    def retrieve(self, teacher_id, query, problem_id=None, top_k=None):
+        self.queries.append((teacher_id, query, problem_id))
+        return [RetrievedChunk(id="c", text="Para despejar, haz lo mismo en ambos lados.",
+                               metadata={}, score=0.9)]
+
+
+class TestScaffoldStreaming:
+    """Test tokens are forwarded as they arrive"""
+
+    def test_first_token_arrives_before_generation_ends(self):
+        """Test time-to-first-token is the provider's, not the full generation time"""
+        provider = FakeProvider(first_token_delay=0.05, token_delay=0.02)
+        saved = []
+        service = make_service(provider=provider, saver=lambda *args: saved.append(args))
+
+        events = collect(service, make_context())
+        tokens = [(data, at) for event, data, at in events if event == "token"]
+
+        assert len(tokens) == len(provider.tokens())
+        assert tokens[0][1] < 0.05 + 0.1
+        assert events[-1][2] - tokens[0][1] >= 0.02 * (len(tokens) - 1) * 0.9
+
+    def test_completed_stream_is_persisted(self):
+        """Test the full text is saved on the attempt once the stream ends"""
+        saved = []
+        service = make_service(provider=FakeProvider(text="¿Qué has hecho con el 1?"),
+                                  saver=lambda *args: saved.append(args))
+        context = make_context()
+
+        events = collect(service, context)
+
+        attempt_id, scaffold = saved[0]
+        assert attempt_id == context.attempt_id
+        assert scaffold["text"] == "¿Qué has hecho con el 1?"
+        assert scaffold["level"] == "LEVEL_1"
+        assert events[-1][0] == "done"
+        assert events[-1][1]["scaffold"] == scaffold
+
+    def test_failure_before_first_token_raises(self):
+        """Test a provider that is down fails the request instead of the stream"""
+        saved = []
+        service = make_service(provider=FakeProvider(error=LLMUnavailable("down")),
+                                  saver=lambda *args: saved.append(args))
+
+        with pytest.raises(LLMUnavailable):
+            collect(service, make_context())
+        assert saved == []
+
+    def test_failure_mid_stream_is_not_persisted(self):
+        """Test an interrupted stream ends with an error event and saves nothing"""
+        saved = []
+        provider = FakeProvider(error=LLMUnavailable("reset"), error_after=3)
+        service = make_service(provider=provider, saver=lambda *args: saved.append(args))
+
+        events = collect(service, make_context())
+
+        assert [event for event, _, _ in events] == ["token"] * 3 + ["error"]
+        assert saved == []
+
+    def test_level_two_includes_teacher_notes(self):
+        """Test Level-2 hints retrieve the teacher's notes into the prompt"""
+        retriever = NotesRetriever()
+        service = make_service(provider=FakeProvider(), retriever=retriever,
+                                  saver=lambda *args: None)
+        context = make_context(ScaffoldLevel.LEVEL_2)
+
+        collect(service, context)
+
+        assert retriever.queries == [(context.teacher_id, "despejar x = 4", context.problem_id)]
+        assert "haz lo mismo en ambos lados" in service.build_request(context).prompt
+
+    def test_sse_frame(self):
+        """Test events are framed as server-sent events"""
+        assert format_sse("token", {"text": "¿Qué"}) == 'event: token\ndata: {"text": "¿Qué"}\n\n'
+
+
+def sse_body(events: list[dict]) -> bytes:
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode("utf-8")
+
+
+def run_provider(provider, request=LLMRequest(system="s", prompt="p")) -> list[str]:
+    async def scenario():
+        try:
+            return [fragment async for fragment in provider.stream(request)]
+        finally:
+            await provider.aclose()
+    return asyncio.run(scenario())
+
+
+class TestHTTPProviders:
+    """Test provider streams are parsed into text fragments"""
+
+    def test_anthropic_stream(self):
+        """Test content_block_delta events become fragments"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.headers["x-api-key"] == "key"
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=sse_body([
+                {"type": "message_start", "message": {}},
+                {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "¿Qué "}},
+                {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "ves?"}},
+                {"type": "message_stop"},
+            ]))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert run_provider(AnthropicProvider(client, api_key="key")) == ["¿Qué ", "ves?"]
+
+    def test_google_stream(self):
+        """Test candidate parts become fragments"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["alt"] == "sse"
+            return httpx.Response(200, content=sse_body([
+                {"candidates": [{"content": {"parts": [{"text": "Piensa "}]}}]},
+                {"candidates": [{"content": {"parts": [{"text": "otra vez"}]}}]},
+            ]))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert run_provider(GoogleProvider(client, api_key="key")) == ["Piensa ", "otra vez"]
+
+    def test_rate_limited_provider_is_unavailable(self):
+        """Test HTTP errors carry the provider's Retry-After"""
+        client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(429, headers={"retry-after": "12"})))
+
+        with pytest.raises(LLMUnavailable) as excinfo:
+            run_provider(AnthropicProvider(client, api_key="key"))
+        assert excinfo.value.retry_after == 12
+
+    def test_missing_key_is_unavailable(self):
+        """Test an unconfigured provider fails without a request"""
+        with pytest.raises(LLMUnavailable):
+            run_provider(GoogleProvider(api_key=""))
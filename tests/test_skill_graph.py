@@ -0,0 +1,124 @@
+"""Tests for the skill tree DAG index"""
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.models.skill import SkillStatus
+
+from app.services.skill_tree_service import SkillGraphCache, SkillGraphIndex
+
+SKILLS = ["algebra-1", "algebra-2", "algebra-3", "calculus-1", "calculus-2"]
+EDGES = [
+    ("algebra-2", "algebra-1"),
+    ("algebra-3", "algebra-2"),
+    ("calculus-1", "algebra-2"),
+    ("calculus-2", "calculus-1"),
+    ("calculus-2", "algebra-3"),
+]
+
+
+@pytest.fixture
+def graph():
+    return SkillGraphIndex(SKILLS, EDGES)
+
+
+class TestSkillGraphIndex:
+    """Test the compact DAG index"""
+
+    def test_topological_order(self, graph):
+        """Test prerequisites come before their dependents"""
+        position = {graph.skill_ids[node]: i for i, node in enumerate(graph.topological_order)}
+        for skill_id, depends_on in EDGES:
+            assert position[depends_on] < position[skill_id]
+
+    def test_transitive_closure(self, graph):
+        """Test ancestors and descendants follow every path"""
+        assert graph.ancestors("calculus-2") == {"algebra-1", "algebra-2", "algebra-3", "calculus-1"}
+        assert graph.ancestors("algebra-1") == set()
+        assert graph.descendants("algebra-2") == {"algebra-3", "calculus-1", "calculus-2"}
+
+    def test_available_skills(self, graph):
+        """Test unlocks only require the direct prerequisites to be mastered"""
+        assert graph.available_skills(set()) == {"algebra-1"}
+        assert graph.available_skills({"algebra-1", "algebra-2"}) == {"algebra-3", "calculus-1"}
+        assert not graph.is_unlocked("calculus-2", {"algebra-1", "algebra-2", "calculus-1"})
+        assert graph.is_unlocked(
+            "calculus-2", {"algebra-1", "algebra-2", "algebra-3", "calculus-1"})
+
+    def test_unlock_changes(self, graph):
+        """Test the frontier unlocks and relocks only LOCKED/AVAILABLE skills"""
+        statuses = {
+            "algebra-1": SkillStatus.MASTERED,
+            "algebra-2": SkillStatus.MASTERED,
+            "algebra-3": SkillStatus.LOCKED,
+            "calculus-1": SkillStatus.IN_PROGRESS,
+            "calculus-2": SkillStatus.AVAILABLE,
+        }
+
+        to_unlock, to_lock = graph.unlock_changes(statuses)
+
+        assert to_unlock == {"algebra-3"}
+        assert to_lock == {"calculus-2"}
+
+    def test_cycle_is_rejected(self):
+        """Test a cyclic dependency raises ValueError"""
+        with pytest.raises(ValueError):
+            SkillGraphIndex(["a", "b"], [("a", "b"), ("b", "a")])
+
+    def test_unknown_skill_is_rejected(self):
+        """Test edges to missing skills raise ValueError"""
+        with pytest.raises(ValueError):
+            SkillGraphIndex(["a"], [("a", "missing")])
+
+    def test_large_graph_bitsets(self):
+        """Test bitsets work beyond 64 skills"""
+        skills = [f"skill-{i}" for i in range(200)]
+        edges = [(skills[i], skills[i - 1]) for i in range(1, 200)]
+
+        chain = SkillGraphIndex(skills, edges)
+
+        assert len(chain.ancestors("skill-199")) == 199
+        assert chain.available_skills(set(skills[:150])) == {"skill-150"}
+
+
+class FakeGraphDB:
+    """Session stand-in returning fixed skills and edges"""
+
+    def __init__(self, skills, edges):
+        self.skills, self.edges = skills, edges
+
+    def scalars(self, statement):
+        return iter(self.skills)
+
+    def execute(self, statement):
+        edges = self.edges
+
+        class Result:
+            def all(self):
+                return edges
+        return Result()
+
+
+class TestSkillGraphCache:
+    """Test version-stamped invalidation"""
+
+    def test_invalidate_bumps_version(self):
+        """Test invalidation makes a built index stale"""
+        cache = SkillGraphCache(store=MemoryStore(), ttl_seconds=60)
+        index = SkillGraphIndex(SKILLS, EDGES, version=cache.version)
+
+        cache.invalidate()
+
+        assert index.version != cache.version
+
+    def test_invalidation_reaches_other_processes(self):
+        """Test a bump by one process makes every process rebuild"""
+        kv = MemoryStore()
+        db = FakeGraphDB(SKILLS, EDGES)
+        local = SkillGraphCache(store=kv, ttl_seconds=60)
+        other = SkillGraphCache(store=kv, ttl_seconds=60)
+        assert other.get(db) is other.get(db)
+
+        db.edges = []
+        local.invalidate()
+
+        assert other.get(db).ancestors("algebra-2") == set()
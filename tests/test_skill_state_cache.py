@@ -0,0 +1,383 @@
+"""Tests for incremental BKT updates with write-behind persistence"""
+import fcntl
+import shutil
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.core.kvstore import MemoryStore
+from app.models.skill import SkillStatus
+from app.services.bkt_service import (
+    PARAMS_GENERATION_KEY,
+    STATES_GENERATION_KEY,
+    bkt_update,
+    bump_generation,
+)
+from app.services.skill_state_cache import SkillStateCache
+
+
+class FakeSkillStates:
+    """In-memory stand-in for the skill_states table"""
+
+    def __init__(self):
+        self.rows = {}
+        self.writes = []
+        self.fail_next_write = False
+        self.mastered_batches = []
+        self.unlocks = {}
+
+    def add(self, student_id, skill_id, probability=0.1, status=SkillStatus.AVAILABLE,
+            bkt_params=None):
+        state_id = uuid4()
+        self.rows[(student_id, skill_id)] = {
+            "id": state_id,
+            "domain_probability": probability,
+            "status": status,
+            "bkt_params": bkt_params or {},
+            "last_activity": None,
+        }
+        return state_id
+
+    def load(self, student_id, skill_id):
+        row = self.rows.get((student_id, skill_id))
+        return dict(row) if row else None
+
+    def write(self, rows):
+        if self.fail_next_write:
+            self.fail_next_write = False
+            raise RuntimeError("database unavailable")
+        self.writes.append(rows)
+        by_id = {row["id"]: row for row in rows}
+        for stored in self.rows.values():
+            if stored["id"] in by_id:
+                stored.update(by_id[stored["id"]])
+
+    def propagate(self, student_ids):
+        self.mastered_batches.append(set(student_ids))
+        return {student_id: self.unlocks[student_id]
+                for student_id in student_ids if student_id in self.unlocks}
+
+
+@pytest.fixture
+def store():
+    return FakeSkillStates()
+
+
+@pytest.fixture
+def kv():
+    return MemoryStore()
+
+
+@pytest.fixture
+def cache(store, kv, tmp_path):
+    return SkillStateCache(
+        loader=store.load,
+        writer=store.write,
+        store=kv,
+        journal_path=str(tmp_path / "bkt.journal"),
+        flush_interval=60,
+        max_batch=1000,
+        fsync=False,
+        on_mastered=store.propagate,
+    )
+
+
+class TestSkillStateCache:
+    """Test cached BKT updates"""
+
+    def test_attempt_updates_probability_without_writing(self, cache, store):
+        """Test attempts are applied in memory and not written synchronously"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        entry = cache.record_attempt(student_id, "algebra-1", True)
+
+        expected = bkt_update(0.1, True, settings.BKT_P_T, settings.BKT_P_S, settings.BKT_P_G)
+        assert entry.probability == pytest.approx(expected)
+        assert entry.status == SkillStatus.IN_PROGRESS
+        assert store.writes == []
+
+    def test_read_your_writes(self, cache, store):
+        """Test reads see unflushed updates"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        cache.record_attempt(student_id, "algebra-1", True)
+        cache.record_attempt(student_id, "algebra-1", True)
+
+        assert cache.get(student_id, "algebra-1").probability > 0.5
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] == 0.1
+
+    def test_mastery_threshold(self, cache, store):
+        """Test status flips to MASTERED above the mastery threshold"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        for _ in range(5):
+            entry = cache.record_attempt(student_id, "algebra-1", True)
+
+        assert entry.probability >= settings.BKT_MASTERY_THRESHOLD
+        assert entry.status == SkillStatus.MASTERED
+
+    def test_per_skill_overrides(self, cache, store):
+        """Test SkillState.bkt_params overrides are used"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1", bkt_params={"P_T": 0.9})
+
+        entry = cache.record_attempt(student_id, "algebra-1", False)
+
+        assert entry.probability >= 0.9
+
+    def test_flush_writes_one_batch(self, cache, store):
+        """Test dirty states are written together and the journal cleared"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        store.add(student_id, "algebra-2")
+        for _ in range(3):
+            cache.record_attempt(student_id, "algebra-1", True)
+        cache.record_attempt(student_id, "algebra-2", False)
+
+        assert cache.flush() == 2
+        assert len(store.writes) == 1
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] > 0.1
+        assert not cache.journal_path.exists()
+        assert cache.flush() == 0
+
+    def test_unknown_state_is_ignored(self, cache):
+        """Test attempts without a skill state are skipped"""
+        assert cache.record_attempt(uuid4(), "missing", True) is None
+
+    def test_failed_flush_is_retried(self, cache, store):
+        """Test a failed write keeps the states dirty and journaled"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        cache.record_attempt(student_id, "algebra-1", True)
+        store.fail_next_write = True
+
+        assert cache.flush() == 0
+        assert cache.journal_path.exists()
+        assert cache.flush() == 1
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] > 0.1
+
+    def test_journal_replayed_after_crash(self, cache, store, tmp_path):
+        """Test a restarted process writes back journaled but unflushed updates"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        entry = cache.record_attempt(student_id, "algebra-1", True)
+
+        # Simulate a crash: the cache is lost, the journal is not
+        restarted = SkillStateCache(
+            loader=store.load, writer=store.write, store=MemoryStore(),
+            journal_path=str(tmp_path / "bkt.journal"), fsync=False, on_mastered=None)
+
+        assert restarted.recover() == 1
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] == \
+            pytest.approx(entry.probability)
+        assert not cache.journal_path.exists()
+
+    def test_background_flusher(self, store, kv, tmp_path):
+        """Test the background thread flushes once the batch is full"""
+        cache = SkillStateCache(
+            loader=store.load, writer=store.write, store=kv,
+            journal_path=str(tmp_path / "bkt.journal"),
+            flush_interval=60, max_batch=1, fsync=False, on_mastered=None)
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        cache.start()
+        try:
+            cache.record_attempt(student_id, "algebra-1", True)
+        finally:
+            cache.stop()
+
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] > 0.1
+
+    def test_mastery_triggers_unlock_after_flush(self, cache, store):
+        """Test mastered students are propagated once their states are written"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        store.add(student_id, "algebra-2", status=SkillStatus.LOCKED)
+        store.unlocks[student_id] = {"algebra-2"}
+        cache.get(student_id, "algebra-2")
+
+        for _ in range(5):
+            cache.record_attempt(student_id, "algebra-1", True)
+        assert store.mastered_batches == []
+
+        cache.flush()
+
+        assert store.mastered_batches == [{student_id}]
+        assert cache.get(student_id, "algebra-2").status == SkillStatus.AVAILABLE
+
+    def test_locked_attempt_does_not_undo_unlock(self, cache, store):
+        """Test a pending LOCKED row is rewritten when the skill is unlocked"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-2", status=SkillStatus.LOCKED)
+        cache.record_attempt(student_id, "algebra-2", False)
+
+        cache.apply_statuses({student_id: {"algebra-2": SkillStatus.AVAILABLE}})
+        cache.flush()
+
+        assert store.rows[(student_id, "algebra-2")]["status"] == SkillStatus.AVAILABLE
+
+
+class TestSharedSkillStates:
+    """Test cached states shared by several workers"""
+
+    @pytest.fixture
+    def worker(self, store, kv, tmp_path):
+        return SkillStateCache(
+            loader=store.load, writer=store.write, store=kv,
+            journal_path=str(tmp_path / "worker" / "bkt.journal"),
+            flush_interval=60, max_batch=1000, fsync=False, on_mastered=None)
+
+    def test_workers_apply_attempts_to_the_same_state(self, cache, worker, store):
+        """Test an attempt on one worker sees the attempts applied by another"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        first = cache.record_attempt(student_id, "algebra-1", True)
+        second = worker.record_attempt(student_id, "algebra-1", True)
+
+        expected = bkt_update(first.probability, True, settings.BKT_P_T,
+                              settings.BKT_P_S, settings.BKT_P_G)
+        assert second.probability == pytest.approx(expected)
+
+    def test_flush_does_not_overwrite_newer_state(self, cache, worker, store):
+        """Test a worker flushing later writes the latest shared state, not its own"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        cache.record_attempt(student_id, "algebra-1", True)
+        latest = worker.record_attempt(student_id, "algebra-1", True)
+
+        worker.flush()
+        cache.flush()
+
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] == \
+            pytest.approx(latest.probability)
+
+    def test_recompute_drops_cached_states(self, cache, store, kv):
+        """Test a new states generation reloads states and drops unflushed rows"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        cache.record_attempt(student_id, "algebra-1", True)
+
+        store.rows[(student_id, "algebra-1")]["domain_probability"] = 0.42
+        bump_generation(STATES_GENERATION_KEY, store=kv)
+
+        assert cache.flush() == 0
+        assert store.writes == []
+        assert cache.get(student_id, "algebra-1").probability == 0.42
+
+    def test_fitted_params_reloaded(self, cache, store, kv):
+        """Test a new params generation keeps L(t) and uses the fitted parameters"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        entry = cache.record_attempt(student_id, "algebra-1", False)
+
+        store.rows[(student_id, "algebra-1")]["bkt_params"] = {"P_T": 0.9}
+        bump_generation(PARAMS_GENERATION_KEY, store=kv)
+
+        reloaded = cache.get(student_id, "algebra-1")
+        assert reloaded.probability == pytest.approx(entry.probability)
+        assert reloaded.params["P_T"] == 0.9
+
+    def test_journal_is_per_process(self, cache, tmp_path):
+        """Test the journal file name carries the process id"""
+        assert cache.journal_path.parent == tmp_path
+        assert cache.journal_path.name != "bkt.journal"
+        assert cache.journal_path.name.startswith("bkt.")
+
+    def test_orphaned_journal_replayed(self, cache, store, tmp_path):
+        """Test journals of dead workers are replayed on startup"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        entry = cache.record_attempt(student_id, "algebra-1", True)
+        orphan = tmp_path / "bkt.999999.journal"
+        shutil.copy(cache.journal_path, orphan)
+        cache.journal_path.unlink()
+
+        restarted = SkillStateCache(
+            loader=store.load, writer=store.write, store=MemoryStore(),
+            journal_path=str(tmp_path / "bkt.journal"), fsync=False, on_mastered=None)
+
+        assert restarted.recover() == 1
+        assert store.rows[(student_id, "algebra-1")]["domain_probability"] == \
+            pytest.approx(entry.probability)
+        assert not orphan.exists()
+
+    def test_live_worker_journal_left_alone(self, cache, store, tmp_path):
+        """Test journals still locked by a running worker are not replayed"""
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+        cache.record_attempt(student_id, "algebra-1", True)
+        live = tmp_path / "bkt.999999.journal"
+        shutil.copy(cache.journal_path, live)
+        cache.journal_path.unlink()
+
+        with open(tmp_path / "bkt.999999.journal.lock", "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            restarted = SkillStateCache(
+                loader=store.load, writer=store.write, store=MemoryStore(),
+                journal_path=str(tmp_path / "bkt.journal"), fsync=False, on_mastered=None)
+
+            assert restarted.recover() == 0
+            assert live.exists()
+
+    def test_concurrent_attempts_are_not_lost(self, store, tmp_path):
+        """Test attempts racing on two workers are all applied to the shared state"""
+        class SlowStore(MemoryStore):
+            def get(self, key):
+                value = super().get(key)
+                time.sleep(0.01)  # widen the window between read and write
+                return value
+
+        kv = SlowStore()
+        cache, worker = (SkillStateCache(
+            loader=store.load, writer=store.write, store=kv,
+            journal_path=str(tmp_path / name / "bkt.journal"), fsync=False, on_mastered=None)
+            for name in ("a", "b"))
+        student_id = uuid4()
+        params = {"P_T": 0.01, "P_S": 0.4, "P_G": 0.45}
+        store.add(student_id, "algebra-1", probability=0.5, bkt_params=params)
+        barrier = threading.Barrier(8)
+
+        def attempt(worker_cache):
+            barrier.wait()
+            worker_cache.record_attempt(student_id, "algebra-1", False)
+
+        threads = [threading.Thread(target=attempt, args=(c,)) for c in [cache, worker] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = 0.5
+        for _ in range(8):
+            expected = bkt_update(expected, False, params["P_T"], params["P_S"], params["P_G"])
+        assert cache.get(student_id, "algebra-1").probability == pytest.approx(expected)
+
+
+class TestJournalSync:
+    """Test journal fsyncs are batched off the request path"""
+
+    def test_attempts_do_not_fsync(self, store, kv, tmp_path, monkeypatch):
+        """Test attempts only append; one fsync covers all of them"""
+        fsyncs = []
+        monkeypatch.setattr("app.services.skill_state_cache.os.fsync", fsyncs.append)
+        cache = SkillStateCache(
+            loader=store.load, writer=store.write, store=kv,
+            journal_path=str(tmp_path / "bkt.journal"), fsync=True, on_mastered=None)
+        student_id = uuid4()
+        store.add(student_id, "algebra-1")
+
+        for _ in range(3):
+            cache.record_attempt(student_id, "algebra-1", True)
+        assert fsyncs == []
+
+        cache._sync_journal()
+        cache._sync_journal()
+        assert len(fsyncs) == 1
@@ -0,0 +1,167 @@
+"""Tests for the memory-mapped local vector store"""
+import json
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.services.rag import LocalVectorStore, MemoryVectorStore
+
+
+def corpus(teacher_id, size: int, dimension: int = 32, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = [f"{teacher_id}:page:block{i}:0" for i in range(size)]
+    embeddings = rng.standard_normal((size, dimension)).astype(np.float32)
+    documents = [f"Bloque {i}" for i in range(size)]
+    metadatas = [{"teacher_id": str(teacher_id), "page_id": "page"} for _ in range(size)]
+    return ids, embeddings, documents, metadatas
+
+
+@pytest.fixture
+def teacher_id():
+    return uuid4()
+
+
+class TestLocalVectorStore:
+    """Test per-teacher collections on disk"""
+
+    def test_matches_exact_search(self, tmp_path, teacher_id):
+        """Test float32 collections return the same ranking as brute force in memory"""
+        local, memory = LocalVectorStore(str(tmp_path), dtype="float32"), MemoryVectorStore()
+        rows = corpus(teacher_id, 200)
+        local.upsert(*rows)
+        memory.upsert(*rows)
+        query = np.random.default_rng(1).standard_normal(32)
+        where = {"teacher_id": str(teacher_id)}
+
+        expected = memory.query(query, 5, where)
+        result = local.query(query, 5, where)
+
+        assert [chunk.id for chunk in result] == [chunk.id for chunk in expected]
+        assert result[0].score == pytest.approx(expected[0].score, abs=1e-5)
+
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    def test_quantized_recall(self, tmp_path, teacher_id, dtype):
+        """Test quantized collections keep almost every true neighbour"""
+        local, memory = LocalVectorStore(str(tmp_path), dtype=dtype), MemoryVectorStore()
+        rows = corpus(teacher_id, 500)
+        local.upsert(*rows)
+        memory.upsert(*rows)
+        where = {"teacher_id": str(teacher_id)}
+
+        hits = 0
+        for query in np.random.default_rng(2).standard_normal((20, 32)):
+            expected = {chunk.id for chunk in memory.query(query, 10, where)}
+            hits += len(expected & {chunk.id for chunk in local.query(query, 10, where)})
+
+        assert hits / 200 >= 0.9
+
+    def test_vectors_are_memory_mapped(self, tmp_path, teacher_id):
+        """Test queries read the matrix through a read-only mapping"""
+        store = LocalVectorStore(str(tmp_path), dtype="float16")
+        store.upsert(*corpus(teacher_id, 10))
+
+        segment = store._load(str(teacher_id)).segments[0]
+
+        assert isinstance(segment.vectors, np.memmap)
+        assert segment.vectors.dtype == np.float16
+
+    def test_writes_are_visible_to_other_instances(self, tmp_path, teacher_id):
+        """Test another process picks up upserts and deletes on its next query"""
+        writer, reader = LocalVectorStore(str(tmp_path)), LocalVectorStore(str(tmp_path))
+        ids, embeddings, documents, metadatas = corpus(teacher_id, 3)
+        writer.upsert(ids, embeddings, documents, metadatas)
+        assert len(reader.query(embeddings[0], 5, {"teacher_id": str(teacher_id)})) == 3
+
+        writer.delete(ids[:2])
+        writer.upsert(ids[2:], embeddings[:1], ["Bloque editado"], metadatas[2:])
+        result = reader.query(embeddings[0], 5, {"teacher_id": str(teacher_id)})
+
+        assert [(chunk.id, chunk.text) for chunk in result] == [(ids[2], "Bloque editado")]
+        assert len(list((tmp_path / str(teacher_id)).glob("vectors-*.npy"))) == \
+            len(reader._load(str(teacher_id)).segments)
+
+    def test_upsert_appends_a_segment(self, tmp_path, teacher_id):
+        """Test an incremental upsert only writes its own rows"""
+        store = LocalVectorStore(str(tmp_path))
+        ids, embeddings, documents, metadatas = corpus(teacher_id, 100)
+        store.upsert(ids, embeddings, documents, metadatas)
+        first = store._load(str(teacher_id)).segments[0]
+
+        store.upsert(ids[:2], -embeddings[:2], ["Editado 0", "Editado 1"], metadatas[:2])
+        collection = store._load(str(teacher_id))
+
+        assert collection.segments[0] is first
+        assert [len(segment.ids) for segment in collection.segments] == [100, 2]
+        assert len(collection) == 100
+        result = store.query(-embeddings[0], 1, {"teacher_id": str(teacher_id)})
+        assert [(chunk.id, chunk.text) for chunk in result] == [(ids[0], "Editado 0")]
+
+    def test_compaction_merges_segments(self, tmp_path, teacher_id):
+        """Test too many segments are rewritten into one and old files removed"""
+        store = LocalVectorStore(str(tmp_path), max_segments=3)
+        ids, embeddings, documents, metadatas = corpus(teacher_id, 8)
+        for i in range(0, 8, 2):
+            store.upsert(ids[i:i + 2], embeddings[i:i + 2], documents[i:i + 2],
+                         metadatas[i:i + 2])
+
+        collection = store._load(str(teacher_id))
+        directory = tmp_path / str(teacher_id)
+
+        assert len(collection.segments) == 1
+        assert collection.ids == ids
+        assert len(list(directory.glob("vectors-*.npy"))) == 1
+        assert len(list(directory.glob("segment-*.json"))) == 1
+
+    def test_reads_and_upgrades_single_file_collections(self, tmp_path, teacher_id):
+        """Test collections whose manifest holds every row keep working"""
+        store = LocalVectorStore(str(tmp_path))
+        ids, embeddings, documents, metadatas = corpus(teacher_id, 4)
+        directory = tmp_path / str(teacher_id)
+        directory.mkdir()
+        np.save(directory / "vectors-old.npy", store._quantize(embeddings)[0])
+        (directory / "chunks.json").write_text(json.dumps({
+            "version": "old", "dtype": "float32", "ids": ids, "documents": documents,
+            "metadatas": metadatas, "scales": None}))
+
+        assert store.query(embeddings[1], 1, {"teacher_id": str(teacher_id)})[0].id == ids[1]
+        store.upsert(ids[:1], embeddings[3:], ["Editado"], metadatas[:1])
+
+        reader = LocalVectorStore(str(tmp_path))
+        result = reader.query(embeddings[3], 2, {"teacher_id": str(teacher_id)})
+        assert {(chunk.id, chunk.text) for chunk in result} == {(ids[0], "Editado"),
+                                                                 (ids[3], documents[3])}
+
+    def test_collections_are_isolated_per_teacher(self, tmp_path, teacher_id):
+        """Test a teacher's query never returns another teacher's chunks"""
+        other_teacher = uuid4()
+        store = LocalVectorStore(str(tmp_path))
+        store.upsert(*corpus(teacher_id, 5))
+        store.upsert(*corpus(other_teacher, 5, seed=3))
+
+        result = store.query(np.ones(32), 10, {"teacher_id": str(teacher_id)})
+
+        assert {chunk.metadata["teacher_id"] for chunk in result} == {str(teacher_id)}
+        assert len(store) == 10
+
+    def test_deleting_everything_empties_the_collection(self, tmp_path, teacher_id):
+        """Test a collection without chunks returns no results"""
+        store = LocalVectorStore(str(tmp_path), dtype="int8")
+        ids, *rest = corpus(teacher_id, 4)
+        store.upsert(ids, *rest)
+
+        store.delete(ids)
+
+        assert store.query(np.ones(32), 3, {"teacher_id": str(teacher_id)}) == []
+        assert len(store) == 0
+
+    def test_extra_filters_apply(self, tmp_path, teacher_id):
+        """Test metadata filters other than the teacher narrow the results"""
+        store = LocalVectorStore(str(tmp_path))
+        ids, embeddings, documents, metadatas = corpus(teacher_id, 6)
+        metadatas[0]["page_id"] = "otra"
+        store.upsert(ids, embeddings, documents, metadatas)
+
+        result = store.query(embeddings[1], 6, {"teacher_id": str(teacher_id), "page_id": "otra"})
+
+        assert [chunk.id for chunk in result] == [ids[0]]
@@ -0,0 +1,151 @@
+"""Tests for the submission verdict cache"""
+from dataclasses import dataclass
+from uuid import uuid4
+
+import pytest
+
+from app.core.kvstore import MemoryStore
+from app.models.problem import Language
+from app.services.sandbox import LocalBackend, SandboxPool, SubmissionResult, VerdictCache
+from app.services.sandbox.verdict_cache import hash_test_cases, normalize_source
+
+
+@dataclass
+class Case:
+    input: str
+    expected_output: str
+    is_hidden: bool = False
+    id: str = ""
+
+    def __post_init__(self):
+        self.id = self.id or str(uuid4())
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(backend=LocalBackend(), sizes={Language.PYTHON: 1},
+                       acquire_timeout=10, health_check_interval=60, enabled=True)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+@pytest.fixture
+def cache():
+    return VerdictCache(store=MemoryStore(), ttl_seconds=60, enabled=True)
+
+
+class TestNormalization:
+    """Test formatting-insensitive source normalization"""
+
+    def test_python_ignores_comments_and_blank_lines(self):
+        """Test comments, blank lines and indentation width are ignored"""
+        first = "def f(x):\n    return x * 2  # double\n\n\nprint(f(3))\n"
+        second = "# helper\ndef f(x):\n  return x*2\nprint(f(3))"
+
+        assert normalize_source(Language.PYTHON, first) == normalize_source(Language.PYTHON, second)
+
+    def test_python_string_contents_matter(self):
+        """Test whitespace inside literals is preserved"""
+        assert normalize_source(Language.PYTHON, "print('a  b')") != \
+            normalize_source(Language.PYTHON, "print('a b')")
+
+    def test_cpp_ignores_comments_and_whitespace(self):
+        """Test comments and layout are ignored for C-like languages"""
+        first = "int main() {\n  // entry\n  return 0; /* done */\n}\n"
+        second = "int main(){return 0;}"
+
+        assert normalize_source(Language.CPP, first) == normalize_source(Language.CPP, second)
+
+    def test_cpp_keeps_meaningful_spaces(self):
+        """Test spaces that separate operators and literal contents are kept"""
+        assert normalize_source(Language.CPP, "x = a - -b;") != \
+            normalize_source(Language.CPP, "x = a--b;")
+        assert normalize_source(Language.JAVA, 'print("a // b");') == 'print("a // b");'
+
+    def test_cpp_preprocessor_lines_end_at_newline(self):
+        """Test a directive swallowing the next line never shares a key with the original"""
+        def cpp(source):
+            return normalize_source(Language.CPP, source)
+
+        assert cpp("#define N 10\nint main(){return N;}") != \
+            cpp("#define N 10 int main(){return N;}")
+        assert cpp("#define X 1 // c\n+2") != cpp("#define X 1 +2")
+        assert cpp("#include <cstdio>\n\n  int main() { }\n") == \
+            cpp("#include <cstdio>\nint main(){}")
+
+    def test_test_case_hash_changes_on_edit(self):
+        """Test editing a test case changes the set hash"""
+        case = Case("1", "2")
+        before = hash_test_cases([case])
+        case.expected_output = "3"
+
+        assert hash_test_cases([case]) != before
+
+
+class TestVerdictCache:
+    """Test cached submission runs"""
+
+    def test_resubmission_is_served_from_cache(self, cache, pool):
+        """Test an equivalent resubmission does not hit the sandbox"""
+        problem_id = uuid4()
+        cases = [Case("2", "4")]
+        first = cache.run(problem_id, Language.PYTHON, "print(int(input())*2)", cases,
+                          pool=pool, timeout=5)
+
+        pool.stop()  # any sandbox use would now fail
+        try:
+            second = cache.run(problem_id, Language.PYTHON,
+                               "# retry\nprint(int(input()) * 2)\n", cases, pool=pool, timeout=5)
+        finally:
+            pool.start()
+
+        assert first.accepted and second.accepted
+        assert second.cases[0].test_case_id == cases[0].id
+
+    def test_edited_test_cases_miss(self, cache, pool):
+        """Test a verdict is not reused after the test cases change"""
+        problem_id = uuid4()
+        case = Case("2", "4")
+        source = "print(int(input())*2)"
+        assert cache.run(problem_id, Language.PYTHON, source, [case], pool=pool, timeout=5).accepted
+
+        case.expected_output = "5"
+
+        assert not cache.run(problem_id, Language.PYTHON, source, [case],
+                             pool=pool, timeout=5).accepted
+
+    def test_key_includes_run_options(self, cache):
+        """Test verdicts under a different time limit or stop policy are kept apart"""
+        problem_id, cases = uuid4(), [Case("1", "2")]
+
+        keys = {
+            cache.key(problem_id, Language.PYTHON, cases, "print(2)", timeout=1,
+                      stop_on_hidden_failure=True),
+            cache.key(problem_id, Language.PYTHON, cases, "print(2)", timeout=5,
+                      stop_on_hidden_failure=True),
+            cache.key(problem_id, Language.PYTHON, cases, "print(2)", timeout=1,
+                      stop_on_hidden_failure=False),
+        }
+
+        assert len(keys) == 3
+
+    def test_invalidate_problem(self, cache):
+        """Test invalidation drops every verdict of the problem"""
+        problem_id = uuid4()
+        cases = [Case("1", "1")]
+        key = cache.key(problem_id, Language.PYTHON, cases, "print(1)")
+        cache.put(problem_id, key, SubmissionResult())
+
+        assert cache.invalidate_problem(problem_id) == 1
+        assert cache.get(key) is None
+
+    def test_timeouts_are_not_cached(self, cache, pool):
+        """Test verdicts containing timeouts are recomputed next time"""
+        problem_id = uuid4()
+        cases = [Case("1", "1")]
+        source = "while True:\n    pass\n"
+
+        cache.run(problem_id, Language.PYTHON, source, cases, pool=pool, timeout=0.3)
+
+        assert cache.get(cache.key(problem_id, Language.PYTHON, cases, source)) is None